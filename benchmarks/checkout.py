@@ -0,0 +1,53 @@
+"""
+Desglose de tiempos de `get_form` por pasarela, contra las pasarelas falsas locales.
+
+Muestra por fase (URLs, firma, HTTP, JSON, otros) la mediana y el p95 en milisegundos. Los
+pagos no se guardan (`PersistenciaNula`), así que la fase de base de datos no aparece.
+
+    python -m benchmarks.checkout [iteraciones] [--perfil cprofile|pyinstrument] [--salida archivo]
+"""
+
+# `benchmarks.solicitudes` configura Django antes de que se importen los proveedores
+from benchmarks.solicitudes import Pago, argumentos
+from payments import RedirectNeeded
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.KhipuProvider import KhipuProvider
+from django_payments_chile.perfilado import estadisticas, perfilador
+from django_payments_chile.testing import PasarelasFalsas
+from django_payments_chile.WebpayProvider import WebpayProvider
+
+PERSISTENCIA = "django_payments_chile.persistencia.PersistenciaNula"
+
+
+def proveedores(url: str) -> dict:
+    return {
+        "flow": FlowProvider("flow_key", "flow_secret", f"{url}/flow", persistencia=PERSISTENCIA),
+        "khipu": KhipuProvider("khipu_key", f"{url}/khipu", persistencia=PERSISTENCIA),
+        "webpay": WebpayProvider("597055555532", "webpay_secret", f"{url}/webpay/", persistencia=PERSISTENCIA),
+    }
+
+
+def crea_pagos(provider, variant: str, iteraciones: int):
+    for numero in range(iteraciones):
+        payment = Pago()
+        payment.pk = numero
+        payment.token = f"00000000-0000-4000-8000-{numero:012d}"
+        payment.variant = variant
+        payment.transaction_id = ""
+        try:
+            provider.get_form(payment)
+        except RedirectNeeded:
+            pass
+
+
+if __name__ == "__main__":
+    opciones = argumentos(__doc__.splitlines()[1], 500)
+    with PasarelasFalsas() as pasarelas:
+        for variant, provider in proveedores(pasarelas.url).items():
+            with estadisticas() as tiempos, perfilador(opciones.perfil, opciones.salida):
+                crea_pagos(provider, variant, opciones.iteraciones)
+            fases = tiempos.resumen()["get_form"]
+            print(f"{variant}: {opciones.iteraciones} pagos")
+            for fase, valores in fases.items():
+                print(f"  {fase:<6} p50={valores['p50']:>8.3f}ms p95={valores['p95']:>8.3f}ms")
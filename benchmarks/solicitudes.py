@@ -0,0 +1,117 @@
+"""
+Asignaciones de memoria al armar la solicitud de creación de pago de Flow.
+
+Compara el armado anterior (copia de la solicitud en `attrs`, ida y vuelta JSON por
+`PaymentAttributeProxy` y filtrado por listas) con `SolicitudFlow`.
+
+    python -m benchmarks.solicitudes [iteraciones] [--perfil cprofile|pyinstrument] [--salida archivo]
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+
+settings.configure(INSTALLED_APPS=["payments"], PAYMENT_HOST="example.com", USE_TZ=True)
+django.setup()
+
+from payments.models import PaymentAttributeProxy  # noqa: E402
+
+from django_payments_chile.clientes import ClienteAPI  # noqa: E402
+from django_payments_chile.perfilado import perfilador  # noqa: E402
+from django_payments_chile.solicitudes import SolicitudFlow, huella  # noqa: E402
+
+API_KEY = "flow_bench_key"  # nosec
+API_SECRET = "flow_bench_secret"  # nosec
+
+
+class Pago:
+    description = "Orden de compra 1234"
+    currency = "CLP"
+    total = 15990
+    token = "9f8e7d6c-5b4a-4392-8170-6f5e4d3c2b1a"
+    billing_email = "correo@usuario.com"
+
+    def __init__(self):
+        self.extra_data = json.dumps(
+            {
+                "datos_extra": {"optional": json.dumps({"rut": "11111111-1"}), "timeout": 600, "currency": "USD"},
+                "carro": [{"sku": f"SKU-{i}", "cantidad": 1, "precio": 990} for i in range(20)],
+            }
+        )
+        self.attrs = PaymentAttributeProxy(self)
+
+    def get_success_url(self):
+        return "https://mi-tienda.cl/pagos/exito"
+
+    def get_process_url(self):
+        return "https://mi-tienda.cl/payments/process/9f8e7d6c-5b4a-4392-8170-6f5e4d3c2b1a/"
+
+
+def anterior(payment):
+    datos = {
+        "apiKey": API_KEY,
+        "commerceOrder": str(payment.token),
+        "urlReturn": payment.get_success_url(),
+        "urlConfirmation": payment.get_process_url(),
+        "subject": payment.description,
+        "amount": int(payment.total),
+        "paymentMethod": 9,
+        "currency": payment.currency,
+    }
+    if payment.billing_email:
+        datos.update({"email": payment.billing_email})
+    extra = payment.attrs.datos_extra
+    for valor in ["commerceOrder", "urlReturn", "urlConfirmation", "amount", "subject", "paymentMethod", "currency"]:
+        if valor in extra:
+            del extra[valor]
+    datos.update(**extra)
+    payment.attrs.datos_payment_create_flow = datos
+    datos = dict(sorted(datos.items()))
+    datos.update({"s": ClienteAPI.genera_firma(datos, API_SECRET)})
+    return datos
+
+
+def actual(payment, solicitud=SolicitudFlow(API_KEY, API_SECRET, 9)):
+    datos = solicitud.crear_pago(payment)
+    payment.attrs.huella_payment_create = huella(datos)
+    return datos
+
+
+def mide(funcion, iteraciones: int):
+    """Microsegundos por pago, bytes asignados por pago y tamaño final de `extra_data`."""
+    pagos = [Pago() for _ in range(iteraciones)]
+    inicio = time.perf_counter()
+    for payment in pagos:
+        funcion(payment)
+    duracion = time.perf_counter() - inicio
+
+    pagos = [Pago() for _ in range(iteraciones)]
+    tracemalloc.start()
+    for payment in pagos:
+        funcion(payment)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    guardado = sum(len(payment.extra_data) for payment in pagos) / iteraciones
+    return duracion / iteraciones * 1e6, pico / iteraciones, guardado
+
+
+def argumentos(descripcion: str, iteraciones: int) -> argparse.Namespace:
+    """Argumentos comunes de los benchmarks: iteraciones y perfilador."""
+    parser = argparse.ArgumentParser(description=descripcion)
+    parser.add_argument("iteraciones", type=int, nargs="?", default=iteraciones)
+    parser.add_argument("--perfil", choices=["cprofile", "pyinstrument"], help="Perfila la medición")
+    parser.add_argument("--salida", help="Archivo del perfil (.prof para cprofile, .html para pyinstrument)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    opciones = argumentos(__doc__.splitlines()[1], 2000)
+    print(f"{'armado':<10}{'us/pago':>10}{'pico B/pago':>14}{'extra_data B':>14}")
+    with perfilador(opciones.perfil, opciones.salida):
+        for nombre, funcion in (("anterior", anterior), ("actual", actual)):
+            microsegundos, pico, guardado = mide(funcion, opciones.iteraciones)
+            print(f"{nombre:<10}{microsegundos:>10.1f}{pico:>14.0f}{guardado:>14.0f}")
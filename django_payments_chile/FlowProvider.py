@@ -1,15 +1,23 @@
-from typing import Any, Optional
+from typing import Optional
 
-import requests
-from django.http import HttpResponseBadRequest, JsonResponse
-from payments import PaymentError, PaymentStatus, RedirectNeeded
-from payments.core import BasicProvider
-from payments.forms import PaymentForm as BasePaymentForm
+from payments import PaymentStatus
 
-from .clientes import ClienteAPI
+from .proveedor import ProveedorBase
+from .referencias import token_de_notificacion
+from .solicitudes import SolicitudFlow
 
+# Códigos de `paymentMethod` de Flow; 9 habilita todos los medios de la cuenta
+MEDIOS_FLOW = {
+    1: "Webpay",
+    2: "Servipag",
+    3: "Multicaja",
+    5: "Onepay",
+    8: "Cryptocompra",
+}
+TODOS_LOS_MEDIOS = 9
 
-class FlowProvider(BasicProvider):
+
+class FlowProvider(ProveedorBase):
     """
     FlowProvider es una clase que proporciona integración con Flow para procesar pagos.
     Inicializa una instancia de FlowProvider con el key y el secreto de Flow.
@@ -19,212 +27,90 @@ class FlowProvider(BasicProvider):
         api_secret (str): ApiSecret entregada por Flow.
         api_medio (int | None): Versión de la API de notificaciones a utilizar (Valor por defecto: 9).
         api_endpoint (str): Ambiente flow, puede ser "live" o "sandbox" (Valor por defecto: live).
-        **kwargs: Argumentos adicionales.
+        **kwargs: Opciones comunes de `ProveedorBase`: outbox, limites, cobertura, referencias, persistencia,
+            api_endpoints_alternativos, vencimiento y perfilado.
     """
 
-    form_class = BasePaymentForm
+    pasarela = "flow"
+    ENDPOINTS = {"live": "https://www.flow.cl/api", "sandbox": "https://sandbox.flow.cl/api"}
+    RUTAS = {
+        "crear": ("post", "/payment/create"),
+        "estado": ("get", "/payment/getStatus"),
+        "reembolso": ("post", "/refund/create"),
+    }
+    CUERPO = "data"
+    ESTADOS = {2: PaymentStatus.CONFIRMED, 3: PaymentStatus.REJECTED, 4: PaymentStatus.ERROR}
+    CAMPO_NOTIFICACION = "token"
+
     api_endpoint: str
     api_key: str = None
     api_secret: str = None
     api_medio: int
 
-    def __init__(
-        self,
-        api_key: str,
-        api_secret: str,
-        api_endpoint: str = "live",
-        api_medio: int = 9,
-        **kwargs: int,
-    ):
-        super().__init__(**kwargs)
-        self.api_endpoint = api_endpoint
+    def __init__(self, api_key: str, api_secret: str, api_endpoint: str = "live", api_medio: int = 9, **kwargs):
+        super().__init__(api_endpoint, api_key, **kwargs)
         self.api_key = api_key
         self.api_secret = api_secret
         self.api_medio = api_medio
-        if self.api_endpoint == "live":
-            self.api_endpoint = "https://www.flow.cl/api"
-        elif self.api_endpoint == "sandbox":
-            self.api_endpoint = "https://sandbox.flow.cl/api"
-
-    def get_form(self, payment, data: Optional[dict] = None) -> Any:
-        """
-        Genera el formulario de pago para redirigir a la página de pago de Flow.
+        self._solicitud = SolicitudFlow(api_key, api_secret, api_medio)
 
-        Args:
-            payment ("Payment"): Objeto de pago Django Payments.
-            data (dict | None): Datos del formulario (opcional).
-
-        Returns:
-            Any: Formulario de pago redirigido a la página de pago de Flow.
+    def solicitud_creacion(self, payment) -> dict:
+        return self._solicitud.crear_pago(payment)
 
-        Raises:
-            RedirectNeeded: Redirige a la página de pago de Flow.
+    def registra_creacion(self, payment, respuesta: dict) -> tuple:
+        payment.attrs.respuesta_flow = {
+            "url": respuesta["url"],
+            "token": respuesta["token"],
+            "flowOrder": respuesta["flowOrder"],
+        }
+        url = f"{respuesta['url']}?token={respuesta['token']}"
+        return respuesta["token"], url, (respuesta["token"], respuesta["flowOrder"])
 
+    def get_token_from_request(self, payment, request) -> Optional[str]:
         """
-        if not payment.transaction_id:
-            datos_para_flow = {
-                "apiKey": self.api_key,
-                "commerceOrder": str(payment.token),
-                "urlReturn": payment.get_success_url(),
-                "urlConfirmation": payment.get_process_url(),
-                "subject": payment.description,
-                "amount": int(payment.total),
-                "paymentMethod": self.api_medio,
-                "currency": payment.currency,
-            }
+        Obtiene el token del pago a partir del `token` de Flow en la notificación.
 
-            if payment.billing_email:
-                datos_para_flow.update({"email": payment.billing_email})
-
-            datos_para_flow.update(**self._extra_data(payment.attrs))
-
-            try:
-                payment.attrs.datos_payment_create_flow = datos_para_flow
-                payment.save()
-            except Exception as e:  # noqa
-                # Dificil llegar acá, y si llegamos es problema de django-payments
-                raise PaymentError(f"Ocurrió un error al guardar attrs.datos_flow: {e}")  # noqa
-            datos_para_flow = dict(sorted(datos_para_flow.items()))
-            firma_datos = ClienteAPI.genera_firma(datos_para_flow, self.api_secret)
-            datos_para_flow.update({"s": firma_datos})
-
-            try:
-                pago_req = requests.post(f"{self.api_endpoint}/payment/create", data=datos_para_flow, timeout=5)
-                pago_req.raise_for_status()
-
-            except Exception as pe:
-                payment.change_status(PaymentStatus.ERROR, str(pe))
-                raise PaymentError(pe)
-            else:
-                pago = pago_req.json()
-                payment.transaction_id = pago["token"]
-                payment.attrs.respuesta_flow = {
-                    "url": pago["url"],
-                    "token": pago["token"],
-                    "flowOrder": pago["flowOrder"],
-                }
-                payment.save()
-                payment.change_status(PaymentStatus.WAITING)
-
-            raise RedirectNeeded(f"{pago['url']}?token={pago['token']}")
-
-    def process_data(self, payment, request) -> JsonResponse:
-        """
-        Procesa los datos del pago recibidos desde Flow.
+        Permite recibir las notificaciones en la URL estática del proveedor. Requiere `referencias=True`.
 
         Args:
-            payment ("Payment"): Objeto de pago Django Payments.
+            payment ("Payment" | None): Objeto de pago Django Payments, si ya se conoce.
             request ("HttpRequest"): Objeto de solicitud HTTP de Django.
 
         Returns:
-            JsonResponse: Respuesta JSON que indica el procesamiento de los datos del pago.
-
+            str | None: Token del pago, o `None` si no se encuentra.
         """
-        if "token" not in request.POST:
-            return HttpResponseBadRequest("token no está en post")
-
-        if payment.status in [PaymentStatus.WAITING, PaymentStatus.PREAUTH]:
-            self.actualiza_estado(payment=payment)
-
-        return JsonResponse({"status": "ok"})
+        if payment is not None:
+            return str(payment.token)
+        if not self.referencias:
+            return None
+        return token_de_notificacion(request, request.POST.get("token"))
 
-    def actualiza_estado(self, payment) -> dict:
-        """Actualiza el estado del pago con Flow
-
-        Args:
-            payment ("Payment): Objeto de pago Django Payments.
-
-        Returns:
-            dict: Diccionario con valores del objeto `PaymentStatus`.
+    def medios_pago(self) -> list:
         """
-        datos_para_flow = {"apiKey": self.api_key, "token": payment.token}
-        datos_para_flow = dict(sorted(datos_para_flow.items()))
-        firma_datos = ClienteAPI.genera_firma(datos_para_flow, self.api_secret)
-        datos_para_flow.update({"s": firma_datos})
-
-        try:
-            # status = FlowPayment.getStatus(self._client, payment.transaction_id)
-            estado_req = requests.get(f"{self.api_endpoint}/payment/getStatus", data=datos_para_flow, timeout=5)
-            estado_req.raise_for_status()
-
-        except Exception as e:
-            raise e
-        else:
-            status = estado_req.json()
-            if status["status"] == 2:
-                payment.change_status(PaymentStatus.CONFIRMED)
-            elif status["status"] == 3:
-                payment.change_status(PaymentStatus.REJECTED)
-            elif status["status"] == 4:
-                payment.change_status(PaymentStatus.ERROR)
-        return status
-
-    def _extra_data(self, attrs) -> dict:
-        """Busca los datos que son enviandos por django-payments y los saca del diccionario
+        Medios de pago que ofrece la variante según `api_medio`.
 
-        Args:
-            attrs ("PaymentAttributeProxy"): Obtenido desde PaymentModel.extra_data
+        Flow no publica el catálogo en su API, así que se responde desde `MEDIOS_FLOW` sin llamadas.
 
         Returns:
-            dict: Diccionario con valores permitidos.
-        """
-        try:
-            data = attrs.datos_extra
-        except AttributeError:
-            return {}
-
-        prohibidos = [
-            "commerceOrder",
-            "urlReturn",
-            "urlConfirmation",
-            "amount",
-            "subject",
-            "paymentMethod",
-            "currency",
-        ]
-        for valor in prohibidos:
-            if valor in data:
-                del data[valor]
-
-        return data
-
-    def refund(self, payment, amount: Optional[int] = None) -> int:
+            list: Diccionarios con `codigo` y `nombre`.
         """
-        Realiza un reembolso del pago.
-        El seguimiendo se debe hacer directamente en Flow
-
-        Args:
-            payment ("Payment"): Objeto de pago Django Payments.
-            amount (int | None): Monto a reembolsar (opcional).
-
-        Returns:
-            int: Monto de reembolso solicitado.
+        codigos = MEDIOS_FLOW if self.api_medio == TODOS_LOS_MEDIOS else [self.api_medio]
+        return [{"codigo": codigo, "nombre": MEDIOS_FLOW.get(codigo, str(codigo))} for codigo in codigos]
 
-        Raises:
-            PaymentError: Error al crear el reembolso.
+    def parametros_estado(self, payment) -> dict:
+        """Parámetros firmados de `/payment/getStatus`, que Flow recibe en la query string."""
+        return {"params": self._solicitud.firma({"apiKey": self.api_key, "token": payment.transaction_id})}
 
-        """
-        if payment.status != PaymentStatus.CONFIRMED:
-            raise PaymentError("El pago debe estar confirmado para reversarse.")
-
-        to_refund = amount or payment.total
-
-        datos_reembolso = {
-            "apiKey": self.api_key,
-            "refundCommerceOrder": payment.token,
-            "receiverEmail": payment.billing_email,
-            "amount": to_refund,
-            "urlCallBack": payment.get_process_url(),
-            "commerceTrxId": payment.token,
-            "flowTrxId": payment.attrs.respuesta_flow["flowOrder"],
-        }
-        try:
-            refun_req = requests.post(f"{self.api_endpoint}/refund/create", data=datos_reembolso, timeout=5)
-            refun_req.raise_for_status()
-        except Exception as pe:
-            raise PaymentError(pe)
-        else:
-            payment.attrs.solicitud_reembolso = refun_req.json()
-            payment.save()
-            payment.change_status(PaymentStatus.REFUNDED)
-            return to_refund
+    def solicitud_reembolso(self, payment, monto) -> dict:
+        """Solicitud firmada de `/refund/create`."""
+        return self._solicitud.firma(
+            {
+                "apiKey": self.api_key,
+                "refundCommerceOrder": payment.token,
+                "receiverEmail": payment.billing_email,
+                "amount": monto,
+                "urlCallBack": payment.get_process_url(),
+                "commerceTrxId": payment.token,
+                "flowTrxId": payment.attrs.respuesta_flow["flowOrder"],
+            }
+        )
@@ -1,207 +1,111 @@
-from decimal import Decimal
-from typing import Any, Optional
+from typing import Optional
 
-import requests
-from django.http import HttpResponseBadRequest, JsonResponse
-from payments import PaymentError, PaymentStatus, RedirectNeeded
-from payments.core import BasicProvider
-from payments.forms import PaymentForm as BasePaymentForm
+from payments import PaymentStatus
 
+from .metadatos import cargador_http, clave, metadatos
+from .proveedor import ProveedorBase
+from .referencias import token_de_notificacion
+from .solicitudes import SolicitudKhipu
 
-class KhipuProvider(BasicProvider):
+
+class KhipuProvider(ProveedorBase):
     """
     KhipuProvider es una clase que proporciona integración con Khipu para procesar pagos.
     Inicializa una instancia de KhipuProvider con la nueva llave de api introducida en v3
 
     Args:
         api_key (str): ApiKey entregada por Khipu.
-        **kwargs: Argumentos adicionales.
+        api_endpoint (str): URL base de la API de Khipu (Valor por defecto: "https://payment-api.khipu.com").
+        **kwargs: Opciones comunes de `ProveedorBase`: outbox, limites, cobertura, referencias, persistencia,
+            api_endpoints_alternativos, vencimiento y perfilado.
     """
 
-    form_class = BasePaymentForm
+    pasarela = "khipu"
+    ENDPOINTS = {"live": "https://payment-api.khipu.com"}
+    RUTAS = {
+        "crear": ("post", "/v3/payments"),
+        "estado": ("get", "/v3/payments/{payment.transaction_id}"),
+        "reembolso": ("post", "/v3/payments/{payment.transaction_id}/refunds"),
+    }
+    CAMPO_NOTIFICACION = "transaction_id"
+
     api_endpoint: str = "https://payment-api.khipu.com"
     api_key: str = None
 
-    def __init__(
-        self,
-        api_key: str,
-        api_endpoint: str,
-        **kwargs: int,
-    ):
-        super().__init__(**kwargs)
-        self.api_endpoint = api_endpoint
+    def __init__(self, api_key: str, api_endpoint: str = "live", **kwargs):
+        super().__init__(api_endpoint, api_key, **kwargs)
         self.api_key = api_key
-
-    def get_form(self, payment, data: Optional[dict] = None) -> Any:
-        """
-        Genera el formulario de pago para redirigir a la página de pago de Khipu.
-
-        Args:
-            payment ("Payment"): Objeto de pago Django Payments.
-            data (dict | None): Datos del formulario (opcional).
-
-        Returns:
-            Any: Formulario de pago redirigido a la página de pago de Khipu.
-
-        Raises:
-            RedirectNeeded: Redirige a la página de pago de Khipu.
-
-        """
-        if not payment.transaction_id:
-            datos_para_khipu = {
-                "transaction_id": str(payment.token),
-                "return_url": payment.get_success_url(),
-                "notify_url": payment.get_process_url(),
-                "subject": payment.description,
-                "amount": Decimal(payment.total),
-                "currency": payment.currency,
-            }
-
-            if payment.billing_email:
-                datos_para_khipu.update({"payer_email": payment.billing_email})
-
-            datos_para_khipu.update(**self._extra_data(payment.attrs))
-
-            payment.attrs.datos_payment_create = datos_para_khipu
-            payment.save()
-
-            try:
-                pago_req = requests.post(
-                    f"{self.api_endpoint}/v3/payments",
-                    data=datos_para_khipu,
-                    timeout=5,
-                    headers=self.genera_headers(),
-                )
-                pago_req.raise_for_status()
-
-            except Exception as pe:
-                payment.change_status(PaymentStatus.ERROR, str(pe))
-                raise PaymentError(pe)
-            else:
-                pago = pago_req.json()
-                payment.transaction_id = pago["payment_id"]
-                payment.attrs.respuesta_khipu = {
-                    "payment_id": pago["payment_id"],
-                    "payment_url": pago["payment_url"],
-                    "simplified_transfer_url": pago["simplified_transfer_url"],
-                    "transfer_url": pago["transfer_url"],
-                    "app_url": pago["app_url"],
-                    "ready_for_terminal": pago["ready_for_terminal"],
-                }
-                payment.save()
-                payment.change_status(PaymentStatus.WAITING)
-
-            raise RedirectNeeded(f"{pago['payment_url']}")
+        self._solicitud = SolicitudKhipu()
+
+    def solicitud_creacion(self, payment) -> dict:
+        return self._solicitud.crear_pago(payment)
+
+    def registra_creacion(self, payment, respuesta: dict) -> tuple:
+        payment.attrs.respuesta_khipu = {
+            "payment_id": respuesta["payment_id"],
+            "payment_url": respuesta["payment_url"],
+            "simplified_transfer_url": respuesta["simplified_transfer_url"],
+            "transfer_url": respuesta["transfer_url"],
+            "app_url": respuesta["app_url"],
+            "ready_for_terminal": respuesta["ready_for_terminal"],
+        }
+        return respuesta["payment_id"], respuesta["payment_url"], (respuesta["payment_id"],)
 
     def genera_headers(self):
         return {"Content-Type": "application/json", "x-api-key": self.api_key}
 
-    def process_data(self, payment, request) -> JsonResponse:
+    def bancos(self) -> list:
         """
-        Procesa los datos del pago recibidos desde Khipu.
+        Bancos disponibles en Khipu, desde el cache de metadatos.
 
-        Args:
-            payment ("Payment"): Objeto de pago Django Payments.
-            request ("HttpRequest"): Objeto de solicitud HTTP de Django.
+        No espera a Khipu: si la lista venció se refresca en segundo plano y se entrega la anterior;
+        si nunca se cargó devuelve una lista vacía.
 
         Returns:
-            JsonResponse: Respuesta JSON que indica el procesamiento de los datos del pago.
-
+            list: Bancos según `GET /v3/banks`.
         """
-        if "transaction_id" not in request.POST:
-            return HttpResponseBadRequest("transaction_id no está en post")
-
-        if payment.status in [PaymentStatus.WAITING, PaymentStatus.PREAUTH]:
-            self.actualiza_estado(payment=payment)
-
-        return JsonResponse({"status": "ok"})
-
-    def actualiza_estado(self, payment) -> dict:
-        """Actualiza el estado del pago con Khipu
-
-        Args:
-            payment ("Payment): Objeto de pago Django Payments.
+        url = f"{self.api_endpoint}/v3/banks"
+        cargador = cargador_http(self._transporte, url, "banks", {"x-api-key": self.api_key})
+        return metadatos.obtiene(clave("khipu", self.api_key, "bancos"), cargador, [])
 
-        Returns:
-            dict: Diccionario con valores del objeto `PaymentStatus`.
+    def metodos_pago(self, cobrador_id: str) -> list:
         """
-        try:
-            estado_req = requests.get(
-                f"{self.api_endpoint}/v3/payments/{payment.token}",
-                timeout=5,
-                headers=self.genera_headers(),
-            )
-            estado_req.raise_for_status()
-
-        except Exception as e:
-            raise e
-        else:
-            status = estado_req.json()
-            if status["status"] == "done" and status["status_detail"] == "normal":
-                payment.change_status(PaymentStatus.CONFIRMED)
-            elif status["status_detail"] in ["rejected-by-payer", "reversed", "marked-as-abuse"]:
-                payment.change_status(PaymentStatus.REJECTED)
-        return status
-
-    def _extra_data(self, attrs) -> dict:
-        """Busca los datos que son enviandos por django-payments y los saca del diccionario
+        Métodos de pago habilitados para un cobrador de Khipu, desde el cache de metadatos.
 
         Args:
-            attrs ("PaymentAttributeProxy"): Obtenido desde PaymentModel.extra_data
+            cobrador_id (str): Identificador del cobrador en Khipu.
 
         Returns:
-            dict: Diccionario con valores permitidos.
+            list: Métodos de pago según `GET /v3/merchants/{id}/paymentMethods`, o una lista vacía.
         """
-        try:
-            data = attrs.datos_extra
-        except AttributeError:
-            return {}
-
-        prohibidos = [
-            "amount",
-            "subject",
-            "currency",
-        ]
-        for valor in prohibidos:
-            if valor in data:
-                del data[valor]
-
-        return data
-
-    def refund(self, payment, amount: Optional[int] = None) -> int:
+        url = f"{self.api_endpoint}/v3/merchants/{cobrador_id}/paymentMethods"
+        cargador = cargador_http(self._transporte, url, "paymentMethods", {"x-api-key": self.api_key})
+        return metadatos.obtiene(clave("khipu", self.api_key, f"metodos:{cobrador_id}"), cargador, [])
+
+    def get_token_from_request(self, payment, request) -> Optional[str]:
         """
-        Realiza un reembolso del pago.
-        El seguimiendo se debe hacer directamente en Khipu
+        Obtiene el token del pago a partir de la notificación de Khipu.
+
+        Usa el `transaction_id` enviado a Khipu al crear el pago o, con `referencias=True`, el `payment_id` de Khipu.
 
         Args:
-            payment ("Payment"): Objeto de pago Django Payments.
-            amount (int | None): Monto a reembolsar (opcional).
+            payment ("Payment" | None): Objeto de pago Django Payments, si ya se conoce.
+            request ("HttpRequest"): Objeto de solicitud HTTP de Django.
 
         Returns:
-            int: Monto de reembolso solicitado.
-
-        Raises:
-            PaymentError: Error al crear el reembolso.
-
+            str | None: Token del pago, o `None` si no se encuentra.
         """
-        if payment.status != PaymentStatus.CONFIRMED:
-            raise PaymentError("El pago debe estar confirmado para reversarse.")
-
-        to_refund = amount or payment.total
-
-        datos_reembolso = {"amount": to_refund}
-        try:
-            refun_req = requests.post(
-                f"{self.api_endpoint}/v3/payments/{payment.token}/refunds",
-                data=datos_reembolso,
-                timeout=5,
-                headers=self.genera_headers(),
-            )
-            refun_req.raise_for_status()
-        except Exception as pe:
-            raise PaymentError(pe)
-        else:
-            payment.attrs.solicitud_reembolso = refun_req.json()
-            payment.save()
-            payment.change_status(PaymentStatus.REFUNDED)
-            return to_refund
+        if payment is not None:
+            return str(payment.token)
+        if request.POST.get("transaction_id"):
+            return request.POST["transaction_id"]
+        if not self.referencias:
+            return None
+        return token_de_notificacion(request, request.POST.get("payment_id"))
+
+    def estado_de(self, respuesta: dict) -> Optional[str]:
+        if respuesta["status"] == "done" and respuesta["status_detail"] == "normal":
+            return PaymentStatus.CONFIRMED
+        if respuesta["status_detail"] in ["rejected-by-payer", "reversed", "marked-as-abuse"]:
+            return PaymentStatus.REJECTED
+        return None
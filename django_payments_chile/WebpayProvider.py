@@ -1,13 +1,17 @@
+import logging
 from typing import Any, Optional
 
+from django.http import HttpResponseRedirect, JsonResponse
+from django.shortcuts import render
 from django.urls import reverse
-import requests
-from django.http import JsonResponse
 from payments import PaymentError, PaymentStatus, RedirectNeeded
-from payments.core import BasicProvider
-from payments.forms import PaymentForm as BasePaymentForm
-import logging
 
+from .commit_diferido import programa_commit
+from .montos import monto_pasarela
+from .perfilado import fase, perfila
+from .plazos import PlazoAgotado
+from .proveedor import ProveedorBase
+from .referencias import token_de_notificacion
 
 logger = logging.getLogger(__name__)
 
@@ -78,7 +82,7 @@ codigo_rechazo_refund = {
 }
 
 
-class WebpayProvider(BasicProvider):
+class WebpayProvider(ProveedorBase):
     """
     WebpayProvider es una clase que proporciona integración con Transbank para procesar pagos.
     Inicializa una instancia de WebpayProvider con el key y el secreto de Transbank.
@@ -87,10 +91,24 @@ class WebpayProvider(BasicProvider):
         api_key_id (str): ApiKey entregada por Transbank.
         api_key_secret (str): ApiSecret entregada por Transbank.
         api_endpoint (str): Ambiente Transbank, puede ser "produccion" o "integracion" (Valor por defecto: produccion)
-        **kwargs: Argumentos adicionales.
+        commit_diferido (bool): Hace el commit en segundo plano tras una página de espera (Valor por defecto: False).
+        **kwargs: Opciones comunes de `ProveedorBase`: outbox, limites, cobertura, referencias, persistencia,
+            api_endpoints_alternativos, vencimiento y perfilado. Con `capture=False` el commit solo autoriza el
+            pago, que queda en `PREAUTH` hasta capturarlo con `capture`; el código de comercio debe ser de
+            captura diferida.
     """
 
-    form_class = BasePaymentForm
+    pasarela = "webpay"
+    ENDPOINTS = {"produccion": "https://webpay3g.transbank.cl", "integracion": "https://webpay3gint.transbank.cl"}
+    RUTAS = {
+        "crear": ("post", "/rswebpaytransaction/api/webpay/v1.2/transactions"),
+        "estado": ("get", "/rswebpaytransaction/api/webpay/v1.2/transactions/{payment.transaction_id}"),
+        "commit": ("put", "/rswebpaytransaction/api/webpay/v1.2/transactions/{token}"),
+        "reembolso": ("post", "/rswebpaytransaction/api/webpay/v1.2/transactions/{payment.transaction_id}/refunds"),
+        "captura": ("put", "/rswebpaytransaction/api/webpay/v1.2/transactions/{payment.transaction_id}/capture"),
+    }
+    ESTADO_CREADO = PaymentStatus.PREAUTH
+
     api_endpoint: str
     api_key_id: str = None
     api_key_secret: str = None
@@ -100,81 +118,38 @@ class WebpayProvider(BasicProvider):
         api_key_id: str,
         api_key_secret: str,
         api_endpoint: str = "produccion",
-        **kwargs: int,
+        commit_diferido: bool = False,
+        **kwargs,
     ):
-        super().__init__(**kwargs)
-        self.api_endpoint = api_endpoint
+        super().__init__(api_endpoint, api_key_id, **kwargs)
         self.api_key_id = api_key_id
         self.api_key_secret = api_key_secret
-        if self.api_endpoint == "produccion":
-            self.api_endpoint = "https://webpay3g.transbank.cl/"
-        elif self.api_endpoint == "integracion":
-            self.api_endpoint = "https://webpay3gint.transbank.cl/"
-
-    def get_form(self, payment, data: Optional[dict] = None) -> Any:
-        """
-        Genera el formulario de pago para redirigir a la página de pago.
-
-        Args:
-            payment ("Payment"): Objeto de pago Django Payments.
-            data (dict | None): Datos del formulario (opcional).
-
-        Returns:
-            Any: Formulario de pago redirigido a la página de pago.
+        self.commit_diferido = commit_diferido
 
-        Raises:
-            RedirectNeeded: Redirige a la página de pago.
-        """
-        if not payment.transaction_id:
-            token = str(payment.token).replace("-", "")[:26]
-            datos_para_tbk = {
-                "buy_order": token,
-                "session_id": token,
-                "return_url": payment.get_process_url(),
-                "amount": int(payment.total),
-            }
+    def solicitud_creacion(self, payment) -> dict:
+        token = str(payment.token).replace("-", "")[:26]
+        with fase("urls"):
+            url_retorno = payment.get_process_url()
+        return {
+            "buy_order": token,
+            "session_id": token,
+            "return_url": url_retorno,
+            "amount": monto_pasarela(payment.total, payment.currency),
+        }
 
-            try:
-                # Solicitar la creación del pago en Webpay
-                pago_req = requests.post(
-                    f"{self.api_endpoint}rswebpaytransaction/api/webpay/v1.2/transactions",
-                    json=datos_para_tbk,
-                    headers=self.genera_headers(),
-                    timeout=5,
-                )
-                # Lanzar una excepción si la respuesta es un error
-                pago_req.raise_for_status()
-
-            except requests.exceptions.RequestException as e:
-                logger.info(f"return_url: {payment.get_process_url()}")
-                logger.error(f"Error en la solicitud a Webpay: {str(e)}")
-                if hasattr(e, 'response') and e.response:
-                    logger.error(f"Status Code: {e.response.status_code}")
-                    logger.error(f"Headers: {e.response.headers}")
-                    logger.error(f"Respuesta de Webpay: {e.response.text}")
-                payment.change_status(PaymentStatus.ERROR, str(e))
-                raise PaymentError(f"Error al procesar el pago: {str(e)}")
-
-            else:
-                # Si la solicitud es exitosa, procesar la respuesta de Webpay
-                pago = pago_req.json()
-                payment.transaction_id = pago["token"]
-                payment.attrs.request_tbk = datos_para_tbk
-                payment.attrs.respuesta_tbk = pago
-                payment.save()
-                payment.change_status(PaymentStatus.PREAUTH)
-
-            # Redirigir al cliente a Webpay para completar el pago
-            raise RedirectNeeded(f"{pago['url']}?token_ws={pago['token']}")
+    def registra_creacion(self, payment, respuesta: dict) -> tuple:
+        payment.attrs.respuesta_tbk = respuesta
+        # Redirigir al cliente a Webpay para completar el pago
+        return respuesta["token"], f"{respuesta['url']}?token_ws={respuesta['token']}", (respuesta["token"],)
 
     def genera_headers(self):
-        
         return {
             "Content-Type": "application/json",
             "Tbk-Api-Key-Id": self.api_key_id,
             "Tbk-Api-Key-Secret": self.api_key_secret,
         }
 
+    @perfila("process_data")
     def process_data(self, payment, request) -> JsonResponse:
         """
         Procesa la captura del pago
@@ -189,125 +164,161 @@ class WebpayProvider(BasicProvider):
 
         """
 
+        if payment.status in [PaymentStatus.WAITING, PaymentStatus.PREAUTH] and self.commit_diferido:
+            # El commit se hace en segundo plano y el cliente espera en una página liviana
+            return self._procesando(payment, request, self.get_token_from_request(payment, request))
+
         if payment.status in [PaymentStatus.WAITING, PaymentStatus.PREAUTH]:
-            self.commit(self.get_token_from_request(request, payment), payment)
+            token = self.get_token_from_request(payment, request)
+            try:
+                self.commit(token, payment)
+            except RedirectNeeded as redireccion:
+                return HttpResponseRedirect(str(redireccion))
+            except PlazoAgotado:
+                # Sin plazo para el commit en la petición, lo termina un hilo y el cliente espera su resultado
+                logger.warning("Commit en segundo plano por plazo agotado, pago %s", payment.pk)
+                return self._procesando(payment, request, token)
+
+        # El cliente volvió a la URL de retorno de un pago ya resuelto: se redirige según su estado final
+        if payment.status in [PaymentStatus.CONFIRMED, PaymentStatus.PREAUTH]:
+            return HttpResponseRedirect(payment.get_success_url())
+        return HttpResponseRedirect(payment.get_failure_url())
+
+    def _procesando(self, payment, request, token: str):
+        """Agenda el commit en segundo plano y responde la página que espera el estado final del pago."""
+        programa_commit(payment, token)
+        contexto = {
+            "url_estado": reverse("payments_chile:estado_pago", kwargs={"token": payment.token}),
+            "intervalo": 1000,
+        }
+        return render(request, "django_payments_chile/procesando.html", contexto)
 
-    def get_token_from_request(self, request, payment) -> str:
-        """Return payment token from provider request."""
-        
-        # Intentar obtener el 'token_ws' desde POST o GET usando el método `get()` para evitar excepciones
+    def get_token_from_request(self, payment, request) -> str:
+        """Return payment token from provider request.
+
+        Con `payment` devuelve el `token_ws` de Transbank. Sin `payment`, es decir desde la URL estática
+        del proveedor, devuelve el token del pago buscando el `token_ws` en las referencias.
+        """
         token_ws = request.POST.get("token_ws") or request.GET.get("token_ws")
-        
-        # Si no se encuentra el token_ws, lanzar un error con mensaje claro
         if not token_ws:
-            raise PaymentError(
-                code=400,
-                message="token_ws is not present in the request."
-            )
-        
+            raise PaymentError(code=400, message="token_ws is not present in the request.")
+
+        if payment is None:
+            return token_de_notificacion(request, token_ws) if self.referencias else None
+
         return token_ws
 
-    def actualiza_estado(self, payment) -> dict:
-        """Actualiza el estado del pago con Flow
+    def registra_estado(self, payment, respuesta: dict):
+        payment.attrs.status_response = respuesta
+        self.persistencia.guarda(payment, ["extra_data"])
+
+    def estado_de(self, respuesta: dict) -> Optional[str]:
+        # Una transacción aún sin commit (INITIALIZED) no trae response_code y sigue pendiente
+        codigo = respuesta.get("response_code")
+        if respuesta.get("status") == "AUTHORIZED" and codigo == 0:
+            # Con captura diferida la autorización deja el pago en PREAUTH hasta `capture`
+            return PaymentStatus.CONFIRMED if self._capture else None
+        if respuesta.get("status") in ["FAILED", "REVERSED", "NULLIFIED"] or codigo not in [None, 0]:
+            return PaymentStatus.REJECTED
+        return None
+
+    def actualiza_estado(self, payment) -> str:
+        """Actualiza el estado del pago consultando la transacción en Transbank
 
         Args:
             payment ("Payment): Objeto de pago Django Payments.
 
         Returns:
-            dict: Diccionario con valores del objeto `PaymentStatus`.
+            str: Estado del pago, uno de `PaymentStatus`.
         """
-
-        try:
-            status_req = requests.put(
-                f"{self.api_endpoint}/rswebpaytransaction/api/webpay/v1.2/transactions/{payment.token}",
-                timeout=5,
-                headers=self.genera_headers(),
-            )
-            status_req.raise_for_status()
-        except Exception as e:
-            raise e
-        else:
-            status = status_req.json()
-            payment.attrs.status_response = status
-            payment.save()
-
-            if status["response_code"] == 0:
-                payment.change_status(PaymentStatus.CONFIRMED)
-                return PaymentStatus.CONFIRMED
-            else:
-                payment.change_status(PaymentStatus.REJECTED)
-                return PaymentStatus.REJECTED
+        super().actualiza_estado(payment)
+        return payment.status
 
     def commit(self, token, payment):
         """Se debe llamar al procesar el retorno"""
-        try:
-            commit_req = requests.put(
-                f"{self.api_endpoint}/rswebpaytransaction/api/webpay/v1.2/transactions/{token}",
-                timeout=5,
-                headers=self.genera_headers(),
-            )
-            commit_req.raise_for_status()
-        except Exception as e:
-            raise e
+        commit = self._llama("commit", payment, ruta={"token": token})
+        commit["vci_str"] = self.agrega_info_error("vci", commit["vci"])
+        commit["payment_type_code_str"] = self.agrega_info_error("pago", commit["payment_type_code"])
+        payment.attrs.commit_response = commit
+        self.persistencia.guarda(payment, ["extra_data"])
+
+        # Verificar el estado de la transacción
+        if commit["status"] == "AUTHORIZED" and commit["response_code"] == 0:
+            if self._capture:
+                self._cambia_estado(payment, PaymentStatus.CONFIRMED)
+            redirect_url = reverse("payment_success", kwargs={"pk": payment.pk})
         else:
-            commit = commit_req.json()
-            commit["vci_str"] = self.agrega_info_error("vci", commit["vci"])
-            commit["payment_type_code_str"] = self.agrega_info_error("pago", commit["payment_type_code"])
-            payment.attrs.commit_response = commit
-            payment.save()
-
-            # Verificar el estado de la transacción
-            if commit["status"] == "AUTHORIZED" and commit["response_code"] == 0:
-                # Redirigir a la página de éxito
-                redirect_url = reverse('payment_success', kwargs={'pk': payment.pk})
-            else:
-                # Redirigir a la página de error
-                redirect_url = reverse('payment_failure', kwargs={'pk': payment.pk})
-
-            raise RedirectNeeded(redirect_url)
-
-    def refund(self, payment, amount: Optional[int] = None) -> int:
+            self._cambia_estado(payment, PaymentStatus.REJECTED)
+            redirect_url = reverse("payment_failure", kwargs={"pk": payment.pk})
+
+        raise RedirectNeeded(redirect_url)
+
+    def espera_captura(self, payment) -> bool:
+        """Indica si el pago está autorizado con captura diferida y solo falta capturarlo.
+
+        Args:
+            payment ("Payment"): Objeto de pago Django Payments.
+
+        Returns:
+            bool: `True` si el commit o la última consulta de estado informaron la autorización.
+        """
+        if self._capture or payment.status != PaymentStatus.PREAUTH:
+            return False
+        for campo in ("status_response", "commit_response"):
+            respuesta = getattr(payment.attrs, campo, None) or {}
+            if respuesta.get("status") == "AUTHORIZED" and respuesta.get("response_code") == 0:
+                return True
+        return False
+
+    @perfila("capture")
+    def capture(self, payment, amount: Optional[int] = None) -> int:
         """
-        Realiza un reembolso del pago.
-        El seguimiendo se debe hacer directamente en Flow
+        Captura un pago autorizado con captura diferida.
+
+        Guarda la respuesta y el monto capturado, pero no cambia el estado: lo confirman
+        `payment.capture()` o `captura.captura_pagos`.
 
         Args:
             payment ("Payment"): Objeto de pago Django Payments.
-            amount (int | None): Monto a reembolsar (opcional).
+            amount (int | None): Monto a capturar, a lo más el autorizado (opcional).
 
         Returns:
-            int: Monto de reembolso solicitado.
+            int: Monto capturado.
 
         Raises:
-            PaymentError: Error al crear el reembolso.
-
+            PaymentError: El pago no espera captura o Transbank rechazó la captura.
         """
-        if payment.status != PaymentStatus.CONFIRMED:
-            raise PaymentError("El pago debe estar confirmado para reversarse.")
-
-        refund_data = {"amount": amount or payment.total}
-        try:
-            refund_req = requests.put(
-                f"{self.api_endpoint}/rswebpaytransaction/api/webpay/v1.2/transactions/{payment.token}/refunds",
-                timeout=5,
-                headers=self.genera_headers(),
-                data=refund_data,
-            )
-            refund_req.raise_for_status()
-        except Exception as e:
-            raise e
-        else:
-            refund = refund_req.json()
-            refund["response_code_str"] = self.agrega_info_error("refund", refund["response_code"])
-            payment.attrs.refund_response = refund
-            payment.save()
-
-            if refund["type"] == "REVERSED":
-                payment.change_status(PaymentStatus.REFUNDED)
-                return payment.total
-            elif refund["type"] == "NULLIFIED" and refund["response_code"] == 0:
-                payment.change_status(PaymentStatus.REFUNDED)
-                return refund["nullified_amount"]
+        if not self.espera_captura(payment):
+            raise PaymentError("El pago debe estar autorizado con captura diferida para capturarse.")
+
+        autorizacion = getattr(payment.attrs, "commit_response", None) or payment.attrs.status_response
+        datos_captura = {
+            "buy_order": autorizacion["buy_order"],
+            "authorization_code": autorizacion["authorization_code"],
+            "capture_amount": monto_pasarela(amount or payment.total, payment.currency),
+        }
+        captura = self._llama("captura", payment, json=datos_captura)
+        payment.attrs.capture_response = captura
+        if captura.get("response_code") != 0:
+            self.persistencia.guarda(payment, ["extra_data"])
+            raise PaymentError(f"Transbank rechazó la captura (código {captura.get('response_code')}).")
+        payment.captured_amount = captura["captured_amount"]
+        self.persistencia.guarda(payment, ["captured_amount", "extra_data"])
+        return captura["captured_amount"]
+
+    def registra_reembolso(self, payment, respuesta: dict, monto) -> Any:
+        """Guarda la respuesta de Transbank; el pago queda reembolsado si se reversó o anuló."""
+        respuesta["response_code_str"] = self.agrega_info_error("refund", respuesta.get("response_code"))
+        payment.attrs.refund_response = respuesta
+        self.persistencia.guarda(payment, ["extra_data"])
+
+        if respuesta["type"] == "REVERSED":
+            self._cambia_estado(payment, PaymentStatus.REFUNDED)
+            return monto_pasarela(payment.total, payment.currency)
+        elif respuesta["type"] == "NULLIFIED" and respuesta["response_code"] == 0:
+            self._cambia_estado(payment, PaymentStatus.REFUNDED)
+            return respuesta["nullified_amount"]
+        return None
 
     def agrega_info_error(self, tipo, codigo):
         if tipo == "vci":
@@ -0,0 +1,27 @@
+from django.contrib import admin
+
+from .models import ResumenDiario
+
+
+@admin.register(ResumenDiario)
+class ResumenDiarioAdmin(admin.ModelAdmin):
+    """Resumen diario de solo lectura; lo escribe el comando `actualiza_resumen`."""
+
+    list_display = (
+        "fecha",
+        "variant",
+        "pagos",
+        "confirmados",
+        "monto_confirmado",
+        "rechazados",
+        "reembolsados",
+        "tasa_reembolso",
+    )
+    list_filter = ("variant",)
+    date_hierarchy = "fecha"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
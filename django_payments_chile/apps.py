@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class DjangoPaymentsChileConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "django_payments_chile"
+    verbose_name = "Django Payments Chile"
+
+    def ready(self):
+        from .conexiones import arranca_workers
+
+        arranca_workers()
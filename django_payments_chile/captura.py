@@ -0,0 +1,142 @@
+"""
+Captura diferida de pagos autorizados.
+
+Con `capture=False` en la variante el commit de Webpay solo autoriza el pago, que queda en
+`PREAUTH` hasta capturarlo, por ejemplo al despachar. `captura_pagos` captura en bloque los pagos
+autorizados de una variante: llama a `capture` del proveedor en varios hilos y con un límite de
+tasa, y escribe el monto capturado y el estado `CONFIRMED` por lotes con `PersistenciaLote`, en
+el hilo principal.
+
+Los pagos autorizados siguen en un estado pendiente, así que el barrido de vencidos, la consulta
+de estados y el commit diferido los reconocen con `espera_captura` y no los tocan.
+"""
+
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from payments import PaymentError, PaymentStatus, get_payment_model
+from payments.core import provider_factory
+
+from .limitador import Limite, limitador
+from .montos import montos_pasarela
+from .persistencia import PersistenciaLote
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResultadoCaptura:
+    variant: str
+    revisados: int = 0
+    capturados: int = 0
+    rechazados: int = 0
+    omitidos: int = 0
+    errores: int = 0
+
+
+def espera_captura(provider, payment) -> bool:
+    """Indica si el proveedor tiene captura diferida y el pago solo espera ser capturado."""
+    verifica = getattr(provider, "espera_captura", None)
+    return verifica is not None and verifica(payment)
+
+
+def por_capturar(variant: str, pks: Optional[Iterable] = None):
+    """Pagos en `PREAUTH` de `variant` creados en la pasarela, opcionalmente solo los de `pks`, por `pk`."""
+    pagos = (
+        get_payment_model()
+        .objects.filter(variant=variant, status=PaymentStatus.PREAUTH)
+        .exclude(transaction_id="")
+        .order_by("pk")
+    )
+    return pagos if pks is None else pagos.filter(pk__in=list(pks))
+
+
+class _Captura:
+    def __init__(self, provider, variant: str, lote: int, hilos: int, tasa: float, montos: dict):
+        # Lote mayor que un bloque: solo se escribe al vaciar desde el hilo principal
+        self.persistencia = PersistenciaLote(tamano=lote + 1)
+        self.provider = copy.copy(provider)
+        self.provider.persistencia = self.persistencia
+        self.variant = variant
+        self.hilos = hilos
+        self.montos = montos
+        self.por_capturar = {}
+        self.limite = Limite(tasa=tasa, capacidad=1, espera_maxima=max(2.0, 2 * hilos / tasa))
+        self.resultado = ResultadoCaptura(variant)
+
+    def _captura(self, payment):
+        """Captura el pago en la pasarela; devuelve el monto, o la excepción si falló."""
+        try:
+            transporte = getattr(self.provider, "_transporte", None)
+            pasarela = transporte.pasarela if transporte is not None else self.variant
+            limitador.espera_turno(pasarela, self.variant, "captura", self.limite)
+            return self.provider.capture(payment, self.por_capturar.get(payment.pk))
+        except Exception as e:  # noqa
+            logger.warning("No se pudo capturar el pago %s: %s", payment.pk, e)
+            return e
+
+    def procesa(self, pagos: list):
+        por_procesar = [payment for payment in pagos if espera_captura(self.provider, payment)]
+        parciales = [payment for payment in por_procesar if payment.pk in self.montos]
+        montos = montos_pasarela(
+            [self.montos[payment.pk] for payment in parciales], [payment.currency for payment in parciales]
+        )
+        self.por_capturar = {payment.pk: monto for payment, monto in zip(parciales, montos)}
+        with ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="payments-chile-captura") as hilos:
+            capturados = dict(zip(por_procesar, hilos.map(self._captura, por_procesar)))
+
+        for payment in pagos:
+            self.resultado.revisados += 1
+            monto = capturados.get(payment)
+            if payment not in capturados:
+                self.resultado.omitidos += 1
+            elif isinstance(monto, PaymentError):
+                self.resultado.rechazados += 1
+            elif isinstance(monto, Exception) or not monto:
+                self.resultado.errores += 1
+            else:
+                self.persistencia.cambia_estado(payment, PaymentStatus.CONFIRMED)
+                self.resultado.capturados += 1
+        self.persistencia.vacia()
+
+
+def captura_pagos(
+    variant: str,
+    pks: Optional[Iterable] = None,
+    montos: Optional[dict] = None,
+    lote: int = 500,
+    hilos: int = 4,
+    tasa: float = 5.0,
+) -> ResultadoCaptura:
+    """
+    Captura los pagos autorizados de una variante con captura diferida.
+
+    Los pagos cuya captura falla quedan en `PREAUTH` para reintentarlos; los que Transbank rechaza
+    guardan la respuesta en `attrs.capture_response`.
+
+    Args:
+        variant (str): Variante de `PAYMENT_VARIANTS`, con `capture=False`.
+        pks (list | None): Pagos a capturar; por defecto todos los autorizados de la variante (opcional).
+        montos (dict | None): Monto a capturar por `pk`, cuando es menor que el total (opcional).
+        lote (int): Pagos leídos y escritos por bloque (Valor por defecto: 500).
+        hilos (int): Capturas simultáneas en la pasarela (Valor por defecto: 4).
+        tasa (float): Capturas por segundo en la pasarela (Valor por defecto: 5).
+
+    Returns:
+        ResultadoCaptura: Pagos revisados, capturados, rechazados, omitidos por no estar autorizados y con error.
+    """
+    pagos = por_capturar(variant, pks)
+    captura = _Captura(provider_factory(variant), variant, lote, hilos, tasa, montos or {})
+
+    ultimo = None
+    while True:
+        bloque = pagos if ultimo is None else pagos.filter(pk__gt=ultimo)
+        bloque = list(bloque[:lote])
+        if not bloque:
+            break
+        captura.procesa(bloque)
+        ultimo = bloque[-1].pk
+    return captura.resultado
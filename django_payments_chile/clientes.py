@@ -1,6 +1,21 @@
+"""
+Firma de las llamadas y estado de cliente compartido por los proveedores.
+
+django-payments crea una instancia de proveedor por variante y la comparte entre los hilos del
+servidor, así que los proveedores no guardan estado de cliente mutable: sesiones HTTP, ejecutores
+e hilos de fondo se obtienen de `clientes`, un registro que los crea una vez por proceso o, con
+`ambito="hilo"`, uno por hilo (o por loop de asyncio si hay uno corriendo). Si el proceso se
+bifurca (gunicorn sin `--preload` o `multiprocessing`), el hijo descarta lo heredado y crea lo suyo.
+"""
+
+import asyncio
 import hashlib
 import hmac
+import os
+import threading
+import weakref
 from dataclasses import dataclass
+from typing import Callable, Hashable
 
 
 @dataclass
@@ -10,3 +25,75 @@ class ClienteAPI:
         datos_flow = "".join(f"{str(key)}{str(value)}" for key, value in datos.items())
         firma = hmac.new(key=secret_key.encode(), msg=datos_flow.encode(), digestmod=hashlib.sha256)
         return firma.hexdigest()
+
+
+def _loop_actual():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class RegistroClientes:
+    """Valores creados bajo demanda por proceso, hilo o loop de asyncio."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reinicia_estado()
+
+    def _reinicia_estado(self):
+        self._pid = os.getpid()
+        self._proceso = {}
+        self._hilos = threading.local()
+        self._loops = weakref.WeakKeyDictionary()
+
+    def _verifica_fork(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reinicia_estado()
+
+    def _valores(self, ambito: str) -> dict:
+        if ambito == "proceso":
+            return self._proceso
+        loop = _loop_actual()
+        if loop is not None:
+            return self._loops.setdefault(loop, {})
+        valores = getattr(self._hilos, "valores", None)
+        if valores is None:
+            valores = self._hilos.valores = {}
+        return valores
+
+    def obtiene(self, clave: Hashable, fabrica: Callable, ambito: str = "proceso"):
+        """Valor de `clave`, creado con `fabrica()` la primera vez en el ámbito.
+
+        Args:
+            clave (Hashable): Identificador del valor, por ejemplo `("sesion", "flow")`.
+            fabrica (Callable): Crea el valor; se llama a lo más una vez por ámbito.
+            ambito (str): "proceso" o "hilo" (Valor por defecto: "proceso").
+        """
+        self._verifica_fork()
+        valores = self._valores(ambito)
+        valor = valores.get(clave)
+        if valor is None:
+            with self._lock:
+                valor = valores.get(clave)
+                if valor is None:
+                    valor = valores[clave] = fabrica()
+        return valor
+
+    def descarta(self, clave: Hashable, ambito: str = "proceso"):
+        """Olvida el valor de `clave` en el ámbito actual; se vuelve a crear al pedirlo."""
+        with self._lock:
+            self._valores(ambito).pop(clave, None)
+
+    def despues_de_fork(self):
+        # El lock pudo quedar tomado por un hilo del padre que no existe en el hijo
+        self._lock = threading.RLock()
+        self._reinicia_estado()
+
+
+clientes = RegistroClientes()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=clientes.despues_de_fork)
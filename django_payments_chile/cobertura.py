@@ -0,0 +1,136 @@
+"""
+Solicitudes cubiertas (hedged requests) para lecturas idempotentes.
+
+Si la primera llamada no respondió dentro del percentil observado de latencia de la operación,
+se envía una segunda idéntica y se usa la primera respuesta que llegue. Un presupuesto limita
+las llamadas extra a una fracción de las llamadas cubiertas.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Callable, Optional
+
+from .clientes import clientes
+
+
+@dataclass(frozen=True)
+class ConfiguracionCobertura:
+    """
+    Args:
+        percentil (float): Percentil de latencia tras el cual se envía la segunda llamada (Valor por defecto: 95).
+        presupuesto (float): Fracción máxima de llamadas extra sobre las cubiertas (Valor por defecto: 0.1).
+        minimo_muestras (int): Latencias observadas antes de empezar a cubrir (Valor por defecto: 20).
+        muestras (int): Latencias recientes consideradas para el percentil (Valor por defecto: 500).
+    """
+
+    percentil: float = 95
+    presupuesto: float = 0.1
+    minimo_muestras: int = 20
+    muestras: int = 500
+
+
+class HistorialLatencia:
+    """Latencias recientes de una operación."""
+
+    def __init__(self, muestras: int = 500):
+        self._latencias = deque(maxlen=muestras)
+        self._lock = threading.Lock()
+
+    def registra(self, latencia: float):
+        with self._lock:
+            self._latencias.append(latencia)
+
+    def percentil(self, percentil: float, minimo_muestras: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._latencias) < minimo_muestras:
+                return None
+            ordenadas = sorted(self._latencias)
+        return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * percentil / 100))]
+
+
+class PresupuestoCobertura:
+    """Cada llamada cubierta suma `fraccion` de crédito y cada llamada extra consume uno."""
+
+    def __init__(self, fraccion: float, maximo: float = 10.0, inicial: float = 0.0):
+        self.fraccion = fraccion
+        self.maximo = maximo
+        self._credito = min(maximo, inicial)
+        self._lock = threading.Lock()
+
+    def registra_llamada(self):
+        with self._lock:
+            self._credito = min(self.maximo, self._credito + self.fraccion)
+
+    def consume(self) -> bool:
+        with self._lock:
+            if self._credito < 1:
+                return False
+            self._credito -= 1
+            return True
+
+
+def ejecutor() -> ThreadPoolExecutor:
+    """Ejecutor de las llamadas cubiertas, uno por proceso."""
+    return clientes.obtiene(
+        "cobertura", lambda: ThreadPoolExecutor(max_workers=32, thread_name_prefix="payments-chile-cobertura")
+    )
+
+
+class Cobertura:
+    """Historial y presupuesto de cobertura de las operaciones de un proveedor."""
+
+    def __init__(self, configuracion: ConfiguracionCobertura):
+        self.configuracion = configuracion
+        self._historiales = {}
+        self._presupuesto = PresupuestoCobertura(configuracion.presupuesto)
+        self.llamadas_extra = 0
+        self._lock = threading.Lock()
+
+    def _historial(self, operacion: str) -> HistorialLatencia:
+        historial = self._historiales.get(operacion)
+        if historial is None:
+            historial = self._historiales.setdefault(operacion, HistorialLatencia(self.configuracion.muestras))
+        return historial
+
+    def ejecuta(self, operacion: str, llamada: Callable, llamada_extra: Optional[Callable] = None):
+        """Ejecuta `llamada` y, si tarda más que el percentil, también `llamada_extra`.
+
+        Args:
+            operacion (str): Operación, se lleva un historial de latencia por cada una.
+            llamada (Callable): Función sin argumentos que hace la llamada.
+            llamada_extra (Callable | None): Función para la segunda llamada, por defecto `llamada`.
+
+        Returns:
+            Any: El resultado de la primera llamada que termine sin error.
+        """
+        historial = self._historial(operacion)
+        self._presupuesto.registra_llamada()
+        espera = historial.percentil(self.configuracion.percentil, self.configuracion.minimo_muestras)
+
+        inicio = perf_counter()
+        if espera is None:
+            resultado = llamada()
+            historial.registra(perf_counter() - inicio)
+            return resultado
+
+        pendientes = {ejecutor().submit(copy_context().run, llamada)}
+        terminadas, pendientes = wait(pendientes, timeout=espera)
+        if not terminadas and self._presupuesto.consume():
+            with self._lock:
+                self.llamadas_extra += 1
+            pendientes.add(ejecutor().submit(copy_context().run, llamada_extra or llamada))
+
+        error = None
+        while True:
+            for futuro in terminadas:
+                if futuro.exception() is None:
+                    historial.registra(perf_counter() - inicio)
+                    return futuro.result()
+                error = futuro.exception()
+            if not pendientes:
+                raise error
+            terminadas, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
@@ -0,0 +1,101 @@
+"""
+Commit de Webpay en segundo plano.
+
+Con `commit_diferido=True` el retorno desde Webpay responde de inmediato con una página de
+"procesando" y el commit se ejecuta en un hilo una vez confirmada la transacción de la petición.
+La página consulta la vista `estado_pago` hasta que el pago deja de estar pendiente.
+
+Mientras el hilo trabaja mantiene una marca en el cache. Si el hilo falla la marca se borra y si
+el proceso muere expira a los `PAYMENTS_CHILE_COMMIT_ESPERA` segundos; sin marca, la consulta de
+estado o el comando `completa_commits` toman el relevo: consultan la transacción con
+`actualiza_estado` y, si sigue sin commit, lo hacen ellos.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from payments import PaymentStatus, RedirectNeeded, get_payment_model
+from payments.core import provider_factory
+
+from .captura import espera_captura
+from .clientes import clientes
+
+logger = logging.getLogger(__name__)
+
+PENDIENTES = (PaymentStatus.WAITING, PaymentStatus.PREAUTH)
+
+
+def espera_commit() -> float:
+    """Segundos que el hilo tiene para terminar el commit antes de que otro tome el relevo."""
+    return getattr(settings, "PAYMENTS_CHILE_COMMIT_ESPERA", 15)
+
+
+def ejecutor() -> ThreadPoolExecutor:
+    """Ejecutor de los commits en segundo plano, uno por proceso."""
+
+    def crea():
+        hilos = getattr(settings, "PAYMENTS_CHILE_COMMIT_HILOS", 4)
+        return ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="payments-chile-commit")
+
+    return clientes.obtiene("commit", crea)
+
+
+def _llave(pk) -> str:
+    return f"payments_chile:commit:{pk}"
+
+
+def programa_commit(payment, token_ws: str):
+    """Agenda el commit de `payment` para cuando se confirme la transacción de la petición actual."""
+    cache.set(_llave(payment.pk), "programado", timeout=espera_commit())
+    variant, pk = payment.variant, payment.pk
+    transaction.on_commit(lambda: ejecutor().submit(ejecuta_commit, variant, pk, token_ws))
+
+
+def _commit(provider, payment, token_ws: str):
+    try:
+        provider.commit(token_ws, payment)
+    except RedirectNeeded:
+        # El commit indica la página de éxito o fallo; aquí solo interesa el estado
+        pass
+
+
+def ejecuta_commit(variant: str, pk: int, token_ws: str):
+    """Hace el commit en el hilo del ejecutor. Si falla deja el relevo a `verifica_commit`."""
+    try:
+        payment = get_payment_model().objects.get(pk=pk)
+        provider = provider_factory(variant)
+        if payment.status in PENDIENTES and not espera_captura(provider, payment):
+            _commit(provider, payment, token_ws)
+    except Exception:  # noqa
+        logger.exception("Commit en segundo plano fallido, pago %s", pk)
+    finally:
+        cache.delete(_llave(pk))
+        connections.close_all()
+
+
+def verifica_commit(provider, payment) -> str:
+    """Completa el commit de un pago pendiente si ningún hilo se está encargando de él.
+
+    Primero consulta la transacción con `actualiza_estado`, así un commit que alcanzó a llegar a
+    Transbank no se repite; solo si sigue sin commit se hace aquí. Un pago autorizado con captura
+    diferida ya tiene su commit.
+
+    Returns:
+        str: Estado del pago, uno de `PaymentStatus`.
+    """
+    if payment.status not in PENDIENTES or espera_captura(provider, payment):
+        return payment.status
+    if not cache.add(_llave(payment.pk), "relevo", timeout=espera_commit()):
+        return payment.status
+    try:
+        provider.actualiza_estado(payment)
+        if payment.status in PENDIENTES and not espera_captura(provider, payment):
+            _commit(provider, payment, payment.transaction_id)
+    except Exception as e:  # noqa
+        logger.warning("No se pudo completar el commit del pago %s: %s", payment.pk, e)
+    finally:
+        cache.delete(_llave(payment.pk))
+    return payment.status
@@ -0,0 +1,297 @@
+"""
+Conciliación de pagos pendientes en varios procesos.
+
+Después de un incidente hay que consultar a la pasarela el estado de miles de pagos, y leer el
+JSON de las respuestas e instanciar los pagos ocupa la CPU: con hilos en un solo proceso no se
+avanza más rápido. `planifica` divide los pagos pendientes en tramos de `pk` consecutivos y los
+guarda en `TramoConciliacion`, que hace de cola en la base de datos. `concilia` levanta
+`procesos` trabajadores que toman tramos con un arriendo y llaman a `actualiza_estado` del
+proveedor para cada pago.
+
+Cada trabajador es un proceso con su propia conexión a la base de datos y sus propias sesiones
+HTTP con las pasarelas (el registro de clientes se reinicia al hacer fork). Cada `bloque` pagos
+anota en el tramo el último `pk` revisado y renueva el arriendo, así que un tramo de un proceso
+que murió lo retoma otro desde ese punto al vencer el arriendo, y volver a ejecutar la misma
+corrida sigue donde quedó.
+"""
+
+import logging
+import multiprocessing
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from payments import get_payment_model
+from payments.core import provider_factory
+
+from .captura import espera_captura
+from .commit_diferido import PENDIENTES
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResultadoConciliacion:
+    corrida: str
+    tramos: int = 0
+    revisados: int = 0
+    actualizados: int = 0
+    errores: int = 0
+
+    def suma(self, otro: "ResultadoConciliacion"):
+        self.tramos += otro.tramos
+        self.revisados += otro.revisados
+        self.actualizados += otro.actualizados
+        self.errores += otro.errores
+
+
+def variantes_consultables() -> list:
+    """Variantes de `PAYMENT_VARIANTS` cuyo proveedor consulta el estado a una pasarela."""
+    return [
+        variant
+        for variant in getattr(settings, "PAYMENT_VARIANTS", {})
+        if getattr(provider_factory(variant), "_transporte", None) is not None
+    ]
+
+
+def por_conciliar(variants: list):
+    """Pagos pendientes de `variants` creados en la pasarela, por `pk`."""
+    return (
+        get_payment_model()
+        .objects.filter(variant__in=variants, status__in=PENDIENTES)
+        .exclude(transaction_id="")
+        .order_by("pk")
+    )
+
+
+def planifica(
+    corrida: str,
+    variants: Optional[list] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    tamano: int = 1000,
+) -> int:
+    """
+    Crea los tramos de una corrida con los pagos pendientes actuales.
+
+    Una corrida que ya tiene tramos no se vuelve a planificar, para que se pueda retomar.
+
+    Args:
+        corrida (str): Nombre de la corrida.
+        variants (list | None): Variantes a conciliar; por defecto las que consultan a una pasarela (opcional).
+        desde (date | None): Solo pagos creados desde este día (opcional).
+        hasta (date | None): Solo pagos creados hasta este día, inclusive (opcional).
+        tamano (int): Pagos por tramo (Valor por defecto: 1000).
+
+    Returns:
+        int: Tramos creados.
+    """
+    from .models import TramoConciliacion
+
+    if TramoConciliacion.objects.filter(corrida=corrida).exists():
+        return 0
+    variants = variants or variantes_consultables()
+    pagos = por_conciliar(variants)
+    if desde is not None:
+        pagos = pagos.filter(created__date__gte=desde)
+    if hasta is not None:
+        pagos = pagos.filter(created__date__lte=hasta)
+
+    def tramo(desde: int, hasta: int):
+        return TramoConciliacion(corrida=corrida, desde=desde, hasta=hasta, ultimo_pk=desde - 1, variants=variants)
+
+    tramos, inicio, cantidad, pk = [], None, 0, None
+    for pk in pagos.values_list("pk", flat=True).iterator(chunk_size=2000):
+        if inicio is None:
+            inicio = pk
+        cantidad += 1
+        if cantidad == tamano:
+            tramos.append(tramo(inicio, pk))
+            inicio, cantidad = None, 0
+    if inicio is not None:
+        tramos.append(tramo(inicio, pk))
+    TramoConciliacion.objects.bulk_create(tramos, batch_size=500)
+    return len(tramos)
+
+
+def toma(corrida: str, responsable: str, arriendo: float = 300):
+    """
+    Toma el primer tramo pendiente de la corrida que no tenga un arriendo vigente.
+
+    El arriendo se toma con un `UPDATE` condicionado al arriendo leído, así que dos procesos
+    nunca toman el mismo tramo aunque la base de datos no tenga `SELECT ... FOR UPDATE`.
+
+    Returns:
+        TramoConciliacion | None: Tramo tomado, o `None` si no quedan tramos disponibles.
+    """
+    from .models import TramoConciliacion
+
+    while True:
+        ahora = timezone.now()
+        candidatos = list(
+            TramoConciliacion.objects.filter(corrida=corrida, terminado__isnull=True)
+            .filter(Q(arriendo_hasta__isnull=True) | Q(arriendo_hasta__lt=ahora))
+            .order_by("pk")
+            .values_list("pk", "arriendo_hasta")[:10]
+        )
+        if not candidatos:
+            return None
+        for pk, arriendo_hasta in candidatos:
+            tomado = TramoConciliacion.objects.filter(pk=pk, arriendo_hasta=arriendo_hasta).update(
+                responsable=responsable,
+                arriendo_hasta=ahora + timedelta(seconds=arriendo),
+                intentos=F("intentos") + 1,
+            )
+            if tomado:
+                return TramoConciliacion.objects.get(pk=pk)
+
+
+class Trabajador:
+    """
+    Concilia tramos de una corrida hasta que no queden disponibles.
+
+    Args:
+        corrida (str): Nombre de la corrida.
+        responsable (str | None): Identificador en los tramos tomados; por defecto host y pid (opcional).
+        arriendo (float): Segundos de arriendo de un tramo, renovado con cada bloque (Valor por defecto: 300).
+        bloque (int): Pagos consultados entre anotaciones de avance (Valor por defecto: 100).
+    """
+
+    def __init__(self, corrida: str, responsable: Optional[str] = None, arriendo: float = 300, bloque: int = 100):
+        self.corrida = corrida
+        self.responsable = responsable or f"{socket.gethostname()}:{os.getpid()}"
+        self.arriendo = arriendo
+        self.bloque = bloque
+        self.providers = {}
+        self.resultado = ResultadoConciliacion(corrida)
+
+    def _provider(self, variant: str):
+        if variant not in self.providers:
+            self.providers[variant] = provider_factory(variant)
+        return self.providers[variant]
+
+    def _consulta(self, payment) -> tuple:
+        """Consulta el estado de un pago; devuelve `(actualizado, error)`."""
+        provider = self._provider(payment.variant)
+        if espera_captura(provider, payment):
+            # Autorizado con captura diferida: lo cierra `captura_pagos`
+            return False, False
+        estado = payment.status
+        try:
+            provider.actualiza_estado(payment)
+        except Exception as e:  # noqa
+            logger.warning("No se pudo conciliar el pago %s: %s", payment.pk, e)
+            return False, True
+        return payment.status != estado, False
+
+    def _anota(self, tramo, ultimo_pk: int, revisados: int, actualizados: int, errores: int, terminado: bool) -> bool:
+        """Guarda el avance y renueva el arriendo; `False` si otro proceso ya tomó el tramo."""
+        from .models import TramoConciliacion
+
+        ahora = timezone.now()
+        return bool(
+            TramoConciliacion.objects.filter(pk=tramo.pk, responsable=self.responsable, terminado__isnull=True).update(
+                ultimo_pk=ultimo_pk,
+                revisados=F("revisados") + revisados,
+                actualizados=F("actualizados") + actualizados,
+                errores=F("errores") + errores,
+                arriendo_hasta=ahora + timedelta(seconds=self.arriendo),
+                terminado=ahora if terminado else None,
+            )
+        )
+
+    def procesa(self, tramo) -> bool:
+        """Concilia los pagos del tramo desde su último `pk` anotado; `False` si perdió el arriendo."""
+        pagos = por_conciliar(tramo.variants).filter(pk__lte=tramo.hasta)
+        ultimo = tramo.ultimo_pk
+        while True:
+            bloque = list(pagos.filter(pk__gt=ultimo)[: self.bloque])
+            actualizados = errores = 0
+            for payment in bloque:
+                actualizado, error = self._consulta(payment)
+                actualizados += actualizado
+                errores += error
+            terminado = len(bloque) < self.bloque
+            ultimo = tramo.hasta if terminado else bloque[-1].pk
+            if not self._anota(tramo, ultimo, len(bloque), actualizados, errores, terminado):
+                logger.warning("El tramo %s de la corrida %s pasó a otro proceso", tramo.pk, self.corrida)
+                return False
+            self.resultado.revisados += len(bloque)
+            self.resultado.actualizados += actualizados
+            self.resultado.errores += errores
+            if terminado:
+                self.resultado.tramos += 1
+                return True
+
+    def ejecuta(self) -> ResultadoConciliacion:
+        while (tramo := toma(self.corrida, self.responsable, self.arriendo)) is not None:
+            try:
+                self.procesa(tramo)
+            finally:
+                close_old_connections()
+        return self.resultado
+
+
+def _inicia_proceso():
+    import django
+    from django.apps import apps
+
+    # Con spawn el proceso parte sin Django configurado
+    if not apps.ready:
+        django.setup()
+
+
+def _trabaja(corrida: str, arriendo: float, bloque: int) -> ResultadoConciliacion:
+    try:
+        return Trabajador(corrida, arriendo=arriendo, bloque=bloque).ejecuta()
+    finally:
+        connections.close_all()
+
+
+def concilia(corrida: str, procesos: int = 1, arriendo: float = 300, bloque: int = 100) -> ResultadoConciliacion:
+    """
+    Concilia los tramos pendientes de una corrida creada con `planifica`.
+
+    Args:
+        corrida (str): Nombre de la corrida.
+        procesos (int): Procesos trabajadores; con 1 se concilia en el proceso actual (Valor por defecto: 1).
+        arriendo (float): Segundos de arriendo de un tramo, renovado con cada bloque (Valor por defecto: 300).
+        bloque (int): Pagos consultados entre anotaciones de avance (Valor por defecto: 100).
+
+    Returns:
+        ResultadoConciliacion: Tramos terminados y pagos revisados, actualizados y con error en esta ejecución.
+    """
+    if procesos <= 1:
+        return Trabajador(corrida, arriendo=arriendo, bloque=bloque).ejecuta()
+
+    # Los hijos no deben compartir la conexión del padre: cada uno abre la suya
+    connections.close_all()
+    metodo = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    resultado = ResultadoConciliacion(corrida)
+    with ProcessPoolExecutor(
+        procesos, mp_context=multiprocessing.get_context(metodo), initializer=_inicia_proceso
+    ) as ejecutor:
+        trabajos = [ejecutor.submit(_trabaja, corrida, arriendo, bloque) for _ in range(procesos)]
+        for trabajo in trabajos:
+            resultado.suma(trabajo.result())
+    return resultado
+
+
+def progreso(corrida: str) -> dict:
+    """Tramos totales y terminados de la corrida, y pagos revisados, actualizados y con error."""
+    from .models import TramoConciliacion
+
+    tramos = TramoConciliacion.objects.filter(corrida=corrida)
+    totales = tramos.aggregate(revisados=Sum("revisados"), actualizados=Sum("actualizados"), errores=Sum("errores"))
+    return {
+        "tramos": tramos.count(),
+        "terminados": tramos.filter(terminado__isnull=False).count(),
+        **{campo: valor or 0 for campo, valor in totales.items()},
+    }
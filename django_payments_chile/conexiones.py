@@ -0,0 +1,199 @@
+"""
+Conexiones HTTP de las pasarelas.
+
+Las sesiones `requests.Session` de cada pasarela comparten por proceso un mismo pool de
+conexiones, así las llamadas reutilizan las conexiones TLS abiertas en lugar de resolver el host y
+negociar TLS en cada una. Cada hilo usa su propia sesión, ya que `requests.Session` no es segura
+entre hilos; el pool sí lo es. Ambas viven en el registro `clientes`. Al iniciar
+cada worker se pueden abrir esas conexiones por adelantado (`PAYMENTS_CHILE_PRECALENTAR`) y
+mantenerlas vivas con sondeos periódicos (`PAYMENTS_CHILE_SONDEO_INTERVALO`) que además
+alimentan la salud de cada host.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+
+from .clientes import clientes
+from .resolucion import AdaptadorDNS, cache_dns
+from .salud import salud
+
+logger = logging.getLogger(__name__)
+
+
+def adaptador(pasarela: str) -> AdaptadorDNS:
+    """Adaptador del proceso para la pasarela, con un pool de `PAYMENTS_CHILE_POOL` conexiones por host.
+
+    Las conexiones nuevas resuelven el host con `resolucion.cache_dns`.
+    """
+    return clientes.obtiene(
+        ("adaptador", pasarela), lambda: AdaptadorDNS(pool_maxsize=getattr(settings, "PAYMENTS_CHILE_POOL", 10))
+    )
+
+
+def sesion(pasarela: str) -> requests.Session:
+    """Sesión de la pasarela para el hilo actual, sobre el adaptador compartido del proceso."""
+
+    def crea():
+        nueva = requests.Session()
+        nueva.mount("https://", adaptador(pasarela))
+        nueva.mount("http://", adaptador(pasarela))
+        return nueva
+
+    return clientes.obtiene(("sesion", pasarela), crea, ambito="hilo")
+
+
+@dataclass
+class ResultadoSondeo:
+    variant: str
+    pasarela: str
+    host: str
+    dns: Optional[float] = None
+    latencia: Optional[float] = None
+    codigo: Optional[int] = None
+    error: str = ""
+
+    @property
+    def disponible(self) -> bool:
+        return not self.error
+
+
+def sondea(variant: str, pasarela: str, url: str, timeout: float = 5) -> ResultadoSondeo:
+    """Resuelve el host de `url` y hace un `HEAD` por la sesión de la pasarela, dejando la conexión abierta.
+
+    Cualquier respuesta HTTP bajo 500 cuenta como disponible; el resultado se registra en `salud`.
+    """
+    partes = urlsplit(url)
+    resultado = ResultadoSondeo(variant, pasarela, partes.hostname or "")
+    try:
+        inicio = time.perf_counter()
+        cache_dns.resuelve(partes.hostname, partes.port or (443 if partes.scheme == "https" else 80))
+        resultado.dns = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        respuesta = sesion(pasarela).head(url, timeout=timeout, allow_redirects=False)
+        resultado.latencia = time.perf_counter() - inicio
+        resultado.codigo = respuesta.status_code
+        if respuesta.status_code >= 500:
+            resultado.error = f"HTTP {respuesta.status_code}"
+    except (OSError, requests.RequestException) as e:
+        resultado.error = str(e) or type(e).__name__
+
+    if resultado.error:
+        salud.registra_falla(resultado.host, resultado.error)
+    else:
+        salud.registra_exito(resultado.host, resultado.latencia)
+    return resultado
+
+
+def endpoints() -> list:
+    """`(variant, pasarela, url)` de las variantes de `PAYMENT_VARIANTS` que usan el transporte del paquete.
+
+    Incluye los endpoints alternativos de cada variante, para conocer también su salud.
+    """
+    from payments.core import provider_factory
+
+    configurados = []
+    for variant in getattr(settings, "PAYMENT_VARIANTS", {}):
+        try:
+            provider = provider_factory(variant)
+        except Exception as e:  # noqa
+            logger.warning("No se pudo crear el proveedor %s: %s", variant, e)
+            continue
+        transporte = getattr(provider, "_transporte", None)
+        if transporte is not None:
+            configurados.extend((variant, transporte.pasarela, url) for url in transporte.endpoints)
+    return configurados
+
+
+def precalienta(timeout: float = 5) -> list:
+    """Sondea una vez cada endpoint configurado.
+
+    Returns:
+        list[ResultadoSondeo]: Un resultado por variante.
+    """
+    return [sondea(variant, pasarela, url, timeout) for variant, pasarela, url in endpoints()]
+
+
+class Sondeo(threading.Thread):
+    """Hilo que sondea los endpoints cada `intervalo` segundos hasta `detiene()`."""
+
+    def __init__(self, intervalo: float):
+        super().__init__(name="payments-chile-sondeo", daemon=True)
+        self.intervalo = intervalo
+        self._detenido = threading.Event()
+
+    def run(self):
+        while not self._detenido.wait(self.intervalo):
+            try:
+                precalienta()
+            except Exception:  # noqa
+                logger.exception("Sondeo de pasarelas fallido")
+
+    def detiene(self):
+        self._detenido.set()
+
+
+def _inicia_sondeo(intervalo: float) -> Sondeo:
+    sondeo = Sondeo(intervalo)
+    sondeo.start()
+    return sondeo
+
+
+def _en_comando() -> bool:
+    """Indica si el proceso es un comando de administración (`migrate`, `shell`...) y no un servidor.
+
+    Solo cuentan `manage.py`, `django-admin` y `python -m django`; `python -m gunicorn` o `uvicorn` son servidores.
+    """
+    if len(sys.argv) < 2:
+        return False
+    programa = os.path.normpath(sys.argv[0])
+    es_django = os.path.basename(programa) in ("manage.py", "django-admin") or programa.endswith(
+        os.path.join("django", "__main__.py")
+    )
+    return es_django and sys.argv[1] != "runserver"
+
+
+def _arranque() -> bool:
+    if _en_comando():
+        return False
+    if getattr(settings, "PAYMENTS_CHILE_PRECALENTAR", False):
+        threading.Thread(target=precalienta, name="payments-chile-precalentar", daemon=True).start()
+    intervalo = getattr(settings, "PAYMENTS_CHILE_SONDEO_INTERVALO", None)
+    if intervalo:
+        clientes.obtiene("sondeo", lambda: _inicia_sondeo(intervalo))
+    return True
+
+
+def arranca():
+    """Precalienta y programa los sondeos según los settings, una vez por proceso.
+
+    En los comandos de administración no se inicia nada. Si la aplicación no está en `INSTALLED_APPS`,
+    el transporte lo llama en la primera llamada a una pasarela.
+    """
+    clientes.obtiene("arranque", _arranque)
+
+
+_en_fork = False
+
+
+def arranca_workers():
+    """Arranca el proceso actual y cada hijo creado con fork, al iniciar la aplicación.
+
+    Los workers sin `--preload` cargan la aplicación y arrancan en `AppConfig.ready`. Los de gunicorn
+    `--preload` nacen con fork desde el master y arrancan en el hijo, antes de atender peticiones: el
+    registro de clientes se reinicia al hacer fork, así que cada worker tiene su propio hilo de sondeo.
+    """
+    global _en_fork
+    arranca()
+    if not _en_fork and hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=arranca)
+        _en_fork = True
@@ -0,0 +1,203 @@
+"""
+Consulta periódica del estado de los pagos pendientes.
+
+`Programador` mantiene los pagos pendientes de su fragmento en una cola de prioridad ordenada por
+la hora de su próxima consulta y llama a `actualiza_estado` del proveedor cuando corresponde. El
+intervalo entre consultas depende de la pasarela y crece con la edad del pago: Webpay se consulta
+seguido durante el primer minuto y una transferencia Khipu, que puede tardar minutos, con calma.
+
+Los pagos se reparten entre procesos por su `pk`: el proceso `fragmento` de `fragmentos` solo
+carga, con el filtro en la consulta SQL, los pagos cuyo `pk % fragmentos` es su fragmento. Los
+intervalos se ajustan por pasarela con el setting `PAYMENTS_CHILE_CONSULTAS`.
+"""
+
+import heapq
+import logging
+import threading
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models.functions import Mod
+from django.utils import timezone
+from payments import get_payment_model
+from payments.core import provider_factory
+
+from .captura import espera_captura
+from .commit_diferido import PENDIENTES
+from .vencimiento import vencimiento_de
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PoliticaConsulta:
+    """
+    Intervalos de consulta de una pasarela.
+
+    Durante los primeros `rapido` segundos de vida del pago se consulta cada `intervalo_rapido`
+    segundos; después cada `proporcion` de la edad del pago, entre `minimo` y `maximo` segundos.
+    """
+
+    rapido: float = 0
+    intervalo_rapido: float = 10
+    proporcion: float = 0.5
+    minimo: float = 15
+    maximo: float = 600
+
+    def intervalo(self, edad: float) -> float:
+        """Segundos hasta la próxima consulta de un pago con `edad` segundos."""
+        if edad < self.rapido:
+            return self.intervalo_rapido
+        return min(self.maximo, max(self.minimo, edad * self.proporcion))
+
+
+POLITICAS = {
+    "webpay": PoliticaConsulta(rapido=60, intervalo_rapido=5, proporcion=0.5, minimo=15, maximo=300),
+    "flow": PoliticaConsulta(rapido=30, intervalo_rapido=10, proporcion=0.5, minimo=20, maximo=600),
+    "khipu": PoliticaConsulta(rapido=0, proporcion=0.25, minimo=30, maximo=900),
+}
+
+
+def politica(pasarela: str) -> PoliticaConsulta:
+    """Política de la pasarela, con los cambios de `PAYMENTS_CHILE_CONSULTAS[pasarela]`."""
+    base = POLITICAS.get(pasarela, PoliticaConsulta())
+    cambios = getattr(settings, "PAYMENTS_CHILE_CONSULTAS", {}).get(pasarela)
+    return replace(base, **cambios) if cambios else base
+
+
+def del_fragmento(pagos, fragmento: int, fragmentos: int):
+    """Filtra `pagos` a los del fragmento, `pk % fragmentos == fragmento`, en la consulta SQL."""
+    if fragmentos <= 1:
+        return pagos
+    return pagos.annotate(fragmento=Mod("pk", fragmentos)).filter(fragmento=fragmento)
+
+
+@dataclass
+class _Variante:
+    provider: object
+    politica: PoliticaConsulta
+    vencimiento: float
+
+
+class Programador:
+    """
+    Cola de consultas de estado de un fragmento.
+
+    Args:
+        fragmento (int): Fragmento de este proceso, entre 0 y `fragmentos - 1` (Valor por defecto: 0).
+        fragmentos (int): Cantidad de procesos que se reparten los pagos (Valor por defecto: 1).
+        variants (list | None): Variantes a consultar; por defecto las de `PAYMENT_VARIANTS` con transporte (opcional).
+        recarga (float): Segundos entre búsquedas de pagos pendientes nuevos (Valor por defecto: 30).
+    """
+
+    def __init__(self, fragmento: int = 0, fragmentos: int = 1, variants: Optional[list] = None, recarga: float = 30):
+        self.fragmento = fragmento
+        self.fragmentos = fragmentos
+        self.recarga = recarga
+        self.variantes = {}
+        for variant in variants or list(getattr(settings, "PAYMENT_VARIANTS", {})):
+            provider = provider_factory(variant)
+            transporte = getattr(provider, "_transporte", None)
+            if transporte is not None:
+                self.variantes[variant] = _Variante(provider, politica(transporte.pasarela), vencimiento_de(provider))
+        self._cola = []
+        self._programados = {}
+        self._autorizados = set()
+        self._ultima_carga = None
+
+    def __len__(self) -> int:
+        return len(self._programados)
+
+    def _programa(self, pk, variant: str, creado, ahora, desde=None):
+        """Programa la próxima consulta un intervalo después de `desde` (por defecto `ahora`)."""
+        configuracion = self.variantes[variant]
+        edad = (ahora - creado).total_seconds()
+        if edad >= configuracion.vencimiento:
+            # Lo rechaza `barre_vencidos`
+            self._programados.pop(pk, None)
+            return
+        proxima = (desde or ahora).timestamp() + configuracion.politica.intervalo(edad)
+        self._programados[pk] = proxima
+        heapq.heappush(self._cola, (proxima, pk, variant, creado))
+
+    def carga(self, ahora=None) -> int:
+        """Agrega a la cola los pagos pendientes del fragmento que aún no estén en ella.
+
+        La primera consulta de cada pago se programa un intervalo después de su último cambio, así
+        los pagos sin cambios hace rato se consultan de inmediato.
+
+        Returns:
+            int: Pagos agregados.
+        """
+        ahora = ahora or timezone.now()
+        self._ultima_carga = ahora
+        pagos = (
+            get_payment_model()
+            .objects.filter(variant__in=list(self.variantes), status__in=PENDIENTES)
+            .exclude(transaction_id="")
+        )
+        pagos = del_fragmento(pagos, self.fragmento, self.fragmentos)
+        agregados = 0
+        autorizados = set()
+        for pk, variant, creado, modificado in pagos.values_list("pk", "variant", "created", "modified").iterator():
+            if pk in self._autorizados:
+                autorizados.add(pk)
+                continue
+            if pk in self._programados:
+                continue
+            self._programa(pk, variant, creado, ahora, desde=modificado)
+            if pk in self._programados:
+                agregados += 1
+        # Los autorizados que ya no están pendientes (capturados, anulados) se olvidan
+        self._autorizados = autorizados
+        return agregados
+
+    def proxima(self) -> Optional[float]:
+        """Timestamp de la próxima consulta, o `None` si la cola está vacía."""
+        while self._cola and self._programados.get(self._cola[0][1]) != self._cola[0][0]:
+            heapq.heappop(self._cola)
+        return self._cola[0][0] if self._cola else None
+
+    def consulta_vencidas(self, ahora=None) -> int:
+        """Consulta los pagos cuya hora de consulta llegó y reprograma los que siguen pendientes.
+
+        Returns:
+            int: Consultas hechas.
+        """
+        ahora = ahora or timezone.now()
+        if self._ultima_carga is None or (ahora - self._ultima_carga).total_seconds() >= self.recarga:
+            self.carga(ahora)
+
+        consultas = 0
+        while (proxima := self.proxima()) is not None and proxima <= ahora.timestamp():
+            _, pk, variant, creado = heapq.heappop(self._cola)
+            del self._programados[pk]
+            payment = get_payment_model().objects.filter(pk=pk, status__in=PENDIENTES).first()
+            if payment is None:
+                continue
+            consultas += 1
+            try:
+                self.variantes[variant].provider.actualiza_estado(payment)
+            except Exception as e:  # noqa
+                logger.warning("No se pudo consultar el estado del pago %s: %s", pk, e)
+            if espera_captura(self.variantes[variant].provider, payment):
+                # Autorizado con captura diferida: ya no cambia hasta que se capture
+                self._autorizados.add(pk)
+            elif payment.status in PENDIENTES:
+                self._programa(pk, variant, creado, ahora)
+        return consultas
+
+    def ejecuta(self, detenido: threading.Event, espera_maxima: float = 5):
+        """Consulta hasta que se active `detenido`, durmiendo hasta la próxima consulta."""
+        while not detenido.is_set():
+            try:
+                self.consulta_vencidas()
+            except Exception:  # noqa
+                logger.exception("Consulta de estados fallida")
+            finally:
+                close_old_connections()
+            proxima = self.proxima()
+            espera = espera_maxima if proxima is None else proxima - timezone.now().timestamp()
+            detenido.wait(min(espera_maxima, max(0.0, espera)))
@@ -0,0 +1,319 @@
+"""
+Exportación de pagos para cargas a un data warehouse.
+
+`exporta` recorre los pagos por páginas de `pk` (keyset) y lee cada página con
+`iterator(chunk_size=...)` sobre `values_list`, sin crear instancias del modelo ni tener más de un
+bloque en memoria. Los datos de la pasarela guardados en `extra_data` se aplanan en columnas fijas
+con un extractor por proveedor, así todas las filas tienen las mismas columnas.
+
+Cada página se escribe en una parte: JSON por línea comprimido con gzip (`jsonl`) o Parquet
+(`parquet`, requiere `pyarrow`) con un grupo de filas por bloque. La parte se escribe en un archivo
+temporal y se renombra al terminar; recién entonces se anota en `estado.json` el último `pk`
+exportado. Una exportación interrumpida se retoma con `reanuda=True` desde la parte siguiente.
+"""
+
+import gzip
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from payments import get_payment_model
+
+# Columnas del modelo de pagos y su tipo
+COLUMNAS_PAGO = {
+    "pk": "entero",
+    "variant": "texto",
+    "status": "texto",
+    "fraud_status": "texto",
+    "total": "decimal",
+    "captured_amount": "decimal",
+    "currency": "texto",
+    "transaction_id": "texto",
+    "token": "texto",
+    "message": "texto",
+    "created": "fecha",
+    "modified": "fecha",
+}
+
+# Columnas que llenan los extractores a partir de `extra_data`
+COLUMNAS_PASARELA = {
+    "orden_pasarela": "texto",
+    "estado_pasarela": "texto",
+    "codigo_respuesta": "entero",
+    "codigo_autorizacion": "texto",
+    "tipo_pago": "texto",
+    "cuotas": "entero",
+    "tarjeta": "texto",
+    "estado_reembolso": "texto",
+    "monto_reembolso": "decimal",
+    "huella_solicitud": "texto",
+}
+
+COLUMNAS = {**COLUMNAS_PAGO, **COLUMNAS_PASARELA}
+
+ESTADO = "estado.json"
+
+
+def _dict(datos: dict, campo: str) -> dict:
+    valor = datos.get(campo)
+    return valor if isinstance(valor, dict) else {}
+
+
+def extrae_comun(datos: dict) -> dict:
+    return {"huella_solicitud": datos.get("huella_payment_create")}
+
+
+def extrae_flow(datos: dict) -> dict:
+    """Columnas de un pago de Flow: orden de Flow y reembolso."""
+    reembolso = _dict(datos, "solicitud_reembolso")
+    return {
+        **extrae_comun(datos),
+        "orden_pasarela": _dict(datos, "respuesta_flow").get("flowOrder"),
+        "estado_reembolso": reembolso.get("status"),
+        "monto_reembolso": reembolso.get("amount"),
+    }
+
+
+def extrae_khipu(datos: dict) -> dict:
+    """Columnas de un pago de Khipu: `payment_id` y respuesta del reembolso."""
+    return {
+        **extrae_comun(datos),
+        "orden_pasarela": _dict(datos, "respuesta_khipu").get("payment_id"),
+        "estado_reembolso": _dict(datos, "solicitud_reembolso").get("message"),
+    }
+
+
+def extrae_webpay(datos: dict) -> dict:
+    """Columnas de un pago de Webpay: la última consulta de estado prima sobre la respuesta del commit."""
+    respuesta = {**_dict(datos, "commit_response"), **_dict(datos, "status_response")}
+    reembolso = _dict(datos, "refund_response")
+    return {
+        **extrae_comun(datos),
+        "orden_pasarela": respuesta.get("buy_order"),
+        "estado_pasarela": respuesta.get("status"),
+        "codigo_respuesta": respuesta.get("response_code"),
+        "codigo_autorizacion": respuesta.get("authorization_code"),
+        "tipo_pago": respuesta.get("payment_type_code"),
+        "cuotas": respuesta.get("installments_number"),
+        "tarjeta": _dict(respuesta, "card_detail").get("card_number"),
+        "estado_reembolso": reembolso.get("type"),
+        "monto_reembolso": reembolso.get("nullified_amount"),
+    }
+
+
+EXTRACTORES = {
+    "FlowProvider": extrae_flow,
+    "KhipuProvider": extrae_khipu,
+    "WebpayProvider": extrae_webpay,
+}
+
+
+def extractor_de(variant: str) -> Callable:
+    """
+    Extractor de una variante: el de `PAYMENTS_CHILE_EXTRACTORES[variant]` o el de su proveedor.
+
+    Las variantes de otros proveedores solo exportan la huella de la solicitud.
+    """
+    propio = getattr(settings, "PAYMENTS_CHILE_EXTRACTORES", {}).get(variant)
+    if propio is not None:
+        return import_string(propio) if isinstance(propio, str) else propio
+    ruta = getattr(settings, "PAYMENT_VARIANTS", {}).get(variant, ("",))[0]
+    return EXTRACTORES.get(ruta.rsplit(".", 1)[-1], extrae_comun)
+
+
+def filas(valores: Iterable[tuple]) -> Iterator[dict]:
+    """Filas aplanadas a partir de tuplas de `COLUMNAS_PAGO` seguidas de `extra_data`."""
+    extractores = {}
+    nombres = list(COLUMNAS_PAGO)
+    for *pago, extra_data in valores:
+        fila = dict(zip(nombres, pago))
+        variant = fila["variant"]
+        if variant not in extractores:
+            extractores[variant] = extractor_de(variant)
+        try:
+            datos = json.loads(extra_data or "{}")
+        except ValueError:
+            datos = {}
+        extraidas = extractores[variant](datos if isinstance(datos, dict) else {})
+        fila.update({columna: extraidas.get(columna) for columna in COLUMNAS_PASARELA})
+        fila["token"] = str(fila["token"]) if fila["token"] is not None else None
+        yield fila
+
+
+def _serializa(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f"{type(valor).__name__} no es serializable")
+
+
+class EscritorJSONL:
+    """Una fila JSON por línea, comprimido con gzip."""
+
+    extension = "jsonl.gz"
+
+    def __init__(self, ruta: str):
+        self._archivo = gzip.open(ruta, "wt", encoding="utf-8")
+
+    def escribe(self, bloque: list):
+        self._archivo.writelines(
+            json.dumps(fila, default=_serializa, ensure_ascii=False, separators=(",", ":")) + "\n" for fila in bloque
+        )
+
+    def cierra(self):
+        self._archivo.close()
+
+
+class EscritorParquet:
+    """Parquet con un grupo de filas por bloque. Requiere el paquete `pyarrow`."""
+
+    extension = "parquet"
+
+    def __init__(self, ruta: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tipos = {
+            "entero": pa.int64(),
+            "texto": pa.string(),
+            "decimal": pa.decimal128(18, 2),
+            "fecha": pa.timestamp("us", tz="UTC"),
+        }
+        self._pa = pa
+        self._esquema = pa.schema([(columna, tipos[tipo]) for columna, tipo in COLUMNAS.items()])
+        self._escritor = pq.ParquetWriter(ruta, self._esquema, compression="zstd")
+
+    def escribe(self, bloque: list):
+        columnas = {columna: [_columnar(fila[columna], COLUMNAS[columna]) for fila in bloque] for columna in COLUMNAS}
+        self._escritor.write_table(self._pa.table(columnas, schema=self._esquema))
+
+    def cierra(self):
+        self._escritor.close()
+
+
+def _columnar(valor, tipo: str):
+    if valor is None:
+        return None
+    if tipo == "decimal":
+        return Decimal(str(valor)).quantize(Decimal("0.01"))
+    if tipo == "entero":
+        return int(valor)
+    if tipo == "texto":
+        return str(valor)
+    return valor
+
+
+ESCRITORES = {"jsonl": EscritorJSONL, "parquet": EscritorParquet}
+
+
+@dataclass
+class ResultadoExportacion:
+    partes: int = 0
+    filas: int = 0
+    ultimo_pk: int = 0
+
+
+def _lee_estado(destino: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(destino, ESTADO), encoding="utf-8") as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        return None
+
+
+def _guarda_estado(destino: str, estado: dict):
+    temporal = os.path.join(destino, f"{ESTADO}.tmp")
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(estado, archivo)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, os.path.join(destino, ESTADO))
+
+
+def _escribe_parte(clase, ruta: str, valores: Iterable[tuple], bloque: int) -> tuple:
+    """Escribe la parte en `ruta`; devuelve `(filas, último pk)`."""
+    temporal = f"{ruta}.tmp"
+    escritor = clase(temporal)
+    cantidad, ultimo, pendientes = 0, None, []
+    try:
+        for fila in filas(valores):
+            pendientes.append(fila)
+            if len(pendientes) >= bloque:
+                escritor.escribe(pendientes)
+                cantidad, ultimo, pendientes = cantidad + len(pendientes), pendientes[-1]["pk"], []
+        if pendientes:
+            escritor.escribe(pendientes)
+            cantidad, ultimo = cantidad + len(pendientes), pendientes[-1]["pk"]
+    finally:
+        escritor.cierra()
+    if cantidad:
+        os.replace(temporal, ruta)
+    else:
+        os.remove(temporal)
+    return cantidad, ultimo
+
+
+def exporta(
+    destino: str,
+    formato: str = "jsonl",
+    variants: Optional[list] = None,
+    filas_por_parte: int = 100_000,
+    chunk_size: int = 2000,
+    reanuda: bool = False,
+) -> ResultadoExportacion:
+    """
+    Exporta los pagos a partes numeradas en el directorio `destino`.
+
+    Args:
+        destino (str): Directorio de las partes y de `estado.json`; se crea si no existe.
+        formato (str): "jsonl" o "parquet" (Valor por defecto: "jsonl").
+        variants (list | None): Variantes a exportar; por defecto todas (opcional).
+        filas_por_parte (int): Pagos por parte (Valor por defecto: 100000).
+        chunk_size (int): Pagos leídos de la base de datos y escritos por bloque (Valor por defecto: 2000).
+        reanuda (bool): Continúa la exportación anotada en `estado.json` (Valor por defecto: False).
+
+    Returns:
+        ResultadoExportacion: Partes y filas escritas en esta ejecución y último `pk` exportado.
+
+    Raises:
+        FileExistsError: `destino` tiene una exportación anterior y no se pidió `reanuda`.
+        ValueError: El formato no existe o no coincide con el de la exportación que se reanuda.
+    """
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato desconocido: {formato}")
+    os.makedirs(destino, exist_ok=True)
+    estado = _lee_estado(destino)
+    if estado is not None and not reanuda:
+        raise FileExistsError(f"{destino} ya tiene una exportación; use reanuda para continuarla")
+    if estado is None:
+        estado = {"formato": formato, "variants": variants, "partes": 0, "filas": 0, "ultimo_pk": 0}
+    elif estado["formato"] != formato:
+        raise ValueError(f"La exportación de {destino} es {estado['formato']}, no {formato}")
+
+    pagos = get_payment_model().objects.order_by("pk")
+    if estado["variants"]:
+        pagos = pagos.filter(variant__in=estado["variants"])
+    clase = ESCRITORES[formato]
+    resultado = ResultadoExportacion(ultimo_pk=estado["ultimo_pk"])
+
+    while True:
+        pagina = pagos.filter(pk__gt=estado["ultimo_pk"])[:filas_por_parte]
+        valores = pagina.values_list(*COLUMNAS_PAGO, "extra_data").iterator(chunk_size=chunk_size)
+        ruta = os.path.join(destino, f"pagos-{estado['partes'] + 1:06d}.{clase.extension}")
+        cantidad, ultimo = _escribe_parte(clase, ruta, valores, chunk_size)
+        if not cantidad:
+            break
+        estado.update(partes=estado["partes"] + 1, filas=estado["filas"] + cantidad, ultimo_pk=ultimo)
+        _guarda_estado(destino, estado)
+        resultado.partes += 1
+        resultado.filas += cantidad
+        resultado.ultimo_pk = ultimo
+        if cantidad < filas_por_parte:
+            break
+    return resultado
@@ -0,0 +1,236 @@
+"""
+Limitador de tasa por pasarela, cuenta y operación.
+
+Cada llamada saliente de un proveedor reserva un turno en un cubo de tokens antes de salir.
+Si no hay tokens la llamada espera su turno hasta `espera_maxima` segundos; si el turno queda
+más lejos se rechaza con `LimiteExcedido` sin llegar a la pasarela.
+
+El cubo puede vivir en el proceso (`local`), en el cache de Django (`cache`, compartido entre
+workers si el cache lo es) o en Redis (`redis://...`, exacto entre procesos). Si el backend
+compartido falla se usa el cubo local del proceso.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from django.conf import settings
+from payments import PaymentError
+
+logger = logging.getLogger(__name__)
+
+
+class LimiteExcedido(PaymentError):
+    pass
+
+
+@dataclass(frozen=True)
+class Limite:
+    """
+    Configuración de un cubo de tokens.
+
+    Args:
+        tasa (float): Tokens repuestos por segundo.
+        capacidad (int): Máximo de tokens acumulados, es decir la ráfaga permitida.
+        espera_maxima (float): Segundos que una llamada puede esperar su turno (Valor por defecto: 2).
+    """
+
+    tasa: float
+    capacidad: int = 1
+    espera_maxima: float = 2.0
+
+
+@dataclass
+class MetricasCubo:
+    llamadas: int = 0
+    esperas: int = 0
+    espera_total: float = 0.0
+    espera_maxima: float = 0.0
+    rechazos: int = 0
+
+
+class CuboLocal:
+    """Cubo de tokens del proceso. Los turnos se reservan por adelantado permitiendo tokens negativos."""
+
+    def __init__(self, limite: Limite):
+        self.limite = limite
+        self._tokens = float(limite.capacidad)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserva(self, clave: str, espera_maxima: Optional[float] = None) -> Optional[float]:
+        maximo = self.limite.espera_maxima if espera_maxima is None else espera_maxima
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.limite.capacidad, self._tokens + (ahora - self._ultimo) * self.limite.tasa)
+            self._ultimo = ahora
+            espera = max(0.0, (1 - self._tokens) / self.limite.tasa)
+            if espera > maximo:
+                return None
+            self._tokens -= 1
+            return espera
+
+
+class CuboCache:
+    """
+    Cubo en el cache de Django, aproximado por ventanas.
+
+    El tiempo se divide en ventanas de `capacidad / tasa` segundos con `capacidad` turnos cada una.
+    Una llamada incrementa atómicamente el contador de la ventana actual y, si está llena, el de las
+    siguientes hasta encontrar un turno o superar la espera máxima.
+    """
+
+    def __init__(self, limite: Limite, alias: str = "default"):
+        from django.core.cache import caches
+
+        self.limite = limite
+        self.cache = caches[alias]
+        self.ventana = limite.capacidad / limite.tasa
+
+    def reserva(self, clave: str, espera_maxima: Optional[float] = None) -> Optional[float]:
+        maximo = self.limite.espera_maxima if espera_maxima is None else espera_maxima
+        ahora = time.time()
+        actual = int(ahora // self.ventana)
+        ultima = int((ahora + maximo) // self.ventana)
+        for ventana in range(actual, ultima + 1):
+            llave = f"payments_chile:limite:{clave}:{ventana}"
+            self.cache.add(llave, 0, timeout=int(self.ventana + self.limite.espera_maxima) + 1)
+            if self.cache.incr(llave) <= self.limite.capacidad:
+                return max(0.0, ventana * self.ventana - ahora)
+        return None
+
+
+class CuboRedis:
+    """Cubo exacto en Redis usando GCRA en un script Lua. Requiere el paquete `redis`."""
+
+    SCRIPT = """
+    local ahora = tonumber(ARGV[1])
+    local intervalo = tonumber(ARGV[2])
+    local rafaga = tonumber(ARGV[3])
+    local espera_maxima = tonumber(ARGV[4])
+    local tat = tonumber(redis.call('GET', KEYS[1]) or ahora)
+    tat = math.max(tat, ahora)
+    local espera = tat - ahora - rafaga
+    if espera > espera_maxima then
+        return '-1'
+    end
+    redis.call('SET', KEYS[1], tat + intervalo, 'PX', math.ceil((tat + intervalo - ahora) * 1000) + 1000)
+    return tostring(math.max(espera, 0))
+    """
+
+    def __init__(self, limite: Limite, url: str):
+        import redis
+
+        self.limite = limite
+        self.cliente = redis.Redis.from_url(url)
+        self.script = self.cliente.register_script(self.SCRIPT)
+
+    def reserva(self, clave: str, espera_maxima: Optional[float] = None) -> Optional[float]:
+        maximo = self.limite.espera_maxima if espera_maxima is None else espera_maxima
+        intervalo = 1 / self.limite.tasa
+        rafaga = intervalo * (self.limite.capacidad - 1)
+        espera = float(
+            self.script(
+                keys=[f"payments_chile:limite:{clave}"],
+                args=[time.time(), intervalo, rafaga, maximo],
+            )
+        )
+        return None if espera < 0 else espera
+
+
+class Limitador:
+    """Registro de cubos por clave y sus métricas de espera."""
+
+    def __init__(self, backend: Optional[str] = None):
+        self.backend = backend
+        self._cubos = {}
+        self._locales = {}
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _backend(self) -> str:
+        return self.backend or getattr(settings, "PAYMENTS_CHILE_LIMITADOR", "cache")
+
+    def _cubo(self, clave: str, limite: Limite):
+        with self._lock:
+            cubo = self._cubos.get(clave)
+            if cubo is None or cubo.limite != limite:
+                backend = self._backend()
+                if backend == "local":
+                    cubo = CuboLocal(limite)
+                elif backend.startswith(("redis://", "rediss://", "unix://")):
+                    cubo = CuboRedis(limite, backend)
+                else:
+                    cubo = CuboCache(limite, "default" if backend == "cache" else backend)
+                self._cubos[clave] = cubo
+                self._locales[clave] = CuboLocal(limite)
+                self._metricas.setdefault(clave, MetricasCubo())
+            return cubo
+
+    def espera_turno(
+        self, pasarela: str, cuenta: str, operacion: str, limite: Limite, espera_maxima: Optional[float] = None
+    ) -> float:
+        """Espera el turno de una llamada y devuelve los segundos esperados.
+
+        Raises:
+            LimiteExcedido: El turno disponible está más lejos que `espera_maxima` o `limite.espera_maxima`.
+        """
+        cuenta = hashlib.sha256(str(cuenta).encode()).hexdigest()[:12]
+        clave = f"{pasarela}:{cuenta}:{operacion}"
+        cubo = self._cubo(clave, limite)
+        try:
+            espera = cubo.reserva(clave, espera_maxima)
+        except Exception as e:  # noqa
+            logger.warning("Limitador compartido no disponible, se usa el local: %s", e)
+            espera = self._locales[clave].reserva(clave, espera_maxima)
+
+        metricas = self._metricas[clave]
+        with self._lock:
+            metricas.llamadas += 1
+            if espera is None:
+                metricas.rechazos += 1
+            elif espera > 0:
+                metricas.esperas += 1
+                metricas.espera_total += espera
+                metricas.espera_maxima = max(metricas.espera_maxima, espera)
+
+        if espera is None:
+            raise LimiteExcedido(f"Límite de llamadas excedido para {pasarela} {operacion}", code=429)
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+    def intenta_turno(self, pasarela: str, cuenta: str, operacion: str, limite: Limite) -> bool:
+        """Toma un turno solo si está disponible sin esperar."""
+        try:
+            self.espera_turno(pasarela, cuenta, operacion, limite, espera_maxima=0)
+        except LimiteExcedido:
+            return False
+        return True
+
+    def metricas(self) -> dict:
+        """Métricas por `pasarela:cuenta:operacion`, con la cuenta ofuscada."""
+        with self._lock:
+            return {clave: asdict(metricas) for clave, metricas in self._metricas.items()}
+
+
+limitador = Limitador()
+
+
+def normaliza_limites(limites: Optional[dict]) -> dict:
+    """Convierte la configuración `limites` de un proveedor en `Limite` por operación.
+
+    Acepta por operación un `Limite`, un diccionario con sus campos o una tupla `(tasa, capacidad)`.
+    La operación `"*"` aplica a las operaciones sin límite propio.
+    """
+    normalizados = {}
+    for operacion, limite in (limites or {}).items():
+        if isinstance(limite, dict):
+            limite = Limite(**limite)
+        elif isinstance(limite, (tuple, list)):
+            limite = Limite(*limite)
+        normalizados[operacion] = limite
+    return normalizados
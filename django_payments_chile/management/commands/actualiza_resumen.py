@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from django_payments_chile.reportes import actualiza_resumen
+
+
+class Command(BaseCommand):
+    help = "Recalcula el resumen diario de los pagos de los días modificados desde la corrida anterior"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--variant", action="append", help="Variantes a resumir (por defecto todas)")
+        parser.add_argument("--completo", action="store_true", help="Recalcula todos los días")
+        parser.add_argument("--solape", type=float, default=300, help="Segundos revisados de nuevo por corrida")
+
+    def handle(self, *args, **options):
+        for variant in options["variant"] or list(getattr(settings, "PAYMENT_VARIANTS", {})):
+            dias = actualiza_resumen(variant, completo=options["completo"], solape=options["solape"])
+            self.stdout.write(f"{variant}: {dias} días recalculados")
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from django_payments_chile.vencimiento import barre_vencidos
+
+
+class Command(BaseCommand):
+    help = "Rechaza los pagos pendientes abandonados, confirmando antes su estado con la pasarela"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--variant", action="append", help="Variantes a revisar (por defecto todas)")
+        parser.add_argument("--vencimiento", type=float, default=None, help="Segundos sin cambios (por variante)")
+        parser.add_argument("--lote", type=int, default=500, help="Pagos leídos y escritos por bloque")
+        parser.add_argument("--hilos", type=int, default=4, help="Consultas simultáneas a la pasarela")
+        parser.add_argument("--tasa", type=float, default=5.0, help="Consultas por segundo a la pasarela")
+
+    def handle(self, *args, **options):
+        for variant in options["variant"] or list(getattr(settings, "PAYMENT_VARIANTS", {})):
+            resultado = barre_vencidos(
+                variant,
+                vencimiento=options["vencimiento"],
+                lote=options["lote"],
+                hilos=options["hilos"],
+                tasa=options["tasa"],
+            )
+            self.stdout.write(
+                f"{variant}: {resultado.revisados} revisados, {resultado.vencidos} vencidos, "
+                f"{resultado.resueltos} resueltos por la pasarela, {resultado.errores} con error"
+            )
@@ -0,0 +1,45 @@
+import csv
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_payments_chile.captura import captura_pagos
+
+
+class Command(BaseCommand):
+    help = "Captura en bloque los pagos autorizados de una variante con captura diferida"
+
+    def add_arguments(self, parser):
+        parser.add_argument("variant", help="Variante con capture=False")
+        parser.add_argument("--pk", type=int, action="append", help="Pagos a capturar")
+        parser.add_argument("--archivo", help="CSV con pk y, opcionalmente, el monto a capturar por línea")
+        parser.add_argument("--todos", action="store_true", help="Captura todos los pagos autorizados de la variante")
+        parser.add_argument("--lote", type=int, default=500, help="Pagos leídos y escritos por bloque")
+        parser.add_argument("--hilos", type=int, default=4, help="Capturas simultáneas en la pasarela")
+        parser.add_argument("--tasa", type=float, default=5.0, help="Capturas por segundo en la pasarela")
+
+    def handle(self, *args, **options):
+        pks, montos = list(options["pk"] or []), {}
+        if options["archivo"]:
+            with open(options["archivo"], newline="") as archivo:
+                for fila in csv.reader(archivo):
+                    if not fila or not fila[0].strip().isdigit():
+                        continue
+                    pks.append(int(fila[0]))
+                    if len(fila) > 1 and fila[1].strip():
+                        montos[int(fila[0])] = Decimal(fila[1].strip())
+        if not pks and not options["todos"]:
+            raise CommandError("Indica los pagos con --pk o --archivo, o usa --todos")
+
+        resultado = captura_pagos(
+            options["variant"],
+            pks=None if options["todos"] and not pks else pks,
+            montos=montos,
+            lote=options["lote"],
+            hilos=options["hilos"],
+            tasa=options["tasa"],
+        )
+        self.stdout.write(
+            f"{options['variant']}: {resultado.revisados} revisados, {resultado.capturados} capturados, "
+            f"{resultado.rechazados} rechazados, {resultado.omitidos} sin autorización, {resultado.errores} con error"
+        )
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from payments import get_payment_model
+from payments.core import provider_factory
+
+from django_payments_chile.commit_diferido import PENDIENTES, espera_commit, verifica_commit
+
+
+class Command(BaseCommand):
+    help = "Completa los commits diferidos de Webpay que ningún hilo terminó"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--variant", action="append", required=True, help="Variantes Webpay a revisar")
+        parser.add_argument(
+            "--antiguedad", type=float, default=None, help="Segundos sin cambios antes de tomar el relevo"
+        )
+        parser.add_argument("--ventana", type=float, default=600, help="No revisa pagos más antiguos que esto (s)")
+
+    def handle(self, *args, **options):
+        antiguedad = espera_commit() if options["antiguedad"] is None else options["antiguedad"]
+        ahora = timezone.now()
+        pagos = get_payment_model().objects.filter(
+            variant__in=options["variant"],
+            status__in=PENDIENTES,
+            modified__lte=ahora - timedelta(seconds=antiguedad),
+            modified__gte=ahora - timedelta(seconds=options["ventana"]),
+        )
+
+        revisados = 0
+        for payment in pagos.exclude(transaction_id="").iterator():
+            verifica_commit(provider_factory(payment.variant), payment)
+            revisados += 1
+
+        self.stdout.write(f"{revisados} pagos revisados")
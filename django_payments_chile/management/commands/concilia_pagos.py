@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from django_payments_chile.conciliacion import concilia, planifica, progreso
+
+
+class Command(BaseCommand):
+    help = "Concilia con la pasarela los pagos pendientes, repartidos por tramos entre varios procesos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("corrida", help="Nombre de la corrida; si ya existe se retoma")
+        parser.add_argument("--variant", action="append", help="Variantes a conciliar (por defecto todas)")
+        parser.add_argument("--desde", type=date.fromisoformat, help="Solo pagos creados desde este día (AAAA-MM-DD)")
+        parser.add_argument("--hasta", type=date.fromisoformat, help="Solo pagos creados hasta este día, inclusive")
+        parser.add_argument("--tamano-tramo", type=int, default=1000, help="Pagos por tramo")
+        parser.add_argument("--procesos", type=int, default=1, help="Procesos trabajadores")
+        parser.add_argument("--arriendo", type=float, default=300, help="Segundos de arriendo de un tramo")
+        parser.add_argument("--bloque", type=int, default=100, help="Pagos consultados entre anotaciones de avance")
+
+    def handle(self, *args, **options):
+        corrida = options["corrida"]
+        nuevos = planifica(
+            corrida, options["variant"], desde=options["desde"], hasta=options["hasta"], tamano=options["tamano_tramo"]
+        )
+        if nuevos:
+            self.stdout.write(f"Corrida {corrida}: {nuevos} tramos planificados")
+        resultado = concilia(
+            corrida, procesos=options["procesos"], arriendo=options["arriendo"], bloque=options["bloque"]
+        )
+        total = progreso(corrida)
+        self.stdout.write(
+            f"{resultado.revisados} pagos revisados, {resultado.actualizados} actualizados, "
+            f"{resultado.errores} con error; {total['terminados']} de {total['tramos']} tramos terminados"
+        )
@@ -0,0 +1,35 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_payments_chile.consultas import Programador
+
+
+class Command(BaseCommand):
+    help = "Consulta el estado de los pagos pendientes de un fragmento con intervalos según la pasarela"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fragmento", type=int, default=0, help="Fragmento de este proceso, desde 0")
+        parser.add_argument("--fragmentos", type=int, default=1, help="Procesos que se reparten los pagos")
+        parser.add_argument("--variant", action="append", help="Variantes a consultar (por defecto todas)")
+        parser.add_argument("--recarga", type=float, default=30, help="Segundos entre búsquedas de pagos nuevos")
+        parser.add_argument("--una-vez", action="store_true", help="Hace las consultas vencidas y termina")
+
+    def handle(self, *args, **options):
+        if not 0 <= options["fragmento"] < options["fragmentos"]:
+            raise CommandError("--fragmento debe estar entre 0 y --fragmentos - 1")
+        programador = Programador(
+            options["fragmento"], options["fragmentos"], options["variant"], recarga=options["recarga"]
+        )
+        if options["una_vez"]:
+            consultas = programador.consulta_vencidas()
+            self.stdout.write(f"{consultas} pagos consultados, {len(programador)} programados")
+            return
+
+        detenido = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: detenido.set())
+        try:
+            programador.ejecuta(detenido)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_payments_chile.exportacion import ESCRITORES, exporta
+
+
+class Command(BaseCommand):
+    help = "Exporta los pagos y las respuestas de las pasarelas en partes comprimidas, retomables si se interrumpe"
+
+    def add_arguments(self, parser):
+        parser.add_argument("destino", help="Directorio de las partes")
+        parser.add_argument("--formato", choices=list(ESCRITORES), default="jsonl")
+        parser.add_argument("--variant", action="append", help="Variantes a exportar (por defecto todas)")
+        parser.add_argument("--filas-por-parte", type=int, default=100_000, help="Pagos por parte")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Pagos leídos y escritos por bloque")
+        parser.add_argument("--reanuda", action="store_true", help="Continúa una exportación interrumpida")
+
+    def handle(self, *args, **options):
+        try:
+            resultado = exporta(
+                options["destino"],
+                formato=options["formato"],
+                variants=options["variant"],
+                filas_por_parte=options["filas_por_parte"],
+                chunk_size=options["chunk_size"],
+                reanuda=options["reanuda"],
+            )
+        except (FileExistsError, ValueError) as e:
+            raise CommandError(str(e))
+        except ImportError as e:
+            raise CommandError(f"El formato {options['formato']} requiere {e.name}")
+        self.stdout.write(
+            f"{resultado.filas} pagos en {resultado.partes} partes, último pk exportado {resultado.ultimo_pk}"
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from payments import get_payment_model
+
+from django_payments_chile.referencias import referencias_de, registra_referencias
+
+
+class Command(BaseCommand):
+    help = "Indexa los identificadores de la pasarela de los pagos creados antes de activar `referencias`"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--variant", action="append", help="Variantes a indexar (por defecto todas)")
+        parser.add_argument("--lote", type=int, default=500, help="Pagos leídos por consulta")
+
+    def handle(self, *args, **options):
+        pagos = get_payment_model().objects.exclude(transaction_id="").only("pk", "variant", "extra_data")
+        if options["variant"]:
+            pagos = pagos.filter(variant__in=options["variant"])
+
+        total = 0
+        for payment in pagos.iterator(chunk_size=options["lote"]):
+            referencias = referencias_de(payment)
+            if referencias:
+                registra_referencias(payment, *referencias)
+                total += 1
+
+        self.stdout.write(f"{total} pagos indexados")
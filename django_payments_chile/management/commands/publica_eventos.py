@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_payments_chile.outbox import ErrorPublicacion, obtiene_sumidero, publica_lote
+
+
+class Command(BaseCommand):
+    help = "Publica en lotes los eventos de estado pendientes del outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=100, help="Eventos por lote")
+        parser.add_argument("--sumidero", default=None, help="Ruta de la clase sumidero (por defecto el setting)")
+        parser.add_argument("--continuo", action="store_true", help="Sigue esperando eventos nuevos")
+        parser.add_argument("--intervalo", type=float, default=1.0, help="Espera entre pasadas sin eventos (s)")
+
+    def handle(self, *args, **options):
+        sumidero = obtiene_sumidero(options["sumidero"])
+        total = 0
+        while True:
+            try:
+                publicados = publica_lote(sumidero, lote=options["lote"])
+            except ErrorPublicacion as e:
+                if not options["continuo"]:
+                    raise CommandError(str(e)) from e
+                self.stderr.write(str(e))
+                publicados = 0
+            total += publicados
+            if publicados:
+                continue
+            if not options["continuo"]:
+                break
+            time.sleep(options["intervalo"])
+
+        self.stdout.write(f"{total} eventos publicados")
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_payments_chile.conexiones import endpoints, sondea
+from django_payments_chile.salud import salud
+
+
+def _ms(segundos) -> str:
+    return "-" if segundos is None else f"{segundos * 1000:.0f} ms"
+
+
+class Command(BaseCommand):
+    help = "Verifica la conexión a las pasarelas configuradas en PAYMENT_VARIANTS: DNS, latencia y circuito"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--variant", action="append", help="Variantes a verificar (por defecto todas)")
+        parser.add_argument("--timeout", type=float, default=5, help="Timeout de cada prueba (s)")
+
+    def handle(self, *args, **options):
+        configurados = [
+            endpoint for endpoint in endpoints() if not options["variant"] or endpoint[0] in options["variant"]
+        ]
+        if not configurados:
+            raise CommandError("No hay variantes de django-payments-chile configuradas")
+
+        fallidas = []
+        for variant, pasarela, url in configurados:
+            resultado = sondea(variant, pasarela, url, options["timeout"])
+            circuito = "cerrado" if salud.disponible(resultado.host) else "abierto"
+            linea = (
+                f"{variant:<16} {resultado.host:<28} dns {_ms(resultado.dns):>8}  "
+                f"latencia {_ms(resultado.latencia):>8}  circuito {circuito}"
+            )
+            if resultado.disponible:
+                self.stdout.write(self.style.SUCCESS(f"OK    {linea}  HTTP {resultado.codigo}"))
+            else:
+                fallidas.append(variant)
+                self.stdout.write(self.style.ERROR(f"FALLA {linea}  {resultado.error}"))
+
+        if fallidas:
+            raise CommandError(f"Pasarelas no disponibles: {', '.join(fallidas)}")
@@ -0,0 +1,176 @@
+"""
+Cache de metadatos de las pasarelas (bancos, medios de pago).
+
+Los metadatos cambian poco y se muestran al renderizar el checkout, así que nunca se piden a la
+pasarela durante la petición: `CacheMetadatos.obtiene` responde siempre desde memoria (o desde el
+cache de Django, compartido entre workers) y, si el valor venció, lo refresca en un hilo mientras
+sigue entregando el anterior (stale-while-revalidate). Los refrescos envían el `ETag` conocido en
+`If-None-Match`; un `304` solo renueva la vigencia.
+
+La vigencia se configura con `PAYMENTS_CHILE_METADATOS_TTL` y el tiempo que se sigue sirviendo un
+valor vencido con `PAYMENTS_CHILE_METADATOS_OBSOLETO`.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from .clientes import clientes
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Metadato:
+    valor: Any
+    etag: Optional[str] = None
+    vence: float = 0.0
+
+
+def ttl() -> float:
+    return getattr(settings, "PAYMENTS_CHILE_METADATOS_TTL", 3600)
+
+
+def obsoleto() -> float:
+    return getattr(settings, "PAYMENTS_CHILE_METADATOS_OBSOLETO", 86400)
+
+
+class CacheMetadatos:
+    """
+    Metadatos por clave, con refresco en segundo plano.
+
+    El cargador recibe el `ETag` conocido y devuelve `(valor, etag)`, o `None` si la pasarela
+    respondió que no hubo cambios.
+    """
+
+    def __init__(self, hilos: int = 2):
+        self.hilos = hilos
+        self._entradas = {}
+        self._refrescos = {}
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._despues_de_fork)
+
+    def _despues_de_fork(self):
+        # Los refrescos en curso eran hilos del padre: no terminarán en el hijo
+        self._lock = threading.Lock()
+        self._refrescos = {}
+
+    def _ejecutor(self) -> ThreadPoolExecutor:
+        return clientes.obtiene(
+            ("metadatos", id(self)),
+            lambda: ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="payments-chile-metadatos"),
+        )
+
+    def _llave(self, clave: str) -> str:
+        return f"payments_chile:metadatos:{clave}"
+
+    def obtiene(self, clave: str, cargador: Callable, predeterminado: Any = None) -> Any:
+        """Valor de `clave` sin esperar a la pasarela.
+
+        Si no hay valor vigente agenda un refresco; mientras tanto entrega el valor vencido (hasta
+        `PAYMENTS_CHILE_METADATOS_OBSOLETO` segundos) o `predeterminado`.
+        """
+        ahora = time.time()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+        if entrada is None or entrada.vence <= ahora:
+            compartida = cache.get(self._llave(clave))
+            if compartida is not None and (entrada is None or compartida.vence > entrada.vence):
+                entrada = compartida
+                with self._lock:
+                    self._entradas[clave] = entrada
+
+        if entrada is not None and entrada.vence > ahora:
+            return entrada.valor
+        self.programa(clave, cargador)
+        if entrada is not None and ahora - entrada.vence <= obsoleto():
+            return entrada.valor
+        return predeterminado
+
+    def programa(self, clave: str, cargador: Callable) -> Future:
+        """Agenda el refresco de `clave`, a lo más uno a la vez por clave."""
+        with self._lock:
+            futuro = self._refrescos.get(clave)
+            if futuro is not None and not futuro.done():
+                return futuro
+            futuro = self._refrescos[clave] = self._ejecutor().submit(self._refresca_en_segundo_plano, clave, cargador)
+        futuro.add_done_callback(lambda terminado: self._termina(clave, terminado))
+        return futuro
+
+    def _refresca_en_segundo_plano(self, clave: str, cargador: Callable):
+        try:
+            return self.refresca(clave, cargador)
+        except Exception as e:  # noqa
+            logger.warning("No se pudieron refrescar los metadatos %s: %s", clave, e)
+
+    def _termina(self, clave: str, futuro: Future):
+        with self._lock:
+            if self._refrescos.get(clave) is futuro:
+                del self._refrescos[clave]
+
+    def refresca(self, clave: str, cargador: Callable) -> Any:
+        """Pide el valor a la pasarela ahora, con el `ETag` conocido, y lo guarda."""
+        with self._lock:
+            anterior = self._entradas.get(clave)
+        resultado = cargador(anterior.etag if anterior is not None else None)
+        if resultado is None and anterior is not None:
+            entrada = Metadato(anterior.valor, anterior.etag, time.time() + ttl())
+        else:
+            if resultado is None:
+                # "Sin cambios" sin un valor que conservar (tras `limpia` o si el cache lo descartó): se pide completo
+                resultado = cargador(None)
+            if resultado is None:
+                raise ValueError(f"La pasarela no entregó los metadatos {clave}")
+            valor, etag = resultado
+            entrada = Metadato(valor, etag, time.time() + ttl())
+
+        with self._lock:
+            self._entradas[clave] = entrada
+        cache.set(self._llave(clave), entrada, timeout=int(ttl() + obsoleto()))
+        return entrada.valor
+
+    def pendiente(self, clave: str) -> Optional[Future]:
+        """Refresco en curso de `clave`, si lo hay."""
+        with self._lock:
+            return self._refrescos.get(clave)
+
+    def limpia(self):
+        with self._lock:
+            self._entradas.clear()
+            self._refrescos.clear()
+
+
+metadatos = CacheMetadatos()
+
+
+def clave(pasarela: str, cuenta: str, recurso: str) -> str:
+    """Clave de un recurso de una cuenta, con la cuenta ofuscada."""
+    return f"{pasarela}:{hashlib.sha256(str(cuenta).encode()).hexdigest()[:12]}:{recurso}"
+
+
+def cargador_http(transporte, url: str, campo: str, headers: Optional[dict] = None) -> Callable:
+    """Cargador que hace un `GET` condicional a `url` y devuelve `campo` de la respuesta JSON."""
+
+    def carga(etag: Optional[str]):
+        encabezados = dict(headers or {})
+        if etag:
+            encabezados["If-None-Match"] = etag
+        respuesta = transporte.solicita(
+            "metadatos", requests.get, url, idempotente=True, headers=encabezados, timeout=5
+        )
+        if respuesta.status_code == 304:
+            return None
+        respuesta.raise_for_status()
+        return respuesta.json()[campo], respuesta.headers.get("ETag")
+
+    return carga
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="EventoPago",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("variant", models.CharField(max_length=255)),
+                ("pago_id", models.BigIntegerField()),
+                ("token", models.CharField(max_length=36)),
+                ("estado_anterior", models.CharField(blank=True, max_length=10)),
+                ("estado", models.CharField(max_length=10)),
+                ("mensaje", models.TextField(blank=True, default="")),
+                ("creado", models.DateTimeField(auto_now_add=True)),
+                ("publicado", models.DateTimeField(blank=True, null=True)),
+                ("intentos", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("publicado__isnull", True)),
+                        fields=["id"],
+                        name="evento_pago_pendiente_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="MensajeCola",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("tema", models.CharField(max_length=100)),
+                ("cuerpo", models.JSONField()),
+                ("creado", models.DateTimeField(auto_now_add=True)),
+                ("consumido", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("consumido__isnull", True)),
+                        fields=["tema", "id"],
+                        name="mensaje_cola_pendiente_idx",
+                    )
+                ],
+            },
+        ),
+    ]
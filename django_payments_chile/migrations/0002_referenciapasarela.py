@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_payments_chile", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReferenciaPasarela",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("variant", models.CharField(max_length=255)),
+                ("referencia", models.CharField(max_length=255)),
+                ("pago_id", models.BigIntegerField(db_index=True)),
+                ("creado", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("variant", "referencia"), name="referencia_pasarela_unica")
+                ],
+            },
+        ),
+    ]
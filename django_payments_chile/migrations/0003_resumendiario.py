@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_payments_chile", "0002_referenciapasarela"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResumenDiario",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("variant", models.CharField(max_length=255)),
+                ("fecha", models.DateField()),
+                ("pagos", models.PositiveIntegerField(default=0)),
+                ("confirmados", models.PositiveIntegerField(default=0)),
+                ("rechazados", models.PositiveIntegerField(default=0)),
+                ("reembolsados", models.PositiveIntegerField(default=0)),
+                ("monto_confirmado", models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ("monto_reembolsado", models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ("rechazos", models.JSONField(blank=True, default=dict)),
+                ("calculado", models.DateTimeField()),
+            ],
+            options={
+                "ordering": ["-fecha", "variant"],
+                "constraints": [models.UniqueConstraint(fields=("variant", "fecha"), name="resumen_diario_unico")],
+            },
+        ),
+    ]
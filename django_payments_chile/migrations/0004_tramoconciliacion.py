@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_payments_chile", "0003_resumendiario"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TramoConciliacion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("corrida", models.CharField(max_length=100)),
+                ("desde", models.BigIntegerField()),
+                ("hasta", models.BigIntegerField()),
+                ("variants", models.JSONField(default=list)),
+                ("ultimo_pk", models.BigIntegerField(default=0)),
+                ("responsable", models.CharField(blank=True, max_length=255)),
+                ("arriendo_hasta", models.DateTimeField(blank=True, null=True)),
+                ("terminado", models.DateTimeField(blank=True, null=True)),
+                ("intentos", models.PositiveIntegerField(default=0)),
+                ("revisados", models.PositiveIntegerField(default=0)),
+                ("actualizados", models.PositiveIntegerField(default=0)),
+                ("errores", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["corrida", "desde"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("terminado__isnull", True)),
+                        fields=["corrida", "id"],
+                        name="tramo_pendiente_idx",
+                    )
+                ],
+                "constraints": [models.UniqueConstraint(fields=("corrida", "desde"), name="tramo_conciliacion_unico")],
+            },
+        ),
+    ]
@@ -0,0 +1,154 @@
+from django.db import models
+from django.db.models import Q
+
+
+class EventoPago(models.Model):
+    """
+    Fila del outbox con una transición de estado de un pago.
+
+    Se escribe en la misma transacción que el cambio de estado y luego `publica_eventos`
+    la entrega a un sumidero, por lo que la notificación de la pasarela no espera a los receptores.
+    """
+
+    variant = models.CharField(max_length=255)
+    pago_id = models.BigIntegerField()
+    token = models.CharField(max_length=36)
+    estado_anterior = models.CharField(max_length=10, blank=True)
+    estado = models.CharField(max_length=10)
+    mensaje = models.TextField(blank=True, default="")
+    creado = models.DateTimeField(auto_now_add=True)
+    publicado = models.DateTimeField(null=True, blank=True)
+    intentos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["id"], condition=Q(publicado__isnull=True), name="evento_pago_pendiente_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.variant} {self.token}: {self.estado_anterior} -> {self.estado}"
+
+    def como_dict(self) -> dict:
+        return {
+            "id": self.pk,
+            "variant": self.variant,
+            "pago_id": self.pago_id,
+            "token": self.token,
+            "estado_anterior": self.estado_anterior,
+            "estado": self.estado,
+            "mensaje": self.mensaje,
+            "creado": self.creado.isoformat(),
+        }
+
+
+class MensajeCola(models.Model):
+    """Mensaje entregado por `SumideroColaBD`, para consumidores que leen la cola desde la base de datos."""
+
+    tema = models.CharField(max_length=100)
+    cuerpo = models.JSONField()
+    creado = models.DateTimeField(auto_now_add=True)
+    consumido = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["tema", "id"], condition=Q(consumido__isnull=True), name="mensaje_cola_pendiente_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tema} #{self.pk}"
+
+
+class ReferenciaPasarela(models.Model):
+    """
+    Identificador externo de un pago en la pasarela.
+
+    Permite encontrar el pago a partir del `token` de Flow, el `token_ws` de Webpay o el `payment_id`
+    de Khipu con una búsqueda por índice, sin recorrer `extra_data`.
+    """
+
+    variant = models.CharField(max_length=255)
+    referencia = models.CharField(max_length=255)
+    pago_id = models.BigIntegerField(db_index=True)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["variant", "referencia"], name="referencia_pasarela_unica"),
+        ]
+
+    def __str__(self):
+        return f"{self.variant} {self.referencia} -> {self.pago_id}"
+
+
+class ResumenDiario(models.Model):
+    """
+    Totales de los pagos de una variante creados en un día, para reportes y dashboards.
+
+    La calcula `actualiza_resumen` solo para los días con pagos modificados desde la última vez,
+    así los reportes leen unas pocas filas en vez de recorrer la tabla de pagos.
+    """
+
+    variant = models.CharField(max_length=255)
+    fecha = models.DateField()
+    pagos = models.PositiveIntegerField(default=0)
+    confirmados = models.PositiveIntegerField(default=0)
+    rechazados = models.PositiveIntegerField(default=0)
+    reembolsados = models.PositiveIntegerField(default=0)
+    monto_confirmado = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    monto_reembolsado = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    rechazos = models.JSONField(default=dict, blank=True)
+    calculado = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-fecha", "variant"]
+        constraints = [
+            models.UniqueConstraint(fields=["variant", "fecha"], name="resumen_diario_unico"),
+        ]
+
+    def __str__(self):
+        return f"{self.variant} {self.fecha}"
+
+    @property
+    def tasa_reembolso(self) -> float:
+        """Fracción de los pagos cobrados (confirmados o reembolsados) que se reembolsó."""
+        cobrados = self.confirmados + self.reembolsados
+        return self.reembolsados / cobrados if cobrados else 0.0
+
+
+class TramoConciliacion(models.Model):
+    """
+    Rango de `pk` de pagos de una corrida de conciliación.
+
+    `concilia` reparte los tramos entre procesos con un arriendo: quien toma un tramo lo renueva
+    cada vez que anota su avance en `ultimo_pk`, y si el proceso muere el tramo queda disponible
+    para otro al vencer el arriendo, que sigue desde el último `pk` anotado.
+    """
+
+    corrida = models.CharField(max_length=100)
+    desde = models.BigIntegerField()
+    hasta = models.BigIntegerField()
+    variants = models.JSONField(default=list)
+    ultimo_pk = models.BigIntegerField(default=0)
+    responsable = models.CharField(max_length=255, blank=True)
+    arriendo_hasta = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+    intentos = models.PositiveIntegerField(default=0)
+    revisados = models.PositiveIntegerField(default=0)
+    actualizados = models.PositiveIntegerField(default=0)
+    errores = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["corrida", "desde"]
+        constraints = [
+            models.UniqueConstraint(fields=["corrida", "desde"], name="tramo_conciliacion_unico"),
+        ]
+        indexes = [
+            models.Index(fields=["corrida", "id"], condition=Q(terminado__isnull=True), name="tramo_pendiente_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.corrida} {self.desde}-{self.hasta}"
@@ -0,0 +1,129 @@
+"""
+Normalización de montos por moneda.
+
+Cada moneda tiene un exponente fijo: los decimales que aceptan las pasarelas. `EXPONENTES` y los
+cuantos derivados se calculan una vez al importar el módulo, y `normaliza` redondea con
+`ROUND_HALF_UP` al cuanto de la moneda del pago. `monto_pasarela` entrega el valor que va en el
+cuerpo de las solicitudes: un `int` para monedas sin decimales como el peso chileno, y un `float`
+para UF o dólares, que se serializan igual en JSON y en formularios.
+
+Las monedas que no están en la tabla se agregan con `PAYMENTS_CHILE_MONEDAS`, por ejemplo
+`{"PEN": 2}`; una moneda desconocida levanta `PaymentError` antes de llamar a la pasarela.
+
+`normaliza_lote` y `montos_pasarela` convierten listas completas de montos, para reembolsos y
+conciliaciones por lote, resolviendo el cuanto de cada moneda una sola vez.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import repeat
+from typing import Iterable, Union
+
+from django.conf import settings
+from payments import PaymentError
+
+# Decimales de cada moneda en las pasarelas
+EXPONENTES = {
+    "CLP": 0,
+    "CLF": 4,
+    "UF": 4,
+    "USD": 2,
+    "EUR": 2,
+    "ARS": 2,
+    "BOB": 2,
+    "BRL": 2,
+    "COP": 2,
+    "MXN": 2,
+    "PEN": 2,
+}
+
+_CUANTOS = {moneda: Decimal(1).scaleb(-exponente) for moneda, exponente in EXPONENTES.items()}
+
+Monto = Union[int, float, str, Decimal]
+
+
+def monedas_adicionales() -> dict:
+    return getattr(settings, "PAYMENTS_CHILE_MONEDAS", {})
+
+
+def cuanto(moneda: str) -> Decimal:
+    """
+    Menor monto de la moneda, por ejemplo `Decimal("0.01")` para dólares.
+
+    Raises:
+        PaymentError: La moneda no está en `EXPONENTES` ni en `PAYMENTS_CHILE_MONEDAS`.
+    """
+    try:
+        return _CUANTOS[moneda]
+    except KeyError:
+        pass
+    adicionales = monedas_adicionales()
+    if moneda not in adicionales:
+        raise PaymentError(f"Moneda no soportada: {moneda}")
+    return Decimal(1).scaleb(-adicionales[moneda])
+
+
+def _decimal(monto: Monto) -> Decimal:
+    # Los float se convierten por su representación corta: 0.1 es Decimal("0.1")
+    return Decimal(repr(monto)) if isinstance(monto, float) else Decimal(monto)
+
+
+def _redondea(monto: Monto, unidad: Decimal) -> Decimal:
+    return _decimal(monto).quantize(unidad, rounding=ROUND_HALF_UP)
+
+
+def _pasarela(monto: Monto, unidad: Decimal) -> Union[int, float]:
+    if unidad == 1:
+        # Montos enteros, el caso común en pesos chilenos, pasan sin convertir
+        return monto if type(monto) is int else int(_redondea(monto, unidad))
+    return float(_redondea(monto, unidad))
+
+
+def normaliza(monto: Monto, moneda: str) -> Decimal:
+    """
+    Monto redondeado a los decimales de la moneda.
+
+    Args:
+        monto (int | float | str | Decimal): Monto a normalizar.
+        moneda (str): Código de la moneda, por ejemplo "CLP" o "UF".
+
+    Returns:
+        Decimal: Monto con los decimales de la moneda, redondeado hacia arriba desde la mitad.
+
+    Raises:
+        PaymentError: Moneda no soportada.
+    """
+    return _redondea(monto, cuanto(moneda))
+
+
+def monto_pasarela(monto: Monto, moneda: str) -> Union[int, float]:
+    """Monto para el cuerpo de una solicitud: `int` sin decimales o `float` redondeado a los de la moneda."""
+    return _pasarela(monto, cuanto(moneda))
+
+
+def _cuantos(monedas: Union[str, Iterable[str]]) -> Iterable[Decimal]:
+    if isinstance(monedas, str):
+        return repeat(cuanto(monedas))
+    resueltos = {}
+    return (resueltos.get(moneda) or resueltos.setdefault(moneda, cuanto(moneda)) for moneda in monedas)
+
+
+def normaliza_lote(montos: Iterable[Monto], monedas: Union[str, Iterable[str]]) -> list:
+    """
+    Normaliza muchos montos de una vez.
+
+    Args:
+        montos (Iterable): Montos a normalizar.
+        monedas (str | Iterable[str]): Una moneda para todos los montos, o la de cada monto en el mismo orden.
+
+    Returns:
+        list[Decimal]: Montos normalizados, en el orden de `montos`.
+
+    Raises:
+        PaymentError: Alguna moneda no está soportada.
+    """
+    return [_redondea(monto, unidad) for monto, unidad in zip(montos, _cuantos(monedas))]
+
+
+def montos_pasarela(montos: Iterable[Monto], monedas: Union[str, Iterable[str]]) -> list:
+    """Como `normaliza_lote`, pero con los valores de `monto_pasarela`."""
+    return [_pasarela(monto, unidad) for monto, unidad in zip(montos, _cuantos(monedas))]
@@ -0,0 +1,154 @@
+"""
+Agrupación de notificaciones repetidas de las pasarelas.
+
+Durante un incidente Flow y Khipu reenvían la misma notificación muchas veces seguidas, y cada
+una consultaría el estado a la pasarela y escribiría el pago. `agrupador.ejecuta` deja pasar una
+sola consulta por pago: las notificaciones que llegan mientras está en curso esperan su resultado
+y las que llegan hasta `PAYMENTS_CHILE_NOTIFICACIONES_VENTANA` segundos después lo reciben sin
+consultar. Cada petición sigue recibiendo su respuesta.
+
+La agrupación es por proceso. Con `PAYMENTS_CHILE_NOTIFICACIONES_COMPARTIDAS=True` además deja una
+marca en el cache de Django, y los otros workers que reciben la misma notificación dentro de la
+ventana responden sin consultar; si la consulta falla la marca se borra. Una ventana de 0
+desactiva la agrupación.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .plazos import PlazoAgotado, tiempo_restante
+
+
+def ventana() -> float:
+    return getattr(settings, "PAYMENTS_CHILE_NOTIFICACIONES_VENTANA", 5)
+
+
+def compartidas() -> bool:
+    return getattr(settings, "PAYMENTS_CHILE_NOTIFICACIONES_COMPARTIDAS", False)
+
+
+class _EnCurso:
+    __slots__ = ("evento", "resultado", "error")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class Agrupador:
+    """Ejecuta a lo más una vez por clave las funciones pedidas al mismo tiempo o dentro de la ventana."""
+
+    def __init__(self):
+        self.ejecutadas = 0
+        self.agrupadas = 0
+        self._lock = threading.Lock()
+        self._en_curso = {}
+        self._recientes = OrderedDict()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._despues_de_fork)
+
+    def _despues_de_fork(self):
+        # Las consultas en curso eran hilos del padre: no terminarán en el hijo
+        self._lock = threading.Lock()
+        self._en_curso = {}
+
+    def _llave(self, clave: str) -> str:
+        return f"payments_chile:notificacion:{clave}"
+
+    def _vigente(self, clave: str, ahora: float, segundos: float):
+        while self._recientes:
+            antigua, (termino, _) = next(iter(self._recientes.items()))
+            if ahora - termino < segundos:
+                break
+            del self._recientes[antigua]
+        return self._recientes.get(clave)
+
+    def ejecuta(self, clave: str, funcion: Callable, predeterminado: Any = None) -> Any:
+        """
+        Resultado de `funcion()`, compartido con las llamadas de la misma `clave`.
+
+        Si otra llamada de `clave` está en curso espera su resultado (o su excepción) dentro del
+        plazo de la petición; si terminó hace menos de la ventana devuelve ese resultado. Si otro
+        worker tiene la marca compartida devuelve `predeterminado` sin llamar a `funcion`.
+
+        Raises:
+            PlazoAgotado: Si se agota el plazo de la petición esperando a la otra llamada.
+        """
+        segundos = ventana()
+        if segundos <= 0:
+            return funcion()
+
+        with self._lock:
+            reciente = self._vigente(clave, time.monotonic(), segundos)
+            otra = self._en_curso.get(clave)
+            if reciente is not None or otra is not None:
+                self.agrupadas += 1
+            else:
+                en_curso = self._en_curso[clave] = _EnCurso()
+        if reciente is not None:
+            return reciente[1]
+        if otra is not None:
+            return self._espera(otra)
+
+        try:
+            if compartidas() and not cache.add(self._llave(clave), 1, timeout=max(int(segundos), 1)):
+                with self._lock:
+                    self.agrupadas += 1
+                en_curso.resultado = predeterminado
+                return predeterminado
+            en_curso.resultado = self._ejecuta(clave, funcion)
+            return en_curso.resultado
+        except BaseException as error:
+            en_curso.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[clave]
+                if en_curso.error is None:
+                    self._recientes.pop(clave, None)
+                    self._recientes[clave] = (time.monotonic(), en_curso.resultado)
+            en_curso.evento.set()
+
+    def _ejecuta(self, clave: str, funcion: Callable) -> Any:
+        with self._lock:
+            self.ejecutadas += 1
+        try:
+            return funcion()
+        except BaseException:
+            if compartidas():
+                cache.delete(self._llave(clave))
+            raise
+
+    def _espera(self, en_curso: _EnCurso) -> Any:
+        restante = tiempo_restante()
+        if not en_curso.evento.wait(timeout=None if restante is None else max(restante, 0)):
+            raise PlazoAgotado("Plazo agotado esperando la consulta de otra notificación")
+        if en_curso.error is not None:
+            raise en_curso.error
+        return en_curso.resultado
+
+    def limpia(self):
+        with self._lock:
+            self._en_curso.clear()
+            self._recientes.clear()
+            self.ejecutadas = self.agrupadas = 0
+
+
+agrupador = Agrupador()
+
+
+def clave(payment) -> str:
+    """Clave de agrupación de las notificaciones de un pago."""
+    return f"{payment.variant}:{payment.token}"
+
+
+def actualiza_notificado(provider, payment) -> Optional[dict]:
+    """Consulta el estado de `payment` por una notificación, agrupada con las repetidas."""
+    return agrupador.ejecuta(clave(payment), lambda: provider.actualiza_estado(payment=payment))
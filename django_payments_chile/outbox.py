@@ -0,0 +1,191 @@
+"""
+Outbox de transiciones de estado.
+
+Los proveedores configurados con `outbox=True` guardan el nuevo estado del pago y un
+`EventoPago` en la misma transacción, sin enviar la señal `status_changed` de django-payments.
+El comando `publica_eventos` entrega luego los eventos en lotes a un sumidero, con entrega
+al-menos-una-vez: un evento se marca como publicado solo después de que el sumidero lo aceptó.
+"""
+
+import json
+import os
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from payments import get_payment_model
+
+SUMIDERO_POR_DEFECTO = "django_payments_chile.outbox.SumideroColaBD"
+
+
+class ErrorPublicacion(Exception):
+    pass
+
+
+def registra_transicion(payment, estado: str, mensaje: str = ""):
+    """Cambia el estado del pago y escribe su evento en el outbox en una sola transacción.
+
+    Args:
+        payment ("Payment"): Objeto de pago Django Payments.
+        estado (str): Nuevo estado, uno de `PaymentStatus`.
+        mensaje (str): Mensaje asociado al cambio de estado.
+    """
+    from .models import EventoPago
+
+    estado_anterior = payment.status
+    with transaction.atomic():
+        payment.status = estado
+        payment.message = mensaje
+        campos = ["status", "message"]
+        if hasattr(payment, "modified"):
+            # `auto_now` solo se aplica a los campos de `update_fields`
+            campos.append("modified")
+        payment.save(update_fields=campos)
+        EventoPago.objects.create(
+            variant=payment.variant,
+            pago_id=payment.pk,
+            token=payment.token,
+            estado_anterior=estado_anterior,
+            estado=estado,
+            mensaje=mensaje,
+        )
+
+
+class SumideroBase:
+    """Destino de los eventos publicados. `publica` debe lanzar una excepción si no pudo entregar el lote."""
+
+    def publica(self, eventos: list):
+        raise NotImplementedError
+
+
+class SumideroColaBD(SumideroBase):
+    """
+    Entrega los eventos como filas de `MensajeCola`.
+
+    Args:
+        tema (str): Tema con que se guardan los mensajes (Valor por defecto: "pagos").
+        alias (str): Alias de la base de datos de la cola (Valor por defecto: "default").
+    """
+
+    def __init__(self, tema: str = "pagos", alias: str = "default"):
+        self.tema = tema
+        self.alias = alias
+
+    def publica(self, eventos: list):
+        from .models import MensajeCola
+
+        MensajeCola.objects.using(self.alias).bulk_create(
+            [MensajeCola(tema=self.tema, cuerpo=evento) for evento in eventos]
+        )
+
+
+class SumideroArchivo(SumideroBase):
+    """
+    Agrega los eventos a un archivo JSON por línea y lo sincroniza a disco antes de confirmar.
+
+    Args:
+        ruta (str): Ruta del archivo.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+
+    def publica(self, eventos: list):
+        lineas = "".join(json.dumps(evento, separators=(",", ":")) + "\n" for evento in eventos)
+        with open(self.ruta, "a", encoding="utf-8") as archivo:
+            archivo.write(lineas)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+
+class SumideroRedis(SumideroBase):
+    """
+    Agrega los eventos a un stream de Redis con `XADD`. Requiere el paquete `redis`.
+
+    Args:
+        url (str): URL de conexión a Redis.
+        stream (str): Nombre del stream (Valor por defecto: "pagos:eventos").
+        largo_maximo (int | None): Largo aproximado máximo del stream (opcional).
+    """
+
+    def __init__(self, url: str, stream: str = "pagos:eventos", largo_maximo: Optional[int] = None):
+        import redis
+
+        self.cliente = redis.Redis.from_url(url)
+        self.stream = stream
+        self.largo_maximo = largo_maximo
+
+    def publica(self, eventos: list):
+        pipe = self.cliente.pipeline(transaction=False)
+        for evento in eventos:
+            pipe.xadd(
+                self.stream,
+                {"evento": json.dumps(evento, separators=(",", ":"))},
+                maxlen=self.largo_maximo,
+                approximate=True,
+            )
+        pipe.execute()
+
+
+class SumideroSenal(SumideroBase):
+    """Envía `payments.signals.status_changed` fuera de la petición, para receptores existentes."""
+
+    def publica(self, eventos: list):
+        from payments.signals import status_changed
+
+        modelo = get_payment_model()
+        pagos = modelo.objects.in_bulk([evento["pago_id"] for evento in eventos])
+        for evento in eventos:
+            pago = pagos.get(evento["pago_id"])
+            if pago is not None:
+                status_changed.send(sender=modelo, instance=pago)
+
+
+def obtiene_sumidero(ruta: Optional[str] = None, **opciones) -> SumideroBase:
+    """Crea el sumidero indicado o el configurado en `PAYMENTS_CHILE_OUTBOX_SUMIDERO`.
+
+    El setting acepta una ruta de clase o una tupla `(ruta, opciones)`.
+    """
+    if ruta is None:
+        configurado = getattr(settings, "PAYMENTS_CHILE_OUTBOX_SUMIDERO", SUMIDERO_POR_DEFECTO)
+        if isinstance(configurado, (tuple, list)):
+            ruta, configuradas = configurado
+            opciones = {**configuradas, **opciones}
+        else:
+            ruta = configurado
+    return import_string(ruta)(**opciones)
+
+
+def publica_lote(sumidero: SumideroBase, lote: int = 100) -> int:
+    """Publica un lote de eventos pendientes y los marca como publicados.
+
+    Si el sumidero falla la transacción se revierte y el lote se reintenta en la siguiente pasada.
+
+    Returns:
+        int: Cantidad de eventos publicados.
+    """
+    from .models import EventoPago
+
+    pendientes = EventoPago.objects.filter(publicado__isnull=True).order_by("id")
+    if connection.features.has_select_for_update:
+        pendientes = pendientes.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+
+    with transaction.atomic():
+        eventos = list(pendientes[:lote])
+        if not eventos:
+            return 0
+        ids = [evento.pk for evento in eventos]
+        try:
+            sumidero.publica([evento.como_dict() for evento in eventos])
+        except Exception as e:
+            causa = e
+            transaction.set_rollback(True)
+        else:
+            EventoPago.objects.filter(pk__in=ids).update(publicado=timezone.now())
+            return len(eventos)
+
+    EventoPago.objects.filter(pk__in=ids).update(intentos=F("intentos") + 1)
+    raise ErrorPublicacion(f"El sumidero no aceptó {len(ids)} eventos: {causa}") from causa
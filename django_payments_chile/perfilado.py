@@ -0,0 +1,289 @@
+"""
+Desglose de tiempos de las operaciones de los proveedores.
+
+Con el perfilado activo, cada operación (`get_form`, `process_data`, `refund`, `capture`) mide
+cuánto tiempo se fue en cada fase:
+
+- `urls`: `get_success_url` y `get_process_url`.
+- `firma`: firma de la solicitud (Flow).
+- `http`: llamadas a la pasarela, desde el transporte.
+- `json`: decodificación de las respuestas.
+- `bd`: consultas SQL, incluidas las de señales y outbox.
+- `otros`: el resto de la operación.
+
+El desglose queda en milisegundos en `payment.attrs.tiempos`, solo en memoria: se guarda con la
+siguiente escritura de `extra_data`. Se activa por proveedor con `perfilado=True` o para todos con
+`PAYMENTS_CHILE_PERFILADO = True`. Mientras haya un `estadisticas()` abierto las operaciones también se
+miden, pero el desglose solo va a las estadísticas y el pago no se modifica. `PerfiladoMiddleware`
+agrega el desglose de la petición en el header `Server-Timing`.
+
+Sin perfilado activo las fases no miden nada. `perfilador` envuelve un bloque con `cProfile` o
+`pyinstrument` para los benchmarks.
+"""
+
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+FASES = ("urls", "firma", "http", "json", "bd")
+
+_activas: ContextVar[tuple] = ContextVar("payments_chile_perfilado", default=())
+_agregados = []
+_lock = threading.Lock()
+
+
+def perfilado_global() -> bool:
+    return getattr(settings, "PAYMENTS_CHILE_PERFILADO", False)
+
+
+class Medicion:
+    """Segundos y cantidad de mediciones por fase de una operación o petición."""
+
+    def __init__(self, operacion: str = ""):
+        self.operacion = operacion
+        self.fases = {}
+        self.veces = {}
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def registra(self, fase: str, segundos: float):
+        with self._lock:
+            self.fases[fase] = self.fases.get(fase, 0.0) + segundos
+            self.veces[fase] = self.veces.get(fase, 0) + 1
+
+    def desglose(self) -> dict:
+        """Segundos por fase, con `otros` y `total`."""
+        desglose = dict(self.fases)
+        desglose["otros"] = max(self.total - sum(self.fases.values()), 0.0)
+        desglose["total"] = self.total
+        return desglose
+
+    def resumen(self) -> dict:
+        """Milisegundos por fase, redondeados a 0,1 ms."""
+        return {fase: round(segundos * 1000, 1) for fase, segundos in self.desglose().items()}
+
+    def server_timing(self) -> str:
+        """Valor del header `Server-Timing`."""
+        return ", ".join(f"{fase};dur={milisegundos}" for fase, milisegundos in self.resumen().items())
+
+
+def activo() -> bool:
+    return bool(_activas.get())
+
+
+def registra(fase: str, segundos: float):
+    """Suma `segundos` a `fase` en las mediciones activas."""
+    for medicion in _activas.get():
+        medicion.registra(fase, segundos)
+
+
+@contextmanager
+def fase(nombre: str):
+    """Mide el bloque como `nombre` si hay una medición activa."""
+    if not _activas.get():
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registra(nombre, time.perf_counter() - inicio)
+
+
+def _mide_consulta(execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        registra("bd", time.perf_counter() - inicio)
+
+
+@contextmanager
+def mide(operacion: str = ""):
+    """Activa una medición para el bloque. Las mediciones anidadas reciben también las fases internas."""
+    medicion = Medicion(operacion)
+    anteriores = _activas.get()
+    token = _activas.set((*anteriores, medicion))
+    inicio = time.perf_counter()
+    with ExitStack() as pila:
+        if not anteriores:
+            # Solo la medición externa instala el wrapper, así cada consulta se cuenta una vez
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(_mide_consulta))
+        try:
+            yield medicion
+        finally:
+            medicion.total = time.perf_counter() - inicio
+            _activas.reset(token)
+            if operacion:
+                _agrega(medicion)
+
+
+def _agrega(medicion: Medicion):
+    with _lock:
+        agregados = list(_agregados)
+    for agregado in agregados:
+        agregado.agrega(medicion)
+
+
+def perfila(operacion: str):
+    """Decorador de los métodos de un proveedor que reciben el pago como primer argumento."""
+
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self, payment, *args, **kwargs):
+            en_pago = getattr(self, "perfilado", False) or perfilado_global()
+            if not (en_pago or _agregados):
+                return metodo(self, payment, *args, **kwargs)
+            medicion = Medicion(operacion)
+            try:
+                # `mide` entrega la medición a las `estadisticas()` abiertas al terminar
+                with mide(operacion) as medicion:
+                    return metodo(self, payment, *args, **kwargs)
+            finally:
+                if en_pago:
+                    # También cuando la operación termina con RedirectNeeded o PaymentError
+                    payment.attrs.tiempos = medicion.resumen()
+
+        return envoltura
+
+    return decorador
+
+
+def _percentil(valores: list, percentil: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(percentil / 100 * (len(ordenados) - 1))))]
+
+
+class Estadisticas:
+    """Desgloses de las operaciones terminadas mientras está abierta, agrupados por operación y fase."""
+
+    def __init__(self):
+        self.mediciones = {}
+        self._lock = threading.Lock()
+
+    def agrega(self, medicion: Medicion):
+        with self._lock:
+            fases = self.mediciones.setdefault(medicion.operacion, {})
+            for nombre, segundos in medicion.desglose().items():
+                fases.setdefault(nombre, []).append(segundos)
+
+    def resumen(self) -> dict:
+        """Por operación y fase: `n`, `total`, `p50`, `p95` y `max`, en milisegundos salvo `n`."""
+        with self._lock:
+            mediciones = {operacion: dict(fases) for operacion, fases in self.mediciones.items()}
+        return {
+            operacion: {
+                nombre: {
+                    "n": len(valores),
+                    "total": round(sum(valores) * 1000, 3),
+                    "p50": round(_percentil(valores, 50) * 1000, 3),
+                    "p95": round(_percentil(valores, 95) * 1000, 3),
+                    "max": round(max(valores) * 1000, 3),
+                }
+                for nombre, valores in fases.items()
+            }
+            for operacion, fases in mediciones.items()
+        }
+
+
+@contextmanager
+def estadisticas():
+    """
+    Reúne el desglose de todas las operaciones de los proveedores, de cualquier hilo, durante el bloque.
+
+        with estadisticas() as tiempos:
+            ejecuta_lote()
+        print(tiempos.resumen()["get_form"]["http"]["p95"])
+    """
+    agregado = Estadisticas()
+    with _lock:
+        _agregados.append(agregado)
+    try:
+        yield agregado
+    finally:
+        with _lock:
+            _agregados.remove(agregado)
+
+
+class PerfiladoMiddleware:
+    """Con `PAYMENTS_CHILE_PERFILADO` activo, agrega el desglose de cada petición en `Server-Timing`."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not perfilado_global():
+            return self.get_response(request)
+        with mide() as medicion:
+            respuesta = self.get_response(request)
+        respuesta["Server-Timing"] = medicion.server_timing()
+        return respuesta
+
+    async def __acall__(self, request):
+        if not perfilado_global():
+            return await self.get_response(request)
+        with mide() as medicion:
+            respuesta = await self.get_response(request)
+        respuesta["Server-Timing"] = medicion.server_timing()
+        return respuesta
+
+
+@contextmanager
+def perfilador(herramienta: Optional[str], destino: Optional[str] = None, salida=None):
+    """
+    Perfila el bloque en el hilo actual con "cprofile" o "pyinstrument"; con `None` no hace nada.
+
+    Args:
+        herramienta (str | None): "cprofile", "pyinstrument" o `None`.
+        destino (str | None): Archivo donde guardar el perfil (`.prof` o `.html`); si no, se imprime (opcional).
+        salida (TextIO | None): Dónde imprimir el perfil (Valor por defecto: `sys.stdout`).
+    """
+    if herramienta is None:
+        yield
+        return
+    if herramienta == "cprofile":
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            yield
+        finally:
+            perfil.disable()
+        if destino:
+            perfil.dump_stats(destino)
+        else:
+            texto = io.StringIO()
+            pstats.Stats(perfil, stream=texto).sort_stats("cumulative").print_stats(30)
+            print(texto.getvalue(), file=salida)
+    elif herramienta == "pyinstrument":
+        from pyinstrument import Profiler
+
+        perfil = Profiler()
+        perfil.start()
+        try:
+            yield
+        finally:
+            perfil.stop()
+        if destino:
+            perfil.write_html(destino)
+        else:
+            print(perfil.output_text(unicode=True), file=salida)
+    else:
+        raise ValueError(f"Perfilador desconocido: {herramienta}")
@@ -0,0 +1,172 @@
+"""
+Persistencia de los pagos desde los proveedores.
+
+Los proveedores no llaman directamente a `payment.save()` ni a `payment.change_status()`: usan
+la persistencia configurada, que recibe los campos que cambiaron. Por defecto se mantiene el
+comportamiento de django-payments (`PersistenciaModelo`); hay alternativas que solo actualizan
+las columnas indicadas, que acumulan los cambios para escribirlos en lotes o que no escriben.
+"""
+
+import threading
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .outbox import registra_transicion
+
+PERSISTENCIA_POR_DEFECTO = "django_payments_chile.persistencia.PersistenciaModelo"
+
+
+def _envia_senal(payment):
+    from payments.signals import status_changed
+
+    status_changed.send(sender=type(payment), instance=payment)
+
+
+class PersistenciaBase:
+    """Interfaz de persistencia usada por los proveedores."""
+
+    def guarda(self, payment, campos: Iterable[str]):
+        """Guarda `campos` de `payment`, por ejemplo `["transaction_id", "extra_data"]`."""
+        raise NotImplementedError
+
+    def cambia_estado(self, payment, estado: str, mensaje: str = ""):
+        """Cambia el estado del pago y avisa del cambio como lo hace `change_status`."""
+        raise NotImplementedError
+
+
+class PersistenciaModelo(PersistenciaBase):
+    """Comportamiento de django-payments: `save()` completo y `change_status`."""
+
+    def guarda(self, payment, campos: Iterable[str]):
+        payment.save()
+
+    def cambia_estado(self, payment, estado: str, mensaje: str = ""):
+        payment.change_status(estado, mensaje)
+
+
+class PersistenciaOutbox(PersistenciaModelo):
+    """Como `PersistenciaModelo`, pero los cambios de estado se registran en el outbox."""
+
+    def cambia_estado(self, payment, estado: str, mensaje: str = ""):
+        registra_transicion(payment, estado, mensaje)
+
+
+class PersistenciaActualizacion(PersistenciaBase):
+    """Escribe solo las columnas indicadas con `QuerySet.update()`, sin `save()` ni señales de modelo."""
+
+    def _actualiza(self, payment, campos: Iterable[str]):
+        valores = {campo: getattr(payment, campo) for campo in campos}
+        if hasattr(payment, "modified"):
+            payment.modified = valores["modified"] = timezone.now()
+        type(payment)._default_manager.filter(pk=payment.pk).update(**valores)
+
+    def guarda(self, payment, campos: Iterable[str]):
+        self._actualiza(payment, campos)
+
+    def cambia_estado(self, payment, estado: str, mensaje: str = ""):
+        payment.status = estado
+        payment.message = mensaje
+        self._actualiza(payment, ["status", "message"])
+        _envia_senal(payment)
+
+
+class PersistenciaLote(PersistenciaBase):
+    """
+    Acumula los cambios y los escribe con `bulk_update` al llegar a `tamano` pagos o al llamar `vacia()`.
+
+    Pensada para procesos por lotes como la conciliación; las señales de cambio de estado se envían
+    después de escribir. Se puede usar como administrador de contexto para vaciar al terminar.
+
+    Args:
+        tamano (int): Pagos acumulados antes de escribir (Valor por defecto: 500).
+    """
+
+    def __init__(self, tamano: int = 500):
+        self.tamano = tamano
+        self._pendientes = {}
+        self._senales = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.vacia()
+
+    def _acumula(self, payment, campos: Iterable[str], senal: bool = False):
+        with self._lock:
+            _, acumulados = self._pendientes.setdefault((type(payment), payment.pk), (payment, set()))
+            acumulados.update(campos)
+            if senal:
+                self._senales.append(payment)
+            lleno = len(self._pendientes) >= self.tamano
+        if lleno:
+            self.vacia()
+
+    def guarda(self, payment, campos: Iterable[str]):
+        self._acumula(payment, campos)
+
+    def cambia_estado(self, payment, estado: str, mensaje: str = ""):
+        payment.status = estado
+        payment.message = mensaje
+        self._acumula(payment, ["status", "message"], senal=True)
+
+    def vacia(self) -> int:
+        """Escribe los cambios acumulados y envía las señales pendientes.
+
+        Returns:
+            int: Cantidad de pagos escritos.
+        """
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+            senales, self._senales = self._senales, []
+
+        grupos = {}
+        for (modelo, _), (payment, campos) in pendientes.items():
+            if hasattr(payment, "modified"):
+                payment.modified = timezone.now()
+                campos.add("modified")
+            grupos.setdefault((modelo, frozenset(campos)), []).append(payment)
+
+        with transaction.atomic():
+            for (modelo, campos), pagos in grupos.items():
+                modelo._default_manager.bulk_update(pagos, sorted(campos), batch_size=self.tamano)
+        for payment in senales:
+            _envia_senal(payment)
+        return len(pendientes)
+
+
+class PersistenciaNula(PersistenciaBase):
+    """No escribe nada: aplica los cambios en memoria y los anota en `cambios`, para simulaciones."""
+
+    def __init__(self):
+        self.cambios = []
+
+    def guarda(self, payment, campos: Iterable[str]):
+        self.cambios.append((payment.pk, {campo: getattr(payment, campo) for campo in campos}))
+
+    def cambia_estado(self, payment, estado: str, mensaje: str = ""):
+        payment.status = estado
+        payment.message = mensaje
+        self.cambios.append((payment.pk, {"status": estado, "message": mensaje}))
+
+
+def obtiene_persistencia(persistencia=None, outbox: bool = False) -> PersistenciaBase:
+    """Persistencia de un proveedor.
+
+    Args:
+        persistencia (PersistenciaBase | str | None): Instancia o ruta de la clase; por defecto el setting
+            `PAYMENTS_CHILE_PERSISTENCIA` o `PersistenciaModelo`.
+        outbox (bool): Usa `PersistenciaOutbox` si no se indicó otra persistencia.
+    """
+    if isinstance(persistencia, PersistenciaBase):
+        return persistencia
+    if persistencia is None:
+        if outbox:
+            return PersistenciaOutbox()
+        persistencia = getattr(settings, "PAYMENTS_CHILE_PERSISTENCIA", PERSISTENCIA_POR_DEFECTO)
+    return import_string(persistencia)()
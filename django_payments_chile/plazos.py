@@ -0,0 +1,109 @@
+"""
+Plazos de las peticiones entrantes.
+
+`PlazoMiddleware` fija el plazo de la petición en un `ContextVar` a partir de un header o del
+setting `PAYMENTS_CHILE_PLAZO_SEGUNDOS`. El transporte de los proveedores calcula el timeout de
+cada llamada con el tiempo que le queda a la petición y, si ya no queda, no llama a la pasarela
+y lanza `PlazoAgotado` para que el pago quede pendiente para la conciliación.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from payments import PaymentError
+
+_plazo: ContextVar[Optional[float]] = ContextVar("payments_chile_plazo", default=None)
+
+#: Tiempo reservado para responder después de la última llamada a la pasarela.
+MARGEN = 0.25
+#: Timeout mínimo con el que vale la pena llamar a la pasarela.
+TIMEOUT_MINIMO = 0.5
+
+
+class PlazoAgotado(PaymentError):
+    pass
+
+
+@contextmanager
+def plazo(segundos: float):
+    """Fija un plazo de `segundos` desde ahora, sin extender uno más corto ya vigente."""
+    vence = time.monotonic() + segundos
+    actual = _plazo.get()
+    token = _plazo.set(vence if actual is None else min(actual, vence))
+    try:
+        yield
+    finally:
+        _plazo.reset(token)
+
+
+def tiempo_restante() -> Optional[float]:
+    """Segundos que le quedan al plazo vigente, o `None` si no hay plazo."""
+    vence = _plazo.get()
+    if vence is None:
+        return None
+    return vence - time.monotonic()
+
+
+def timeout_para(timeout: Optional[float]) -> Optional[float]:
+    """Timeout de una llamada ajustado al plazo vigente.
+
+    Args:
+        timeout (float | None): Timeout configurado para la llamada.
+
+    Returns:
+        float | None: El menor entre `timeout` y lo que queda del plazo descontando `MARGEN`.
+
+    Raises:
+        PlazoAgotado: Lo que queda del plazo no alcanza para `TIMEOUT_MINIMO`.
+    """
+    restante = tiempo_restante()
+    if restante is None:
+        return timeout
+    disponible = restante - MARGEN
+    if disponible < TIMEOUT_MINIMO:
+        raise PlazoAgotado(f"Plazo de la petición agotado ({restante:.2f}s restantes)", code=504)
+    return disponible if timeout is None else min(timeout, disponible)
+
+
+def plazo_de_peticion(request) -> Optional[float]:
+    """Segundos de plazo para `request` según el header `PAYMENTS_CHILE_PLAZO_HEADER` o el setting."""
+    header = getattr(settings, "PAYMENTS_CHILE_PLAZO_HEADER", "X-Request-Timeout")
+    valor = request.headers.get(header) if header else None
+    if valor:
+        try:
+            return float(valor)
+        except ValueError:
+            pass
+    return getattr(settings, "PAYMENTS_CHILE_PLAZO_SEGUNDOS", None)
+
+
+class PlazoMiddleware:
+    """Fija el plazo de cada petición. El header se interpreta en segundos restantes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        segundos = plazo_de_peticion(request)
+        if segundos is None:
+            return self.get_response(request)
+        with plazo(segundos):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        segundos = plazo_de_peticion(request)
+        if segundos is None:
+            return await self.get_response(request)
+        with plazo(segundos):
+            return await self.get_response(request)
@@ -0,0 +1,279 @@
+"""
+Base común de los proveedores de Flow, Khipu y Webpay.
+
+`ProveedorBase` tiene el esqueleto que comparten las pasarelas: las opciones comunes (outbox,
+límites, cobertura, reintentos, referencias, persistencia, endpoints alternativos, vencimiento y
+perfilado), las llamadas a la API con `_llama` sobre el `Transporte` (límite de tasa, failover,
+cobertura, reintentos, registro y tiempos), el guardado del pago y la traducción de estados. La
+creación, la consulta de estado, el reembolso y las notificaciones siguen el mismo flujo en las
+tres pasarelas.
+
+Cada proveedor declara sus `ENDPOINTS`, las `RUTAS` de sus operaciones y `ESTADOS`, y arma y lee
+los cuerpos con unos pocos métodos: `solicitud_creacion`, `registra_creacion`, `parametros_estado`,
+`registra_estado`, `estado_de`, `solicitud_reembolso` y `registra_reembolso`.
+"""
+
+import logging
+from typing import Any, Optional, Union
+
+import requests
+from django.http import HttpResponseBadRequest, JsonResponse
+from payments import PaymentError, PaymentStatus, RedirectNeeded
+from payments.core import BasicProvider
+from payments.forms import PaymentForm as BasePaymentForm
+
+from .montos import monto_pasarela
+from .notificaciones import actualiza_notificado
+from .perfilado import perfila
+from .persistencia import PersistenciaBase, obtiene_persistencia
+from .plazos import PlazoAgotado
+from .referencias import registra_referencias
+from .solicitudes import huella
+from .transporte import Transporte
+
+logger = logging.getLogger(__name__)
+
+
+class ProveedorBase(BasicProvider):
+    """
+    Proveedor de django-payments para una pasarela con API HTTP.
+
+    Args:
+        api_endpoint (str): URL base de la API, o un alias de `ENDPOINTS` como "sandbox".
+        cuenta (str): Cuenta en la pasarela, para los límites de tasa y el registro de llamadas.
+        outbox (bool): Registra los cambios de estado en el outbox (Valor por defecto: False).
+        limites (dict | None): Límites de tasa por operación: "crear", "estado", "reembolso"... (opcional).
+        cobertura (bool | dict): Cubre las consultas de estado lentas con otra llamada (Valor por defecto: False).
+        referencias (bool): Indexa los identificadores de la pasarela (Valor por defecto: False).
+        persistencia (PersistenciaBase | str | None): Cómo se guardan los pagos, ver `persistencia` (opcional).
+        api_endpoints_alternativos (list | None): URL base alternativas de la API, para failover (opcional).
+        vencimiento (float | None): Segundos sin cambios tras los que un pago pendiente se da por abandonado,
+            ver `vencimiento` (opcional).
+        perfilado (bool): Deja el desglose de tiempos de cada operación en `attrs.tiempos`, ver `perfilado`
+            (Valor por defecto: False).
+        reintentos (bool | dict): Reintenta con backoff las consultas de estado que fallan (Valor por defecto: False).
+        **kwargs: Argumentos de `BasicProvider`, como `capture`.
+    """
+
+    form_class = BasePaymentForm
+
+    # Nombre de la pasarela en el transporte, los límites y el registro de llamadas
+    pasarela: str = ""
+    # Alias de ambiente y su URL base
+    ENDPOINTS: dict = {}
+    # Operación: (verbo HTTP, ruta bajo la URL base); la ruta se completa con `str.format(payment=...)`
+    RUTAS: dict = {}
+    # Argumento de `requests` con el cuerpo de la creación y el reembolso: "data" (formulario) o "json"
+    CUERPO: str = "json"
+    # Estado de la pasarela y el `PaymentStatus` que le corresponde
+    ESTADOS: dict = {}
+    # Estado del pago recién creado en la pasarela
+    ESTADO_CREADO: str = PaymentStatus.WAITING
+    # Campo que debe venir en el POST de las notificaciones
+    CAMPO_NOTIFICACION: str = ""
+
+    def __init__(
+        self,
+        api_endpoint: str,
+        cuenta: str,
+        outbox: bool = False,
+        limites: Optional[dict] = None,
+        cobertura: Union[bool, dict] = False,
+        referencias: bool = False,
+        persistencia: Union[str, PersistenciaBase, None] = None,
+        api_endpoints_alternativos: Optional[list] = None,
+        vencimiento: Optional[float] = None,
+        perfilado: bool = False,
+        reintentos: Union[bool, dict] = False,
+        **kwargs: int,
+    ):
+        super().__init__(**kwargs)
+        self.api_endpoint = self.ENDPOINTS.get(api_endpoint, api_endpoint).rstrip("/")
+        self.persistencia = obtiene_persistencia(persistencia, outbox)
+        self.vencimiento = vencimiento
+        self.perfilado = perfilado
+        self.referencias = referencias
+        endpoints = [self.api_endpoint, *(endpoint.rstrip("/") for endpoint in api_endpoints_alternativos or [])]
+        self._transporte = Transporte(self.pasarela, cuenta, limites, cobertura, endpoints, reintentos)
+
+    def genera_headers(self) -> dict:
+        """Encabezados de autenticación de las llamadas a la API."""
+        return {}
+
+    def url(self, operacion: str, **valores) -> str:
+        """URL de una operación de `RUTAS`, con los `valores` de su ruta."""
+        return self.api_endpoint + self.RUTAS[operacion][1].format(**valores)
+
+    def _llama(self, operacion: str, payment, idempotente: bool = False, ruta: Optional[dict] = None, **kwargs) -> Any:
+        """
+        Llama a una operación de `RUTAS` y devuelve el JSON de la respuesta.
+
+        Args:
+            operacion (str): Operación de `RUTAS`, también usada para límites, registro y tiempos.
+            payment ("Payment"): Objeto de pago Django Payments.
+            idempotente (bool): La llamada se puede repetir o cubrir sin efectos (Valor por defecto: False).
+            ruta (dict | None): Valores adicionales para la ruta, además de `payment` (opcional).
+            **kwargs: Argumentos de `requests`, como `data`, `json` o `params`.
+
+        Raises:
+            requests.HTTPError: La pasarela respondió con un error.
+        """
+        headers = self.genera_headers()
+        if headers:
+            kwargs.setdefault("headers", headers)
+        respuesta = self._transporte.solicita(
+            operacion,
+            getattr(requests, self.RUTAS[operacion][0]),
+            self.url(operacion, payment=payment, **(ruta or {})),
+            idempotente=idempotente,
+            variant=payment.variant,
+            timeout=5,
+            **kwargs,
+        )
+        respuesta.raise_for_status()
+        return respuesta.json()
+
+    def _cambia_estado(self, payment, estado: str, mensaje: str = ""):
+        """Cambia el estado del pago a través de la persistencia configurada."""
+        self.persistencia.cambia_estado(payment, estado, mensaje)
+
+    def solicitud_creacion(self, payment) -> dict:
+        """Cuerpo de la solicitud de creación del pago."""
+        raise NotImplementedError
+
+    def registra_creacion(self, payment, respuesta: dict) -> tuple:
+        """
+        Guarda en `payment.attrs` la respuesta de la creación.
+
+        Returns:
+            tuple: `transaction_id` del pago, URL de pago a la que se redirige y referencias a indexar.
+        """
+        raise NotImplementedError
+
+    @perfila("get_form")
+    def get_form(self, payment, data: Optional[dict] = None) -> Any:
+        """
+        Crea el pago en la pasarela y redirige a su página de pago.
+
+        Args:
+            payment ("Payment"): Objeto de pago Django Payments.
+            data (dict | None): Datos del formulario (opcional).
+
+        Raises:
+            RedirectNeeded: Redirige a la página de pago.
+            PlazoAgotado: No quedó plazo para llamar a la pasarela; el pago no cambia de estado.
+            PaymentError: La pasarela no creó el pago; el pago queda en `ERROR`.
+        """
+        if not payment.transaction_id:
+            datos = self.solicitud_creacion(payment)
+            payment.attrs.huella_payment_create = huella(datos)
+            try:
+                respuesta = self._llama("crear", payment, **{self.CUERPO: datos})
+            except PlazoAgotado:
+                # No hubo plazo para llamar a la pasarela: el pago no se creó y queda como estaba, para reintentarlo
+                logger.warning("Creación del pago %s en %s sin plazo", payment.pk, self.pasarela)
+                raise
+            except Exception as e:
+                # El código y la huella de la respuesta quedan en el registro de llamadas
+                logger.error("Error al crear el pago %s en %s: %s", payment.pk, self.pasarela, type(e).__name__)
+                self._cambia_estado(payment, PaymentStatus.ERROR, str(e))
+                raise PaymentError(f"Error al procesar el pago: {e}")
+
+            transaction_id, url_pago, referencias = self.registra_creacion(payment, respuesta)
+            payment.transaction_id = transaction_id
+            self.persistencia.guarda(payment, ["transaction_id", "extra_data"])
+            if self.referencias:
+                registra_referencias(payment, *referencias)
+            self._cambia_estado(payment, self.ESTADO_CREADO)
+            raise RedirectNeeded(url_pago)
+
+    def parametros_estado(self, payment) -> dict:
+        """Argumentos de `requests` para la consulta de estado, como `params` o un cuerpo firmado."""
+        return {}
+
+    def registra_estado(self, payment, respuesta: dict):
+        """Guarda la respuesta de la consulta de estado; por defecto no se guarda."""
+
+    def estado_de(self, respuesta: dict) -> Optional[str]:
+        """`PaymentStatus` que corresponde a la respuesta de estado, o `None` si el pago sigue igual."""
+        return self.ESTADOS.get(respuesta.get("status"))
+
+    @perfila("actualiza_estado")
+    def actualiza_estado(self, payment) -> dict:
+        """
+        Consulta el estado del pago en la pasarela y lo actualiza.
+
+        Args:
+            payment ("Payment"): Objeto de pago Django Payments.
+
+        Returns:
+            dict: Respuesta de la pasarela.
+        """
+        respuesta = self._llama("estado", payment, idempotente=True, **self.parametros_estado(payment))
+        self.registra_estado(payment, respuesta)
+        estado = self.estado_de(respuesta)
+        if estado is not None:
+            self._cambia_estado(payment, estado)
+        return respuesta
+
+    @perfila("process_data")
+    def process_data(self, payment, request) -> JsonResponse:
+        """
+        Procesa la notificación de la pasarela consultando el estado del pago.
+
+        Args:
+            payment ("Payment"): Objeto de pago Django Payments.
+            request ("HttpRequest"): Objeto de solicitud HTTP de Django.
+
+        Returns:
+            JsonResponse: `ok`, o `202` si no hubo plazo para consultar y el pago queda pendiente.
+        """
+        if self.CAMPO_NOTIFICACION not in request.POST:
+            return HttpResponseBadRequest(f"{self.CAMPO_NOTIFICACION} no está en post")
+
+        if payment.status in [PaymentStatus.WAITING, PaymentStatus.PREAUTH]:
+            try:
+                # Las notificaciones repetidas del mismo pago comparten una sola consulta
+                actualiza_notificado(self, payment)
+            except PlazoAgotado:
+                # Sin plazo para consultar a la pasarela, el pago queda pendiente para la conciliación
+                return JsonResponse({"status": "pendiente"}, status=202)
+
+        return JsonResponse({"status": "ok"})
+
+    def solicitud_reembolso(self, payment, monto: Union[int, float]) -> dict:
+        """Cuerpo de la solicitud de reembolso de `monto`."""
+        return {"amount": monto}
+
+    def registra_reembolso(self, payment, respuesta: dict, monto: Union[int, float]) -> Optional[Union[int, float]]:
+        """Guarda la respuesta del reembolso, marca el pago como reembolsado y devuelve el monto."""
+        payment.attrs.solicitud_reembolso = respuesta
+        self.persistencia.guarda(payment, ["extra_data"])
+        self._cambia_estado(payment, PaymentStatus.REFUNDED)
+        return monto
+
+    @perfila("refund")
+    def refund(self, payment, amount: Optional[int] = None) -> int:
+        """
+        Realiza un reembolso del pago.
+        El seguimiento se debe hacer directamente en la pasarela.
+
+        Args:
+            payment ("Payment"): Objeto de pago Django Payments.
+            amount (int | None): Monto a reembolsar; por defecto el total (opcional).
+
+        Returns:
+            int: Monto de reembolso solicitado.
+
+        Raises:
+            PaymentError: El pago no está confirmado o la pasarela no aceptó el reembolso.
+        """
+        if payment.status != PaymentStatus.CONFIRMED:
+            raise PaymentError("El pago debe estar confirmado para reversarse.")
+
+        monto = monto_pasarela(amount or payment.total, payment.currency)
+        try:
+            respuesta = self._llama("reembolso", payment, **{self.CUERPO: self.solicitud_reembolso(payment, monto)})
+        except Exception as e:
+            raise PaymentError(e)
+        return self.registra_reembolso(payment, respuesta, monto)
@@ -0,0 +1,85 @@
+"""
+Índice de identificadores externos de los pagos.
+
+Los proveedores configurados con `referencias=True` registran en `get_form` los identificadores
+que les entrega la pasarela. Las notificaciones, la conciliación y el cruce de liquidaciones
+encuentran luego el pago por `(variant, referencia)` usando el índice único.
+"""
+
+from typing import Iterable, Optional
+
+from payments import get_payment_model
+
+
+def registra_referencias(payment, *referencias):
+    """Registra los identificadores externos de `payment`, ignorando los ya registrados."""
+    from .models import ReferenciaPasarela
+
+    ReferenciaPasarela.objects.bulk_create(
+        [
+            ReferenciaPasarela(variant=payment.variant, referencia=str(referencia), pago_id=payment.pk)
+            for referencia in referencias
+            if referencia not in (None, "")
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def referencias_de(payment) -> list:
+    """Identificadores externos guardados en `extra_data` por los proveedores, para indexar pagos antiguos."""
+    referencias = []
+    for clave, campos in (
+        ("respuesta_flow", ("token", "flowOrder")),
+        ("respuesta_khipu", ("payment_id",)),
+        ("respuesta_tbk", ("token",)),
+    ):
+        respuesta = getattr(payment.attrs, clave, None) or {}
+        referencias.extend(respuesta[campo] for campo in campos if respuesta.get(campo) not in (None, ""))
+    return referencias
+
+
+def pk_por_referencia(variant: str, referencia: str) -> Optional[int]:
+    """Primary key del pago con la referencia externa indicada, o `None`."""
+    from .models import ReferenciaPasarela
+
+    return (
+        ReferenciaPasarela.objects.filter(variant=variant, referencia=str(referencia))
+        .values_list("pago_id", flat=True)
+        .first()
+    )
+
+
+def pks_por_referencias(variant: str, referencias: Iterable[str]) -> dict:
+    """Diccionario `referencia -> pk` para un lote de referencias, en una sola consulta."""
+    from .models import ReferenciaPasarela
+
+    return dict(
+        ReferenciaPasarela.objects.filter(variant=variant, referencia__in=[str(r) for r in referencias]).values_list(
+            "referencia", "pago_id"
+        )
+    )
+
+
+def pago_por_referencia(variant: str, referencia: str):
+    """Pago con la referencia externa indicada, o `None`."""
+    pk = pk_por_referencia(variant, referencia)
+    if pk is None:
+        return None
+    return get_payment_model().objects.filter(pk=pk).first()
+
+
+def token_por_referencia(variant: str, referencia: str) -> Optional[str]:
+    """Token de django-payments del pago con la referencia externa indicada, o `None`."""
+    pk = pk_por_referencia(variant, referencia)
+    if pk is None:
+        return None
+    return get_payment_model().objects.filter(pk=pk).values_list("token", flat=True).first()
+
+
+def token_de_notificacion(request, referencia: Optional[str]) -> Optional[str]:
+    """Token del pago de una notificación recibida en la URL estática `process/<variant>/`."""
+    coincidencia = getattr(request, "resolver_match", None)
+    variant = coincidencia.kwargs.get("variant") if coincidencia else None
+    if not variant or not referencia:
+        return None
+    return token_por_referencia(variant, referencia)
@@ -0,0 +1,129 @@
+"""
+Registro estructurado de las llamadas a las pasarelas.
+
+El transporte deja un registro compacto por llamada en el logger `django_payments_chile.llamadas`:
+pasarela, variante, operación, método, ruta, código HTTP, latencia y una huella corta del cuerpo
+de la respuesta, nunca el cuerpo ni los encabezados. Los datos van en los argumentos del mensaje
+(formateo diferido) y en `extra["payments_chile"]` para formatters JSON.
+
+Las llamadas fallidas (excepción o HTTP 4xx/5xx) se registran siempre con nivel WARNING; de las
+exitosas solo la fracción `PAYMENTS_CHILE_REGISTRO_MUESTREO` con nivel INFO. Si el logger no está
+habilitado para el nivel, el registro no calcula nada. Con nivel DEBUG se agregan los parámetros
+de la llamada, con los secretos (`apiKey`, `s`, `Tbk-Api-Key-Secret`...) ocultos.
+"""
+
+import hashlib
+import logging
+import random
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.conf import settings
+
+logger = logging.getLogger("django_payments_chile.llamadas")
+
+OCULTO = "***"
+
+SECRETOS = frozenset(
+    {
+        "apikey",
+        "s",
+        "secret",
+        "secretkey",
+        "tbk-api-key-id",
+        "tbk-api-key-secret",
+        "x-api-key",
+        "authorization",
+    }
+)
+
+MENSAJE = "pasarela=%s variant=%s operacion=%s metodo=%s ruta=%s codigo=%s latencia_ms=%.1f huella=%s"
+
+
+def es_secreto(clave) -> bool:
+    return str(clave).lower() in SECRETOS
+
+
+def redacta(datos) -> dict:
+    """Copia de `datos` (diccionario o lista de pares) con los valores secretos ocultos."""
+    if not datos:
+        return {}
+    pares = datos.items() if isinstance(datos, dict) else datos
+    return {clave: OCULTO if es_secreto(clave) else valor for clave, valor in pares}
+
+
+def redacta_url(url: str) -> str:
+    """`url` con los parámetros secretos de la consulta ocultos."""
+    partes = urlsplit(url)
+    if not partes.query:
+        return url
+    consulta = urlencode(redacta(parse_qsl(partes.query, keep_blank_values=True)), safe="*")
+    return urlunsplit(partes._replace(query=consulta))
+
+
+def huella_cuerpo(respuesta) -> str:
+    """Primeros 12 caracteres del sha256 del cuerpo de la respuesta, para correlacionar sin guardarlo."""
+    contenido = getattr(respuesta, "content", None)
+    if not isinstance(contenido, bytes):
+        return ""
+    return hashlib.sha256(contenido).hexdigest()[:12]
+
+
+def muestreo() -> float:
+    return getattr(settings, "PAYMENTS_CHILE_REGISTRO_MUESTREO", 0.1)
+
+
+def registra_llamada(
+    pasarela: str,
+    variant: str,
+    operacion: str,
+    verbo: str,
+    url: str,
+    latencia: float,
+    respuesta=None,
+    error: Optional[BaseException] = None,
+    parametros: Optional[dict] = None,
+):
+    """Registra una llamada a la pasarela.
+
+    Args:
+        pasarela (str): Nombre de la pasarela.
+        variant (str): Variante del pago, si se conoce.
+        operacion (str): Operación del transporte, por ejemplo "crear".
+        verbo (str): Método HTTP.
+        url (str): URL llamada.
+        latencia (float): Segundos que tomó la llamada.
+        respuesta (requests.Response | None): Respuesta, si la hubo.
+        error (Exception | None): Error de la llamada, si lo hubo.
+        parametros (dict | None): Argumentos de la llamada; solo se registran con nivel DEBUG.
+    """
+    codigo = getattr(respuesta, "status_code", None)
+    fallida = error is not None or (isinstance(codigo, int) and codigo >= 400)
+    nivel = logging.WARNING if fallida else logging.INFO
+    if not logger.isEnabledFor(nivel) or (not fallida and random.random() >= muestreo()):  # nosec
+        return
+
+    evento = {
+        "pasarela": pasarela,
+        "variant": variant,
+        "operacion": operacion,
+        "metodo": verbo,
+        "ruta": redacta_url(urlsplit(url)._replace(scheme="", netloc="").geturl()),
+        "codigo": codigo,
+        "latencia_ms": round(latencia * 1000, 1),
+        "huella": huella_cuerpo(respuesta),
+    }
+    mensaje = MENSAJE
+    argumentos = [evento[campo] for campo in ("pasarela", "variant", "operacion", "metodo", "ruta", "codigo")]
+    argumentos += [evento["latencia_ms"], evento["huella"]]
+    if error is not None:
+        evento["error"] = type(error).__name__
+        mensaje += " error=%s"
+        argumentos.append(evento["error"])
+    if parametros and logger.isEnabledFor(logging.DEBUG):
+        evento["parametros"] = {
+            nombre: redacta(valor) if isinstance(valor, dict) else valor
+            for nombre, valor in parametros.items()
+            if nombre in ("params", "data", "json", "headers")
+        }
+    logger.log(nivel, mensaje, *argumentos, extra={"payments_chile": evento})
@@ -0,0 +1,69 @@
+"""
+Reintentos de las lecturas idempotentes.
+
+Una lectura que falla por conexión, timeout o una respuesta 502, 503 o 504 se repite en el mismo
+host tras una espera aleatoria entre cero y un tope que se duplica en cada intento (backoff
+exponencial con jitter completo), así los workers que fallaron juntos no reintentan juntos.
+
+Los reintentos se detienen al agotar `intentos`, cuando la espera y una llamada mínima ya no caben
+en el plazo de la petición, o cuando se agota el presupuesto: cada lectura suma `presupuesto` de
+crédito y cada reintento consume uno, de modo que una pasarela caída no recibe el tráfico
+multiplicado por los reintentos.
+"""
+
+import random
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from .cobertura import PresupuestoCobertura
+from .plazos import MARGEN, TIMEOUT_MINIMO, tiempo_restante
+
+#: Códigos HTTP de una falla transitoria de la pasarela o de su balanceador.
+CODIGOS_REINTENTABLES = frozenset({502, 503, 504})
+
+
+@dataclass(frozen=True)
+class ConfiguracionReintentos:
+    """
+    Args:
+        intentos (int): Reintentos como máximo después de la primera llamada (Valor por defecto: 2).
+        espera (float): Tope en segundos de la espera antes del primer reintento (Valor por defecto: 0.1).
+        espera_maxima (float): Tope en segundos de la espera de cualquier reintento (Valor por defecto: 1).
+        presupuesto (float): Fracción máxima de reintentos sobre las lecturas (Valor por defecto: 0.1).
+    """
+
+    intentos: int = 2
+    espera: float = 0.1
+    espera_maxima: float = 1.0
+    presupuesto: float = 0.1
+
+
+class Reintentos:
+    """Presupuesto y esperas de los reintentos de las lecturas de un proveedor."""
+
+    def __init__(self, configuracion: ConfiguracionReintentos):
+        self.configuracion = configuracion
+        # Parte con el crédito completo para cubrir una falla apenas arranca el proceso
+        self._presupuesto = PresupuestoCobertura(configuracion.presupuesto, inicial=10.0)
+        self.azar = random.Random()
+        self.reintentos = 0
+        self._lock = threading.Lock()
+
+    def registra_llamada(self):
+        self._presupuesto.registra_llamada()
+
+    def espera(self, intento: int) -> Optional[float]:
+        """Segundos a esperar antes del reintento número `intento` (desde 0), o `None` si no se reintenta."""
+        if intento >= self.configuracion.intentos:
+            return None
+        tope = min(self.configuracion.espera_maxima, self.configuracion.espera * 2**intento)
+        espera = self.azar.uniform(0, tope)
+        restante = tiempo_restante()
+        if restante is not None and restante - MARGEN - espera < TIMEOUT_MINIMO:
+            return None
+        if not self._presupuesto.consume():
+            return None
+        with self._lock:
+            self.reintentos += 1
+        return espera
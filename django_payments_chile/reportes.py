@@ -0,0 +1,197 @@
+"""
+Reportes de pagos por variante y día.
+
+Filtrar o agregar por los datos de la pasarela obliga a decodificar el JSON de `extra_data` de
+cada pago. `actualiza_resumen` calcula en cambio una fila de `ResumenDiario` por variante y día de
+creación: cantidades y montos por estado con agregaciones de la base de datos, y los códigos de
+rechazo leyendo `extra_data` solo de los pagos rechazados de ese día.
+
+El cálculo es incremental: cada corrida recalcula solo los días con pagos modificados desde la
+anterior (con un margen `solape` para transacciones que se confirmaron tarde). Los reportes leen
+el resumen con `resumen` y `totales`, que se guardan en el cache de Django por
+`PAYMENTS_CHILE_REPORTES_TTL` segundos y se invalidan al actualizar el resumen.
+"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from datetime import time as hora
+from datetime import timedelta
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from payments import PaymentStatus, get_payment_model
+
+from .WebpayProvider import codigos_rechazo_nivel_1
+
+SIN_CODIGO = "sin código"
+
+CAMPOS = ("pagos", "confirmados", "rechazados", "reembolsados", "monto_confirmado", "monto_reembolsado", "rechazos")
+
+
+def ttl() -> float:
+    return getattr(settings, "PAYMENTS_CHILE_REPORTES_TTL", 300)
+
+
+def codigo_rechazo(extra_data: str, mensaje: str = "") -> str:
+    """Código de rechazo de un pago: el `response_code` de Webpay o, en otras pasarelas, el mensaje."""
+    try:
+        datos = json.loads(extra_data or "{}")
+    except ValueError:
+        datos = {}
+    for campo in ("commit_response", "status_response"):
+        respuesta = datos.get(campo)
+        if isinstance(respuesta, dict) and respuesta.get("response_code") not in (None, 0):
+            return str(respuesta["response_code"])
+    return (mensaje or SIN_CODIGO)[:100]
+
+
+def describe_rechazo(codigo: str) -> str:
+    """Descripción de un código de rechazo según las tablas de Webpay; otros códigos se devuelven tal cual."""
+    return " ".join(codigos_rechazo_nivel_1.get(codigo, codigo).split())
+
+
+def _dia(fecha: date):
+    inicio = timezone.make_aware(datetime.combine(fecha, hora.min))
+    return inicio, timezone.make_aware(datetime.combine(fecha + timedelta(days=1), hora.min))
+
+
+def calcula_dia(variant: str, fecha: date) -> dict:
+    """Totales de los pagos de `variant` creados en `fecha`, con los campos de `ResumenDiario`."""
+    inicio, fin = _dia(fecha)
+    pagos = get_payment_model().objects.filter(variant=variant, created__gte=inicio, created__lt=fin)
+    totales = pagos.aggregate(
+        pagos=Count("pk"),
+        confirmados=Count("pk", filter=Q(status=PaymentStatus.CONFIRMED)),
+        rechazados=Count("pk", filter=Q(status=PaymentStatus.REJECTED)),
+        reembolsados=Count("pk", filter=Q(status=PaymentStatus.REFUNDED)),
+        monto_confirmado=Sum("total", filter=Q(status=PaymentStatus.CONFIRMED)),
+        monto_reembolsado=Sum("total", filter=Q(status=PaymentStatus.REFUNDED)),
+    )
+    rechazos = {}
+    for extra_data, mensaje in pagos.filter(status=PaymentStatus.REJECTED).values_list("extra_data", "message"):
+        codigo = codigo_rechazo(extra_data, mensaje)
+        rechazos[codigo] = rechazos.get(codigo, 0) + 1
+    totales["monto_confirmado"] = totales["monto_confirmado"] or Decimal(0)
+    totales["monto_reembolsado"] = totales["monto_reembolsado"] or Decimal(0)
+    totales["rechazos"] = rechazos
+    return totales
+
+
+def dias_modificados(variant: str, desde=None, hasta=None) -> set:
+    """Días de creación de los pagos de `variant` modificados entre `desde` y `hasta`."""
+    pagos = get_payment_model().objects.filter(variant=variant)
+    if desde is not None:
+        pagos = pagos.filter(modified__gt=desde)
+    if hasta is not None:
+        pagos = pagos.filter(modified__lte=hasta)
+    return set(pagos.annotate(fecha=TruncDate("created")).values_list("fecha", flat=True).distinct())
+
+
+def _invalida():
+    try:
+        cache.incr("payments_chile:reportes:version")
+    except ValueError:
+        cache.set("payments_chile:reportes:version", 1, timeout=None)
+
+
+def actualiza_resumen(variant: str, completo: bool = False, solape: float = 300, ahora=None) -> int:
+    """
+    Recalcula el resumen de los días de `variant` con pagos modificados desde la corrida anterior.
+
+    Args:
+        variant (str): Variante de `PAYMENT_VARIANTS`.
+        completo (bool): Recalcula todos los días, no solo los modificados (Valor por defecto: False).
+        solape (float): Segundos que se vuelven a revisar antes de la corrida anterior (Valor por defecto: 300).
+        ahora (datetime | None): Momento de corte (opcional).
+
+    Returns:
+        int: Días recalculados.
+    """
+    from .models import ResumenDiario
+
+    corte = ahora or timezone.now()
+    anterior = None
+    if not completo:
+        anterior = ResumenDiario.objects.filter(variant=variant).aggregate(ultimo=Max("calculado"))["ultimo"]
+    desde = anterior - timedelta(seconds=solape) if anterior is not None else None
+
+    filas = [
+        ResumenDiario(variant=variant, fecha=fecha, calculado=corte, **calcula_dia(variant, fecha))
+        for fecha in sorted(dias_modificados(variant, desde, corte))
+    ]
+    if filas:
+        ResumenDiario.objects.bulk_create(
+            filas,
+            update_conflicts=True,
+            unique_fields=["variant", "fecha"],
+            update_fields=[*CAMPOS, "calculado"],
+        )
+        _invalida()
+    return len(filas)
+
+
+def _cacheado(nombre: str, argumentos: tuple, calcula):
+    version = cache.get("payments_chile:reportes:version", 0)
+    llave = f"payments_chile:reportes:{version}:{nombre}:{':'.join(str(argumento) for argumento in argumentos)}"
+    valor = cache.get(llave)
+    if valor is None:
+        valor = calcula()
+        cache.set(llave, valor, timeout=ttl())
+    return valor
+
+
+def resumen(variant: Optional[str] = None, desde: Optional[date] = None, hasta: Optional[date] = None) -> list:
+    """Filas de `ResumenDiario` entre `desde` y `hasta` (inclusive), de una variante o de todas."""
+    from .models import ResumenDiario
+
+    def calcula():
+        filas = ResumenDiario.objects.all()
+        if variant is not None:
+            filas = filas.filter(variant=variant)
+        if desde is not None:
+            filas = filas.filter(fecha__gte=desde)
+        if hasta is not None:
+            filas = filas.filter(fecha__lte=hasta)
+        return list(filas)
+
+    return _cacheado("resumen", (variant, desde, hasta), calcula)
+
+
+@dataclass
+class Totales:
+    pagos: int = 0
+    confirmados: int = 0
+    rechazados: int = 0
+    reembolsados: int = 0
+    monto_confirmado: Decimal = Decimal(0)
+    monto_reembolsado: Decimal = Decimal(0)
+    rechazos: dict = field(default_factory=dict)
+
+    @property
+    def tasa_reembolso(self) -> float:
+        cobrados = self.confirmados + self.reembolsados
+        return self.reembolsados / cobrados if cobrados else 0.0
+
+    def rechazos_descritos(self) -> list:
+        """Lista de `(código, descripción, cantidad)`, de los rechazos más frecuentes a los menos."""
+        return [
+            (codigo, describe_rechazo(codigo), cantidad)
+            for codigo, cantidad in sorted(self.rechazos.items(), key=lambda par: (-par[1], par[0]))
+        ]
+
+
+def totales(variant: Optional[str] = None, desde: Optional[date] = None, hasta: Optional[date] = None) -> Totales:
+    """Suma de las filas de `resumen` del período, con los rechazos por código."""
+    resultado = Totales()
+    for fila in resumen(variant, desde, hasta):
+        for campo in CAMPOS[:-1]:
+            setattr(resultado, campo, getattr(resultado, campo) + getattr(fila, campo))
+        for codigo, cantidad in fila.rechazos.items():
+            resultado.rechazos[codigo] = resultado.rechazos.get(codigo, 0) + cantidad
+    return resultado
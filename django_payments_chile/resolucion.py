@@ -0,0 +1,211 @@
+"""
+Resolución de nombres con cache para los hosts de las pasarelas.
+
+Las conexiones nuevas del pool de cada pasarela resuelven el host a través de `cache_dns`, que
+guarda las direcciones durante el TTL del registro (o `PAYMENTS_CHILE_DNS_TTL` si el resolutor
+no lo informa). Si el resolutor falla se siguen usando las últimas direcciones conocidas hasta
+`PAYMENTS_CHILE_DNS_OBSOLETO` segundos después de vencidas, en lugar de fallar el pago.
+
+El resolutor se elige con `PAYMENTS_CHILE_DNS_RESOLUTOR`: `ResolutorSistema` (por defecto, usa
+`getaddrinfo`), `ResolutorDNSPython` (requiere el paquete `dnspython`, respeta el TTL real) o
+`ResolutorEstatico` para pruebas sin red.
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util import connection
+
+try:
+    from urllib3.exceptions import NameResolutionError
+except ImportError:
+    # urllib3 1.26, que requests todavía permite, informa las fallas de DNS como NewConnectionError
+    NameResolutionError = None
+
+RESOLUTOR_POR_DEFECTO = "django_payments_chile.resolucion.ResolutorSistema"
+
+
+class ResolutorSistema:
+    """Resuelve con `socket.getaddrinfo`; no conoce el TTL del registro."""
+
+    def resuelve(self, host: str, puerto: int) -> tuple:
+        direcciones = []
+        for *_, direccion in socket.getaddrinfo(host, puerto, type=socket.SOCK_STREAM):
+            if direccion[0] not in direcciones:
+                direcciones.append(direccion[0])
+        return direcciones, None
+
+
+class ResolutorDNSPython:
+    """Resuelve registros A y AAAA con `dnspython`, devolviendo el menor TTL de las respuestas."""
+
+    def __init__(self):
+        import dns.resolver
+
+        self.resolver = dns.resolver.Resolver()
+
+    def resuelve(self, host: str, puerto: int) -> tuple:
+        import dns.exception
+
+        direcciones, ttl = [], None
+        for tipo in ("A", "AAAA"):
+            try:
+                respuesta = self.resolver.resolve(host, tipo)
+            except dns.exception.DNSException:
+                continue
+            direcciones.extend(registro.to_text() for registro in respuesta)
+            ttl = respuesta.rrset.ttl if ttl is None else min(ttl, respuesta.rrset.ttl)
+        if not direcciones:
+            raise socket.gaierror(socket.EAI_NONAME, f"No se pudo resolver {host}")
+        return direcciones, ttl
+
+
+class ResolutorEstatico:
+    """
+    Resolutor fijo para pruebas sin red.
+
+    Args:
+        registros (dict): `host -> [direcciones]` o `host -> ([direcciones], ttl)`.
+    """
+
+    def __init__(self, registros: Optional[dict] = None):
+        self.registros = dict(registros or {})
+        self.consultas = 0
+
+    def resuelve(self, host: str, puerto: int) -> tuple:
+        self.consultas += 1
+        registro = self.registros.get(host)
+        if registro is None:
+            raise socket.gaierror(socket.EAI_NONAME, f"No se pudo resolver {host}")
+        if isinstance(registro, tuple):
+            return list(registro[0]), registro[1]
+        return list(registro), None
+
+
+@dataclass
+class _Entrada:
+    direcciones: list
+    vence: float
+
+
+class CacheDNS:
+    """Cache de direcciones por host, compartida por las conexiones del proceso."""
+
+    def __init__(self, resolutor=None):
+        self._resolutor = resolutor
+        self._entradas = {}
+        self._lock = threading.Lock()
+
+    @property
+    def resolutor(self):
+        if self._resolutor is None:
+            configurado = getattr(settings, "PAYMENTS_CHILE_DNS_RESOLUTOR", RESOLUTOR_POR_DEFECTO)
+            self._resolutor = import_string(configurado)() if isinstance(configurado, str) else configurado
+        return self._resolutor
+
+    @resolutor.setter
+    def resolutor(self, resolutor):
+        self._resolutor = resolutor
+        self.limpia()
+
+    def limpia(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def resuelve(self, host: str, puerto: int) -> list:
+        """Direcciones de `host`, desde el cache mientras no venzan.
+
+        Raises:
+            socket.gaierror: El resolutor falló y no hay direcciones recientes conocidas.
+        """
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(host)
+        if entrada is not None and entrada.vence > ahora:
+            return entrada.direcciones
+
+        try:
+            direcciones, ttl = self.resolutor.resuelve(host, puerto)
+        except OSError:
+            obsoleto = getattr(settings, "PAYMENTS_CHILE_DNS_OBSOLETO", 300)
+            if entrada is not None and ahora - entrada.vence <= obsoleto:
+                return entrada.direcciones
+            raise
+
+        if ttl is None:
+            ttl = getattr(settings, "PAYMENTS_CHILE_DNS_TTL", 60)
+        with self._lock:
+            self._entradas[host] = _Entrada(direcciones, ahora + ttl)
+        return direcciones
+
+
+cache_dns = CacheDNS()
+
+
+class _ConexionResuelta:
+    """Abre el socket con las direcciones de `cache_dns`, probando cada una en orden."""
+
+    def _new_conn(self):
+        try:
+            direcciones = cache_dns.resuelve(self._dns_host, self.port)
+        except socket.gaierror as e:
+            if NameResolutionError is None:
+                raise NewConnectionError(self, f"Failed to resolve '{self.host}' ({e})") from e
+            raise NameResolutionError(self.host, self, e) from e
+
+        error = None
+        for direccion in direcciones:
+            try:
+                return connection.create_connection(
+                    (direccion, self.port),
+                    self.timeout,
+                    source_address=self.source_address,
+                    socket_options=self.socket_options,
+                )
+            except socket.timeout as e:
+                raise ConnectTimeoutError(
+                    self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+                ) from e
+            except OSError as e:
+                error = e
+        raise NewConnectionError(self, f"Failed to establish a new connection: {error}") from error
+
+
+class ConexionHTTP(_ConexionResuelta, HTTPConnection):
+    pass
+
+
+class ConexionHTTPS(_ConexionResuelta, HTTPSConnection):
+    pass
+
+
+class PoolHTTP(HTTPConnectionPool):
+    ConnectionCls = ConexionHTTP
+
+
+class PoolHTTPS(HTTPSConnectionPool):
+    ConnectionCls = ConexionHTTPS
+
+
+class AdaptadorDNS(HTTPAdapter):
+    """`HTTPAdapter` cuyas conexiones resuelven los hosts con `cache_dns`."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": PoolHTTP, "https": PoolHTTPS}
@@ -0,0 +1,106 @@
+"""
+Salud de los hosts de las pasarelas y circuito de protección.
+
+El transporte registra el resultado de cada llamada y los sondeos periódicos el de cada prueba.
+Con el setting `PAYMENTS_CHILE_CIRCUITO` activo, un host que acumula `fallas` consecutivas queda
+con el circuito abierto durante `enfriamiento` segundos: las llamadas se rechazan con
+`CircuitoAbierto` sin esperar el timeout. Pasado el enfriamiento se deja pasar la siguiente
+llamada y su resultado cierra o vuelve a abrir el circuito.
+
+Independiente del circuito, un host con `PAYMENTS_CHILE_FAILOVER_FALLAS` fallas seguidas deja de
+estar sano y el transporte usa los endpoints alternativos de la pasarela; vuelve a intentarse
+`PAYMENTS_CHILE_FAILOVER_REINTENTO` segundos después de su última falla.
+"""
+
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Optional
+
+from django.conf import settings
+from payments import PaymentError
+
+
+class CircuitoAbierto(PaymentError):
+    pass
+
+
+@dataclass
+class EstadoHost:
+    exitos: int = 0
+    fallas: int = 0
+    fallas_consecutivas: int = 0
+    latencia: Optional[float] = None
+    ultimo_error: str = ""
+    ultima_falla: float = 0.0
+    abierto_hasta: float = 0.0
+
+
+class Salud:
+    """Estado de salud por host."""
+
+    def __init__(self):
+        self._estados = {}
+        self._lock = threading.Lock()
+
+    def _configuracion(self) -> Optional[dict]:
+        return getattr(settings, "PAYMENTS_CHILE_CIRCUITO", None)
+
+    def _estado(self, host: str) -> EstadoHost:
+        estado = self._estados.get(host)
+        if estado is None:
+            estado = self._estados[host] = EstadoHost()
+        return estado
+
+    def registra_exito(self, host: str, latencia: float):
+        with self._lock:
+            estado = self._estado(host)
+            estado.exitos += 1
+            estado.fallas_consecutivas = 0
+            estado.latencia = latencia
+            estado.abierto_hasta = 0.0
+
+    def registra_falla(self, host: str, error: str = ""):
+        configuracion = self._configuracion()
+        with self._lock:
+            estado = self._estado(host)
+            estado.fallas += 1
+            estado.fallas_consecutivas += 1
+            estado.ultimo_error = error
+            estado.ultima_falla = time.monotonic()
+            if configuracion and estado.fallas_consecutivas >= configuracion.get("fallas", 5):
+                estado.abierto_hasta = time.monotonic() + configuracion.get("enfriamiento", 30)
+
+    def disponible(self, host: str) -> bool:
+        """`False` si el circuito del host está abierto."""
+        with self._lock:
+            estado = self._estados.get(host)
+            return estado is None or estado.abierto_hasta <= time.monotonic()
+
+    def sano(self, host: str) -> bool:
+        """`False` si el host tiene el circuito abierto o fallas seguidas recientes."""
+        umbral = getattr(settings, "PAYMENTS_CHILE_FAILOVER_FALLAS", 3)
+        reintento = getattr(settings, "PAYMENTS_CHILE_FAILOVER_REINTENTO", 30)
+        ahora = time.monotonic()
+        with self._lock:
+            estado = self._estados.get(host)
+            if estado is None:
+                return True
+            if estado.abierto_hasta > ahora:
+                return False
+            return estado.fallas_consecutivas < umbral or ahora - estado.ultima_falla >= reintento
+
+    def estado(self, host: str) -> EstadoHost:
+        with self._lock:
+            return replace(self._estado(host))
+
+    def estados(self) -> dict:
+        with self._lock:
+            return {host: asdict(estado) for host, estado in self._estados.items()}
+
+    def reinicia(self):
+        with self._lock:
+            self._estados.clear()
+
+
+salud = Salud()
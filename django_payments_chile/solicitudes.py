@@ -0,0 +1,121 @@
+"""
+Construcción de las solicitudes de creación de pago.
+
+Cada pasarela tiene un constructor inmutable que arma el cuerpo de la solicitud una sola vez a
+partir del pago. Los datos de `attrs.datos_extra` se filtran contra un `frozenset` de campos
+reservados por el proveedor sin modificar lo guardado, y en el pago solo se guarda una huella
+de lo enviado en lugar de una copia completa.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import ClassVar, Mapping
+
+from .clientes import ClienteAPI
+from .montos import monto_pasarela
+from .perfilado import fase
+
+
+def huella(datos: Mapping) -> str:
+    """Huella corta y estable de una solicitud: sha256 del JSON canónico, 16 caracteres."""
+    contenido = json.dumps(datos, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(contenido.encode()).hexdigest()[:16]
+
+
+def datos_extra(attrs, reservados: frozenset) -> dict:
+    """Datos extra del pago sin los campos reservados, sin modificar `attrs.datos_extra`.
+
+    Args:
+        attrs ("PaymentAttributeProxy"): Obtenido desde PaymentModel.extra_data
+        reservados (frozenset): Campos que arma el proveedor y no se pueden reemplazar.
+
+    Returns:
+        dict: Diccionario con valores permitidos.
+    """
+    try:
+        datos = attrs.datos_extra
+    except AttributeError:
+        return {}
+    return {clave: valor for clave, valor in datos.items() if clave not in reservados}
+
+
+@dataclass(frozen=True)
+class SolicitudFlow:
+    """Arma y firma las solicitudes a Flow: `/payment/create` y la firma de los demás servicios."""
+
+    api_key: str
+    api_secret: str
+    api_medio: int
+
+    RESERVADOS: ClassVar[frozenset] = frozenset(
+        {
+            "apiKey",
+            "commerceOrder",
+            "urlReturn",
+            "urlConfirmation",
+            "amount",
+            "subject",
+            "paymentMethod",
+            "currency",
+            "s",
+        }
+    )
+
+    def crear_pago(self, payment) -> dict:
+        """Solicitud firmada, con los campos ordenados como exige la firma de Flow."""
+        with fase("urls"):
+            url_retorno, url_confirmacion = payment.get_success_url(), payment.get_process_url()
+        datos = {
+            "apiKey": self.api_key,
+            "commerceOrder": str(payment.token),
+            "urlReturn": url_retorno,
+            "urlConfirmation": url_confirmacion,
+            "subject": payment.description,
+            "amount": monto_pasarela(payment.total, payment.currency),
+            "paymentMethod": self.api_medio,
+            "currency": payment.currency,
+        }
+        if payment.billing_email:
+            datos["email"] = payment.billing_email
+        datos.update(datos_extra(payment.attrs, self.RESERVADOS))
+        return self.firma(datos)
+
+    def firma(self, datos: Mapping) -> dict:
+        """Parámetros ordenados por nombre con la firma `s`, que Flow exige en todos sus servicios."""
+        datos = dict(sorted(datos.items()))
+        with fase("firma"):
+            datos["s"] = ClienteAPI.genera_firma(datos, self.api_secret)
+        return datos
+
+
+@dataclass(frozen=True)
+class SolicitudKhipu:
+    """Arma la solicitud `POST /v3/payments` de Khipu."""
+
+    RESERVADOS: ClassVar[frozenset] = frozenset(
+        {
+            "transaction_id",
+            "return_url",
+            "notify_url",
+            "subject",
+            "amount",
+            "currency",
+        }
+    )
+
+    def crear_pago(self, payment) -> dict:
+        with fase("urls"):
+            url_retorno, url_notificacion = payment.get_success_url(), payment.get_process_url()
+        datos = {
+            "transaction_id": str(payment.token),
+            "return_url": url_retorno,
+            "notify_url": url_notificacion,
+            "subject": payment.description,
+            "amount": monto_pasarela(payment.total, payment.currency),
+            "currency": payment.currency,
+        }
+        if payment.billing_email:
+            datos["payer_email"] = payment.billing_email
+        datos.update(datos_extra(payment.attrs, self.RESERVADOS))
+        return datos
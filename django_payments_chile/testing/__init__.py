@@ -0,0 +1,15 @@
+"""
+Pasarelas falsas para pruebas y mediciones sin salir a internet.
+
+```python
+from django_payments_chile.testing import PasarelasFalsas, Perfil
+
+with PasarelasFalsas(perfil=Perfil(latencia=0.05, fallas=0.01)) as pasarelas:
+    FlowProvider("flow_key", "flow_secret", f"{pasarelas.url}/flow")
+```
+"""
+
+from .pasarelas import CREDENCIALES, Almacen, Perfil
+from .servidor import PasarelasFalsas
+
+__all__ = ["CREDENCIALES", "Almacen", "PasarelasFalsas", "Perfil"]
@@ -0,0 +1,482 @@
+"""
+Máquinas de estado de las pasarelas falsas.
+
+Cada pasarela recibe una llamada ya decodificada (método, ruta, parámetros y encabezados) y
+devuelve `Respuesta`. Los pagos se guardan en un `Almacen` con capacidad fija: al llenarse se
+descartan los menos usados, así una prueba de millones de pagos ocupa memoria acotada. Un pago
+descartado responde como inexistente, igual que una transacción vencida en la pasarela real.
+
+El comprador decide al crear el pago (`comprador_automatico=True`) o al visitar la URL de pago
+que entrega la pasarela; aprueba salvo con probabilidad `Perfil.rechazos`.
+"""
+
+import hashlib
+import hmac
+import random
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import count
+from typing import Optional
+
+from ..clientes import ClienteAPI
+
+# Credenciales que aceptan las pasarelas falsas por defecto, las de la tienda de pruebas
+CREDENCIALES = {
+    "flow": {"flow_key": "flow_secret"},
+    "khipu": {"khipu_key": ""},
+    "webpay": {"597055555532": "webpay_secret"},
+}
+
+BANCOS_KHIPU = [
+    {"bank_id": "SDYJq", "name": "Banco de Chile", "message": "", "min_amount": 200, "type": "Persona", "parent": ""},
+    {"bank_id": "Bawdf", "name": "BancoEstado", "message": "", "min_amount": 200, "type": "Persona", "parent": ""},
+    {"bank_id": "dXhKn", "name": "Santander", "message": "", "min_amount": 200, "type": "Persona", "parent": ""},
+]
+
+
+@dataclass(frozen=True)
+class Perfil:
+    """
+    Comportamiento de una pasarela falsa.
+
+    Args:
+        latencia (float): Segundos de espera antes de responder (Valor por defecto: 0).
+        variacion (float): Variación aleatoria de la latencia, en más o en menos (Valor por defecto: 0).
+        lentas (float): Probabilidad de sumar `latencia_lenta` a una respuesta (Valor por defecto: 0).
+        latencia_lenta (float): Segundos extra de las respuestas lentas (Valor por defecto: 2).
+        fallas (float): Probabilidad de responder HTTP 503 (Valor por defecto: 0).
+        caidas (float): Probabilidad de cerrar la conexión sin responder (Valor por defecto: 0).
+        rechazos (float): Probabilidad de que el comprador rechace o no pueda pagar (Valor por defecto: 0).
+    """
+
+    latencia: float = 0.0
+    variacion: float = 0.0
+    lentas: float = 0.0
+    latencia_lenta: float = 2.0
+    fallas: float = 0.0
+    caidas: float = 0.0
+    rechazos: float = 0.0
+
+    def espera(self, azar: random.Random) -> float:
+        espera = self.latencia + (azar.uniform(-self.variacion, self.variacion) if self.variacion else 0.0)
+        if self.lentas and azar.random() < self.lentas:
+            espera += self.latencia_lenta
+        return max(0.0, espera)
+
+
+@dataclass
+class Respuesta:
+    codigo: int = 200
+    datos: Optional[dict] = None
+    encabezados: dict = field(default_factory=dict)
+
+
+def error(codigo: int, mensaje: str) -> Respuesta:
+    return Respuesta(codigo, {"code": codigo, "message": mensaje})
+
+
+class PagoFalso:
+    __slots__ = (
+        "token",
+        "orden",
+        "numero",
+        "monto",
+        "moneda",
+        "estado",
+        "aprobado",
+        "reembolsado",
+        "capturado",
+        "creado",
+    )
+
+    def __init__(self, token: str, orden: str, numero: int, monto: int, moneda: str = "CLP"):
+        self.token = token
+        self.orden = orden
+        self.numero = numero
+        self.monto = monto
+        self.moneda = moneda
+        self.estado = ""
+        # `None` mientras el comprador no decide
+        self.aprobado = None
+        self.reembolsado = 0
+        self.capturado = 0
+        self.creado = datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+class Almacen:
+    """
+    Pagos con capacidad fija y descarte del menos usado.
+
+    Un pago se guarda bajo varias claves (token, orden de compra) pero ocupa un solo lugar: la
+    capacidad cuenta pagos y al descartar uno se descartan todas sus claves, así un pago nunca
+    queda visible por una clave e inexistente por otra.
+    """
+
+    def __init__(self, capacidad: int = 100_000):
+        self.capacidad = capacidad
+        self.descartados = 0
+        # Clave principal -> (pago, claves), en orden de uso
+        self._pagos = OrderedDict()
+        # Cualquier clave -> clave principal
+        self._claves = {}
+
+    def __len__(self) -> int:
+        return len(self._pagos)
+
+    def guarda(self, pago: PagoFalso, principal: str, *claves: str):
+        claves = (principal, *claves)
+        self._pagos[principal] = (pago, claves)
+        self._pagos.move_to_end(principal)
+        for clave in claves:
+            self._claves[clave] = principal
+        while len(self._pagos) > self.capacidad:
+            descartada, (_, claves) = self._pagos.popitem(last=False)
+            for clave in claves:
+                if self._claves.get(clave) == descartada:
+                    del self._claves[clave]
+            self.descartados += 1
+
+    def obtiene(self, clave: str) -> Optional[PagoFalso]:
+        principal = self._claves.get(clave)
+        if principal is None:
+            return None
+        self._pagos.move_to_end(principal)
+        return self._pagos[principal][0]
+
+
+class PasarelaFalsa:
+    """Base de las pasarelas falsas: almacén, credenciales y decisión del comprador."""
+
+    nombre = ""
+
+    def __init__(self, url: str, perfil: Perfil, credenciales: dict, capacidad: int, comprador_automatico: bool):
+        self.url = url
+        self.perfil = perfil
+        self.credenciales = credenciales
+        self.comprador_automatico = comprador_automatico
+        self.pagos = Almacen(capacidad)
+        self.azar = random.Random()
+        self._ordenes = count(1)
+
+    def decide(self, pago: PagoFalso):
+        if pago.aprobado is None:
+            pago.aprobado = self.azar.random() >= self.perfil.rechazos
+
+    def nuevo(self, token: str, orden: str, monto, moneda: str, *claves: str) -> PagoFalso:
+        pago = PagoFalso(token, orden, next(self._ordenes), int(float(monto)), moneda)
+        self.pagos.guarda(pago, token, *claves)
+        if self.comprador_automatico:
+            self.decide(pago)
+        return pago
+
+    def responde(self, metodo: str, ruta: str, parametros: dict, encabezados: dict) -> Respuesta:
+        raise NotImplementedError
+
+
+class FlowFalso(PasarelaFalsa):
+    """Flow: `/payment/create`, `/payment/getStatus`, `/refund/create`, con firma `s` de `ClienteAPI`."""
+
+    nombre = "flow"
+
+    def firma_valida(self, parametros: dict) -> bool:
+        secreto = self.credenciales.get(parametros.get("apiKey"))
+        if secreto is None or "s" not in parametros:
+            return False
+        datos = {clave: parametros[clave] for clave in sorted(parametros) if clave != "s"}
+        return hmac.compare_digest(ClienteAPI.genera_firma(datos, secreto), parametros["s"])
+
+    def responde(self, metodo, ruta, parametros, encabezados):
+        if metodo == "GET" and ruta == "/pagar":
+            return self.paga(parametros.get("token", ""))
+        if ruta not in ("/payment/create", "/payment/getStatus", "/refund/create"):
+            return error(404, "Not found")
+        if not self.firma_valida(parametros):
+            return error(401, "Invalid apiKey or signature")
+        if ruta == "/refund/create" and metodo == "POST":
+            return self.reembolsa(parametros)
+        if ruta == "/payment/create" and metodo == "POST":
+            return self.crea(parametros)
+        if ruta == "/payment/getStatus" and metodo == "GET":
+            return self.estado(parametros.get("token", ""))
+        return error(405, "Method not allowed")
+
+    def crea(self, parametros: dict) -> Respuesta:
+        orden = parametros.get("commerceOrder", "")
+        if not orden or "amount" not in parametros:
+            return error(400, "commerceOrder and amount are required")
+        if self.pagos.obtiene(f"orden:{orden}") is not None:
+            return error(400, "commerceOrder already exists")
+        token = hashlib.sha1(f"{orden}:{next(self._ordenes)}".encode()).hexdigest().upper()  # nosec
+        pago = self.nuevo(token, orden, parametros["amount"], parametros.get("currency", "CLP"), f"orden:{orden}")
+        return Respuesta(200, {"url": f"{self.url}/pagar", "token": token, "flowOrder": pago.numero})
+
+    def _busca(self, token: str) -> Optional[PagoFalso]:
+        return self.pagos.obtiene(token) or self.pagos.obtiene(f"orden:{token}")
+
+    def paga(self, token: str) -> Respuesta:
+        pago = self._busca(token)
+        if pago is None:
+            return error(404, "Payment not found")
+        self.decide(pago)
+        return Respuesta(200, {"status": 2 if pago.aprobado else 3})
+
+    def estado(self, token: str) -> Respuesta:
+        pago = self._busca(token)
+        if pago is None:
+            return error(400, "Token not found")
+        status = 1 if pago.aprobado is None else (2 if pago.aprobado else 3)
+        return Respuesta(
+            200,
+            {
+                "flowOrder": pago.numero,
+                "commerceOrder": pago.orden,
+                "requestDate": pago.creado,
+                "status": status,
+                "amount": pago.monto,
+                "currency": pago.moneda,
+                "pending_info": {},
+                "paymentData": {"amount": pago.monto, "balance": pago.monto - pago.reembolsado} if status == 2 else {},
+            },
+        )
+
+    def reembolsa(self, parametros: dict) -> Respuesta:
+        pago = self._busca(parametros.get("commerceTrxId", "")) or self._busca(parametros.get("flowTrxId", ""))
+        if pago is None or not pago.aprobado:
+            return error(400, "Payment not found or not paid")
+        monto = int(float(parametros.get("amount", 0)))
+        if monto <= 0 or monto > pago.monto - pago.reembolsado:
+            return error(400, "Invalid refund amount")
+        pago.reembolsado += monto
+        return Respuesta(
+            200,
+            {
+                "token": hashlib.sha1(f"reembolso:{pago.token}:{pago.reembolsado}".encode())
+                .hexdigest()
+                .upper(),  # nosec
+                "flowRefundOrder": next(self._ordenes),
+                "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "status": "created",
+                "amount": monto,
+                "fee": 0,
+            },
+        )
+
+
+class KhipuFalso(PasarelaFalsa):
+    """Khipu: `/v3/payments`, su estado y reembolsos, y `/v3/banks` con `ETag`."""
+
+    nombre = "khipu"
+
+    def responde(self, metodo, ruta, parametros, encabezados):
+        partes = ruta.strip("/").split("/")
+        if metodo == "GET" and partes[0] == "pagar" and len(partes) == 2:
+            return self.paga(partes[1])
+        if encabezados.get("x-api-key") not in self.credenciales:
+            return error(401, "Invalid api key")
+        if partes[:1] != ["v3"]:
+            return error(404, "Not found")
+        if partes[1:] == ["banks"] and metodo == "GET":
+            return self.bancos(encabezados)
+        if partes[1:] == ["payments"] and metodo == "POST":
+            return self.crea(parametros)
+        if len(partes) == 3 and partes[1] == "payments" and metodo == "GET":
+            return self.estado(partes[2])
+        if len(partes) == 4 and partes[1] == "payments" and partes[3] == "refunds" and metodo == "POST":
+            return self.reembolsa(partes[2])
+        return error(404, "Not found")
+
+    def bancos(self, encabezados: dict) -> Respuesta:
+        etag = '"bancos-1"'
+        if encabezados.get("if-none-match") == etag:
+            return Respuesta(304, None, {"ETag": etag})
+        return Respuesta(200, {"banks": BANCOS_KHIPU}, {"ETag": etag})
+
+    def crea(self, parametros: dict) -> Respuesta:
+        if "amount" not in parametros or "subject" not in parametros:
+            return error(400, "subject and amount are required")
+        orden = parametros.get("transaction_id", "")
+        token = hashlib.sha1(f"{orden}:{next(self._ordenes)}".encode()).hexdigest()[:12]  # nosec
+        self.nuevo(token, orden, parametros["amount"], parametros.get("currency", "CLP"), *([orden] if orden else []))
+        url = f"{self.url}/pagar/{token}"
+        return Respuesta(
+            201,
+            {
+                "payment_id": token,
+                "payment_url": url,
+                "simplified_transfer_url": url,
+                "transfer_url": url,
+                "app_url": f"khipu:///pos/{token}",
+                "ready_for_terminal": False,
+            },
+        )
+
+    def paga(self, token: str) -> Respuesta:
+        pago = self.pagos.obtiene(token)
+        if pago is None:
+            return error(404, "Payment not found")
+        self.decide(pago)
+        return self.estado(token)
+
+    def estado(self, token: str) -> Respuesta:
+        pago = self.pagos.obtiene(token)
+        if pago is None:
+            return error(404, "Payment not found")
+        if pago.aprobado is None:
+            status, detalle = "pending", "pending"
+        elif not pago.aprobado:
+            status, detalle = "done", "rejected-by-payer"
+        else:
+            status, detalle = "done", "reversed" if pago.reembolsado else "normal"
+        return Respuesta(
+            200,
+            {
+                "payment_id": pago.token,
+                "transaction_id": pago.orden,
+                "status": status,
+                "status_detail": detalle,
+                "amount": pago.monto,
+                "currency": pago.moneda,
+            },
+        )
+
+    def reembolsa(self, token: str) -> Respuesta:
+        pago = self.pagos.obtiene(token)
+        if pago is None or not pago.aprobado or pago.reembolsado:
+            return error(400, "Payment not found or not refundable")
+        pago.reembolsado = pago.monto
+        return Respuesta(200, {"message": "Reembolso realizado"})
+
+
+class WebpayFalso(PasarelaFalsa):
+    """Webpay Plus: creación, commit, estado, anulación y captura diferida de `/transactions`."""
+
+    nombre = "webpay"
+    RUTA = "/rswebpaytransaction/api/webpay/v1.2/transactions"
+
+    def responde(self, metodo, ruta, parametros, encabezados):
+        if ruta == "/pagar":
+            return self.paga(parametros.get("token_ws", ""))
+        clave = encabezados.get("tbk-api-key-id")
+        if clave not in self.credenciales or self.credenciales[clave] != encabezados.get("tbk-api-key-secret"):
+            return Respuesta(401, {"error_message": "Not Authorized"})
+        if not ruta.startswith(self.RUTA):
+            return error(404, "Not found")
+        resto = ruta.removeprefix(self.RUTA).strip("/")
+        partes = resto.split("/") if resto else []
+        if not partes and metodo == "POST":
+            return self.crea(parametros)
+        if len(partes) == 1 and metodo == "PUT":
+            return self.commit(partes[0])
+        if len(partes) == 1 and metodo == "GET":
+            return self.estado(partes[0])
+        if len(partes) == 2 and partes[1] == "refunds" and metodo in ("POST", "PUT"):
+            return self.anula(partes[0], parametros)
+        if len(partes) == 2 and partes[1] == "capture" and metodo == "PUT":
+            return self.captura(partes[0], parametros)
+        return error(404, "Not found")
+
+    def _busca(self, token: str) -> Optional[PagoFalso]:
+        return self.pagos.obtiene(token)
+
+    def crea(self, parametros: dict) -> Respuesta:
+        faltantes = {"buy_order", "session_id", "amount", "return_url"} - set(parametros)
+        if faltantes:
+            return Respuesta(422, {"error_message": f"{sorted(faltantes)[0]} is required!"})
+        orden = parametros["buy_order"]
+        token = hashlib.sha256(f"{orden}:{next(self._ordenes)}".encode()).hexdigest()
+        pago = self.nuevo(token, orden, parametros["amount"], "CLP", f"orden:{orden}")
+        pago.estado = "INITIALIZED"
+        return Respuesta(200, {"token": token, "url": f"{self.url}/pagar"})
+
+    def paga(self, token: str) -> Respuesta:
+        pago = self.pagos.obtiene(token)
+        if pago is None:
+            return Respuesta(404, {"error_message": "Transaction not found"})
+        self.decide(pago)
+        return Respuesta(200, {"token_ws": token, "aprobado": pago.aprobado})
+
+    def _detalle(self, pago: PagoFalso) -> dict:
+        datos = {
+            "vci": "TSY" if pago.aprobado else "TSN",
+            "amount": pago.monto,
+            "status": pago.estado,
+            "buy_order": pago.orden,
+            "session_id": pago.orden,
+            "card_detail": {"card_number": "6623"},
+            "accounting_date": pago.creado[5:7] + pago.creado[8:10],
+            "transaction_date": pago.creado,
+            "authorization_code": "1213" if pago.aprobado else "000000",
+            "payment_type_code": "VN",
+            "response_code": 0 if pago.aprobado else -1,
+            "installments_number": 0,
+        }
+        if pago.estado == "INITIALIZED":
+            # Sin commit la transacción aún no trae el resultado de la autorización
+            for campo in ("vci", "card_detail", "authorization_code", "payment_type_code", "response_code"):
+                del datos[campo]
+        return datos
+
+    def commit(self, token: str) -> Respuesta:
+        pago = self.pagos.obtiene(token)
+        if pago is None:
+            return Respuesta(404, {"error_message": "Transaction not found"})
+        if pago.estado != "INITIALIZED":
+            return Respuesta(422, {"error_message": "Invalid status for transaction while authorizing"})
+        if pago.aprobado is None:
+            return Respuesta(422, {"error_message": "Transaction not finished by cardholder"})
+        pago.estado = "AUTHORIZED" if pago.aprobado else "FAILED"
+        return Respuesta(200, self._detalle(pago))
+
+    def estado(self, token: str) -> Respuesta:
+        pago = self.pagos.obtiene(token)
+        if pago is None:
+            return Respuesta(404, {"error_message": "Transaction not found"})
+        return Respuesta(200, self._detalle(pago))
+
+    def anula(self, token: str, parametros: dict) -> Respuesta:
+        pago = self._busca(token)
+        if pago is None:
+            return Respuesta(404, {"error_message": "Transaction not found"})
+        monto = int(float(parametros.get("amount", 0)))
+        saldo = pago.monto - pago.reembolsado
+        if pago.estado not in ("AUTHORIZED", "PARTIALLY_NULLIFIED") or monto <= 0 or monto > saldo:
+            return Respuesta(422, {"error_message": "Invalid status or amount for refund"})
+        pago.reembolsado += monto
+        if monto == pago.monto:
+            pago.estado = "REVERSED"
+            return Respuesta(200, {"type": "REVERSED"})
+        pago.estado = "NULLIFIED" if pago.reembolsado == pago.monto else "PARTIALLY_NULLIFIED"
+        return Respuesta(
+            200,
+            {
+                "type": "NULLIFIED",
+                "authorization_code": "123456",
+                "authorization_date": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "nullified_amount": monto,
+                "balance": pago.monto - pago.reembolsado,
+                "response_code": 0,
+            },
+        )
+
+    def captura(self, token: str, parametros: dict) -> Respuesta:
+        pago = self.pagos.obtiene(token)
+        if pago is None:
+            return Respuesta(404, {"error_message": "Transaction not found"})
+        monto = int(float(parametros.get("capture_amount", 0)))
+        if pago.estado != "AUTHORIZED" or pago.capturado or monto <= 0 or monto > pago.monto:
+            return Respuesta(422, {"error_message": "Invalid status or amount for capture"})
+        pago.capturado = monto
+        return Respuesta(
+            200,
+            {
+                "token": pago.token,
+                "authorization_code": parametros.get("authorization_code", "1213"),
+                "authorization_date": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "captured_amount": monto,
+                "response_code": 0,
+            },
+        )
+
+
+PASARELAS = {pasarela.nombre: pasarela for pasarela in (FlowFalso, KhipuFalso, WebpayFalso)}
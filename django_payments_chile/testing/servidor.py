@@ -0,0 +1,204 @@
+"""
+Servidor HTTP asyncio de las pasarelas falsas.
+
+Atiende `/flow`, `/khipu` y `/webpay` en un solo puerto con conexiones persistentes (HTTP/1.1
+keep-alive). La latencia simulada se espera con `asyncio.sleep`, así miles de llamadas
+concurrentes no ocupan un hilo cada una. `PasarelasFalsas.inicia()` lo levanta en un hilo propio
+para usarlo desde pruebas síncronas; dentro de un loop se usa `await abre()` y `await cierra()`.
+"""
+
+import asyncio
+import json
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from .pasarelas import CREDENCIALES, PASARELAS, Perfil, Respuesta
+
+MOTIVOS = {200: "OK", 201: "Created", 304: "Not Modified", 401: "Unauthorized", 404: "Not Found"}
+
+
+@dataclass
+class Estadisticas:
+    solicitudes: int = 0
+    fallas: int = 0
+    caidas: int = 0
+
+
+def decodifica(cuerpo: bytes) -> dict:
+    """Parámetros de un cuerpo JSON o de formulario, sin importar el `Content-Type` declarado."""
+    if not cuerpo:
+        return {}
+    try:
+        datos = json.loads(cuerpo)
+    except ValueError:
+        return dict(parse_qsl(cuerpo.decode(), keep_blank_values=True))
+    return datos if isinstance(datos, dict) else {}
+
+
+class PasarelasFalsas:
+    """
+    Servidor local que simula Flow (`/flow`), Khipu (`/khipu`) y Transbank (`/webpay`).
+
+    Args:
+        puerto (int): Puerto local, 0 elige uno libre (Valor por defecto: 0).
+        latencia (float): Segundos de espera antes de responder cada llamada (Valor por defecto: 0).
+        perfil (Perfil | None): Latencia, fallas y rechazos de todas las pasarelas (opcional).
+        perfiles (dict | None): `Perfil` por pasarela, en lugar de `perfil` (opcional).
+        credenciales (dict | None): Claves aceptadas por pasarela; por defecto `CREDENCIALES` (opcional).
+        capacidad (int): Pagos recordados por pasarela antes de descartar los menos usados (Valor por defecto: 100000).
+        comprador_automatico (bool): El comprador paga al crear el pago, sin visitar la URL de pago
+            (Valor por defecto: True).
+        semilla (int | None): Semilla del azar de los perfiles, para pruebas reproducibles (opcional).
+    """
+
+    def __init__(
+        self,
+        puerto: int = 0,
+        latencia: float = 0.0,
+        perfil: Optional[Perfil] = None,
+        perfiles: Optional[dict] = None,
+        credenciales: Optional[dict] = None,
+        capacidad: int = 100_000,
+        comprador_automatico: bool = True,
+        semilla: Optional[int] = None,
+    ):
+        self.puerto = puerto
+        self.estadisticas = Estadisticas()
+        perfil = perfil or Perfil(latencia=latencia)
+        credenciales = credenciales or CREDENCIALES
+        self.pasarelas = {}
+        for nombre, clase in PASARELAS.items():
+            pasarela = clase(
+                "",
+                (perfiles or {}).get(nombre, perfil),
+                credenciales.get(nombre, {}),
+                capacidad,
+                comprador_automatico,
+            )
+            if semilla is not None:
+                pasarela.azar.seed(f"{semilla}:{nombre}")
+            self.pasarelas[nombre] = pasarela
+        self._servidor = None
+        self._conexiones = set()
+        self._loop = None
+        self._hilo = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.puerto}"
+
+    async def abre(self) -> "PasarelasFalsas":
+        """Empieza a atender en el loop actual."""
+        self._servidor = await asyncio.start_server(self._atiende, "127.0.0.1", self.puerto)
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        for nombre, pasarela in self.pasarelas.items():
+            pasarela.url = f"{self.url}/{nombre}"
+        return self
+
+    async def cierra(self):
+        """Deja de aceptar conexiones y corta las abiertas (keep-alive)."""
+        if self._servidor is not None:
+            self._servidor.close()
+            for conexion in list(self._conexiones):
+                conexion.cancel()
+            await asyncio.gather(*self._conexiones, return_exceptions=True)
+            await self._servidor.wait_closed()
+            self._servidor = None
+
+    def inicia(self) -> "PasarelasFalsas":
+        """Levanta el servidor en un hilo con su propio loop y espera a que acepte conexiones."""
+        listo = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def ejecuta():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.abre())
+            listo.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.cierra())
+            self._loop.close()
+
+        self._hilo = threading.Thread(target=ejecuta, name="pasarelas-falsas", daemon=True)
+        self._hilo.start()
+        listo.wait()
+        return self
+
+    def detiene(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._hilo.join()
+            self._loop = None
+
+    def __enter__(self):
+        return self.inicia()
+
+    def __exit__(self, *exc):
+        self.detiene()
+
+    async def _atiende(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        tarea = asyncio.current_task()
+        self._conexiones.add(tarea)
+        try:
+            while await self._solicitud(lector, escritor):
+                pass
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+            # Cortada por el cliente o por `cierra`
+            pass
+        finally:
+            self._conexiones.discard(tarea)
+            escritor.close()
+
+    async def _solicitud(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> bool:
+        """Atiende una solicitud; `False` si hay que cerrar la conexión."""
+        linea = await lector.readline()
+        if not linea.strip():
+            return False
+        metodo, destino, version = linea.decode("latin-1").split(" ", 2)
+        encabezados = {}
+        while (linea := await lector.readline()) not in (b"\r\n", b"\n", b""):
+            nombre, _, valor = linea.decode("latin-1").partition(":")
+            encabezados[nombre.strip().lower()] = valor.strip()
+        largo = int(encabezados.get("content-length") or 0)
+        cuerpo = await lector.readexactly(largo) if largo else b""
+
+        self.estadisticas.solicitudes += 1
+        partes = urlsplit(destino)
+        ruta = "/" + "/".join(parte for parte in partes.path.split("/") if parte)
+        nombre, _, resto = ruta[1:].partition("/")
+        pasarela = self.pasarelas.get(nombre)
+        perfil = pasarela.perfil if pasarela is not None else Perfil()
+        azar = pasarela.azar if pasarela is not None else None
+
+        espera = perfil.espera(azar) if azar is not None else 0.0
+        if espera:
+            await asyncio.sleep(espera)
+        if azar is not None and perfil.caidas and azar.random() < perfil.caidas:
+            self.estadisticas.caidas += 1
+            return False
+        if pasarela is None:
+            respuesta = Respuesta(404, {"error": "no encontrado"})
+        elif perfil.fallas and azar.random() < perfil.fallas:
+            self.estadisticas.fallas += 1
+            respuesta = Respuesta(503, {"error": "falla simulada"})
+        else:
+            parametros = {**dict(parse_qsl(partes.query, keep_blank_values=True)), **decodifica(cuerpo)}
+            respuesta = pasarela.responde(metodo, "/" + resto, parametros, encabezados)
+
+        sigue = version.strip() == "HTTP/1.1" and encabezados.get("connection", "").lower() != "close"
+        escritor.write(self._serializa(respuesta, sigue))
+        await escritor.drain()
+        return sigue
+
+    def _serializa(self, respuesta: Respuesta, sigue: bool) -> bytes:
+        cuerpo = b"" if respuesta.datos is None else json.dumps(respuesta.datos).encode()
+        encabezados = {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(cuerpo)),
+            "Connection": "keep-alive" if sigue else "close",
+            **respuesta.encabezados,
+        }
+        lineas = [f"HTTP/1.1 {respuesta.codigo} {MOTIVOS.get(respuesta.codigo, 'Error')}"]
+        lineas += [f"{nombre}: {valor}" for nombre, valor in encabezados.items()]
+        return ("\r\n".join(lineas) + "\r\n\r\n").encode("latin-1") + cuerpo
@@ -0,0 +1,214 @@
+"""
+Transporte común de las llamadas salientes de los proveedores.
+
+Toda llamada a una pasarela pasa por `Transporte.solicita`, que aplica el límite de tasa
+configurado para la operación y ajusta el timeout al plazo de la petición antes de ejecutarla.
+Las lecturas idempotentes pueden además cubrirse con una segunda llamada si la primera tarda y
+reintentarse con backoff si fallan, dentro del mismo plazo.
+Las funciones de `requests` se ejecutan en la sesión compartida de la pasarela; el resultado
+de cada llamada alimenta la salud del host y queda en el registro de llamadas.
+"""
+
+from time import perf_counter, sleep
+from typing import Callable, Optional, Union
+from urllib.parse import urlsplit
+
+import requests
+
+from .cobertura import Cobertura, ConfiguracionCobertura
+from .conexiones import arranca, sesion
+from .limitador import LimiteExcedido, limitador, normaliza_limites
+from .perfilado import activo, fase, registra
+from .plazos import timeout_para
+from .registro import registra_llamada
+from .reintentos import CODIGOS_REINTENTABLES, ConfiguracionReintentos, Reintentos
+from .salud import CircuitoAbierto, salud
+
+_VERBOS = {
+    requests.api.get: "GET",
+    requests.api.post: "POST",
+    requests.api.put: "PUT",
+    requests.api.delete: "DELETE",
+    requests.api.head: "HEAD",
+}
+
+
+def _json_medido(decodifica: Callable) -> Callable:
+    """`Response.json` que registra la decodificación en la fase `json` del perfilado."""
+
+    def json(**kwargs):
+        with fase("json"):
+            return decodifica(**kwargs)
+
+    return json
+
+
+class Transporte:
+    """
+    Ejecuta las llamadas de un proveedor hacia su pasarela.
+
+    Args:
+        pasarela (str): Nombre de la pasarela, por ejemplo "flow".
+        cuenta (str): Identificador de la cuenta del comercio, se usa ofuscado en el limitador.
+        limites (dict | None): Límites de tasa por operación, ver `limitador.normaliza_limites` (opcional).
+        cobertura (bool | dict): Cubre las lecturas idempotentes, ver `ConfiguracionCobertura` (opcional).
+        endpoints (list | None): URL base de la API seguida de sus alternativas, en orden de preferencia (opcional).
+        reintentos (bool | dict): Reintenta las lecturas idempotentes, ver `ConfiguracionReintentos` (opcional).
+    """
+
+    def __init__(
+        self,
+        pasarela: str,
+        cuenta: str,
+        limites: Optional[dict] = None,
+        cobertura: Union[bool, dict, None] = None,
+        endpoints: Optional[list] = None,
+        reintentos: Union[bool, dict, None] = None,
+    ):
+        self.pasarela = pasarela
+        self.cuenta = cuenta
+        self.endpoints = [endpoint for endpoint in endpoints or [] if endpoint]
+        self.limites = normaliza_limites(limites)
+        self.cobertura = None
+        if cobertura:
+            configuracion = ConfiguracionCobertura(**cobertura) if isinstance(cobertura, dict) else None
+            self.cobertura = Cobertura(configuracion or ConfiguracionCobertura())
+        self.reintentos = None
+        if reintentos:
+            configuracion = ConfiguracionReintentos(**reintentos) if isinstance(reintentos, dict) else None
+            self.reintentos = Reintentos(configuracion or ConfiguracionReintentos())
+
+    def solicita(
+        self, operacion: str, metodo: Callable, url: str, idempotente: bool = False, variant: str = "", **kwargs
+    ):
+        """Ejecuta `metodo(url, **kwargs)` respetando el límite de la operación y el plazo vigente.
+
+        Args:
+            operacion (str): Nombre de la operación, por ejemplo "crear" o "estado".
+            metodo (Callable): Función de `requests` a usar, por ejemplo `requests.post`.
+            url (str): URL de la llamada.
+            idempotente (bool): La llamada es una lectura que se puede repetir sin efectos (Valor por defecto: False).
+            variant (str): Variante del pago, para el registro de llamadas (opcional).
+
+        Returns:
+            requests.Response: Respuesta de la pasarela.
+
+        Raises:
+            PlazoAgotado: No queda plazo para hacer la llamada.
+            CircuitoAbierto: El host acumuló demasiadas fallas seguidas.
+        """
+        arranca()
+        timeout_para(kwargs.get("timeout"))
+        url = self._url_sana(url)
+        host = urlsplit(url).hostname or ""
+        if not salud.disponible(host):
+            raise CircuitoAbierto(f"Circuito abierto para {self.pasarela} ({host})", code=503)
+        limite = self.limites.get(operacion) or self.limites.get("*")
+        if limite is not None:
+            limitador.espera_turno(self.pasarela, self.cuenta, operacion, limite)
+        kwargs["timeout"] = timeout_para(kwargs.get("timeout"))
+        if not idempotente or self.reintentos is None:
+            return self._intenta(operacion, variant, limite, host, metodo, url, idempotente, kwargs)
+
+        self.reintentos.registra_llamada()
+        intento = 0
+        while True:
+            try:
+                respuesta = self._intenta(operacion, variant, limite, host, metodo, url, idempotente, kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                espera = self._espera_reintento(operacion, limite, host, intento)
+                if espera is None:
+                    raise
+            else:
+                if getattr(respuesta, "status_code", None) not in CODIGOS_REINTENTABLES:
+                    return respuesta
+                espera = self._espera_reintento(operacion, limite, host, intento)
+                if espera is None:
+                    return respuesta
+            intento += 1
+            sleep(espera)
+            kwargs["timeout"] = timeout_para(kwargs.get("timeout"))
+
+    def _intenta(
+        self,
+        operacion: str,
+        variant: str,
+        limite,
+        host: str,
+        metodo: Callable,
+        url: str,
+        idempotente: bool,
+        kwargs: dict,
+    ):
+        """Una llamada, cubierta si corresponde, con el paso al endpoint alternativo de las lecturas."""
+        if idempotente and self.cobertura is not None:
+            return self.cobertura.ejecuta(
+                operacion,
+                lambda: self._llama(operacion, variant, host, metodo, url, kwargs),
+                lambda: self._llamada_extra(operacion, variant, limite, host, metodo, url, kwargs),
+            )
+        try:
+            return self._llama(operacion, variant, host, metodo, url, kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            # Una lectura que no alcanzó a la pasarela se repite una vez en el siguiente endpoint sano
+            alternativa = self._url_sana(url, excluye=url) if idempotente else url
+            if alternativa == url:
+                raise
+            kwargs["timeout"] = timeout_para(kwargs.get("timeout"))
+            return self._llama(operacion, variant, urlsplit(alternativa).hostname or "", metodo, alternativa, kwargs)
+
+    def _espera_reintento(self, operacion: str, limite, host: str, intento: int) -> Optional[float]:
+        """Espera antes de reintentar en `host`, o `None` si el circuito se abrió, no hay turno o presupuesto."""
+        if not salud.disponible(host):
+            return None
+        if limite is not None and not limitador.intenta_turno(self.pasarela, self.cuenta, operacion, limite):
+            return None
+        return self.reintentos.espera(intento)
+
+    def _url_sana(self, url: str, excluye: Optional[str] = None) -> str:
+        """`url` sobre el primer endpoint sano, o sin cambios si ninguno lo está o no es de esta pasarela."""
+        base = next((endpoint for endpoint in self.endpoints if url.startswith(endpoint)), None)
+        if base is None:
+            return url
+        for endpoint in self.endpoints:
+            candidata = url.replace(base, endpoint, 1)
+            if candidata != excluye and salud.sano(urlsplit(endpoint).hostname or ""):
+                return candidata
+        return url
+
+    def _llama(self, operacion: str, variant: str, host: str, metodo: Callable, url: str, kwargs: dict):
+        """Ejecuta la llamada, en la sesión de la pasarela si `metodo` es una función de `requests`."""
+        verbo = _VERBOS.get(metodo)
+        nombre = verbo or getattr(metodo, "__name__", "").upper()
+        inicio = perf_counter()
+        try:
+            if verbo is None:
+                respuesta = metodo(url, **kwargs)
+            else:
+                respuesta = sesion(self.pasarela).request(verbo, url, **kwargs)
+        except Exception as e:
+            latencia = perf_counter() - inicio
+            registra("http", latencia)
+            registra_llamada(self.pasarela, variant, operacion, nombre, url, latencia, error=e, parametros=kwargs)
+            if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+                salud.registra_falla(host, str(e))
+            raise
+        latencia = perf_counter() - inicio
+        registra("http", latencia)
+        if activo():
+            respuesta.json = _json_medido(respuesta.json)
+        registra_llamada(self.pasarela, variant, operacion, nombre, url, latencia, respuesta, parametros=kwargs)
+        codigo = getattr(respuesta, "status_code", None)
+        if isinstance(codigo, int) and codigo >= 500:
+            salud.registra_falla(host, f"HTTP {codigo}")
+        else:
+            salud.registra_exito(host, latencia)
+        return respuesta
+
+    def _llamada_extra(
+        self, operacion: str, variant: str, limite, host: str, metodo: Callable, url: str, kwargs: dict
+    ):
+        """Segunda llamada de una lectura cubierta; no espera turno en el limitador."""
+        if limite is not None and not limitador.intenta_turno(self.pasarela, self.cuenta, operacion, limite):
+            raise LimiteExcedido(f"Sin turno para cubrir {self.pasarela} {operacion}", code=429)
+        return self._llama(operacion, variant, host, metodo, url, kwargs)
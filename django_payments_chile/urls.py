@@ -0,0 +1,9 @@
+from django.urls import path
+
+from . import views
+
+app_name = "payments_chile"
+
+urlpatterns = [
+    path("estado/<uuid:token>/", views.estado_pago, name="estado_pago"),
+]
@@ -0,0 +1,137 @@
+"""
+Vencimiento de pagos abandonados.
+
+Un pago que queda en `WAITING` o `PREAUTH` porque el cliente no volvió desde la pasarela sigue
+siendo revisado por las notificaciones y la conciliación. `barre_vencidos` rechaza los pagos de
+una variante que llevan más de `vencimiento` segundos sin cambios.
+
+Los pagos que alcanzaron a crearse en la pasarela (con `transaction_id`) se consultan antes con
+`actualiza_estado`, en varios hilos y con un límite de tasa, por si el cliente sí pagó. Los cambios
+se escriben por lotes con `PersistenciaLote`, así la consulta usa el índice `(variant, status,
+modified)` del modelo de pagos y el conjunto de pendientes se mantiene chico. Los pagos autorizados
+con captura diferida no vencen: esperan a `captura_pagos`.
+"""
+
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.utils import timezone
+from payments import PaymentStatus, get_payment_model
+from payments.core import provider_factory
+
+from .captura import espera_captura
+from .commit_diferido import PENDIENTES
+from .limitador import Limite, limitador
+from .persistencia import PersistenciaLote
+
+logger = logging.getLogger(__name__)
+
+MENSAJE_VENCIDO = "Pago vencido sin respuesta del cliente"
+
+
+@dataclass
+class ResultadoBarrido:
+    variant: str
+    revisados: int = 0
+    vencidos: int = 0
+    resueltos: int = 0
+    errores: int = 0
+
+
+def vencimiento_de(provider) -> float:
+    """Segundos de vencimiento de la variante, o el setting `PAYMENTS_CHILE_VENCIMIENTO` (un día)."""
+    vencimiento = getattr(provider, "vencimiento", None)
+    return getattr(settings, "PAYMENTS_CHILE_VENCIMIENTO", 86400) if vencimiento is None else vencimiento
+
+
+def pendientes_vencidos(variant: str, vencimiento: float, ahora=None):
+    """Pagos pendientes de `variant` sin cambios desde hace `vencimiento` segundos, ordenados por `pk`."""
+    limite = (ahora or timezone.now()) - timedelta(seconds=vencimiento)
+    return (
+        get_payment_model().objects.filter(variant=variant, status__in=PENDIENTES, modified__lt=limite).order_by("pk")
+    )
+
+
+class _Barrido:
+    def __init__(self, provider, variant: str, lote: int, hilos: int, tasa: float):
+        # Lote mayor que un bloque: solo se escribe al vaciar desde el hilo principal
+        self.persistencia = PersistenciaLote(tamano=lote + 1)
+        self.provider = copy.copy(provider)
+        self.provider.persistencia = self.persistencia
+        self.variant = variant
+        self.hilos = hilos
+        self.limite = Limite(tasa=tasa, capacidad=1, espera_maxima=max(2.0, 2 * hilos / tasa))
+        self.resultado = ResultadoBarrido(variant)
+
+    def _consulta(self, payment) -> bool:
+        """Consulta el estado en la pasarela; `False` si la consulta falló."""
+        try:
+            transporte = getattr(self.provider, "_transporte", None)
+            pasarela = transporte.pasarela if transporte is not None else self.variant
+            limitador.espera_turno(pasarela, self.variant, "vencimiento", self.limite)
+            self.provider.actualiza_estado(payment)
+        except Exception as e:  # noqa
+            logger.warning("No se pudo consultar el pago %s antes de vencerlo: %s", payment.pk, e)
+            return False
+        return True
+
+    def procesa(self, pagos: list):
+        por_consultar = [payment for payment in pagos if payment.transaction_id]
+        with ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="payments-chile-vencimiento") as hilos:
+            consultados = dict(zip(por_consultar, hilos.map(self._consulta, por_consultar)))
+
+        for payment in pagos:
+            self.resultado.revisados += 1
+            if not consultados.get(payment, True):
+                self.resultado.errores += 1
+            elif payment.status not in PENDIENTES or espera_captura(self.provider, payment):
+                self.resultado.resueltos += 1
+            else:
+                self.persistencia.cambia_estado(payment, PaymentStatus.REJECTED, MENSAJE_VENCIDO)
+                self.resultado.vencidos += 1
+        self.persistencia.vacia()
+
+
+def barre_vencidos(
+    variant: str,
+    vencimiento: Optional[float] = None,
+    lote: int = 500,
+    hilos: int = 4,
+    tasa: float = 5.0,
+    ahora=None,
+) -> ResultadoBarrido:
+    """
+    Rechaza los pagos pendientes vencidos de una variante.
+
+    Los pagos cuya consulta a la pasarela falla se dejan pendientes para el siguiente barrido.
+
+    Args:
+        variant (str): Variante de `PAYMENT_VARIANTS`.
+        vencimiento (float | None): Segundos sin cambios; por defecto el del proveedor (opcional).
+        lote (int): Pagos leídos y escritos por bloque (Valor por defecto: 500).
+        hilos (int): Consultas simultáneas a la pasarela (Valor por defecto: 4).
+        tasa (float): Consultas por segundo a la pasarela (Valor por defecto: 5).
+        ahora (datetime | None): Momento de referencia (opcional).
+
+    Returns:
+        ResultadoBarrido: Pagos revisados, vencidos, resueltos por la pasarela y con error.
+    """
+    provider = provider_factory(variant)
+    vencimiento = vencimiento_de(provider) if vencimiento is None else vencimiento
+    pagos = pendientes_vencidos(variant, vencimiento, ahora)
+    barrido = _Barrido(provider, variant, lote, hilos, tasa)
+
+    ultimo = None
+    while True:
+        bloque = pagos if ultimo is None else pagos.filter(pk__gt=ultimo)
+        bloque = list(bloque[:lote])
+        if not bloque:
+            break
+        barrido.procesa(bloque)
+        ultimo = bloque[-1].pk
+    return barrido.resultado
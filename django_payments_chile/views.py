@@ -0,0 +1,37 @@
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from payments import PaymentStatus, get_payment_model
+from payments.core import provider_factory
+
+from .captura import espera_captura
+from .commit_diferido import PENDIENTES, verifica_commit
+
+
+def estado_pago(request, token):
+    """
+    Estado de un pago para la página de "procesando" del commit diferido.
+
+    Responde con una consulta por el índice de `token`. Solo si el pago sigue pendiente y ningún
+    hilo se está encargando del commit, lo completa con `verifica_commit`. Un pago autorizado con
+    captura diferida sigue en `PREAUTH` pero lleva a la página de éxito.
+    """
+    Payment = get_payment_model()
+    datos = Payment.objects.filter(token=token).values("pk", "variant", "status").first()
+    if datos is None:
+        raise Http404("Pago no encontrado")
+
+    estado = datos["status"]
+    autorizado = False
+    if estado in PENDIENTES:
+        provider = provider_factory(datos["variant"])
+        if getattr(provider, "commit_diferido", False):
+            payment = Payment.objects.get(pk=datos["pk"])
+            estado = verifica_commit(provider, payment)
+            autorizado = espera_captura(provider, payment)
+
+    url = None
+    if estado == PaymentStatus.CONFIRMED or autorizado:
+        url = reverse("payment_success", kwargs={"pk": datos["pk"]})
+    elif estado not in PENDIENTES:
+        url = reverse("payment_failure", kwargs={"pk": datos["pk"]})
+    return JsonResponse({"estado": estado, "url": url})
@@ -5,10 +5,21 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [os.path.join(PROJECT_ROOT, "templates")],
+        "APP_DIRS": True,
     }
 ]
 USE_TZ = True
 SECRET_KEY = "NOTREALLY"  # nosec
 PAYMENT_HOST = "example.com"
+PAYMENT_MODEL = "pagos_prueba.Pago"
 
-INSTALLED_APPS = ["payments", "django.contrib.sites"]
+INSTALLED_APPS = [
+    "payments",
+    "django.contrib.contenttypes",
+    "django.contrib.sites",
+    "django_payments_chile",
+    "tests.pagos_prueba",
+]
+DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}}
+DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+ROOT_URLCONF = "tests.urls"
@@ -0,0 +1,17 @@
+from django.db import models
+from payments.models import BasePayment
+
+
+class Pago(BasePayment):
+    class Meta:
+        # Pagos pendientes por antigüedad, para `barre_vencidos`
+        indexes = [models.Index(fields=["variant", "status", "modified"], name="pago_pendientes_idx")]
+
+    def get_failure_url(self):
+        return "http://mi-app.cl/error"
+
+    def get_success_url(self):
+        return "http://mi-app.cl/exito"
+
+    def get_purchased_items(self):
+        return []
@@ -0,0 +1,160 @@
+import json
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from payments import PaymentError, PaymentStatus, RedirectNeeded, get_payment_model
+from payments.core import PROVIDER_CACHE, provider_factory
+
+from django_payments_chile.captura import captura_pagos
+from django_payments_chile.vencimiento import barre_vencidos
+
+VARIANTES = {
+    "webpay": (
+        "django_payments_chile.providers.WebpayProvider",
+        {
+            "api_key_id": "597055555540",
+            "api_key_secret": "secreto",
+            "api_endpoint": "integracion",
+            "capture": False,
+            "vencimiento": 3600,
+        },
+    ),
+}
+
+
+def autorizacion(token: str, codigo: int = 0) -> dict:
+    return {
+        "vci": "TSY",
+        "amount": 5000,
+        "status": "AUTHORIZED",
+        "buy_order": token[:26],
+        "authorization_code": f"AUT{token[-3:]}",
+        "payment_type_code": "VN",
+        "response_code": codigo,
+    }
+
+
+def respuesta(datos):
+    return Mock(json=Mock(return_value=datos))
+
+
+def crea_autorizado(transaction_id: str, **campos):
+    pago = get_payment_model().objects.create(
+        variant="webpay", total=5000, currency="CLP", status=PaymentStatus.PREAUTH, transaction_id=transaction_id
+    )
+    pago.attrs.commit_response = autorizacion(transaction_id, **campos)
+    pago.save()
+    return pago
+
+
+@override_settings(PAYMENT_VARIANTS=VARIANTES)
+class TestCaptura(TestCase):
+    def setUp(self):
+        cache.clear()
+        PROVIDER_CACHE.clear()
+        self.addCleanup(PROVIDER_CACHE.clear)
+
+    def test_commit_solo_autoriza(self):
+        pago = get_payment_model().objects.create(
+            variant="webpay", total=5000, currency="CLP", status=PaymentStatus.PREAUTH, transaction_id="TOKEN_1"
+        )
+        provider = provider_factory("webpay")
+
+        with patch("django_payments_chile.proveedor.requests.put") as mock_put:
+            mock_put.return_value = respuesta(autorizacion("TOKEN_1"))
+            with self.assertRaises(RedirectNeeded) as redireccion:
+                provider.commit("TOKEN_1", pago)
+
+        pago.refresh_from_db()
+        self.assertEqual(pago.status, PaymentStatus.PREAUTH)
+        self.assertTrue(provider.espera_captura(pago))
+        self.assertEqual(str(redireccion.exception), f"/payments/{pago.pk}/success")
+
+    def test_capture(self):
+        pago = crea_autorizado("TOKEN_CAPTURA")
+        capturado = {"token": "TOKEN_CAPTURA", "captured_amount": 4000, "response_code": 0}
+
+        with patch("django_payments_chile.proveedor.requests.put") as mock_put:
+            mock_put.return_value = respuesta(capturado)
+            pago.capture(4000)
+
+        url = mock_put.call_args.args[0]
+        self.assertTrue(url.endswith("/transactions/TOKEN_CAPTURA/capture"))
+        self.assertEqual(
+            mock_put.call_args.kwargs["json"],
+            {"buy_order": "TOKEN_CAPTURA", "authorization_code": "AUTURA", "capture_amount": 4000},
+        )
+        pago.refresh_from_db()
+        self.assertEqual(pago.status, PaymentStatus.CONFIRMED)
+        self.assertEqual(pago.captured_amount, Decimal(4000))
+        self.assertEqual(pago.attrs.capture_response, capturado)
+
+    def test_capture_sin_autorizacion(self):
+        pago = crea_autorizado("TOKEN_RECHAZADO", codigo=-1)
+        with self.assertRaises(PaymentError):
+            provider_factory("webpay").capture(pago)
+
+    def test_captura_pagos(self):
+        autorizados = [crea_autorizado(f"TOKEN_{i:03}") for i in range(7)]
+        rechazado = crea_autorizado("TOKEN_NEGADO")
+        caido = crea_autorizado("TOKEN_CAIDO")
+        sin_commit = get_payment_model().objects.create(
+            variant="webpay", total=5000, currency="CLP", status=PaymentStatus.PREAUTH, transaction_id="TOKEN_NUEVO"
+        )
+
+        def captura(url, json=None, **kwargs):
+            token = url.split("/")[-2]
+            if token == "TOKEN_CAIDO":
+                raise ConnectionError("sin respuesta")
+            codigo = -1 if token == "TOKEN_NEGADO" else 0
+            return respuesta({"token": token, "captured_amount": json["capture_amount"], "response_code": codigo})
+
+        with patch("django_payments_chile.proveedor.requests.put", side_effect=captura) as mock_put:
+            resultado = captura_pagos("webpay", montos={autorizados[0].pk: 1000}, lote=3, hilos=3, tasa=100)
+
+        self.assertEqual(mock_put.call_count, 9)
+        self.assertEqual(
+            (resultado.revisados, resultado.capturados, resultado.rechazados, resultado.omitidos, resultado.errores),
+            (10, 7, 1, 1, 1),
+        )
+        montos = dict(
+            get_payment_model()
+            .objects.filter(status=PaymentStatus.CONFIRMED)
+            .values_list("transaction_id", "captured_amount")
+        )
+        self.assertEqual(montos.pop("TOKEN_000"), Decimal(1000))
+        self.assertEqual(set(montos.values()), {Decimal(5000)})
+        for pago in (rechazado, caido, sin_commit):
+            pago.refresh_from_db()
+            self.assertEqual(pago.status, PaymentStatus.PREAUTH)
+        self.assertEqual(json.loads(rechazado.extra_data)["capture_response"]["response_code"], -1)
+
+    def test_autorizados_no_vencen(self):
+        pago = crea_autorizado("TOKEN_ESPERA")
+        get_payment_model().objects.filter(pk=pago.pk).update(modified=pago.modified.replace(year=2020))
+        estado = {**autorizacion("TOKEN_ESPERA"), "status": "AUTHORIZED"}
+
+        with patch("django_payments_chile.proveedor.requests.get", return_value=respuesta(estado)):
+            resultado = barre_vencidos("webpay")
+
+        self.assertEqual((resultado.vencidos, resultado.resueltos), (0, 1))
+        pago.refresh_from_db()
+        self.assertEqual(pago.status, PaymentStatus.PREAUTH)
+
+    def test_comando(self):
+        pago = crea_autorizado("TOKEN_COMANDO")
+        with self.assertRaises(CommandError):
+            call_command("captura_pagos", "webpay", stdout=StringIO())
+
+        salida = StringIO()
+        capturado = {"token": "TOKEN_COMANDO", "captured_amount": 5000, "response_code": 0}
+        with patch("django_payments_chile.proveedor.requests.put", return_value=respuesta(capturado)):
+            call_command("captura_pagos", "webpay", pk=[pago.pk], stdout=salida)
+
+        self.assertIn("webpay: 1 revisados, 1 capturados", salida.getvalue())
+        pago.refresh_from_db()
+        self.assertEqual(pago.status, PaymentStatus.CONFIRMED)
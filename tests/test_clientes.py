@@ -0,0 +1,118 @@
+import asyncio
+import os
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase
+from payments import PaymentStatus, RedirectNeeded
+
+from django_payments_chile.clientes import RegistroClientes, clientes
+from django_payments_chile.conexiones import adaptador, sesion
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.KhipuProvider import KhipuProvider
+from django_payments_chile.testing import PasarelasFalsas
+from django_payments_chile.WebpayProvider import WebpayProvider
+
+PERSISTENCIA = "django_payments_chile.persistencia.PersistenciaNula"
+
+
+class Pago:
+    currency = "CLP"
+    description = "Compra"
+    total = 10000
+    billing_email = ""
+
+    def __init__(self, numero: int, variant: str):
+        self.pk = numero
+        self.token = f"00000000-0000-4000-8000-{numero:012d}"
+        self.variant = variant
+        self.transaction_id = ""
+        self.extra_data = ""
+        self.status = PaymentStatus.WAITING
+        self.message = ""
+        self.attrs = type("attrs", (), {})()
+
+    def get_success_url(self):
+        return "http://tienda.local/exito"
+
+    def get_process_url(self):
+        return "http://tienda.local/proceso"
+
+
+class TestRegistroClientes(SimpleTestCase):
+    def test_ambitos(self):
+        registro = RegistroClientes()
+        creados = []
+        fabrica = lambda: creados.append(object()) or creados[-1]  # noqa: E731
+
+        self.assertIs(registro.obtiene("x", fabrica), registro.obtiene("x", fabrica))
+        por_hilo = []
+        hilos = [
+            threading.Thread(target=lambda: por_hilo.append(registro.obtiene("y", fabrica, ambito="hilo")))
+            for _ in range(4)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len({id(valor) for valor in por_hilo}), 4)
+
+        async def en_loop():
+            return registro.obtiene("y", fabrica, ambito="hilo"), registro.obtiene("y", fabrica, ambito="hilo")
+
+        primero, segundo = asyncio.run(en_loop())
+        self.assertIs(primero, segundo)
+        self.assertIsNot(asyncio.run(en_loop())[0], primero)
+
+    def test_fork_descarta_lo_heredado(self):
+        registro = RegistroClientes()
+        original = registro.obtiene("x", object)
+        registro._pid = -1  # como si este proceso fuera un hijo
+        self.assertIsNot(registro.obtiene("x", object), original)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requiere fork")
+    def test_fork_real(self):
+        del_padre = sesion("flow")
+        pid = os.fork()
+        if pid == 0:
+            # Solo queda lo que el hijo crea al arrancar tras el fork, nada del padre
+            heredado = bool(set(clientes._proceso) - {"arranque"})
+            os._exit(1 if heredado or sesion("flow") is del_padre else 0)
+        _, estado = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(estado), 0)
+
+
+class TestConcurrencia(SimpleTestCase):
+    def setUp(self):
+        self.pasarelas = PasarelasFalsas().inicia()
+        self.addCleanup(self.pasarelas.detiene)
+        url = self.pasarelas.url
+        self.providers = {
+            "flow": FlowProvider("flow_key", "flow_secret", f"{url}/flow", persistencia=PERSISTENCIA),
+            "khipu": KhipuProvider("khipu_key", f"{url}/khipu", persistencia=PERSISTENCIA),
+            "webpay": WebpayProvider("597055555532", "webpay_secret", f"{url}/webpay/", persistencia=PERSISTENCIA),
+        }
+
+    def paga(self, numero: int) -> str:
+        variant = ("flow", "khipu", "webpay")[numero % 3]
+        provider, pago = self.providers[variant], Pago(numero, variant)
+        with self.assertRaises(RedirectNeeded):
+            provider.get_form(pago)
+        if variant == "webpay":
+            with self.assertRaises(RedirectNeeded):
+                provider.commit(pago.transaction_id, pago)
+        else:
+            provider.actualiza_estado(pago)
+        return pago.status
+
+    def test_llamadas_concurrentes(self):
+        with ThreadPoolExecutor(max_workers=32) as hilos:
+            estados = list(hilos.map(self.paga, range(300)))
+
+        self.assertEqual(estados, [PaymentStatus.CONFIRMED] * 300)
+        for variant, provider in self.providers.items():
+            confirmados = [pk for pk, cambios in provider.persistencia.cambios if cambios.get("status") == "confirmed"]
+            self.assertEqual(len(confirmados), 100)
+            # Todas las sesiones de los hilos comparten el pool del proceso
+            self.assertIs(sesion(variant).get_adapter(self.pasarelas.url), adaptador(variant))
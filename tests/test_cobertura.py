@@ -0,0 +1,71 @@
+import threading
+import time
+from unittest import TestCase
+
+from django_payments_chile.cobertura import Cobertura, ConfiguracionCobertura, HistorialLatencia
+
+
+class LlamadaLenta:
+    """La primera llamada tarda `lenta` segundos, las siguientes responden de inmediato."""
+
+    def __init__(self, lenta: float):
+        self.lenta = lenta
+        self.llamadas = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.llamadas += 1
+            numero = self.llamadas
+        if numero == 1:
+            time.sleep(self.lenta)
+        return numero
+
+
+class TestCobertura(TestCase):
+    def cobertura(self, presupuesto=1.0):
+        cobertura = Cobertura(ConfiguracionCobertura(presupuesto=presupuesto, minimo_muestras=5))
+        for _ in range(10):
+            cobertura._historial("estado").registra(0.01)
+        return cobertura
+
+    def test_percentil(self):
+        historial = HistorialLatencia()
+        self.assertIsNone(historial.percentil(95, minimo_muestras=1))
+        for latencia in range(1, 101):
+            historial.registra(latencia / 100)
+        self.assertAlmostEqual(historial.percentil(95), 0.96)
+
+    def test_sin_historial_no_cubre(self):
+        cobertura = Cobertura(ConfiguracionCobertura())
+        llamada = LlamadaLenta(0.05)
+
+        self.assertEqual(cobertura.ejecuta("estado", llamada), 1)
+        self.assertEqual(cobertura.llamadas_extra, 0)
+
+    def test_cubre_llamada_lenta(self):
+        cobertura = self.cobertura()
+        llamada = LlamadaLenta(0.5)
+
+        inicio = time.perf_counter()
+        self.assertEqual(cobertura.ejecuta("estado", llamada), 2)
+        self.assertLess(time.perf_counter() - inicio, 0.4)
+        self.assertEqual(cobertura.llamadas_extra, 1)
+
+    def test_presupuesto_agotado(self):
+        cobertura = self.cobertura(presupuesto=0.0)
+        llamada = LlamadaLenta(0.1)
+
+        self.assertEqual(cobertura.ejecuta("estado", llamada), 1)
+        self.assertEqual(cobertura.llamadas_extra, 0)
+
+    def test_error_usa_la_otra_llamada(self):
+        cobertura = self.cobertura()
+        llamadas = []
+
+        def falla_lento():
+            llamadas.append(1)
+            time.sleep(0.1)
+            raise ConnectionError("caída")
+
+        self.assertEqual(cobertura.ejecuta("estado", falla_lento, lambda: "ok"), "ok")
@@ -0,0 +1,247 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponseRedirect
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from payments import PaymentStatus, RedirectNeeded, get_payment_model
+from payments.core import PROVIDER_CACHE
+
+from django_payments_chile.commit_diferido import ejecuta_commit, programa_commit, verifica_commit
+from django_payments_chile.plazos import PlazoAgotado
+from django_payments_chile.WebpayProvider import WebpayProvider
+
+
+class payment_attrs:
+    pass
+
+
+class Payment(Mock):
+    pk = 3
+    variant = "webpay"
+    token = "7c1d9e4a-2b3f-4a5c-9d8e-1f2a3b4c5d6e"
+    transaction_id = "TOKEN_WS"
+    status = PaymentStatus.PREAUTH
+    message = ""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attrs = payment_attrs()
+
+    def change_status(self, status, message=""):
+        self.status = status
+        self.message = message
+
+    def get_success_url(self):
+        return "https://mi-app.cl/exito"
+
+    def get_failure_url(self):
+        return "https://mi-app.cl/error"
+
+
+def respuesta(datos):
+    return Mock(json=Mock(return_value=datos))
+
+
+class TestCommitDiferido(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.provider = WebpayProvider(
+            api_key_id="597055555532", api_key_secret="secreto", api_endpoint="integracion", commit_diferido=True
+        )  # nosec
+
+    def test_process_data_responde_sin_commit(self):
+        payment = Payment()
+        request = RequestFactory().get("/payments/process/", {"token_ws": "TOKEN_WS"})
+
+        with (
+            patch("django_payments_chile.proveedor.requests.put") as mock_put,
+            patch("django_payments_chile.commit_diferido.ejecutor") as mock_ejecutor,
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                respuesta_http = self.provider.process_data(payment, request)
+
+        self.assertEqual(respuesta_http.status_code, 200)
+        self.assertContains(respuesta_http, f"/payments/chile/estado/{payment.token}/")
+        mock_put.assert_not_called()
+        mock_ejecutor.return_value.submit.assert_called_once_with(ejecuta_commit, "webpay", 3, "TOKEN_WS")
+
+    def test_process_data_pago_resuelto(self):
+        request = RequestFactory().get("/payments/process/", {"token_ws": "TOKEN_WS"})
+        with patch("django_payments_chile.proveedor.requests.put") as mock_put:
+            rechazado = self.provider.process_data(Payment(status=PaymentStatus.REJECTED), request)
+            confirmado = self.provider.process_data(Payment(status=PaymentStatus.CONFIRMED), request)
+
+        self.assertEqual(rechazado.url, "https://mi-app.cl/error")
+        self.assertEqual(confirmado.url, "https://mi-app.cl/exito")
+        mock_put.assert_not_called()
+
+    def test_process_data_plazo_agotado(self):
+        provider = WebpayProvider(api_key_id="597055555532", api_key_secret="secreto", api_endpoint="integracion")
+        payment = Payment()
+        request = RequestFactory().get("/payments/process/", {"token_ws": "TOKEN_WS"})
+
+        with (
+            patch.object(provider, "commit", side_effect=PlazoAgotado("commit")),
+            patch("django_payments_chile.commit_diferido.ejecutor") as mock_ejecutor,
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                respuesta_http = provider.process_data(payment, request)
+
+        # Nunca la página de éxito: el cliente espera el commit en segundo plano
+        self.assertEqual(respuesta_http.status_code, 200)
+        self.assertNotIsInstance(respuesta_http, HttpResponseRedirect)
+        self.assertContains(respuesta_http, f"/payments/chile/estado/{payment.token}/")
+        mock_ejecutor.return_value.submit.assert_called_once_with(ejecuta_commit, "webpay", 3, "TOKEN_WS")
+
+    def test_ejecuta_commit(self):
+        payment = Payment()
+        with (
+            patch("django_payments_chile.commit_diferido.get_payment_model") as modelo,
+            patch("django_payments_chile.commit_diferido.provider_factory", return_value=self.provider),
+            patch.object(self.provider, "commit", side_effect=RedirectNeeded("/exito")) as commit,
+        ):
+            modelo.return_value.objects.get.return_value = payment
+            programa_commit(payment, "TOKEN_WS")
+            ejecuta_commit("webpay", 3, "TOKEN_WS")
+
+        commit.assert_called_once_with("TOKEN_WS", payment)
+        self.assertIsNone(cache.get("payments_chile:commit:3"))
+
+    def test_verifica_commit_espera_al_hilo(self):
+        payment = Payment()
+        programa_commit(payment, "TOKEN_WS")
+        with patch.object(self.provider, "actualiza_estado") as actualiza:
+            self.assertEqual(verifica_commit(self.provider, payment), PaymentStatus.PREAUTH)
+        actualiza.assert_not_called()
+
+    def test_verifica_commit_toma_el_relevo(self):
+        payment = Payment()
+        commit = {
+            "vci": "TSY",
+            "status": "AUTHORIZED",
+            "response_code": 0,
+            "payment_type_code": "VN",
+        }
+        with (
+            patch("django_payments_chile.proveedor.requests.get") as mock_get,
+            patch("django_payments_chile.proveedor.requests.put") as mock_put,
+        ):
+            mock_get.return_value = respuesta({"status": "INITIALIZED"})
+            mock_put.return_value = respuesta(commit)
+            self.assertEqual(verifica_commit(self.provider, payment), PaymentStatus.CONFIRMED)
+
+        self.assertTrue(mock_get.call_args.args[0].endswith("/transactions/TOKEN_WS"))
+        mock_put.assert_called_once()
+
+    def test_verifica_commit_no_repite_commit(self):
+        payment = Payment()
+        with (
+            patch("django_payments_chile.proveedor.requests.get") as mock_get,
+            patch("django_payments_chile.proveedor.requests.put") as mock_put,
+        ):
+            mock_get.return_value = respuesta({"status": "AUTHORIZED", "response_code": 0})
+            self.assertEqual(verifica_commit(self.provider, payment), PaymentStatus.CONFIRMED)
+
+        mock_put.assert_not_called()
+
+
+VARIANTES = {
+    "webpay": (
+        "django_payments_chile.providers.WebpayProvider",
+        {
+            "api_key_id": "597055555532",
+            "api_key_secret": "secreto",
+            "api_endpoint": "integracion",
+            "commit_diferido": True,
+        },
+    ),
+}
+COMMIT = {"vci": "TSY", "status": "AUTHORIZED", "response_code": 0, "payment_type_code": "VN"}
+
+
+def crea_pago(sin_cambios: float = 60, **campos):
+    campos = {"status": PaymentStatus.PREAUTH, "transaction_id": "TOKEN_WS", **campos}
+    pago = get_payment_model().objects.create(variant="webpay", total=5000, currency="CLP", **campos)
+    get_payment_model().objects.filter(pk=pago.pk).update(modified=timezone.now() - timedelta(seconds=sin_cambios))
+    return pago
+
+
+@override_settings(PAYMENT_VARIANTS=VARIANTES)
+class TestEstadoPago(TestCase):
+    def setUp(self):
+        cache.clear()
+        PROVIDER_CACHE.clear()
+        self.addCleanup(PROVIDER_CACHE.clear)
+
+    def estado(self, pago):
+        return self.client.get(f"/payments/chile/estado/{pago.token}/")
+
+    def test_pago_desconocido(self):
+        self.assertEqual(
+            self.client.get("/payments/chile/estado/7c1d9e4a-2b3f-4a5c-9d8e-1f2a3b4c5d6e/").status_code, 404
+        )
+
+    def test_pagos_resueltos(self):
+        confirmado = crea_pago(status=PaymentStatus.CONFIRMED)
+        rechazado = crea_pago(status=PaymentStatus.REJECTED)
+        with patch("django_payments_chile.proveedor.requests.get") as mock_get:
+            respuesta_http = self.estado(confirmado)
+            self.assertEqual(respuesta_http.status_code, 200)
+            self.assertEqual(
+                respuesta_http.json(), {"estado": "confirmed", "url": f"/payments/{confirmado.pk}/success"}
+            )
+            self.assertEqual(self.estado(rechazado).json()["url"], f"/payments/{rechazado.pk}/failure")
+        mock_get.assert_not_called()
+
+    def test_espera_al_hilo_del_commit(self):
+        pago = crea_pago()
+        programa_commit(pago, "TOKEN_WS")
+        with patch("django_payments_chile.proveedor.requests.get") as mock_get:
+            self.assertEqual(self.estado(pago).json(), {"estado": "preauth", "url": None})
+        mock_get.assert_not_called()
+
+    def test_toma_el_relevo_una_sola_vez(self):
+        pago = crea_pago()
+        with (
+            patch("django_payments_chile.proveedor.requests.get") as mock_get,
+            patch("django_payments_chile.proveedor.requests.put") as mock_put,
+        ):
+            mock_get.return_value = respuesta({"status": "INITIALIZED"})
+            mock_put.return_value = respuesta(COMMIT)
+            primera = self.estado(pago).json()
+            segunda = self.estado(pago).json()
+
+        esperado = {"estado": "confirmed", "url": f"/payments/{pago.pk}/success"}
+        self.assertEqual((primera, segunda), (esperado, esperado))
+        mock_put.assert_called_once()
+        pago.refresh_from_db()
+        self.assertEqual(pago.status, PaymentStatus.CONFIRMED)
+
+    def test_comando_completa_commits(self):
+        abandonado = crea_pago()
+        reciente = crea_pago(sin_cambios=0)
+        crea_pago(sin_cambios=3600)  # fuera de la ventana
+        crea_pago(transaction_id="")  # nunca llegó a Webpay
+        with (
+            patch("django_payments_chile.proveedor.requests.get") as mock_get,
+            patch("django_payments_chile.proveedor.requests.put") as mock_put,
+        ):
+            mock_get.return_value = respuesta({"status": "INITIALIZED"})
+            mock_put.return_value = respuesta(COMMIT)
+            salida = StringIO()
+            call_command("completa_commits", variant=["webpay"], stdout=salida)
+            self.assertIn("1 pagos revisados", salida.getvalue())
+
+            # Ya confirmado, una segunda pasada no repite el commit
+            salida = StringIO()
+            call_command("completa_commits", variant=["webpay"], stdout=salida)
+            self.assertIn("0 pagos revisados", salida.getvalue())
+
+        mock_put.assert_called_once()
+        abandonado.refresh_from_db()
+        reciente.refresh_from_db()
+        self.assertEqual((abandonado.status, reciente.status), (PaymentStatus.CONFIRMED, PaymentStatus.PREAUTH))
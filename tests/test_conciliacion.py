@@ -0,0 +1,98 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from payments import PaymentStatus, get_payment_model
+from payments.core import PROVIDER_CACHE
+
+from django_payments_chile.conciliacion import Trabajador, concilia, planifica, progreso, toma
+from django_payments_chile.models import TramoConciliacion
+
+VARIANTES = {
+    "flow": ("django_payments_chile.providers.FlowProvider", {"api_key": "k", "api_secret": "s"}),
+    "khipu": ("django_payments_chile.providers.KhipuProvider", {"api_key": "k", "api_endpoint": "https://khipu"}),
+    "otra": ("payments.dummy.DummyProvider", {}),
+}
+
+
+def crea_pago(variant: str = "flow", **campos):
+    campos.setdefault("transaction_id", f"T{variant}")
+    return get_payment_model().objects.create(variant=variant, total=5000, currency="CLP", **campos)
+
+
+def confirma_salvo(caido):
+    def actualiza_estado(provider, payment):
+        if payment.pk == caido.pk:
+            raise ConnectionError("pasarela caída")
+        payment.status = PaymentStatus.CONFIRMED
+        return {}
+
+    return actualiza_estado
+
+
+@override_settings(PAYMENT_VARIANTS=VARIANTES)
+class TestConciliacion(TestCase):
+    def setUp(self):
+        PROVIDER_CACHE.clear()
+        self.addCleanup(PROVIDER_CACHE.clear)
+        self.pagos = [crea_pago() for _ in range(7)]
+        crea_pago("otra")
+        crea_pago(status=PaymentStatus.CONFIRMED)
+        crea_pago(transaction_id="")
+
+    def test_planifica_tramos(self):
+        self.assertEqual(planifica("incidente", tamano=3), 3)
+        tramos = list(TramoConciliacion.objects.filter(corrida="incidente"))
+        pks = [pago.pk for pago in self.pagos]
+        self.assertEqual(
+            [(tramo.desde, tramo.hasta) for tramo in tramos], [(pks[0], pks[2]), (pks[3], pks[5]), (pks[6], pks[6])]
+        )
+        self.assertEqual(tramos[0].variants, ["flow", "khipu"])
+        self.assertEqual(planifica("incidente"), 0)
+
+        ayer = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(planifica("ayer", hasta=ayer), 0)
+
+    def test_concilia_y_retoma(self):
+        planifica("incidente", tamano=3)
+        # Un proceso tomó el primer tramo, anotó su avance y murió
+        tramo = toma("incidente", "muerto", arriendo=60)
+        TramoConciliacion.objects.filter(pk=tramo.pk).update(ultimo_pk=self.pagos[1].pk)
+
+        with patch("django_payments_chile.FlowProvider.FlowProvider.actualiza_estado", autospec=True) as estado:
+            estado.side_effect = confirma_salvo(self.pagos[3])
+            resultado = concilia("incidente", bloque=2)
+            self.assertEqual((resultado.tramos, resultado.revisados), (2, 4))
+
+            # Al vencer el arriendo otro proceso sigue desde el último pk anotado
+            TramoConciliacion.objects.filter(pk=tramo.pk).update(arriendo_hasta=timezone.now() - timedelta(seconds=1))
+            resultado = concilia("incidente", bloque=2)
+        self.assertEqual((resultado.tramos, resultado.revisados), (1, 1))
+        self.assertEqual(estado.call_count, 5)
+
+        total = progreso("incidente")
+        self.assertEqual(total, {"tramos": 3, "terminados": 3, "revisados": 5, "actualizados": 4, "errores": 1})
+        self.assertEqual(TramoConciliacion.objects.get(pk=tramo.pk).intentos, 2)
+        self.assertIsNone(toma("incidente", "otro"))
+
+    def test_arriendo_perdido(self):
+        planifica("incidente", tamano=10)
+        primero = Trabajador("incidente", responsable="lento", arriendo=60)
+        tramo = toma("incidente", primero.responsable)
+        self.assertIsNone(toma("incidente", "rapido"))
+
+        TramoConciliacion.objects.filter(pk=tramo.pk).update(arriendo_hasta=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(toma("incidente", "rapido").pk, tramo.pk)
+        with patch("django_payments_chile.FlowProvider.FlowProvider.actualiza_estado", autospec=True):
+            self.assertFalse(primero.procesa(tramo))
+        self.assertEqual(TramoConciliacion.objects.get(pk=tramo.pk).revisados, 0)
+
+    def test_comando(self):
+        salida = StringIO()
+        with patch("django_payments_chile.FlowProvider.FlowProvider.actualiza_estado", autospec=True):
+            call_command("concilia_pagos", "incidente", "--variant", "flow", "--tamano-tramo", "5", stdout=salida)
+        self.assertIn("2 tramos planificados", salida.getvalue())
+        self.assertIn("7 pagos revisados, 0 actualizados, 0 con error; 2 de 2 tramos terminados", salida.getvalue())
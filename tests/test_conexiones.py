@@ -0,0 +1,136 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest.mock import Mock, patch
+
+import requests
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from payments.core import PROVIDER_CACHE
+
+from django_payments_chile.clientes import clientes
+from django_payments_chile import conexiones
+from django_payments_chile.conexiones import arranca, sesion, sondea
+from django_payments_chile.salud import CircuitoAbierto, salud
+from django_payments_chile.transporte import Transporte
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):  # noqa
+        pass
+
+    def do_HEAD(self):  # noqa
+        self.send_response(405)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class TestConexiones(SimpleTestCase):
+    def setUp(self):
+        salud.reinicia()
+        PROVIDER_CACHE.clear()
+        self.addCleanup(PROVIDER_CACHE.clear)
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Manejador)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}/api"
+
+    def test_transporte_usa_la_sesion_de_la_pasarela(self):
+        self.assertIs(sesion("flow"), sesion("flow"))
+        with patch.object(requests.Session, "request", return_value=Mock(status_code=200)) as request:
+            Transporte("flow", "cuenta").solicita("estado", requests.get, "https://www.flow.cl/api/x", timeout=5)
+        request.assert_called_once_with("GET", "https://www.flow.cl/api/x", timeout=5)
+        self.assertEqual(salud.estado("www.flow.cl").exitos, 1)
+
+    @override_settings(PAYMENTS_CHILE_CIRCUITO={"fallas": 2, "enfriamiento": 30})
+    def test_circuito(self):
+        transporte = Transporte("flow", "cuenta")
+        metodo = Mock(side_effect=requests.ConnectionError("sin conexión"))
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                transporte.solicita("estado", metodo, "https://www.flow.cl/api/x")
+        with self.assertRaises(CircuitoAbierto):
+            transporte.solicita("estado", metodo, "https://www.flow.cl/api/x")
+        self.assertEqual(metodo.call_count, 2)
+
+    @override_settings(PAYMENTS_CHILE_SONDEO_INTERVALO=3600)
+    def test_sondeo_al_primer_uso_de_cada_proceso(self):
+        def limpia():
+            clientes.descarta("arranque")
+            clientes.descarta("sondeo")
+
+        limpia()
+        self.addCleanup(limpia)
+        transporte = Transporte("flow", "cuenta")
+        with (
+            patch("django_payments_chile.conexiones._inicia_sondeo") as inicia,
+            patch.object(requests.Session, "request", return_value=Mock(status_code=200)),
+        ):
+            with patch("django_payments_chile.conexiones.sys.argv", ["manage.py", "migrate"]):
+                arranca()
+            inicia.assert_not_called()
+
+            clientes.descarta("arranque")
+            with patch("django_payments_chile.conexiones.sys.argv", ["gunicorn", "tienda.wsgi"]):
+                for _ in range(2):
+                    transporte.solicita("estado", requests.get, "https://www.flow.cl/api/x", timeout=5)
+                self.assertEqual(inicia.call_count, 1)
+
+                # Un worker creado con fork parte sin sondeo y lo inicia en su primera llamada
+                clientes.despues_de_fork()
+                transporte.solicita("estado", requests.get, "https://www.flow.cl/api/x", timeout=5)
+            self.assertEqual(inicia.call_count, 2)
+
+    def test_comandos_de_administracion(self):
+        casos = {
+            ("manage.py", "migrate"): True,
+            ("/usr/bin/django-admin", "shell"): True,
+            ("/venv/lib/python3.11/site-packages/django/__main__.py", "migrate"): True,
+            ("manage.py", "runserver"): False,
+            ("/venv/lib/python3.11/site-packages/gunicorn/__main__.py", "tienda.wsgi"): False,
+            ("/venv/lib/python3.11/site-packages/uvicorn/__main__.py", "tienda.asgi:application"): False,
+        }
+        for argv, comando in casos.items():
+            with self.subTest(argv=argv), patch("django_payments_chile.conexiones.sys.argv", list(argv)):
+                self.assertIs(conexiones._en_comando(), comando)
+
+    def test_arranque_en_cada_worker(self):
+        with (
+            patch("django_payments_chile.conexiones.arranca") as arranca_proceso,
+            patch("django_payments_chile.conexiones.os.register_at_fork") as registra,
+            patch("django_payments_chile.conexiones._en_fork", False),
+        ):
+            conexiones.arranca_workers()
+            conexiones.arranca_workers()
+        # El proceso actual arranca al iniciar la aplicación y los hijos de --preload al hacer fork
+        self.assertEqual(arranca_proceso.call_count, 2)
+        registra.assert_called_once_with(after_in_child=arranca_proceso)
+
+    def test_sondea(self):
+        resultado = sondea("flow", "flow", self.url)
+        self.assertTrue(resultado.disponible)
+        self.assertEqual(resultado.codigo, 405)
+        self.assertIsNotNone(resultado.dns)
+
+        caido = sondea("flow", "flow", "http://127.0.0.1:9/api", timeout=1)
+        self.assertFalse(caido.disponible)
+        self.assertEqual(salud.estado("127.0.0.1").fallas, 1)
+
+    def test_comando_verifica_pasarelas(self):
+        variantes = {
+            "flow": ("django_payments_chile.providers.FlowProvider", {"api_key": "k", "api_secret": "s"}),
+            "local": (
+                "django_payments_chile.providers.FlowProvider",
+                {"api_key": "k", "api_secret": "s", "api_endpoint": self.url},
+            ),
+        }
+        salida = StringIO()
+        with override_settings(PAYMENT_VARIANTS=variantes):
+            call_command("verifica_pasarelas", variant=["local"], stdout=salida)
+        self.assertIn("OK    local", salida.getvalue())
+
+        variantes["local"][1]["api_endpoint"] = "http://127.0.0.1:9/api"
+        PROVIDER_CACHE.clear()
+        with override_settings(PAYMENT_VARIANTS=variantes), self.assertRaises(CommandError):
+            call_command("verifica_pasarelas", variant=["local"], timeout=1, stdout=StringIO())
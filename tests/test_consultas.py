@@ -0,0 +1,122 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from payments import PaymentStatus, get_payment_model
+from payments.core import PROVIDER_CACHE
+
+from django_payments_chile.consultas import POLITICAS, Programador, politica
+
+VARIANTES = {
+    "flow": ("django_payments_chile.providers.FlowProvider", {"api_key": "k", "api_secret": "s"}),
+    "khipu": ("django_payments_chile.providers.KhipuProvider", {"api_key": "k", "api_endpoint": "https://khipu"}),
+}
+
+
+def crea_pago(variant: str, edad: float, sin_cambios: float, **campos):
+    pago = get_payment_model().objects.create(
+        variant=variant, total=5000, currency="CLP", transaction_id=f"T{variant}", **campos
+    )
+    ahora = timezone.now()
+    get_payment_model().objects.filter(pk=pago.pk).update(
+        created=ahora - timedelta(seconds=edad), modified=ahora - timedelta(seconds=sin_cambios)
+    )
+    return pago
+
+
+class TestPoliticas(SimpleTestCase):
+    def test_intervalos_por_pasarela_y_edad(self):
+        self.assertEqual(POLITICAS["webpay"].intervalo(10), 5)
+        self.assertEqual(POLITICAS["webpay"].intervalo(120), 60)
+        self.assertEqual(POLITICAS["webpay"].intervalo(3600), 300)
+        self.assertEqual(POLITICAS["khipu"].intervalo(10), 30)
+        self.assertEqual(POLITICAS["khipu"].intervalo(600), 150)
+
+    @override_settings(PAYMENTS_CHILE_CONSULTAS={"khipu": {"maximo": 60}})
+    def test_setting(self):
+        self.assertEqual(politica("khipu").intervalo(600), 60)
+        self.assertEqual(politica("flow"), POLITICAS["flow"])
+
+
+def marca(estado):
+    def actualiza_estado(provider, payment):
+        payment.status = estado
+        return {}
+
+    return actualiza_estado
+
+
+@override_settings(PAYMENT_VARIANTS=VARIANTES)
+class TestProgramador(TestCase):
+    def setUp(self):
+        PROVIDER_CACHE.clear()
+        self.addCleanup(PROVIDER_CACHE.clear)
+
+    def test_consulta_y_reprograma(self):
+        flow = crea_pago("flow", edad=600, sin_cambios=600)
+        crea_pago("khipu", edad=600, sin_cambios=5)
+        crea_pago("flow", edad=200000, sin_cambios=200000)  # vencido
+        crea_pago("flow", edad=600, sin_cambios=600, status=PaymentStatus.CONFIRMED)
+
+        programador = Programador()
+        ahora = timezone.now()
+        with (
+            patch("django_payments_chile.FlowProvider.FlowProvider.actualiza_estado", autospec=True) as flow_estado,
+            patch(
+                "django_payments_chile.KhipuProvider.KhipuProvider.actualiza_estado",
+                autospec=True,
+                side_effect=marca(PaymentStatus.CONFIRMED),
+            ) as khipu_estado,
+        ):
+            self.assertEqual(programador.consulta_vencidas(ahora), 1)
+            self.assertEqual(flow_estado.call_args.args[1].pk, flow.pk)
+            self.assertEqual(len(programador), 2)
+
+            # Flow sigue pendiente: se consulta de nuevo un intervalo después
+            self.assertEqual(programador.consulta_vencidas(ahora + timedelta(seconds=60)), 0)
+            self.assertEqual(programador.consulta_vencidas(ahora + timedelta(seconds=310)), 2)
+            khipu_estado.assert_called_once()
+
+        self.assertEqual(len(programador), 1)
+        self.assertAlmostEqual(programador.proxima(), (ahora + timedelta(seconds=310)).timestamp() + 455, delta=1)
+
+    def test_fragmento(self):
+        pagos = {crea_pago("flow", edad=600, sin_cambios=600).pk for _ in range(10)}
+        por_fragmento = []
+        for fragmento in range(3):
+            programador = Programador(fragmento=fragmento, fragmentos=3, variants=["flow"])
+            self.assertEqual(programador.carga(), len(programador))
+            por_fragmento.append(set(programador._programados))
+
+        # Cada pago queda en exactamente un fragmento y todos los fragmentos tienen pagos
+        self.assertTrue(all(por_fragmento))
+        self.assertEqual(sum(map(len, por_fragmento)), len(pagos))
+        self.assertEqual(set().union(*por_fragmento), pagos)
+        self.assertEqual(por_fragmento[1], {pk for pk in pagos if pk % 3 == 1})
+
+    def test_autorizados_se_olvidan(self):
+        pago = crea_pago("flow", edad=600, sin_cambios=600, status=PaymentStatus.PREAUTH)
+        programador = Programador(variants=["flow"])
+        ahora = timezone.now()
+        with (
+            patch("django_payments_chile.FlowProvider.FlowProvider.actualiza_estado", autospec=True),
+            patch("django_payments_chile.consultas.espera_captura", return_value=True),
+        ):
+            self.assertEqual(programador.consulta_vencidas(ahora), 1)
+        self.assertEqual(programador._autorizados, {pago.pk})
+        self.assertEqual(programador.carga(ahora), 0)
+
+        # Al capturarse deja de estar pendiente y sale del conjunto
+        get_payment_model().objects.filter(pk=pago.pk).update(status=PaymentStatus.CONFIRMED)
+        programador.carga(ahora)
+        self.assertEqual(programador._autorizados, set())
+
+    def test_comando_una_vez(self):
+        crea_pago("flow", edad=600, sin_cambios=600)
+        salida = StringIO()
+        with patch("django_payments_chile.FlowProvider.FlowProvider.actualiza_estado", autospec=True):
+            call_command("consulta_estados", "--una-vez", variant=["flow"], stdout=salida)
+        self.assertIn("1 pagos consultados, 1 programados", salida.getvalue())
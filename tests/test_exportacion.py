@@ -0,0 +1,134 @@
+import gzip
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from payments import PaymentStatus, get_payment_model
+
+from django_payments_chile import exportacion
+from django_payments_chile.exportacion import COLUMNAS, exporta
+
+PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+VARIANTES = {
+    "flow": ("django_payments_chile.providers.FlowProvider", {}),
+    "khipu": ("django_payments_chile.providers.KhipuProvider", {}),
+    "webpay": ("django_payments_chile.providers.WebpayProvider", {}),
+    "otra": ("payments.dummy.DummyProvider", {}),
+}
+
+
+def crea_pago(variant: str, **attrs):
+    pago = get_payment_model().objects.create(
+        variant=variant, total=5000, currency="CLP", status=PaymentStatus.CONFIRMED
+    )
+    for nombre, valor in attrs.items():
+        setattr(pago.attrs, nombre, valor)
+    pago.save()
+    return pago
+
+
+def lee(destino: str) -> list:
+    filas = []
+    for nombre in sorted(os.listdir(destino)):
+        if nombre.endswith(".jsonl.gz"):
+            with gzip.open(os.path.join(destino, nombre), "rt", encoding="utf-8") as archivo:
+                filas.extend(json.loads(linea) for linea in archivo)
+    return filas
+
+
+@override_settings(PAYMENT_VARIANTS=VARIANTES)
+class TestExportacion(TestCase):
+    def setUp(self):
+        self.destino = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.destino)
+        self.flow = crea_pago("flow", respuesta_flow={"flowOrder": 981}, solicitud_reembolso={"status": "created"})
+        self.khipu = crea_pago("khipu", respuesta_khipu={"payment_id": "kh-1"}, huella_payment_create="abc")
+        self.webpay = crea_pago(
+            "webpay",
+            commit_response={
+                "status": "AUTHORIZED",
+                "response_code": 0,
+                "buy_order": "orden",
+                "installments_number": 3,
+            },
+            status_response={"status": "NULLIFIED", "card_detail": {"card_number": "6623"}},
+            refund_response={"type": "NULLIFIED", "nullified_amount": 2500},
+        )
+        self.otra = crea_pago("otra")
+        get_payment_model().objects.filter(pk=self.otra.pk).update(extra_data="no es json")
+        crea_pago("flow")
+
+    def test_partes_aplanadas(self):
+        with self.assertNumQueries(3):
+            resultado = exporta(self.destino, filas_por_parte=2, chunk_size=1)
+        self.assertEqual((resultado.partes, resultado.filas), (3, 5))
+        partes = sorted(nombre for nombre in os.listdir(self.destino) if nombre.startswith("pagos-"))
+        self.assertEqual(partes, [f"pagos-00000{n}.jsonl.gz" for n in (1, 2, 3)])
+
+        filas = {fila["pk"]: fila for fila in lee(self.destino)}
+        self.assertTrue(all(list(fila) == list(COLUMNAS) for fila in filas.values()))
+        flow, khipu, webpay = filas[self.flow.pk], filas[self.khipu.pk], filas[self.webpay.pk]
+        self.assertEqual((flow["orden_pasarela"], flow["estado_reembolso"]), (981, "created"))
+        self.assertEqual((khipu["orden_pasarela"], khipu["huella_solicitud"]), ("kh-1", "abc"))
+        self.assertEqual(
+            (webpay["estado_pasarela"], webpay["codigo_respuesta"], webpay["cuotas"]), ("NULLIFIED", 0, 3)
+        )
+        self.assertEqual((webpay["tarjeta"], webpay["monto_reembolso"]), ("6623", 2500))
+        self.assertEqual((filas[self.otra.pk]["orden_pasarela"], filas[self.otra.pk]["total"]), (None, "5000.00"))
+        self.assertEqual(flow["token"], str(self.flow.token))
+
+    def test_reanuda_sin_duplicar(self):
+        escribe_parte = exportacion._escribe_parte
+        llamadas = []
+
+        def falla_en_la_segunda(*args):
+            llamadas.append(1)
+            if len(llamadas) == 2:
+                raise OSError("disco lleno")
+            return escribe_parte(*args)
+
+        with patch.object(exportacion, "_escribe_parte", falla_en_la_segunda), self.assertRaises(OSError):
+            exporta(self.destino, filas_por_parte=2, variants=["flow", "webpay", "otra"])
+        self.assertEqual(len(lee(self.destino)), 2)
+        with self.assertRaises(FileExistsError):
+            exporta(self.destino)
+        with self.assertRaises(ValueError):
+            exporta(self.destino, formato="parquet", reanuda=True)
+
+        resultado = exporta(self.destino, filas_por_parte=2, reanuda=True)
+        self.assertEqual((resultado.partes, resultado.filas), (1, 2))
+        self.assertEqual([fila["variant"] for fila in lee(self.destino)], ["flow", "webpay", "otra", "flow"])
+        self.assertFalse([nombre for nombre in os.listdir(self.destino) if nombre.endswith(".tmp")])
+
+        # Los pagos nuevos se agregan en otra parte al volver a reanudar
+        crea_pago("webpay")
+        self.assertEqual(exporta(self.destino, reanuda=True).filas, 1)
+
+    def test_comando(self):
+        salida = StringIO()
+        call_command("exporta_pagos", self.destino, "--variant", "khipu", stdout=salida)
+        self.assertIn("1 pagos en 1 partes", salida.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("exporta_pagos", self.destino)
+
+    @skipIf(PYARROW, "pyarrow está instalado")
+    def test_parquet_requiere_pyarrow(self):
+        with self.assertRaisesMessage(CommandError, "requiere pyarrow"):
+            call_command("exporta_pagos", self.destino, "--formato", "parquet")
+
+    @skipUnless(PYARROW, "requiere pyarrow")
+    def test_parquet(self):
+        import pyarrow.parquet as pq
+
+        exporta(self.destino, formato="parquet", filas_por_parte=10, chunk_size=2)
+        tabla = pq.read_table(os.path.join(self.destino, "pagos-000001.parquet"))
+        self.assertEqual((tabla.num_rows, tabla.column_names), (5, list(COLUMNAS)))
+        self.assertEqual(pq.ParquetFile(os.path.join(self.destino, "pagos-000001.parquet")).num_row_groups, 3)
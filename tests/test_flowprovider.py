@@ -4,6 +4,7 @@ from unittest.mock import Mock, patch
 import requests
 from payments import PaymentError, PaymentStatus, RedirectNeeded
 
+from django_payments_chile.clientes import ClienteAPI
 from django_payments_chile.FlowProvider import FlowProvider
 
 API_KEY = "flow_test_key"  # nosec
@@ -51,7 +52,7 @@ class TestFlowProvider(TestCase):
         test_payment = Payment()
         test_payment.attrs.datos_extra = {"payment_currency": "CLP", "currency": "CLP"}
         provider = FlowProvider(api_key=API_KEY, api_secret=API_SECRET)
-        with patch("django_payments_chile.FlowProvider.requests.post") as mock_post:
+        with patch("django_payments_chile.proveedor.requests.post") as mock_post:
             # Configure mock response
             mock_response = Mock()
             mock_response.raise_for_status.return_value = None  # Simulates no exception raised
@@ -69,7 +70,7 @@ class TestFlowProvider(TestCase):
     def test_provider_create_session_error(self):
         payment = Payment()
         provider = FlowProvider(api_key=API_KEY, api_secret=API_SECRET)
-        with patch("django_payments_chile.FlowProvider.requests.post") as mock_post:
+        with patch("django_payments_chile.proveedor.requests.post") as mock_post:
             # Simulate an error response
             mock_response = Mock()
             mock_response.raise_for_status.side_effect = requests.exceptions.RequestException("Error occurred")
@@ -91,7 +92,7 @@ class TestFlowProvider(TestCase):
     def test_provider_transaction_id_set(self):
         payment = Payment()
         provider = FlowProvider(api_key=API_KEY, api_secret=API_SECRET)
-        with patch("django_payments_chile.FlowProvider.requests.post") as mock_post:
+        with patch("django_payments_chile.proveedor.requests.post") as mock_post:
             # Configure mock response with transaction ID
             mock_response = Mock()
             mock_response.raise_for_status.return_value = None
@@ -117,7 +118,7 @@ class TestFlowProvider(TestCase):
     def test_provider_full_refund(self):
         payment = Payment(status=PaymentStatus.CONFIRMED)
         provider = FlowProvider(api_key=API_KEY, api_secret=API_SECRET)
-        with patch("django_payments_chile.FlowProvider.requests.post") as mock_post_refund:
+        with patch("django_payments_chile.proveedor.requests.post") as mock_post_refund:
             # Configure mock response
             mock_response_refund = Mock()
             mock_response_refund.raise_for_status.return_value = None  # Simulates no exception raised
@@ -135,10 +136,16 @@ class TestFlowProvider(TestCase):
             # print(f"{refund = }")
             self.assertEqual(refund, payment.total)
 
+        # Flow exige la firma en todos sus servicios, también en /refund/create
+        datos = dict(mock_post_refund.call_args.kwargs["data"])
+        firma = datos.pop("s")
+        self.assertEqual(list(datos), sorted(datos))
+        self.assertEqual(firma, ClienteAPI.genera_firma(datos, API_SECRET))
+
     def test_provider_full_refund_error(self):
         payment = Payment(status=PaymentStatus.CONFIRMED)
         provider = FlowProvider(api_key=API_KEY, api_secret=API_SECRET)
-        with patch("django_payments_chile.FlowProvider.requests.post") as mock_post:
+        with patch("django_payments_chile.proveedor.requests.post") as mock_post:
             # Configure mock response
             mock_response = Mock()
             mock_response.raise_for_status.side_effect = requests.exceptions.RequestException("Error occurred")
@@ -150,7 +157,7 @@ class TestFlowProvider(TestCase):
     def test_provider_update_status_confirmed(self):
         test_payment = Payment()
         provider = FlowProvider(api_key=API_KEY, api_secret=API_SECRET)
-        with patch("django_payments_chile.FlowProvider.requests.get") as mock_status:
+        with patch("django_payments_chile.proveedor.requests.get") as mock_status:
             # Configure mock response
             mock_response = Mock()
             mock_response.raise_for_status.return_value = None  # Simulates no exception raised
@@ -166,7 +173,7 @@ class TestFlowProvider(TestCase):
     def test_provider_update_status_rejected(self):
         test_payment = Payment()
         provider = FlowProvider(api_key=API_KEY, api_secret=API_SECRET)
-        with patch("django_payments_chile.FlowProvider.requests.get") as mock_status:
+        with patch("django_payments_chile.proveedor.requests.get") as mock_status:
             # Configure mock response
             mock_response = Mock()
             mock_response.raise_for_status.return_value = None  # Simulates no exception raised
@@ -182,7 +189,7 @@ class TestFlowProvider(TestCase):
     def test_provider_update_status_error(self):
         test_payment = Payment()
         provider = FlowProvider(api_key=API_KEY, api_secret=API_SECRET)
-        with patch("django_payments_chile.FlowProvider.requests.get") as mock_status:
+        with patch("django_payments_chile.proveedor.requests.get") as mock_status:
             # Configure mock response
             mock_response = Mock()
             mock_response.raise_for_status.return_value = None  # Simulates no exception raised
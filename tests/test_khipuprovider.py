@@ -52,7 +52,7 @@ class TestKhipuProvider(TestCase):
         test_payment.attrs.datos_extra = {"payment_currency": "CLP", "currency": "CLP"}
         provider = KhipuProvider(api_key=API_KEY, api_endpoint=API_ENDPOINT)
 
-        with patch("django_payments_chile.KhipuProvider.requests.post") as mock_post:
+        with patch("django_payments_chile.proveedor.requests.post") as mock_post:
             mock_response = Mock()
             mock_response.raise_for_status.return_value = None
             mock_response.json.return_value = {
@@ -76,7 +76,7 @@ class TestKhipuProvider(TestCase):
         test_payment = Payment()
         provider = KhipuProvider(api_key=API_KEY, api_endpoint=API_ENDPOINT)
 
-        with patch("django_payments_chile.KhipuProvider.requests.post") as mock_post:
+        with patch("django_payments_chile.proveedor.requests.post") as mock_post:
             mock_response = Mock()
             mock_response.raise_for_status.side_effect = requests.exceptions.RequestException("Error")
             mock_post.return_value = mock_response
@@ -90,7 +90,7 @@ class TestKhipuProvider(TestCase):
         test_payment = Payment()
         provider = KhipuProvider(api_key=API_KEY, api_endpoint=API_ENDPOINT)
 
-        with patch("django_payments_chile.KhipuProvider.requests.get") as mock_get:
+        with patch("django_payments_chile.proveedor.requests.get") as mock_get:
             mock_response = Mock()
             mock_response.raise_for_status.return_value = None
             mock_response.json.return_value = {"status": "done", "status_detail": "normal"}
@@ -105,7 +105,7 @@ class TestKhipuProvider(TestCase):
         test_payment.status = PaymentStatus.CONFIRMED
         provider = KhipuProvider(api_key=API_KEY, api_endpoint=API_ENDPOINT)
 
-        with patch("django_payments_chile.KhipuProvider.requests.post") as mock_post:
+        with patch("django_payments_chile.proveedor.requests.post") as mock_post:
             mock_response = Mock()
             mock_response.raise_for_status.return_value = None
             mock_response.json.return_value = {"message": "Refund created"}
@@ -0,0 +1,93 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from payments import PaymentError, PaymentStatus, RedirectNeeded
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.limitador import CuboCache, CuboLocal, Limitador, Limite, LimiteExcedido
+
+
+class payment_attrs:
+    pass
+
+
+class Payment(Mock):
+    description = "payment"
+    currency = "CLP"
+    status = PaymentStatus.WAITING
+    message = None
+    total = 5000
+    token = "e1f0c2d4-3b5a-4c6d-8e7f-9a0b1c2d3e4f"
+    transaction_id = None
+    billing_email = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attrs = payment_attrs()
+
+    def change_status(self, status, message=""):
+        self.status = status
+        self.message = message
+
+    def get_process_url(self):
+        return "http://mi-app.cl/process"
+
+    def get_success_url(self):
+        return "http://mi-app.cl/exito"
+
+
+class TestLimitador(TestCase):
+    def test_cubo_local_espera_turno(self):
+        cubo = CuboLocal(Limite(tasa=10, capacidad=2, espera_maxima=1))
+
+        self.assertEqual(cubo.reserva("k"), 0)
+        self.assertEqual(cubo.reserva("k"), 0)
+        self.assertAlmostEqual(cubo.reserva("k"), 0.1, places=2)
+        self.assertAlmostEqual(cubo.reserva("k"), 0.2, places=2)
+
+    def test_cubo_local_rechaza(self):
+        cubo = CuboLocal(Limite(tasa=1, capacidad=1, espera_maxima=0.5))
+
+        self.assertEqual(cubo.reserva("k"), 0)
+        self.assertIsNone(cubo.reserva("k"))
+
+    def test_cubo_cache(self):
+        cubo = CuboCache(Limite(tasa=100, capacidad=2, espera_maxima=0.05))
+
+        esperas = [cubo.reserva("cache") for _ in range(4)]
+        self.assertEqual(esperas[:2], [0, 0])
+        self.assertTrue(all(espera is not None and espera <= 0.05 for espera in esperas[2:]))
+
+    @patch("django_payments_chile.limitador.time.sleep")
+    def test_metricas(self, mock_sleep):
+        limitador = Limitador(backend="local")
+        limite = Limite(tasa=10, capacidad=1, espera_maxima=0.15)
+
+        limitador.espera_turno("flow", "cuenta", "crear", limite)
+        limitador.espera_turno("flow", "cuenta", "crear", limite)
+        with self.assertRaises(LimiteExcedido):
+            limitador.espera_turno("flow", "cuenta", "crear", limite)
+
+        (clave, metricas), *_ = limitador.metricas().items()
+        self.assertTrue(clave.startswith("flow:") and clave.endswith(":crear"))
+        self.assertNotIn("cuenta", clave)
+        self.assertEqual(metricas["llamadas"], 3)
+        self.assertEqual(metricas["esperas"], 1)
+        self.assertEqual(metricas["rechazos"], 1)
+        mock_sleep.assert_called_once()
+
+    @patch("django_payments_chile.limitador.settings.PAYMENTS_CHILE_LIMITADOR", "local", create=True)
+    def test_provider_limite_excedido(self):
+        provider = FlowProvider(
+            api_key="limite_key", api_secret="limite_secret", limites={"crear": (0.01, 1, 0)}  # nosec
+        )
+        with patch("django_payments_chile.proveedor.requests.post") as mock_post:
+            mock_post.return_value.json.return_value = {"url": "https://flow.cl", "token": "T", "flowOrder": 1}
+            with self.assertRaises(RedirectNeeded):
+                provider.get_form(Payment())
+            payment = Payment()
+            with self.assertRaises(PaymentError):
+                provider.get_form(payment)
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(payment.status, PaymentStatus.ERROR)
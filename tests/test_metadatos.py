@@ -0,0 +1,101 @@
+import threading
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.KhipuProvider import KhipuProvider
+from django_payments_chile.metadatos import clave, metadatos
+
+BANCOS = [{"bank_id": "Bawdf", "name": "DemoBank", "min_amount": 200}]
+
+
+def respuesta(codigo=200, datos=None, etag='"v1"'):
+    return Mock(status_code=codigo, headers={"ETag": etag}, json=Mock(return_value=datos))
+
+
+class TestMetadatos(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        metadatos.limpia()
+        self.provider = KhipuProvider(api_key="khipu_test_key", api_endpoint="https://payment-api.khipu.com")  # nosec
+        self.clave = clave("khipu", "khipu_test_key", "bancos")
+
+    def espera_refresco(self):
+        futuro = metadatos.pendiente(self.clave)
+        if futuro is not None:
+            futuro.result(timeout=5)
+
+    def test_carga_en_segundo_plano_y_usa_cache(self):
+        with patch("django_payments_chile.metadatos.requests.get") as mock_get:
+            mock_get.return_value = respuesta(datos={"banks": BANCOS})
+            self.assertEqual(self.provider.bancos(), [])
+            self.espera_refresco()
+            self.assertEqual(self.provider.bancos(), BANCOS)
+            self.assertEqual(self.provider.bancos(), BANCOS)
+
+        mock_get.assert_called_once()
+        self.assertEqual(mock_get.call_args.args[0], "https://payment-api.khipu.com/v3/banks")
+        self.assertEqual(mock_get.call_args.kwargs["headers"], {"x-api-key": "khipu_test_key"})
+
+    @override_settings(PAYMENTS_CHILE_METADATOS_TTL=0)
+    def test_vencido_se_revalida_con_etag(self):
+        with patch("django_payments_chile.metadatos.requests.get") as mock_get:
+            mock_get.return_value = respuesta(datos={"banks": BANCOS})
+            self.provider.bancos()
+            self.espera_refresco()
+
+            mock_get.return_value = respuesta(304)
+            self.assertEqual(self.provider.bancos(), BANCOS)
+            self.espera_refresco()
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(mock_get.call_args.kwargs["headers"]["If-None-Match"], '"v1"')
+
+    def test_sin_cambios_sin_valor_anterior(self):
+        # Tras `limpia` o un descarte del cache la pasarela todavía puede responder "sin cambios"
+        cargador = Mock(side_effect=[None, (BANCOS, '"v2"')])
+        self.assertEqual(metadatos.refresca(self.clave, cargador), BANCOS)
+        self.assertEqual([llamada.args for llamada in cargador.call_args_list], [(None,), (None,)])
+
+        metadatos.limpia()
+        cache.clear()
+        with self.assertRaisesMessage(ValueError, "no entregó los metadatos"):
+            metadatos.refresca(self.clave, Mock(return_value=None))
+        self.assertIsNone(cache.get(f"payments_chile:metadatos:{self.clave}"))
+
+    @override_settings(PAYMENTS_CHILE_METADATOS_TTL=0)
+    def test_no_espera_a_la_pasarela(self):
+        with patch("django_payments_chile.metadatos.requests.get") as mock_get:
+            mock_get.return_value = respuesta(datos={"banks": BANCOS})
+            self.provider.bancos()
+            self.espera_refresco()
+
+            liberada = threading.Event()
+            mock_get.side_effect = lambda *args, **kwargs: liberada.wait(5) and respuesta(500)
+            for _ in range(3):
+                self.assertEqual(self.provider.bancos(), BANCOS)
+            liberada.set()
+            self.espera_refresco()
+
+            # Un solo refresco a la vez, y si falla se sigue entregando el valor anterior
+            self.assertEqual(mock_get.call_count, 2)
+            self.assertEqual(self.provider.bancos(), BANCOS)
+            self.espera_refresco()
+
+    def test_cache_compartido_entre_procesos(self):
+        with patch("django_payments_chile.metadatos.requests.get") as mock_get:
+            mock_get.return_value = respuesta(datos={"paymentMethods": [{"id": "simplified_transfer"}]})
+            self.provider.metodos_pago("12345")
+            futuro = metadatos.pendiente(clave("khipu", "khipu_test_key", "metodos:12345"))
+            futuro.result(timeout=5)
+            metadatos.limpia()
+            self.assertEqual(self.provider.metodos_pago("12345"), [{"id": "simplified_transfer"}])
+        mock_get.assert_called_once()
+
+    def test_medios_flow(self):
+        todos = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret")  # nosec
+        self.assertIn({"codigo": 1, "nombre": "Webpay"}, todos.medios_pago())
+        webpay = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret", api_medio=1)  # nosec
+        self.assertEqual(webpay.medios_pago(), [{"codigo": 1, "nombre": "Webpay"}])
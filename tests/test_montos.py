@@ -0,0 +1,66 @@
+import json
+from decimal import Decimal
+from unittest.mock import Mock
+
+from django.test import SimpleTestCase, override_settings
+from payments import PaymentError
+
+from django_payments_chile.montos import monto_pasarela, montos_pasarela, normaliza, normaliza_lote
+from django_payments_chile.solicitudes import SolicitudFlow, SolicitudKhipu
+
+
+class Payment(Mock):
+    description = "payment"
+    total = Decimal("1234.565")
+    token = "5a4e3d2c-1b0a-4f9e-8d7c-6b5a4e3d2c1b"
+    billing_email = ""
+
+    def __init__(self, currency: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.currency = currency
+        self.attrs = type("attrs", (), {})()
+
+    def get_process_url(self):
+        return "http://mi-app.cl/process"
+
+    def get_success_url(self):
+        return "http://mi-app.cl/exito"
+
+
+class TestMontos(SimpleTestCase):
+    def test_redondeo_por_moneda(self):
+        self.assertEqual(normaliza(Decimal("1000.50"), "CLP"), Decimal(1001))
+        self.assertEqual(normaliza("10.005", "USD"), Decimal("10.01"))
+        self.assertEqual(normaliza(0.1, "USD"), Decimal("0.10"))
+        self.assertEqual(normaliza(Decimal("37654.123456"), "UF"), Decimal("37654.1235"))
+
+        self.assertEqual(monto_pasarela(Decimal("5000.00"), "CLP"), 5000)
+        self.assertIs(type(monto_pasarela(Decimal("5000.00"), "CLP")), int)
+        self.assertEqual(monto_pasarela(Decimal("19.999"), "USD"), 20.0)
+        self.assertEqual(json.dumps(monto_pasarela("1.5", "UF")), "1.5")
+
+    def test_moneda_no_soportada(self):
+        with self.assertRaisesMessage(PaymentError, "Moneda no soportada: XXX"):
+            normaliza(1, "XXX")
+        with override_settings(PAYMENTS_CHILE_MONEDAS={"XXX": 3}):
+            self.assertEqual(normaliza("1.23456", "XXX"), Decimal("1.235"))
+
+    def test_lote(self):
+        montos = [Decimal("1000.4"), 2500, "10.125", 3.3333]
+        self.assertEqual(
+            normaliza_lote(montos, ["CLP", "CLP", "USD", "UF"]),
+            [Decimal(1000), Decimal(2500), Decimal("10.13"), Decimal("3.3333")],
+        )
+        self.assertEqual(montos_pasarela(montos[:2], "CLP"), [1000, 2500])
+        with self.assertRaises(PaymentError):
+            montos_pasarela([1, 2], ["CLP", "XXX"])
+
+    def test_solicitudes_con_la_misma_regla(self):
+        flow = SolicitudFlow("flow_test_key", "flow_test_secret", 9).crear_pago(Payment("CLP"))
+        khipu = SolicitudKhipu().crear_pago(Payment("CLP"))
+        self.assertEqual((flow["amount"], khipu["amount"]), (1235, 1235))
+
+        khipu = SolicitudKhipu().crear_pago(Payment("USD"))
+        self.assertEqual((khipu["amount"], khipu["currency"]), (1234.57, "USD"))
+        with self.assertRaises(PaymentError):
+            SolicitudKhipu().crear_pago(Payment("XXX"))
@@ -0,0 +1,129 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from payments import PaymentStatus, RedirectNeeded
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.notificaciones import Agrupador, agrupador
+from django_payments_chile.plazos import PlazoAgotado, plazo
+from django_payments_chile.testing import PasarelasFalsas, Perfil
+
+
+class Pago:
+    variant = "flow"
+    token = "00000000-0000-4000-8000-000000000001"
+    currency = "CLP"
+    description = "Compra"
+    total = 10000
+    billing_email = "comprador@example.com"
+
+    def __init__(self, transaction_id: str = ""):
+        self.pk = 1
+        self.transaction_id = transaction_id
+        self.extra_data = ""
+        self.status = PaymentStatus.WAITING
+        self.message = ""
+        self.attrs = type("attrs", (), {})()
+
+    def get_success_url(self):
+        return "http://tienda.local/exito"
+
+    def get_process_url(self):
+        return "http://tienda.local/proceso"
+
+
+class TestAgrupador(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.agrupador = Agrupador()
+
+    def test_llamadas_simultaneas_comparten_el_resultado(self):
+        libera = threading.Event()
+        llamadas = []
+
+        def consulta():
+            llamadas.append(1)
+            libera.wait(5)
+            return {"status": 2}
+
+        with ThreadPoolExecutor(max_workers=10) as ejecutor:
+            futuros = [ejecutor.submit(self.agrupador.ejecuta, "flow:1", consulta) for _ in range(10)]
+            while self.agrupador.agrupadas < 9:
+                threading.Event().wait(0.01)
+            libera.set()
+        self.assertEqual([futuro.result() for futuro in futuros], [{"status": 2}] * 10)
+        self.assertEqual((len(llamadas), self.agrupador.ejecutadas), (1, 1))
+
+        # Dentro de la ventana se entrega el resultado sin volver a consultar; otra clave sí consulta
+        self.assertEqual(self.agrupador.ejecuta("flow:1", consulta), {"status": 2})
+        self.agrupador.ejecuta("flow:2", consulta)
+        self.assertEqual(len(llamadas), 2)
+        with override_settings(PAYMENTS_CHILE_NOTIFICACIONES_VENTANA=0):
+            self.agrupador.ejecuta("flow:1", consulta)
+        self.assertEqual(len(llamadas), 3)
+
+    def test_errores_no_se_recuerdan(self):
+        def falla():
+            raise ValueError("pasarela caída")
+
+        with self.assertRaises(ValueError):
+            self.agrupador.ejecuta("flow:1", falla)
+        self.assertEqual(self.agrupador.ejecuta("flow:1", lambda: "ok"), "ok")
+
+    def test_espera_dentro_del_plazo(self):
+        libera = threading.Event()
+        lider = threading.Thread(target=self.agrupador.ejecuta, args=("flow:1", lambda: libera.wait(5)))
+        lider.start()
+        while not self.agrupador._en_curso:
+            threading.Event().wait(0.01)
+        with plazo(0.1), self.assertRaises(PlazoAgotado):
+            self.agrupador.ejecuta("flow:1", lambda: "no se llama")
+        libera.set()
+        lider.join()
+
+    @override_settings(PAYMENTS_CHILE_NOTIFICACIONES_COMPARTIDAS=True)
+    def test_marca_compartida_entre_workers(self):
+        otro_worker = Agrupador()
+        self.assertEqual(self.agrupador.ejecuta("flow:1", lambda: "consultado"), "consultado")
+        self.assertEqual(otro_worker.ejecuta("flow:1", lambda: "consultado", "omitido"), "omitido")
+        self.assertEqual(otro_worker.ejecutadas, 0)
+
+        # Si la consulta falla, la marca se borra y otro worker puede consultar
+        with self.assertRaises(ValueError):
+            self.agrupador.ejecuta("flow:2", lambda: int("x"))
+        self.assertEqual(otro_worker.ejecuta("flow:2", lambda: "consultado"), "consultado")
+
+
+class TestNotificacionesFlow(SimpleTestCase):
+    def setUp(self):
+        agrupador.limpia()
+        self.addCleanup(agrupador.limpia)
+
+    def test_rafaga_de_notificaciones(self):
+        pasarelas = PasarelasFalsas(perfiles={"flow": Perfil(latencia=0.2)}).inicia()
+        self.addCleanup(pasarelas.detiene)
+        provider = FlowProvider(
+            "flow_key",
+            "flow_secret",
+            f"{pasarelas.url}/flow",
+            persistencia="django_payments_chile.persistencia.PersistenciaNula",
+        )
+        pago = Pago()
+        with self.assertRaises(RedirectNeeded):
+            provider.get_form(pago)
+        consultas = pasarelas.estadisticas.solicitudes
+
+        def notifica(_):
+            # Cada notificación carga su propia copia del pago, como la vista de django-payments
+            copia = Pago(pago.transaction_id)
+            request = RequestFactory().post("/", {"token": pago.transaction_id})
+            return copia, provider.process_data(copia, request)
+
+        with ThreadPoolExecutor(max_workers=20) as ejecutor:
+            resultados = list(ejecutor.map(notifica, range(20)))
+
+        self.assertEqual([respuesta.status_code for _, respuesta in resultados], [200] * 20)
+        self.assertEqual(pasarelas.estadisticas.solicitudes - consultas, 1)
+        self.assertEqual(sum(copia.status == PaymentStatus.CONFIRMED for copia, _ in resultados), 1)
@@ -0,0 +1,155 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from payments import PaymentStatus, get_payment_model
+from payments.signals import status_changed
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.models import EventoPago
+from django_payments_chile.outbox import (
+    ErrorPublicacion,
+    SumideroArchivo,
+    SumideroBase,
+    SumideroRedis,
+    SumideroSenal,
+    publica_lote,
+    registra_transicion,
+)
+
+
+class Payment(Mock):
+    pk = 1
+    variant = "flow"
+    token = "d3b9a5f2-6a1e-4f57-9b7c-2f0c3a1e9d11"
+    transaction_id = "TOKEN_ID"
+    status = PaymentStatus.WAITING
+    message = ""
+
+
+class SumideroFallido(SumideroBase):
+    def publica(self, eventos):
+        raise ConnectionError("sin conexión")
+
+
+class TestOutbox(TestCase):
+    def test_registra_transicion(self):
+        payment = Payment()
+        registra_transicion(payment, PaymentStatus.CONFIRMED, "ok")
+
+        payment.save.assert_called_once_with(update_fields=["status", "message", "modified"])
+        payment.change_status.assert_not_called()
+        evento = EventoPago.objects.get()
+        self.assertEqual(evento.estado_anterior, PaymentStatus.WAITING)
+        self.assertEqual(evento.estado, PaymentStatus.CONFIRMED)
+        self.assertIsNone(evento.publicado)
+
+    def test_registra_transicion_actualiza_modified(self):
+        modelo = get_payment_model()
+        pago = modelo.objects.create(variant="flow", total=1000, currency="CLP")
+        antes = timezone.now() - timedelta(days=1)
+        modelo.objects.filter(pk=pago.pk).update(modified=antes)
+        pago.refresh_from_db()
+
+        registra_transicion(pago, PaymentStatus.CONFIRMED)
+        pago.refresh_from_db()
+        self.assertEqual(pago.status, PaymentStatus.CONFIRMED)
+        self.assertGreater(pago.modified, antes + timedelta(hours=23))
+
+    def test_comando_reentrega_tras_una_falla(self):
+        for _ in range(3):
+            registra_transicion(Payment(), PaymentStatus.CONFIRMED)
+
+        with tempfile.TemporaryDirectory() as directorio:
+            caido = ("django_payments_chile.outbox.SumideroArchivo", {"ruta": os.path.join(directorio, "no", "x")})
+            with override_settings(PAYMENTS_CHILE_OUTBOX_SUMIDERO=caido), self.assertRaises(CommandError):
+                call_command("publica_eventos", stdout=StringIO())
+            self.assertEqual(EventoPago.objects.filter(publicado__isnull=True, intentos=1).count(), 3)
+
+            ruta = os.path.join(directorio, "eventos.jsonl")
+            archivo = ("django_payments_chile.outbox.SumideroArchivo", {"ruta": ruta})
+            with override_settings(PAYMENTS_CHILE_OUTBOX_SUMIDERO=archivo):
+                salida = StringIO()
+                call_command("publica_eventos", "--lote", "2", stdout=salida)
+                self.assertIn("3 eventos publicados", salida.getvalue())
+                salida = StringIO()
+                call_command("publica_eventos", stdout=salida)
+                self.assertIn("0 eventos publicados", salida.getvalue())
+
+            with open(ruta) as archivo:
+                pagos = [json.loads(linea)["pago_id"] for linea in archivo]
+        self.assertEqual(len(pagos), 3)
+        self.assertFalse(EventoPago.objects.filter(publicado__isnull=True).exists())
+
+    def test_sumidero_senal(self):
+        pago = get_payment_model().objects.create(variant="flow", total=1000, currency="CLP")
+        registra_transicion(pago, PaymentStatus.CONFIRMED)
+        recibidos = []
+
+        def receptor(sender, instance, **kwargs):
+            recibidos.append(instance.pk)
+
+        status_changed.connect(receptor)
+        self.addCleanup(status_changed.disconnect, receptor)
+        self.assertEqual(publica_lote(SumideroSenal()), 1)
+        self.assertEqual(recibidos, [pago.pk])
+
+    def test_sumidero_redis(self):
+        redis = Mock()
+        with patch.dict("sys.modules", {"redis": redis}):
+            sumidero = SumideroRedis("redis://localhost/0", largo_maximo=1000)
+        pipe = redis.Redis.from_url.return_value.pipeline.return_value
+        registra_transicion(Payment(), PaymentStatus.CONFIRMED)
+
+        self.assertEqual(publica_lote(sumidero), 1)
+        stream, campos = pipe.xadd.call_args.args
+        self.assertEqual(stream, "pagos:eventos")
+        self.assertEqual(json.loads(campos["evento"])["estado"], PaymentStatus.CONFIRMED)
+        self.assertEqual(pipe.xadd.call_args.kwargs, {"maxlen": 1000, "approximate": True})
+        pipe.execute.assert_called_once()
+
+    def test_publica_lote_archivo(self):
+        for _ in range(3):
+            registra_transicion(Payment(), PaymentStatus.CONFIRMED)
+
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, "eventos.jsonl")
+            self.assertEqual(publica_lote(SumideroArchivo(ruta), lote=2), 2)
+            self.assertEqual(publica_lote(SumideroArchivo(ruta), lote=2), 1)
+            self.assertEqual(publica_lote(SumideroArchivo(ruta), lote=2), 0)
+
+            with open(ruta) as archivo:
+                eventos = [json.loads(linea) for linea in archivo]
+        self.assertEqual([evento["estado"] for evento in eventos], [PaymentStatus.CONFIRMED] * 3)
+        self.assertFalse(EventoPago.objects.filter(publicado__isnull=True).exists())
+
+    def test_publica_lote_sumidero_fallido(self):
+        registra_transicion(Payment(), PaymentStatus.CONFIRMED)
+
+        with self.assertRaises(ErrorPublicacion):
+            publica_lote(SumideroFallido())
+
+        evento = EventoPago.objects.get()
+        self.assertIsNone(evento.publicado)
+        self.assertEqual(evento.intentos, 1)
+
+    def test_provider_outbox(self):
+        payment = Payment()
+        provider = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret", outbox=True)  # nosec
+        with patch("django_payments_chile.proveedor.requests.get") as mock_status:
+            mock_response = Mock()
+            mock_response.raise_for_status.return_value = None
+            mock_response.json.return_value = {"status": 2}
+            mock_status.return_value = mock_response
+
+            provider.actualiza_estado(payment)
+
+        self.assertEqual(payment.status, PaymentStatus.CONFIRMED)
+        payment.change_status.assert_not_called()
+        self.assertEqual(EventoPago.objects.get().estado, PaymentStatus.CONFIRMED)
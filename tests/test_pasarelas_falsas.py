@@ -0,0 +1,139 @@
+import requests
+from django.test import SimpleTestCase
+from payments import PaymentError, PaymentStatus, RedirectNeeded
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.KhipuProvider import KhipuProvider
+from django_payments_chile.testing import PasarelasFalsas, Perfil
+from django_payments_chile.testing.pasarelas import FlowFalso
+from django_payments_chile.WebpayProvider import WebpayProvider
+
+PERSISTENCIA = "django_payments_chile.persistencia.PersistenciaNula"
+
+
+class Pago:
+    currency = "CLP"
+    description = "Compra"
+    total = 10000
+    billing_email = "comprador@example.com"
+
+    def __init__(self, numero: int, variant: str):
+        self.pk = numero
+        self.token = f"00000000-0000-4000-8000-{numero:012d}"
+        self.variant = variant
+        self.transaction_id = ""
+        self.extra_data = ""
+        self.status = PaymentStatus.WAITING
+        self.message = ""
+        self.attrs = type("attrs", (), {})()
+
+    def get_success_url(self):
+        return "http://tienda.local/exito"
+
+    def get_process_url(self):
+        return "http://tienda.local/proceso"
+
+
+class TestPasarelasFalsas(SimpleTestCase):
+    def levanta(self, **opciones) -> PasarelasFalsas:
+        pasarelas = PasarelasFalsas(**opciones).inicia()
+        self.addCleanup(pasarelas.detiene)
+        return pasarelas
+
+    def crea(self, provider, pago) -> str:
+        with self.assertRaises(RedirectNeeded) as redireccion:
+            provider.get_form(pago)
+        return str(redireccion.exception)
+
+    def test_flow_valida_la_firma(self):
+        url = self.levanta().url
+        provider = FlowProvider("flow_key", "flow_secret", f"{url}/flow", persistencia=PERSISTENCIA)
+        pago = Pago(1, "flow")
+        self.assertTrue(self.crea(provider, pago).startswith(f"{url}/flow/pagar?token="))
+        provider.actualiza_estado(pago)
+        self.assertEqual(pago.status, PaymentStatus.CONFIRMED)
+        self.assertEqual(provider.refund(pago, 4000), 4000)
+
+        falsificado = FlowProvider("flow_key", "otro_secreto", f"{url}/flow", persistencia=PERSISTENCIA)
+        with self.assertRaises(PaymentError):
+            falsificado.get_form(Pago(2, "flow"))
+        pago.status = PaymentStatus.CONFIRMED
+        with self.assertRaisesMessage(PaymentError, "401"):
+            falsificado.refund(pago, 1000)
+        sin_firma = {"apiKey": "flow_key", "amount": 1000, "flowTrxId": pago.attrs.respuesta_flow["flowOrder"]}
+        self.assertEqual(requests.post(f"{url}/flow/refund/create", data=sin_firma, timeout=5).status_code, 401)
+
+    def test_webpay_espera_al_comprador(self):
+        url = self.levanta(comprador_automatico=False).url
+        provider = WebpayProvider("597055555532", "webpay_secret", f"{url}/webpay/", persistencia=PERSISTENCIA)
+        pago = Pago(3, "webpay")
+        redireccion = self.crea(provider, pago)
+
+        self.assertEqual(provider.actualiza_estado(pago), PaymentStatus.PREAUTH)
+        with self.assertRaises(requests.HTTPError):
+            provider.commit(pago.transaction_id, pago)
+
+        requests.get(redireccion, timeout=5)
+        with self.assertRaises(RedirectNeeded):
+            provider.commit(pago.transaction_id, pago)
+        self.assertEqual(pago.status, PaymentStatus.CONFIRMED)
+        self.assertEqual(pago.attrs.commit_response["authorization_code"], "1213")
+        with self.assertRaises(requests.HTTPError):
+            provider.commit(pago.transaction_id, pago)
+
+        self.assertEqual(provider.refund(pago, 2500), 2500)
+        self.assertEqual(pago.attrs.refund_response["balance"], 7500)
+        self.assertEqual(requests.get(f"{url}/webpay/no-existe", timeout=5).status_code, 401)
+
+    def test_khipu_rechazos_y_bancos(self):
+        pasarelas = self.levanta(perfiles={"khipu": Perfil(rechazos=1.0)})
+        provider = KhipuProvider("khipu_key", f"{pasarelas.url}/khipu", persistencia=PERSISTENCIA)
+        pago = Pago(4, "khipu")
+        self.crea(provider, pago)
+        provider.actualiza_estado(pago)
+        self.assertEqual(pago.status, PaymentStatus.REJECTED)
+
+        bancos = requests.get(f"{pasarelas.url}/khipu/v3/banks", headers={"x-api-key": "khipu_key"}, timeout=5)
+        self.assertTrue(bancos.json()["banks"])
+        sin_cambios = requests.get(
+            f"{pasarelas.url}/khipu/v3/banks",
+            headers={"x-api-key": "khipu_key", "If-None-Match": bancos.headers["ETag"]},
+            timeout=5,
+        )
+        self.assertEqual(sin_cambios.status_code, 304)
+
+    def test_fallas_y_caidas(self):
+        pasarelas = self.levanta(perfiles={"flow": Perfil(fallas=1.0), "khipu": Perfil(caidas=1.0)})
+        self.assertEqual(requests.post(f"{pasarelas.url}/flow/payment/create", timeout=5).status_code, 503)
+        with self.assertRaises(requests.ConnectionError):
+            requests.get(f"{pasarelas.url}/khipu/v3/banks", timeout=5)
+        self.assertEqual((pasarelas.estadisticas.fallas, pasarelas.estadisticas.caidas), (1, 1))
+
+    def test_memoria_acotada(self):
+        flow = FlowFalso("http://flow", Perfil(), {"flow_key": "flow_secret"}, 100, True)
+        tokens = []
+        for numero in range(5000):
+            respuesta = flow.crea({"commerceOrder": f"orden-{numero}", "amount": "1000"})
+            tokens.append(respuesta.datos["token"])
+
+        # La capacidad cuenta pagos, no claves: el token y la orden de compra se descartan juntos
+        self.assertEqual(len(flow.pagos), 100)
+        self.assertEqual(flow.pagos.descartados, 5000 - 100)
+        self.assertEqual(flow.estado(tokens[0]).codigo, 400)
+        self.assertEqual(flow.estado(tokens[-1]).datos["status"], 2)
+
+    def test_descarte_por_pago(self):
+        flow = FlowFalso("http://flow", Perfil(), {"flow_key": "flow_secret"}, 2, True)
+        tokens = [
+            flow.crea({"commerceOrder": f"orden-{numero}", "amount": "1000"}).datos["token"] for numero in range(2)
+        ]
+
+        # Usar el pago por su orden de compra lo mantiene vivo también por su token
+        self.assertIsNotNone(flow.pagos.obtiene("orden:orden-0"))
+        flow.crea({"commerceOrder": "orden-2", "amount": "1000"})
+
+        self.assertEqual(flow.estado(tokens[0]).datos["commerceOrder"], "orden-0")
+        self.assertEqual(flow.estado(tokens[1]).codigo, 400)
+        self.assertIsNone(flow.pagos.obtiene("orden:orden-1"))
+        self.assertEqual(flow.crea({"commerceOrder": "orden-1", "amount": "1000"}).codigo, 200)
+        self.assertEqual((len(flow.pagos), flow.pagos.descartados), (2, 2))
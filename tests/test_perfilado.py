@@ -0,0 +1,126 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from payments import PaymentStatus, RedirectNeeded, get_payment_model
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.perfilado import PerfiladoMiddleware, estadisticas, mide, perfilador
+from django_payments_chile.testing import PasarelasFalsas, Perfil
+
+PERSISTENCIA = "django_payments_chile.persistencia.PersistenciaNula"
+
+
+class Pago:
+    variant = "flow"
+    currency = "CLP"
+    description = "Compra"
+    total = 10000
+    billing_email = "comprador@example.com"
+
+    def __init__(self, numero: int):
+        self.pk = numero
+        self.token = f"00000000-0000-4000-8000-{numero:012d}"
+        self.transaction_id = ""
+        self.extra_data = ""
+        self.status = PaymentStatus.WAITING
+        self.message = ""
+        self.attrs = type("attrs", (), {})()
+
+    def get_success_url(self):
+        return "http://tienda.local/exito"
+
+    def get_process_url(self):
+        return "http://tienda.local/proceso"
+
+
+class TestPerfilado(TestCase):
+    def setUp(self):
+        self.pasarelas = PasarelasFalsas(perfiles={"flow": Perfil(latencia=0.02)}).inicia()
+        self.addCleanup(self.pasarelas.detiene)
+
+    def provider(self, **opciones) -> FlowProvider:
+        url = f"{self.pasarelas.url}/flow"
+        return FlowProvider("flow_key", "flow_secret", url, persistencia=PERSISTENCIA, **opciones)
+
+    def test_desglose_en_attrs(self):
+        pago = Pago(1)
+        with self.assertRaises(RedirectNeeded):
+            self.provider(perfilado=True).get_form(pago)
+
+        tiempos = pago.attrs.tiempos
+        self.assertEqual(set(tiempos), {"urls", "firma", "http", "json", "otros", "total"})
+        self.assertGreaterEqual(tiempos["http"], 20)
+        self.assertAlmostEqual(sum(tiempos.values()) - tiempos["total"], tiempos["total"], delta=0.5)
+
+        sin_perfilado = Pago(2)
+        with self.assertRaises(RedirectNeeded):
+            self.provider().get_form(sin_perfilado)
+        self.assertFalse(hasattr(sin_perfilado.attrs, "tiempos"))
+
+    def test_estadisticas_de_un_lote(self):
+        provider = self.provider()
+
+        pagos = []
+
+        def crea(numero):
+            pagos.append(Pago(numero))
+            try:
+                provider.get_form(pagos[-1])
+            except RedirectNeeded:
+                pass
+
+        with estadisticas() as tiempos:
+            with ThreadPoolExecutor(max_workers=4) as ejecutor:
+                list(ejecutor.map(crea, range(8)))
+        crea(99)
+
+        resumen = tiempos.resumen()
+        self.assertEqual(list(resumen), ["get_form"])
+        self.assertEqual(resumen["get_form"]["http"]["n"], 8)
+        self.assertGreaterEqual(resumen["get_form"]["http"]["p50"], 20)
+        self.assertLessEqual(resumen["get_form"]["total"]["p50"], resumen["get_form"]["total"]["max"])
+        # Las estadísticas no escriben el desglose en pagos de proveedores sin perfilado
+        self.assertFalse(any(hasattr(pago.attrs, "tiempos") for pago in pagos))
+
+    def test_consultas_de_base_de_datos(self):
+        modelo = get_payment_model()
+        with mide() as medicion:
+            modelo.objects.create(variant="flow", total=1000, currency="CLP")
+            with mide() as interna:
+                modelo.objects.count()
+        self.assertEqual(interna.veces["bd"], 1)
+        self.assertGreater(medicion.veces["bd"], interna.veces["bd"])
+
+    @override_settings(PAYMENTS_CHILE_PERFILADO=True)
+    def test_server_timing(self):
+        provider = self.provider()
+
+        def vista(request):
+            try:
+                provider.get_form(Pago(3))
+            except RedirectNeeded:
+                pass
+            return HttpResponse()
+
+        respuesta = PerfiladoMiddleware(vista)(RequestFactory().get("/"))
+        self.assertRegex(respuesta["Server-Timing"], r"^urls;dur=[\d.]+, firma;dur=[\d.]+, http;dur=[\d.]+")
+
+        async def vista_asincrona(request):
+            return HttpResponse()
+
+        respuesta = asyncio.run(PerfiladoMiddleware(vista_asincrona)(RequestFactory().get("/")))
+        self.assertRegex(respuesta["Server-Timing"], r"^otros;dur=[\d.]+, total;dur=[\d.]+$")
+
+    def test_perfilador(self):
+        salida = StringIO()
+        with perfilador("cprofile", salida=salida):
+            sum(range(1000))
+        self.assertIn("function calls", salida.getvalue())
+        with perfilador(None):
+            pass
+        with self.assertRaises(ValueError):
+            with perfilador("otro"):
+                pass
@@ -0,0 +1,86 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from payments import PaymentStatus, get_payment_model
+from payments.signals import status_changed
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.persistencia import (
+    PersistenciaActualizacion,
+    PersistenciaLote,
+    PersistenciaModelo,
+    PersistenciaNula,
+    PersistenciaOutbox,
+)
+
+
+def crea_pago(**campos):
+    return get_payment_model().objects.create(variant="flow", total=5000, currency="CLP", **campos)
+
+
+class TestPersistencia(TestCase):
+    def setUp(self):
+        self.senales = []
+        status_changed.connect(self.recibe, dispatch_uid="test_persistencia")
+        self.addCleanup(status_changed.disconnect, dispatch_uid="test_persistencia")
+
+    def recibe(self, sender, instance, **kwargs):
+        self.senales.append((instance.pk, instance.status))
+
+    def test_por_defecto(self):
+        provider = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret")  # nosec
+        self.assertIsInstance(provider.persistencia, PersistenciaModelo)
+        provider = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret", outbox=True)  # nosec
+        self.assertIsInstance(provider.persistencia, PersistenciaOutbox)
+
+    def test_actualizacion_solo_campos_indicados(self):
+        pago = crea_pago()
+        copia = get_payment_model().objects.get(pk=pago.pk)
+        copia.description = "cambiada en otro proceso"
+        copia.save()
+
+        pago.transaction_id = "TOKEN_ID"
+        pago.attrs.respuesta_flow = {"token": "TOKEN_ID"}
+        persistencia = PersistenciaActualizacion()
+        persistencia.guarda(pago, ["transaction_id", "extra_data"])
+        persistencia.cambia_estado(pago, PaymentStatus.CONFIRMED)
+
+        pago.refresh_from_db()
+        self.assertEqual(pago.transaction_id, "TOKEN_ID")
+        self.assertEqual(pago.attrs.respuesta_flow, {"token": "TOKEN_ID"})
+        self.assertEqual(pago.description, "cambiada en otro proceso")
+        self.assertEqual(pago.status, PaymentStatus.CONFIRMED)
+        self.assertEqual(self.senales, [(pago.pk, PaymentStatus.CONFIRMED)])
+
+    def test_lote(self):
+        pagos = [crea_pago() for _ in range(5)]
+        with PersistenciaLote(tamano=3) as persistencia:
+            for pago in pagos:
+                pago.transaction_id = f"TOKEN_{pago.pk}"
+                persistencia.cambia_estado(pago, PaymentStatus.CONFIRMED)
+                persistencia.guarda(pago, ["transaction_id"])
+            # Al llegar a `tamano` pagos acumulados se escribe sin esperar el final
+            self.assertGreaterEqual(get_payment_model().objects.filter(status=PaymentStatus.CONFIRMED).count(), 3)
+
+        self.assertEqual(get_payment_model().objects.filter(status=PaymentStatus.CONFIRMED).count(), 5)
+        self.assertEqual(
+            sorted(get_payment_model().objects.values_list("transaction_id", flat=True)),
+            sorted(f"TOKEN_{pago.pk}" for pago in pagos),
+        )
+        self.assertEqual(len(self.senales), 5)
+
+    def test_nula(self):
+        pago = crea_pago()
+        persistencia = PersistenciaNula()
+        provider = FlowProvider(
+            api_key="flow_test_key", api_secret="flow_test_secret", persistencia=persistencia
+        )  # nosec
+        with patch("django_payments_chile.proveedor.requests.get") as mock_get:
+            mock_get.return_value.json.return_value = {"status": 2}
+            provider.actualiza_estado(pago)
+
+        self.assertEqual(pago.status, PaymentStatus.CONFIRMED)
+        self.assertEqual(persistencia.cambios, [(pago.pk, {"status": PaymentStatus.CONFIRMED, "message": ""})])
+        pago.refresh_from_db()
+        self.assertEqual(pago.status, PaymentStatus.WAITING)
+        self.assertEqual(self.senales, [])
@@ -0,0 +1,70 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from payments import PaymentStatus
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.plazos import PlazoAgotado, PlazoMiddleware, plazo, tiempo_restante, timeout_para
+
+
+class TestPlazos(TestCase):
+    def test_sin_plazo(self):
+        self.assertIsNone(tiempo_restante())
+        self.assertEqual(timeout_para(5), 5)
+
+    def test_timeout_ajustado_al_plazo(self):
+        with plazo(2):
+            self.assertLessEqual(timeout_para(5), 1.75)
+            self.assertEqual(timeout_para(1), 1)
+            with plazo(10):
+                self.assertLessEqual(tiempo_restante(), 2)
+        self.assertIsNone(tiempo_restante())
+
+    def test_plazo_agotado(self):
+        with plazo(0.5):
+            with self.assertRaises(PlazoAgotado):
+                timeout_para(5)
+
+    def test_middleware_header(self):
+        restantes = []
+
+        def vista(request):
+            restantes.append(tiempo_restante())
+            return HttpResponse()
+
+        middleware = PlazoMiddleware(vista)
+        middleware(RequestFactory().get("/", HTTP_X_REQUEST_TIMEOUT="3"))
+        with override_settings(PAYMENTS_CHILE_PLAZO_SEGUNDOS=8):
+            middleware(RequestFactory().get("/"))
+
+        self.assertTrue(2 < restantes[0] <= 3)
+        self.assertTrue(7 < restantes[1] <= 8)
+
+    def test_process_data_diferido(self):
+        payment = Mock(status=PaymentStatus.WAITING, token="TOKEN")
+        provider = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret")  # nosec
+        request = RequestFactory().post("/process", {"token": "TOKEN"})
+
+        with patch("django_payments_chile.proveedor.requests.get") as mock_get, plazo(0.1):
+            respuesta = provider.process_data(payment, request)
+
+        self.assertEqual(respuesta.status_code, 202)
+        mock_get.assert_not_called()
+        self.assertEqual(payment.status, PaymentStatus.WAITING)
+
+    def test_get_form_sin_plazo(self):
+        payment = Mock(status=PaymentStatus.WAITING, transaction_id="", currency="CLP", total=1000, billing_email="")
+        payment.attrs = type("attrs", (), {})()
+        provider = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret")  # nosec
+
+        with patch("django_payments_chile.proveedor.requests.post") as mock_post, plazo(0.1):
+            with self.assertRaises(PlazoAgotado):
+                provider.get_form(payment)
+
+        # El pago no se marca como fallido: sigue pendiente y se puede volver a intentar
+        mock_post.assert_not_called()
+        payment.change_status.assert_not_called()
+        self.assertEqual(payment.status, PaymentStatus.WAITING)
+        self.assertEqual(payment.transaction_id, "")
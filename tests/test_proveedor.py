@@ -0,0 +1,133 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from django.http import QueryDict
+from payments import PaymentError, PaymentStatus, RedirectNeeded
+
+from django_payments_chile.KhipuProvider import KhipuProvider
+from django_payments_chile.proveedor import ProveedorBase
+from django_payments_chile.WebpayProvider import WebpayProvider
+
+
+class payment_attrs:
+    pass
+
+
+class Payment(Mock):
+    id = 1
+    pk = 1
+    variant = "prueba"
+    description = "payment"
+    currency = "CLP"
+    status = PaymentStatus.WAITING
+    total = 5000
+    transaction_id = None
+    token = "5a4e3d2c-1b0a-4f9e-8d7c-6b5a4e3d2c1b"
+    billing_email = "correo@usuario.com"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attrs = payment_attrs()
+
+    def change_status(self, status, message=""):
+        self.status = status
+        self.message = message
+
+    def get_process_url(self):
+        return "https://mi-app.cl/process"
+
+    def get_success_url(self):
+        return "https://mi-app.cl/exito"
+
+
+class PasarelaPrueba(ProveedorBase):
+    pasarela = "prueba"
+    ENDPOINTS = {"sandbox": "https://sandbox.pasarela.cl/api/"}
+    RUTAS = {
+        "crear": ("post", "/cobros"),
+        "estado": ("get", "/cobros/{payment.transaction_id}"),
+        "reembolso": ("post", "/cobros/{payment.transaction_id}/devoluciones"),
+    }
+    ESTADOS = {"pagado": PaymentStatus.CONFIRMED, "rechazado": PaymentStatus.REJECTED}
+    CAMPO_NOTIFICACION = "id"
+
+    def __init__(self, api_endpoint: str = "sandbox", **kwargs):
+        super().__init__(api_endpoint, "cuenta", **kwargs)
+
+    def solicitud_creacion(self, payment) -> dict:
+        return {"monto": payment.total, "orden": payment.token}
+
+    def registra_creacion(self, payment, respuesta: dict) -> tuple:
+        payment.attrs.respuesta = respuesta
+        return respuesta["id"], respuesta["url"], [respuesta["id"]]
+
+
+def responde(datos: dict):
+    respuesta = Mock()
+    respuesta.raise_for_status.return_value = None
+    respuesta.json.return_value = datos
+    return respuesta
+
+
+class TestProveedorBase(TestCase):
+    def test_pasarela_declarativa(self):
+        provider = PasarelaPrueba()
+        payment = Payment()
+        self.assertEqual(provider.api_endpoint, "https://sandbox.pasarela.cl/api")
+
+        with patch("django_payments_chile.proveedor.requests.post") as post:
+            post.return_value = responde({"id": "cobro-1", "url": "https://pasarela.cl/pagar/cobro-1"})
+            with self.assertRaises(RedirectNeeded) as redireccion:
+                provider.get_form(payment)
+        self.assertEqual(str(redireccion.exception), "https://pasarela.cl/pagar/cobro-1")
+        self.assertEqual(post.call_args.args[0], "https://sandbox.pasarela.cl/api/cobros")
+        self.assertEqual(post.call_args.kwargs["json"], {"monto": 5000, "orden": payment.token})
+        self.assertEqual((payment.transaction_id, payment.status), ("cobro-1", PaymentStatus.WAITING))
+
+        with patch("django_payments_chile.proveedor.requests.get") as get:
+            get.return_value = responde({"status": "pagado"})
+            provider.process_data(payment, Mock(POST=QueryDict("id=cobro-1")))
+        self.assertEqual(get.call_args.args[0], "https://sandbox.pasarela.cl/api/cobros/cobro-1")
+        self.assertEqual(payment.status, PaymentStatus.CONFIRMED)
+
+        with patch("django_payments_chile.proveedor.requests.post") as post:
+            post.return_value = responde({"id": "devolucion-1"})
+            self.assertEqual(provider.refund(payment, 2000), 2000)
+        self.assertEqual(post.call_args.args[0], "https://sandbox.pasarela.cl/api/cobros/cobro-1/devoluciones")
+        self.assertEqual(post.call_args.kwargs["json"], {"amount": 2000})
+        self.assertEqual(payment.status, PaymentStatus.REFUNDED)
+
+    def test_error_al_crear(self):
+        provider = PasarelaPrueba()
+        payment = Payment()
+        with patch("django_payments_chile.proveedor.requests.post", side_effect=ConnectionError("caída")):
+            with self.assertRaises(PaymentError):
+                provider.get_form(payment)
+        self.assertEqual(payment.status, PaymentStatus.ERROR)
+
+    def test_urls_sin_doble_barra(self):
+        webpay = WebpayProvider("id", "secreto", "integracion", api_endpoints_alternativos=["https://respaldo.cl/"])
+        payment = Payment(transaction_id="01ab")
+        self.assertEqual(
+            webpay.url("estado", payment=payment),
+            "https://webpay3gint.transbank.cl/rswebpaytransaction/api/webpay/v1.2/transactions/01ab",
+        )
+        self.assertEqual(WebpayProvider("id", "secreto", "https://webpay.cl/").api_endpoint, "https://webpay.cl")
+        self.assertEqual(webpay._transporte.endpoints, ["https://webpay3gint.transbank.cl", "https://respaldo.cl"])
+
+    def test_reembolsos_con_transaction_id(self):
+        payment = Payment(transaction_id="01ab", status=PaymentStatus.CONFIRMED)
+        with patch("django_payments_chile.proveedor.requests.post") as post:
+            post.return_value = responde({"type": "REVERSED"})
+            WebpayProvider("id", "secreto", "integracion").refund(payment)
+        self.assertTrue(post.call_args.args[0].endswith("/transactions/01ab/refunds"))
+        self.assertEqual(post.call_args.kwargs["json"], {"amount": 5000})
+
+        khipu = KhipuProvider("llave")
+        self.assertEqual(khipu.api_endpoint, "https://payment-api.khipu.com")
+        payment = Payment(transaction_id="khipu-1", status=PaymentStatus.CONFIRMED)
+        with patch("django_payments_chile.proveedor.requests.post") as post:
+            post.return_value = responde({"message": "ok"})
+            khipu.refund(payment)
+        self.assertEqual(post.call_args.args[0], "https://payment-api.khipu.com/v3/payments/khipu-1/refunds")
+        self.assertEqual(post.call_args.kwargs["json"], {"amount": 5000})
@@ -0,0 +1,119 @@
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+from payments import PaymentStatus, RedirectNeeded, get_payment_model
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.models import ReferenciaPasarela
+from django_payments_chile.referencias import (
+    pk_por_referencia,
+    pks_por_referencias,
+    referencias_de,
+    registra_referencias,
+)
+
+
+class payment_attrs:
+    pass
+
+
+class Payment(Mock):
+    pk = 7
+    variant = "flow"
+    description = "payment"
+    currency = "CLP"
+    status = PaymentStatus.WAITING
+    message = None
+    total = 5000
+    token = "0b7e2c9a-5d41-4f3e-a2c8-6e1f9d3b7a20"
+    transaction_id = None
+    billing_email = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attrs = payment_attrs()
+
+    def change_status(self, status, message=""):
+        self.status = status
+        self.message = message
+
+    def get_process_url(self):
+        return "http://mi-app.cl/process"
+
+    def get_success_url(self):
+        return "http://mi-app.cl/exito"
+
+
+class TestReferencias(TestCase):
+    def test_registra_y_busca(self):
+        payment = Payment()
+        registra_referencias(payment, "TOKEN_ID", 1234, None)
+        registra_referencias(payment, "TOKEN_ID")
+
+        self.assertEqual(ReferenciaPasarela.objects.count(), 2)
+        self.assertEqual(pk_por_referencia("flow", "TOKEN_ID"), 7)
+        self.assertEqual(pk_por_referencia("flow", 1234), 7)
+        self.assertIsNone(pk_por_referencia("khipu", "TOKEN_ID"))
+        self.assertEqual(pks_por_referencias("flow", ["TOKEN_ID", "OTRO"]), {"TOKEN_ID": 7})
+
+    def test_referencias_de_extra_data(self):
+        payment = Payment()
+        payment.attrs.respuesta_flow = {"url": "https://flow.cl", "token": "TOKEN_ID", "flowOrder": 1234}
+        self.assertEqual(referencias_de(payment), ["TOKEN_ID", 1234])
+
+    def test_flow_registra_referencias(self):
+        payment = Payment()
+        provider = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret", referencias=True)  # nosec
+        with patch("django_payments_chile.proveedor.requests.post") as mock_post:
+            mock_post.return_value.json.return_value = {
+                "url": "https://flow.cl",
+                "token": "TOKEN_ID",
+                "flowOrder": 1234,
+            }
+            with self.assertRaises(RedirectNeeded):
+                provider.get_form(payment)
+
+        self.assertEqual(pks_por_referencias("flow", ["TOKEN_ID", "1234"]), {"TOKEN_ID": 7, "1234": 7})
+
+    def test_flow_token_desde_url_estatica(self):
+        provider = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret", referencias=True)  # nosec
+        request = RequestFactory().post("/payments/process/flow/", {"token": "TOKEN_ID"})
+        request.resolver_match = Mock(kwargs={"variant": "flow"})
+
+        with patch("django_payments_chile.referencias.token_por_referencia", return_value=Payment.token) as busqueda:
+            self.assertEqual(provider.get_token_from_request(payment=None, request=request), Payment.token)
+        busqueda.assert_called_once_with("flow", "TOKEN_ID")
+
+        sin_indice = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret")  # nosec
+        self.assertIsNone(sin_indice.get_token_from_request(payment=None, request=request))
+
+    def test_comando_indexa_referencias(self):
+        Pago = get_payment_model()
+        flow = Pago.objects.create(variant="flow", total=5000, currency="CLP", transaction_id="TOKEN_ID")
+        flow.attrs.respuesta_flow = {"token": "TOKEN_ID", "flowOrder": 1234}
+        flow.save()
+        khipu = Pago.objects.create(variant="khipu", total=5000, currency="CLP", transaction_id="khipu-1")
+        khipu.attrs.respuesta_khipu = {"payment_id": "khipu-1"}
+        khipu.save()
+        Pago.objects.create(variant="flow", total=5000, currency="CLP")
+
+        salida = StringIO()
+        call_command("indexa_referencias", "--variant", "flow", stdout=salida)
+        self.assertIn("1 pagos indexados", salida.getvalue())
+        self.assertEqual(pks_por_referencias("flow", ["TOKEN_ID", "1234"]), {"TOKEN_ID": flow.pk, "1234": flow.pk})
+        self.assertIsNone(pk_por_referencia("khipu", "khipu-1"))
+
+        call_command("indexa_referencias", "--lote", "1", stdout=StringIO())
+        self.assertEqual(pk_por_referencia("khipu", "khipu-1"), khipu.pk)
+        indice = list(
+            ReferenciaPasarela.objects.order_by("variant", "referencia").values_list("variant", "referencia")
+        )
+        self.assertEqual(indice, [("flow", "1234"), ("flow", "TOKEN_ID"), ("khipu", "khipu-1")])
+
+        call_command("indexa_referencias", stdout=StringIO())
+        self.assertEqual(
+            list(ReferenciaPasarela.objects.order_by("variant", "referencia").values_list("variant", "referencia")),
+            indice,
+        )
@@ -0,0 +1,92 @@
+import logging
+from unittest.mock import Mock, patch
+
+import requests
+from django.test import SimpleTestCase, override_settings
+from payments import PaymentStatus
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.registro import redacta, redacta_url, registra_llamada
+from django_payments_chile.transporte import Transporte
+
+API_KEY = "flow_test_key"  # nosec
+API_SECRET = "flow_test_secret"  # nosec
+
+
+class Payment(Mock):
+    token = "1f2e3d4c-5b6a-4798-8a9b-0c1d2e3f4a5b"
+    transaction_id = "C93B4FAD6D63ED9A3F25D21E5D6DD0105FA8CAAQ"
+    variant = "flow"
+    status = PaymentStatus.WAITING
+
+    def change_status(self, status, message=""):
+        self.status = status
+
+
+def respuesta(codigo=200, contenido=b'{"status": 2}'):
+    return Mock(status_code=codigo, content=contenido, json=Mock(return_value={"status": 2}))
+
+
+@override_settings(PAYMENTS_CHILE_REGISTRO_MUESTREO=1)
+class TestRegistro(SimpleTestCase):
+    def setUp(self):
+        self.provider = FlowProvider(api_key=API_KEY, api_secret=API_SECRET)
+
+    def test_un_registro_por_llamada(self):
+        with (
+            patch("django_payments_chile.proveedor.requests.get", return_value=respuesta()),
+            self.assertLogs("django_payments_chile.llamadas", logging.INFO) as registros,
+        ):
+            self.provider.actualiza_estado(Payment())
+
+        [registro] = registros.records
+        evento = registro.payments_chile
+        self.assertEqual(registro.levelno, logging.INFO)
+        self.assertEqual((evento["pasarela"], evento["variant"], evento["operacion"]), ("flow", "flow", "estado"))
+        self.assertEqual((evento["ruta"], evento["codigo"]), ("/api/payment/getStatus", 200))
+        self.assertEqual(len(evento["huella"]), 12)
+        self.assertNotIn("parametros", evento)
+        self.assertNotIn(API_KEY, registro.getMessage())
+
+    def test_debug_oculta_secretos(self):
+        with (
+            patch("django_payments_chile.proveedor.requests.get", return_value=respuesta()),
+            self.assertLogs("django_payments_chile.llamadas", logging.DEBUG) as registros,
+        ):
+            self.provider.actualiza_estado(Payment())
+
+        datos = registros.records[0].payments_chile["parametros"]["params"]
+        self.assertEqual((datos["apiKey"], datos["s"]), ("***", "***"))
+        self.assertEqual(datos["token"], Payment.transaction_id)
+
+    @override_settings(PAYMENTS_CHILE_REGISTRO_MUESTREO=0)
+    def test_muestreo_solo_de_exitos(self):
+        transporte = Transporte("flow", API_KEY)
+        with self.assertNoLogs("django_payments_chile.llamadas", logging.INFO):
+            transporte.solicita("estado", Mock(return_value=respuesta()), "https://www.flow.cl/api/x")
+
+        with self.assertLogs("django_payments_chile.llamadas", logging.INFO) as registros:
+            transporte.solicita("estado", Mock(return_value=respuesta(500)), "https://www.flow.cl/api/x")
+            with self.assertRaises(requests.ConnectionError):
+                transporte.solicita(
+                    "estado", Mock(side_effect=requests.ConnectionError("caida")), "https://www.flow.cl/api/x"
+                )
+        self.assertEqual([registro.levelno for registro in registros.records], [logging.WARNING] * 2)
+        self.assertEqual(registros.records[1].payments_chile["error"], "ConnectionError")
+
+    def test_sin_logger_no_calcula(self):
+        logging.getLogger("django_payments_chile.llamadas").disabled = True
+        self.addCleanup(setattr, logging.getLogger("django_payments_chile.llamadas"), "disabled", False)
+        with patch("django_payments_chile.registro.huella_cuerpo") as huella:
+            registra_llamada("flow", "flow", "estado", "GET", "https://www.flow.cl/api/x", 0.1, respuesta())
+        huella.assert_not_called()
+
+    def test_redacta(self):
+        self.assertEqual(
+            redacta({"Tbk-Api-Key-Secret": "secreto", "Tbk-Api-Key-Id": "597", "buy_order": "1"}),
+            {"Tbk-Api-Key-Secret": "***", "Tbk-Api-Key-Id": "***", "buy_order": "1"},
+        )
+        self.assertEqual(
+            redacta_url("/api/payment/getStatus?apiKey=k&token=t&s=f"),
+            "/api/payment/getStatus?apiKey=***&token=t&s=***",
+        )
@@ -0,0 +1,117 @@
+from unittest.mock import Mock, patch
+
+import requests
+from django.test import SimpleTestCase, override_settings
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.plazos import plazo
+from django_payments_chile.reintentos import ConfiguracionReintentos, Reintentos
+from django_payments_chile.salud import salud
+from django_payments_chile.transporte import Transporte
+
+URL = "https://www.flow.cl/api/payment/getStatus"
+
+
+def responde(codigo: int = 200, datos: dict = None):
+    respuesta = Mock(status_code=codigo)
+    respuesta.json.return_value = datos or {}
+    return respuesta
+
+
+class Pago:
+    variant = "flow"
+    token = "2c3d4e5f-6a7b-4c8d-9e0f-1a2b3c4d5e6f"
+    transaction_id = "TOKEN_ID"
+    status = "waiting"
+    total = 5000
+
+    def __init__(self):
+        self.attrs = type("attrs", (), {})()
+
+    def change_status(self, status, message=""):
+        self.status = status
+
+    def save(self, **kwargs):
+        pass
+
+
+class TestReintentos(SimpleTestCase):
+    def setUp(self):
+        salud.reinicia()
+        self.addCleanup(salud.reinicia)
+        espera = patch("django_payments_chile.transporte.sleep")
+        self.sleep = espera.start()
+        self.addCleanup(espera.stop)
+
+    def test_reintenta_la_lectura_con_backoff(self):
+        transporte = Transporte("flow", "cuenta", reintentos={"intentos": 2, "espera": 0.1})
+        metodo = Mock(side_effect=[requests.ConnectionError("caída"), requests.Timeout("lenta"), responde()])
+
+        self.assertEqual(transporte.solicita("estado", metodo, URL, idempotente=True).status_code, 200)
+        self.assertEqual(metodo.call_count, 3)
+        primera, segunda = (llamada.args[0] for llamada in self.sleep.call_args_list)
+        self.assertTrue(0 <= primera <= 0.1 and 0 <= segunda <= 0.2)
+        self.assertEqual(transporte.reintentos.reintentos, 2)
+
+    def test_intentos_acotados(self):
+        transporte = Transporte("flow", "cuenta", reintentos={"intentos": 2})
+        metodo = Mock(return_value=responde(503))
+        self.assertEqual(transporte.solicita("estado", metodo, URL, idempotente=True).status_code, 503)
+        self.assertEqual(metodo.call_count, 3)
+
+        metodo = Mock(side_effect=requests.ConnectionError("caída"))
+        with self.assertRaises(requests.ConnectionError):
+            transporte.solicita("estado", metodo, URL, idempotente=True)
+        self.assertEqual(metodo.call_count, 3)
+
+        # Un 4xx es una respuesta de la pasarela, no una falla transitoria
+        metodo = Mock(return_value=responde(400))
+        self.assertEqual(transporte.solicita("estado", metodo, URL, idempotente=True).status_code, 400)
+        self.assertEqual(metodo.call_count, 1)
+
+    def test_no_reintenta_operaciones_con_efectos(self):
+        transporte = Transporte("flow", "cuenta", reintentos=True)
+        metodo = Mock(side_effect=requests.ConnectionError("caída"))
+        with self.assertRaises(requests.ConnectionError):
+            transporte.solicita("reembolso", metodo, URL)
+        self.assertEqual(metodo.call_count, 1)
+        self.sleep.assert_not_called()
+
+    def test_dentro_del_plazo(self):
+        transporte = Transporte("flow", "cuenta", reintentos={"intentos": 3, "espera": 10, "espera_maxima": 10})
+        transporte.reintentos.azar = Mock(uniform=Mock(return_value=0.6))
+        metodo = Mock(side_effect=requests.ConnectionError("caída"))
+
+        # Con 1,5 s de plazo cabe una espera de 0,6 s y otra llamada, pero no una segunda espera
+        with plazo(1.5), patch("django_payments_chile.reintentos.tiempo_restante", side_effect=[1.5, 0.9]):
+            with self.assertRaises(requests.ConnectionError):
+                transporte.solicita("estado", metodo, URL, idempotente=True)
+        self.assertEqual(metodo.call_count, 2)
+        self.sleep.assert_called_once_with(0.6)
+
+    def test_presupuesto(self):
+        reintentos = Reintentos(ConfiguracionReintentos(intentos=5, presupuesto=0.5))
+        self.assertEqual(sum(reintentos.espera(0) is not None for _ in range(15)), 10)
+        reintentos.registra_llamada()
+        reintentos.registra_llamada()
+        self.assertIsNotNone(reintentos.espera(0))
+        self.assertIsNone(reintentos.espera(0))
+        self.assertIsNone(Reintentos(ConfiguracionReintentos(intentos=1)).espera(1))
+
+    @override_settings(PAYMENTS_CHILE_CIRCUITO={"fallas": 2, "enfriamiento": 30})
+    def test_circuito_abierto_corta_los_reintentos(self):
+        transporte = Transporte("flow", "cuenta", reintentos={"intentos": 5})
+        metodo = Mock(side_effect=requests.ConnectionError("caída"))
+        with self.assertRaises(requests.ConnectionError):
+            transporte.solicita("estado", metodo, URL, idempotente=True)
+        self.assertEqual(metodo.call_count, 2)
+
+    def test_consulta_de_estado_del_proveedor(self):
+        provider = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret", reintentos=True)  # nosec
+        with patch("django_payments_chile.proveedor.requests.get") as get:
+            get.side_effect = [requests.ConnectionError("caída"), responde(datos={"status": 2})]
+            self.assertEqual(provider.actualiza_estado(Pago())["status"], 2)
+        self.assertEqual(get.call_count, 2)
+
+        sin_reintentos = FlowProvider(api_key="flow_test_key", api_secret="flow_test_secret")  # nosec
+        self.assertIsNone(sin_reintentos._transporte.reintentos)
@@ -0,0 +1,89 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from payments import PaymentStatus, get_payment_model
+
+from django_payments_chile.models import ResumenDiario
+from django_payments_chile.reportes import actualiza_resumen, codigo_rechazo, describe_rechazo, resumen, totales
+
+HOY = timezone.now() - timedelta(hours=1)
+AYER = HOY - timedelta(days=1)
+
+
+def crea_pago(creado, status=PaymentStatus.CONFIRMED, total=1000, variant="webpay", codigo=None, **campos):
+    pago = get_payment_model().objects.create(variant=variant, total=total, currency="CLP", status=status, **campos)
+    if codigo is not None:
+        pago.attrs.commit_response = {"status": "FAILED", "response_code": codigo}
+        pago.save()
+    get_payment_model().objects.filter(pk=pago.pk).update(created=creado, modified=creado)
+    return pago
+
+
+class TestReportes(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_codigos_de_rechazo(self):
+        self.assertEqual(codigo_rechazo('{"commit_response": {"response_code": -1}}'), "-1")
+        self.assertEqual(codigo_rechazo('{"commit_response": {"response_code": 0}}', "Vencido"), "Vencido")
+        self.assertEqual(codigo_rechazo(""), "sin código")
+        self.assertTrue(describe_rechazo("-4").startswith("Rechazo - Rechazada por parte del emisor"))
+        self.assertEqual(describe_rechazo("Vencido"), "Vencido")
+
+    def test_resumen_por_dia(self):
+        for _ in range(3):
+            crea_pago(AYER, total=2000)
+        crea_pago(AYER, status=PaymentStatus.REFUNDED, total=500)
+        crea_pago(AYER, status=PaymentStatus.REJECTED, codigo=-1)
+        crea_pago(AYER, status=PaymentStatus.REJECTED, codigo=-1)
+        crea_pago(AYER, status=PaymentStatus.REJECTED, message="Pago vencido")
+        crea_pago(HOY)
+        crea_pago(AYER, variant="flow")
+
+        self.assertEqual(actualiza_resumen("webpay"), 2)
+
+        fila = ResumenDiario.objects.get(variant="webpay", fecha=timezone.localdate(AYER))
+        self.assertEqual((fila.pagos, fila.confirmados, fila.rechazados, fila.reembolsados), (7, 3, 3, 1))
+        self.assertEqual((fila.monto_confirmado, fila.monto_reembolsado), (Decimal(6000), Decimal(500)))
+        self.assertEqual(fila.rechazos, {"-1": 2, "Pago vencido": 1})
+        self.assertEqual(fila.tasa_reembolso, 0.25)
+        self.assertFalse(ResumenDiario.objects.filter(variant="flow").exists())
+
+        total = totales("webpay")
+        self.assertEqual((total.pagos, total.confirmados), (8, 4))
+        self.assertEqual(total.rechazos_descritos()[0][:2], ("-1", describe_rechazo("-1")))
+
+    def test_incremental(self):
+        anterior = crea_pago(AYER - timedelta(days=1))
+        crea_pago(AYER)
+        self.assertEqual(actualiza_resumen("webpay", ahora=HOY), 2)
+        self.assertEqual(resumen("webpay", desde=timezone.localdate(AYER))[0].confirmados, 1)
+
+        # Solo se recalcula el día del pago modificado después de la corrida anterior
+        anterior.refresh_from_db()
+        anterior.status = PaymentStatus.REFUNDED
+        anterior.save()
+        with self.assertNumQueries(5):
+            self.assertEqual(actualiza_resumen("webpay"), 1)
+        fila = ResumenDiario.objects.get(fecha=timezone.localdate(anterior.created))
+        self.assertEqual((fila.confirmados, fila.reembolsados), (0, 1))
+        self.assertEqual(actualiza_resumen("webpay"), 1)
+
+        # Las lecturas se sirven del cache hasta la siguiente actualización
+        resumen("webpay")
+        with self.assertNumQueries(0):
+            self.assertEqual(len(resumen("webpay")), 2)
+        self.assertEqual(actualiza_resumen("webpay", completo=True), 2)
+        with self.assertNumQueries(1):
+            resumen("webpay")
+
+    def test_comando(self):
+        crea_pago(AYER)
+        salida = StringIO()
+        call_command("actualiza_resumen", variant=["webpay"], stdout=salida)
+        self.assertIn("webpay: 1 días recalculados", salida.getvalue())
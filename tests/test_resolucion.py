@@ -0,0 +1,136 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import requests
+from django.test import SimpleTestCase, override_settings
+from payments import RedirectNeeded
+
+from django_payments_chile.FlowProvider import FlowProvider
+from django_payments_chile.resolucion import ResolutorEstatico, cache_dns
+from django_payments_chile.salud import salud
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):  # noqa
+        pass
+
+    def do_GET(self):  # noqa
+        cuerpo = json.dumps({"status": 2, "host": self.headers["Host"]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+
+class TestResolucion(SimpleTestCase):
+    def setUp(self):
+        salud.reinicia()
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Manejador)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        self.puerto = self.servidor.server_address[1]
+
+        self.resolutor = ResolutorEstatico({"pasarela.prueba": (["127.0.0.1"], 60), "caida.prueba": ["127.0.0.1"]})
+        cache_dns.resolutor = self.resolutor
+        self.addCleanup(setattr, cache_dns, "_resolutor", None)
+        self.addCleanup(cache_dns.limpia)
+
+    def test_cache_respeta_ttl(self):
+        self.assertEqual(cache_dns.resuelve("pasarela.prueba", 443), ["127.0.0.1"])
+        self.assertEqual(cache_dns.resuelve("pasarela.prueba", 443), ["127.0.0.1"])
+        self.assertEqual(self.resolutor.consultas, 1)
+
+        self.resolutor.registros["pasarela.prueba"] = (["127.0.0.2"], 0)
+        with patch("django_payments_chile.resolucion.time.monotonic", return_value=10**9):
+            self.assertEqual(cache_dns.resuelve("pasarela.prueba", 443), ["127.0.0.2"])
+        self.assertEqual(self.resolutor.consultas, 2)
+
+    @override_settings(PAYMENTS_CHILE_DNS_OBSOLETO=300)
+    def test_usa_direcciones_vencidas_si_el_resolutor_falla(self):
+        with override_settings(PAYMENTS_CHILE_DNS_TTL=0):
+            cache_dns.resuelve("caida.prueba", 443)
+        del self.resolutor.registros["caida.prueba"]
+        self.assertEqual(cache_dns.resuelve("caida.prueba", 443), ["127.0.0.1"])
+        with self.assertRaises(socket.gaierror):
+            cache_dns.resuelve("desconocido.prueba", 443)
+
+    def test_falla_de_dns(self):
+        provider = FlowProvider(
+            api_key="flow_test_key",
+            api_secret="flow_test_secret",
+            api_endpoint=f"http://desconocido.prueba:{self.puerto}",
+        )  # nosec
+        with self.assertRaises(requests.ConnectionError):
+            provider.actualiza_estado(Pago())
+        # urllib3 1.26 no tiene NameResolutionError
+        with patch("django_payments_chile.resolucion.NameResolutionError", None):
+            with self.assertRaises(requests.ConnectionError):
+                provider.actualiza_estado(Pago())
+
+    def test_conexion_por_cache(self):
+        provider = FlowProvider(
+            api_key="flow_test_key",
+            api_secret="flow_test_secret",
+            api_endpoint=f"http://pasarela.prueba:{self.puerto}",
+        )  # nosec
+        self.assertEqual(provider.actualiza_estado(Pago())["host"], f"pasarela.prueba:{self.puerto}")
+
+    @override_settings(PAYMENTS_CHILE_FAILOVER_FALLAS=1)
+    def test_failover_a_endpoint_alternativo(self):
+        provider = FlowProvider(
+            api_key="flow_test_key",
+            api_secret="flow_test_secret",
+            api_endpoint="http://caida.prueba:9",
+            api_endpoints_alternativos=[f"http://pasarela.prueba:{self.puerto}"],
+        )  # nosec
+        # La consulta de estado es idempotente: se repite en el endpoint alternativo
+        self.assertEqual(provider.actualiza_estado(Pago())["host"], f"pasarela.prueba:{self.puerto}")
+        self.assertFalse(salud.sano("caida.prueba"))
+
+        # Con el endpoint principal marcado como caído, la creación va directo al alternativo
+        with patch("django_payments_chile.conexiones.requests.Session.request") as request:
+            request.return_value.json.return_value = {"url": "https://flow.cl", "token": "T", "flowOrder": 1}
+            with self.assertRaises(RedirectNeeded):
+                provider.get_form(Pago())
+        self.assertTrue(request.call_args.args[1].startswith(f"http://pasarela.prueba:{self.puerto}/"))
+
+    def test_lectura_no_idempotente_no_se_repite(self):
+        provider = FlowProvider(
+            api_key="flow_test_key",
+            api_secret="flow_test_secret",
+            api_endpoint="http://caida.prueba:9",
+            api_endpoints_alternativos=[f"http://pasarela.prueba:{self.puerto}"],
+        )  # nosec
+        with self.assertRaises(requests.ConnectionError):
+            provider._transporte.solicita("reembolso", requests.post, "http://caida.prueba:9/refund/create")
+
+
+class Pago:
+    variant = "flow"
+    token = "1f2e3d4c-5b6a-4798-8a9b-0c1d2e3f4a5b"
+    transaction_id = None
+    status = "waiting"
+    description = "payment"
+    currency = "CLP"
+    total = 5000
+    billing_email = None
+
+    def __init__(self):
+        self.attrs = type("attrs", (), {})()
+
+    def change_status(self, status, message=""):
+        self.status = status
+
+    def save(self):
+        pass
+
+    def get_success_url(self):
+        return "http://mi-app.cl/exito"
+
+    def get_process_url(self):
+        return "http://mi-app.cl/process"
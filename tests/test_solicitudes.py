@@ -0,0 +1,61 @@
+from decimal import Decimal
+from unittest import TestCase
+from unittest.mock import Mock
+
+from django_payments_chile.clientes import ClienteAPI
+from django_payments_chile.solicitudes import SolicitudFlow, SolicitudKhipu, huella
+
+
+class payment_attrs:
+    pass
+
+
+class Payment(Mock):
+    description = "payment"
+    currency = "CLP"
+    total = 5000
+    token = "5a4e3d2c-1b0a-4f9e-8d7c-6b5a4e3d2c1b"
+    billing_email = "correo@usuario.com"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attrs = payment_attrs()
+
+    def get_process_url(self):
+        return "http://mi-app.cl/process"
+
+    def get_success_url(self):
+        return "http://mi-app.cl/exito"
+
+
+class TestSolicitudes(TestCase):
+    def test_flow_no_modifica_datos_extra(self):
+        payment = Payment()
+        payment.attrs.datos_extra = {"amount": 1, "currency": "USD", "optional": "{}", "timeout": 600}
+        solicitud = SolicitudFlow("flow_test_key", "flow_test_secret", 9).crear_pago(payment)  # nosec
+
+        self.assertEqual(payment.attrs.datos_extra, {"amount": 1, "currency": "USD", "optional": "{}", "timeout": 600})
+        self.assertEqual(solicitud["amount"], 5000)
+        self.assertEqual(solicitud["currency"], "CLP")
+        self.assertEqual(solicitud["timeout"], 600)
+        self.assertEqual(solicitud["email"], "correo@usuario.com")
+
+        sin_firma = {clave: valor for clave, valor in solicitud.items() if clave != "s"}
+        self.assertEqual(list(sin_firma), sorted(sin_firma))
+        self.assertEqual(solicitud["s"], ClienteAPI.genera_firma(sin_firma, "flow_test_secret"))
+
+    def test_khipu_campos_reservados(self):
+        payment = Payment()
+        payment.attrs.datos_extra = {"transaction_id": "otro", "notify_url": "http://otro", "body": "detalle"}
+        solicitud = SolicitudKhipu().crear_pago(payment)
+
+        self.assertEqual(solicitud["transaction_id"], payment.token)
+        self.assertEqual(solicitud["notify_url"], "http://mi-app.cl/process")
+        self.assertEqual(solicitud["amount"], Decimal(5000))
+        self.assertEqual(solicitud["body"], "detalle")
+        self.assertEqual(solicitud["payer_email"], "correo@usuario.com")
+
+    def test_huella(self):
+        self.assertEqual(huella({"a": 1, "b": Decimal("2.5")}), huella({"b": Decimal("2.5"), "a": 1}))
+        self.assertNotEqual(huella({"a": 1}), huella({"a": 2}))
+        self.assertEqual(len(huella({"a": 1})), 16)
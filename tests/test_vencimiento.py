@@ -0,0 +1,80 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from payments import PaymentStatus, get_payment_model
+from payments.core import PROVIDER_CACHE
+
+from django_payments_chile.vencimiento import MENSAJE_VENCIDO, barre_vencidos
+
+VARIANTES = {
+    "flow": (
+        "django_payments_chile.providers.FlowProvider",
+        {"api_key": "flow_test_key", "api_secret": "flow_test_secret", "vencimiento": 3600},
+    ),
+}
+
+
+def crea_pago(antiguedad: float, **campos):
+    pago = get_payment_model().objects.create(variant="flow", total=5000, currency="CLP", **campos)
+    get_payment_model().objects.filter(pk=pago.pk).update(modified=timezone.now() - timedelta(seconds=antiguedad))
+    return pago
+
+
+def estado_de(pago) -> str:
+    pago.refresh_from_db()
+    return pago.status
+
+
+@override_settings(PAYMENT_VARIANTS=VARIANTES)
+class TestVencimiento(TestCase):
+    def setUp(self):
+        cache.clear()
+        PROVIDER_CACHE.clear()
+        self.addCleanup(PROVIDER_CACHE.clear)
+
+    def test_vence_solo_pendientes_antiguos(self):
+        abandonados = [crea_pago(7200) for _ in range(5)]
+        preautorizado = crea_pago(7200, status=PaymentStatus.PREAUTH)
+        reciente = crea_pago(60)
+        confirmado = crea_pago(7200, status=PaymentStatus.CONFIRMED)
+
+        with patch("django_payments_chile.proveedor.requests.get") as mock_get:
+            resultado = barre_vencidos("flow", lote=2)
+
+        mock_get.assert_not_called()
+        self.assertEqual((resultado.revisados, resultado.vencidos), (6, 6))
+        for pago in [*abandonados, preautorizado]:
+            self.assertEqual(estado_de(pago), PaymentStatus.REJECTED)
+            self.assertEqual(pago.message, MENSAJE_VENCIDO)
+        self.assertEqual(estado_de(reciente), PaymentStatus.WAITING)
+        self.assertEqual(estado_de(confirmado), PaymentStatus.CONFIRMED)
+
+    def test_confirma_con_la_pasarela(self):
+        pagado = crea_pago(7200, transaction_id="TOKEN_PAGADO")
+        abandonado = crea_pago(7200, transaction_id="TOKEN_ABANDONADO")
+        caido = crea_pago(7200, transaction_id="TOKEN_CAIDO")
+        estados = {"TOKEN_PAGADO": 2, "TOKEN_ABANDONADO": 1}
+
+        def consulta(url, params, **kwargs):
+            if params["token"] not in estados:
+                raise ConnectionError("sin respuesta")
+            return Mock(json=Mock(return_value={"status": estados[params["token"]]}))
+
+        with patch("django_payments_chile.proveedor.requests.get", side_effect=consulta):
+            resultado = barre_vencidos("flow", hilos=3, tasa=100)
+
+        self.assertEqual((resultado.vencidos, resultado.resueltos, resultado.errores), (1, 1, 1))
+        self.assertEqual(estado_de(pagado), PaymentStatus.CONFIRMED)
+        self.assertEqual(estado_de(abandonado), PaymentStatus.REJECTED)
+        self.assertEqual(estado_de(caido), PaymentStatus.WAITING)
+
+    def test_comando(self):
+        crea_pago(600)
+        salida = StringIO()
+        call_command("barre_vencidos", vencimiento=300, stdout=salida)
+        self.assertIn("flow: 1 revisados, 1 vencidos", salida.getvalue())
@@ -0,0 +1,9 @@
+from django.http import HttpResponse
+from django.urls import include, path
+
+urlpatterns = [
+    path("payments/", include("payments.urls")),
+    path("payments/chile/", include("django_payments_chile.urls")),
+    path("payments/<int:pk>/success", HttpResponse, name="payment_success"),
+    path("payments/<int:pk>/failure", HttpResponse, name="payment_failure"),
+]
@@ -1,4 +1,18 @@
 from django.contrib import admin
 
-# Register your models here.
-admin.site.check = 1
+from .models import Pago
+
+
+@admin.register(Pago)
+class PagoAdmin(admin.ModelAdmin):
+    # Solo columnas: el listado no decodifica `extra_data` de cada pago
+    list_display = ("id", "variant", "status", "total", "currency", "transaction_id", "created")
+    list_filter = ("variant", "status")
+    search_fields = ("=transaction_id", "=token")
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith("changelist"):
+            queryset = queryset.defer("extra_data")
+        return queryset
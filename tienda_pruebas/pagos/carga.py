@@ -0,0 +1,216 @@
+"""
+Generador de carga para la tienda de pruebas.
+
+Cada comprador recorre el flujo completo de un pago: `crear_pago`, la redirección a la
+pasarela, la notificación de la pasarela a la URL de proceso y la página de éxito.
+Las pasarelas son las de `django_payments_chile.testing`, por lo que no se sale a internet.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from django.db import OperationalError, connection
+from django.test import Client, override_settings
+from payments import core, get_payment_model
+
+from django_payments_chile.testing import PasarelasFalsas
+
+PASOS = ("crear_pago", "redireccion", "notificacion", "exito")
+
+
+def variantes_falsas(url: str) -> dict:
+    """Configuración de `PAYMENT_VARIANTS` apuntando a las pasarelas falsas en `url`."""
+    return {
+        "flow": (
+            "django_payments_chile.providers.FlowProvider",
+            {"api_key": "flow_key", "api_secret": "flow_secret", "api_endpoint": f"{url}/flow"},
+        ),
+        "khipu": (
+            "django_payments_chile.providers.KhipuProvider",
+            {"api_key": "khipu_key", "api_endpoint": f"{url}/khipu"},
+        ),
+        "webpay": (
+            "django_payments_chile.providers.WebpayProvider",
+            {"api_key_id": "597055555532", "api_key_secret": "webpay_secret", "api_endpoint": f"{url}/webpay/"},
+        ),
+    }
+
+
+def _percentil(valores: list, percentil: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(percentil / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+@dataclass
+class MetricasVariante:
+    """Métricas acumuladas para una variante de pago."""
+
+    compras: int = 0
+    errores: int = 0
+    consultas_bd: int = 0
+    tiempo_bd: float = 0.0
+    bloqueos: int = 0
+    consulta_mas_lenta: float = 0.0
+    ultimo_error: str = ""
+    latencias: dict = field(default_factory=lambda: defaultdict(list))
+    duracion: float = 0.0
+
+    def resumen(self) -> dict:
+        pasos = {}
+        for paso in PASOS:
+            valores = self.latencias.get(paso, [])
+            pasos[paso] = {
+                "p50": _percentil(valores, 50),
+                "p95": _percentil(valores, 95),
+                "p99": _percentil(valores, 99),
+                "max": max(valores, default=0.0),
+            }
+        return {
+            "compras": self.compras,
+            "errores": self.errores,
+            "compras_por_segundo": self.compras / self.duracion if self.duracion else 0.0,
+            "consultas_por_compra": self.consultas_bd / self.compras if self.compras else 0.0,
+            "tiempo_bd": self.tiempo_bd,
+            "bloqueos": self.bloqueos,
+            "consulta_mas_lenta": self.consulta_mas_lenta,
+            "ultimo_error": self.ultimo_error,
+            "pasos": pasos,
+        }
+
+
+class _ContadorConsultas:
+    """
+    `execute_wrapper` que cuenta consultas, su duración y los bloqueos de la base de datos.
+
+    Con `timeout` en SQLite la contención no falla sino que espera, por eso además del número de
+    bloqueos se guarda la consulta más lenta.
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+        self.maximo = 0.0
+        self.bloqueos = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            if "locked" in str(e):
+                self.bloqueos += 1
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.tiempo += duracion
+            self.maximo = max(self.maximo, duracion)
+
+
+class GeneradorCarga:
+    """
+    Ejecuta compradores concurrentes contra la tienda usando el cliente de pruebas de Django.
+
+    Args:
+        variantes (list[str]): Variantes de `PAYMENT_VARIANTS` a ejercitar.
+        compradores (int): Compradores por variante.
+        concurrencia (int): Compradores ejecutándose al mismo tiempo.
+    """
+
+    def __init__(self, variantes: list, compradores: int = 100, concurrencia: int = 10):
+        self.variantes = variantes
+        self.compradores = compradores
+        self.concurrencia = concurrencia
+        self._lock = threading.Lock()
+
+    def _paso(self, metricas: MetricasVariante, paso: str, funcion):
+        contador = _ContadorConsultas()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contador):
+            respuesta = funcion()
+        duracion = time.perf_counter() - inicio
+        with self._lock:
+            metricas.latencias[paso].append(duracion)
+            metricas.consultas_bd += contador.consultas
+            metricas.tiempo_bd += contador.tiempo
+            metricas.bloqueos += contador.bloqueos
+            metricas.consulta_mas_lenta = max(metricas.consulta_mas_lenta, contador.maximo)
+        if respuesta.status_code >= 400:
+            raise AssertionError(f"{paso}: HTTP {respuesta.status_code}")
+        return respuesta
+
+    def _notificacion(self, variante: str, pago, url_pasarela: str) -> dict:
+        """Datos que envía la pasarela a la URL de proceso."""
+        if variante == "webpay":
+            return {"token_ws": parse_qs(urlsplit(url_pasarela).query)["token_ws"][0]}
+        if variante == "khipu":
+            return {"transaction_id": pago.transaction_id}
+        return {"token": pago.transaction_id}
+
+    def _comprador(self, variante: str, metricas: MetricasVariante):
+        cliente = Client(raise_request_exception=False)
+        try:
+            respuesta = self._paso(
+                metricas, "crear_pago", lambda: cliente.get("/tienda/crear-pago", {"variant": variante})
+            )
+            url_pagar = respuesta["Location"]
+            respuesta = self._paso(metricas, "redireccion", lambda: cliente.get(url_pagar))
+            url_pasarela = respuesta["Location"]
+
+            pk = int(url_pagar.rstrip("/").rsplit("/", 1)[-1])
+            pago = get_payment_model().objects.only("token", "transaction_id").get(pk=pk)
+            datos = self._notificacion(variante, pago, url_pasarela)
+            self._paso(metricas, "notificacion", lambda: cliente.post(pago.get_process_url(), datos))
+
+            self._paso(metricas, "exito", lambda: cliente.get(f"/payments/{pk}/success"))
+        except Exception as e:  # noqa
+            with self._lock:
+                metricas.errores += 1
+                metricas.ultimo_error = repr(e)
+        else:
+            with self._lock:
+                metricas.compras += 1
+        finally:
+            connection.close()
+
+    def ejecuta(self, latencia: float = 0.0, url_pasarelas: Optional[str] = None) -> dict:
+        """
+        Ejecuta la carga y devuelve un resumen por variante.
+
+        Args:
+            latencia (float): Latencia simulada de cada llamada a las pasarelas falsas.
+            url_pasarelas (str | None): URL de pasarelas ya levantadas; si es `None` se levantan las falsas.
+
+        Returns:
+            dict: Resumen de métricas por variante.
+        """
+        pasarelas = None
+        if url_pasarelas is None:
+            pasarelas = PasarelasFalsas(latencia=latencia).inicia()
+            url_pasarelas = pasarelas.url
+
+        resultados = {}
+        try:
+            with override_settings(PAYMENT_VARIANTS=variantes_falsas(url_pasarelas)):
+                core.PROVIDER_CACHE.clear()
+                for variante in self.variantes:
+                    metricas = MetricasVariante()
+                    inicio = time.perf_counter()
+                    with ThreadPoolExecutor(max_workers=self.concurrencia) as ejecutor:
+                        for _ in range(self.compradores):
+                            ejecutor.submit(self._comprador, variante, metricas)
+                    metricas.duracion = time.perf_counter() - inicio
+                    resultados[variante] = metricas.resumen()
+        finally:
+            core.PROVIDER_CACHE.clear()
+            if pasarelas is not None:
+                pasarelas.detiene()
+        return resultados
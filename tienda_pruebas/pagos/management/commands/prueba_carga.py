@@ -0,0 +1,53 @@
+import json
+
+from django.core.management.base import BaseCommand
+from pagos.carga import GeneradorCarga
+
+from django_payments_chile.perfilado import estadisticas
+
+
+class Command(BaseCommand):
+    help = "Ejecuta compradores concurrentes contra la tienda usando pasarelas falsas locales"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--variantes", nargs="+", default=["flow", "khipu", "webpay"])
+        parser.add_argument("--compradores", type=int, default=100, help="Compradores por variante")
+        parser.add_argument("--concurrencia", type=int, default=10)
+        parser.add_argument("--latencia", type=float, default=0.0, help="Latencia simulada de la pasarela (s)")
+        parser.add_argument("--url-pasarelas", default=None, help="URL de pasarelas falsas ya levantadas")
+        parser.add_argument("--json", action="store_true", help="Imprime el resultado como JSON")
+        parser.add_argument("--fases", action="store_true", help="Desglosa el tiempo de los proveedores por fase")
+
+    def handle(self, *args, **options):
+        generador = GeneradorCarga(
+            variantes=options["variantes"],
+            compradores=options["compradores"],
+            concurrencia=options["concurrencia"],
+        )
+        with estadisticas() as tiempos:
+            resultados = generador.ejecuta(latencia=options["latencia"], url_pasarelas=options["url_pasarelas"])
+        fases = tiempos.resumen() if options["fases"] else {}
+
+        if options["json"]:
+            self.stdout.write(json.dumps({**resultados, "fases": fases} if fases else resultados, indent=2))
+            return
+
+        for variante, resumen in resultados.items():
+            self.stdout.write(
+                f"{variante}: {resumen['compras']} compras, {resumen['errores']} errores, "
+                f"{resumen['compras_por_segundo']:.1f} compras/s, "
+                f"{resumen['consultas_por_compra']:.1f} consultas/compra, "
+                f"{resumen['tiempo_bd']:.3f}s en BD, {resumen['bloqueos']} bloqueos, "
+                f"consulta más lenta {resumen['consulta_mas_lenta'] * 1000:.1f}ms"
+            )
+            for paso, latencias in resumen["pasos"].items():
+                self.stdout.write(
+                    f"  {paso:<13} p50={latencias['p50'] * 1000:.1f}ms p95={latencias['p95'] * 1000:.1f}ms "
+                    f"p99={latencias['p99'] * 1000:.1f}ms max={latencias['max'] * 1000:.1f}ms"
+                )
+            if resumen["ultimo_error"]:
+                self.stdout.write(f"  último error: {resumen['ultimo_error']}")
+        for operacion, desglose in fases.items():
+            self.stdout.write(f"{operacion} (todas las variantes):")
+            for fase, valores in desglose.items():
+                self.stdout.write(f"  {fase:<6} p50={valores['p50']:.2f}ms p95={valores['p95']:.2f}ms")
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pagos", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pago",
+            index=models.Index(fields=["variant", "status", "modified"], name="pago_pendientes_idx"),
+        ),
+    ]
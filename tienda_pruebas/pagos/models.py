@@ -1,8 +1,13 @@
 from django.conf import settings
+from django.db import models
 from payments.models import BasePayment
 
 
 class Pago(BasePayment):
+    class Meta:
+        # Pagos pendientes por antigüedad, para `barre_vencidos`
+        indexes = [models.Index(fields=["variant", "status", "modified"], name="pago_pendientes_idx")]
+
     def get_failure_url(self) -> str:
         # Redirige a esta URL si el pago falla
         return f"https://{settings.PAYMENT_HOST}/payments/{self.pk}/failure"
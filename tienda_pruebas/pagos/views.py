@@ -1,11 +1,12 @@
-from django.shortcuts import redirect
-from payments import get_payment_model
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from payments import RedirectNeeded, get_payment_model
 
 
 def crear_pago(request):
     payment = get_payment_model()
     payment = payment.objects.create(
-        variant="flow",  # Debe coincidir con el nombre en PAYMENT_VARIANTS
+        variant=request.GET.get("variant", "flow"),  # Debe coincidir con el nombre en PAYMENT_VARIANTS
         description="Pago por Orden #123",
         total=10000,  # Monto en centavos (100 pesos)
         currency="CLP",
@@ -13,5 +14,25 @@ def crear_pago(request):
         billing_last_name="Pérez",
         billing_email="juan.perez@example.com",
     )
-    # Redirige al usuario a la URL del proveedor de pagos
-    return redirect(payment.get_process_url())
+    # Redirige al usuario a la página que inicia el pago
+    return redirect("pagar", pk=payment.pk)
+
+
+def pagar(request, pk):
+    payment = get_object_or_404(get_payment_model(), pk=pk)
+    try:
+        payment.get_form(data=request.POST or None)
+    except RedirectNeeded as redireccion:
+        # Redirige al usuario a la URL del proveedor de pagos
+        return redirect(str(redireccion))
+    return HttpResponse(f"Pago {payment.pk}: {payment.status}")
+
+
+def pago_exitoso(request, pk):
+    payment = get_object_or_404(get_payment_model(), pk=pk)
+    return HttpResponse(f"Pago {payment.pk} exitoso: {payment.status}")
+
+
+def pago_fallido(request, pk):
+    payment = get_object_or_404(get_payment_model(), pk=pk)
+    return HttpResponse(f"Pago {payment.pk} fallido: {payment.status}")
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 
+import django
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -20,12 +22,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY: str
+SECRET_KEY = "django-insecure-solo-para-tienda-de-pruebas"  # nosec
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = ["localhost", "127.0.0.1", "testserver"]
 
 
 # Application definition
@@ -39,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "tienda",
     "pagos",
+    "django_payments_chile",
 ]
 
 MIDDLEWARE = [
@@ -79,9 +82,15 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Con varios compradores concurrentes SQLite necesita esperar el bloqueo en vez de fallar
+        "OPTIONS": {"timeout": 20},
     }
 }
 
+if django.VERSION >= (5, 1):
+    # Toma el bloqueo de escritura al abrir la transacción; `transaction_mode` existe desde Django 5.1
+    DATABASES["default"]["OPTIONS"]["transaction_mode"] = "IMMEDIATE"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -128,12 +137,12 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Configuración de django-payments
 PAYMENT_HOST = "mi-tienda.cl"  # Reemplaza con tu dominio
 PAYMENT_USES_SSL = True  # Usa True si tienes HTTPS, False en caso contrario
-PAYMENT_MODEL = "pagos.modelos.Pago"  # Modelo personalizado para pagos
+PAYMENT_MODEL = "pagos.Pago"  # Modelo personalizado para pagos
 
 # Configuración para proveedores chilenos (ejemplo con Flow)
 PAYMENT_VARIANTS = {
     "flow": (
-        "django_payments_chile.FlowProvider",
+        "django_payments_chile.providers.FlowProvider",
         {
             "api_key": "",
             "api_secret": "",
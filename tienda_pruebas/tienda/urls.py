@@ -17,10 +17,14 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import include, path
-from pagos.views import crear_pago
+from pagos.views import crear_pago, pagar, pago_exitoso, pago_fallido
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("payments/", include("payments.urls")),
-    path("/tienda/crear-pago", crear_pago, name="crear_pago"),
+    path("payments/chile/", include("django_payments_chile.urls")),
+    path("payments/<int:pk>/success", pago_exitoso, name="payment_success"),
+    path("payments/<int:pk>/failure", pago_fallido, name="payment_failure"),
+    path("tienda/crear-pago", crear_pago, name="crear_pago"),
+    path("tienda/pagar/<int:pk>", pagar, name="pagar"),
 ]